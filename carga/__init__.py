@@ -0,0 +1,7 @@
+"""
+Gerador de carga dos desafios
+
+Executa cenários (carga/cenarios/*.json) em malha aberta contra os
+serviços, na rede ou em processo com PostgreSQL e Redis em memória, e
+reporta vazão e percentis de latência em JSON. Ver carga/__main__.py.
+"""
@@ -0,0 +1,67 @@
+"""
+Executa um cenário de carga e imprime o relatório em JSON
+
+Uso (a partir da raiz do repositório):
+    python -m carga carga/cenarios/desafio5.json --local
+    python -m carga carga/cenarios/desafio5.json --alvo http://localhost:5000 --rps 200 --duracao 60
+    python -m carga carga/cenarios/desafio2.json --local --saida resultado.json
+
+--local carrega os serviços do desafio neste processo, com PostgreSQL e
+Redis em memória (carga.falsos) e sem rede; sem ele, as requisições vão
+para o "alvo" do cenário (ex.: os containers do docker-compose).
+
+O relatório vai para a saída padrão (ou --saida) e um resumo para stderr.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from carga.gerador import GeradorCarga
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('cenario', help="arquivo JSON do cenário")
+    parser.add_argument('--local', action='store_true', help="serviços em processo, com bancos em memória")
+    parser.add_argument('--alvo', help="URL base (substitui a do cenário)")
+    parser.add_argument('--rps', type=float, help="taxa alvo (substitui a do cenário)")
+    parser.add_argument('--duracao', type=float, help="duração da medição em segundos")
+    parser.add_argument('--aquecimento', type=float, help="aquecimento em segundos")
+    parser.add_argument('--chegadas', choices=('constante', 'poisson'))
+    parser.add_argument('--saida', help="arquivo para o relatório JSON")
+    args = parser.parse_args()
+
+    with open(args.cenario, encoding='utf-8') as arquivo:
+        cenario = json.load(arquivo)
+    for chave, valor in (('alvo', args.alvo), ('rps', args.rps), ('duracao_s', args.duracao),
+                         ('aquecimento_s', args.aquecimento), ('chegadas', args.chegadas)):
+        if valor is not None:
+            cenario[chave] = valor
+
+    transporte = None
+    if args.local:
+        from carga.locais import montar
+        from carga.transporte import TransporteWSGI
+        local = cenario.get('local', {})
+        print(f"Montando {local.get('desafio')} em processo...", file=sys.stderr)
+        apps = montar(local.get('desafio'), local.get('dados'))
+        transporte = TransporteWSGI(apps, threads=local.get('threads', 16))
+
+    print(f"Executando {cenario.get('nome')}: {cenario['rps']} req/s por {cenario['duracao_s']}s "
+          f"({'local' if args.local else cenario['alvo']})", file=sys.stderr)
+    relatorio = asyncio.run(GeradorCarga(cenario, transporte).executar())
+
+    saida = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(saida + '\n')
+    else:
+        print(saida)
+
+    latencia = relatorio['latencia_ms'] or {}
+    print(f"concluídas={relatorio['concluidas']} rps={relatorio['rps_obtido']} "
+          f"erros={sum(relatorio['erros'].values())} descartadas={relatorio['descartadas']} "
+          f"p50={latencia.get('p50')}ms p99={latencia.get('p99')}ms", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
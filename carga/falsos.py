@@ -0,0 +1,269 @@
+"""
+Stand-ins em memória do PostgreSQL e do Redis
+
+Cobrem apenas o que os serviços dos desafios 2 e 3 usam, para executá-los
+em processo, sem containers nem rede. Não são bancos de verdade: o custo
+de uma consulta aqui não representa o do PostgreSQL, só remove a
+dependência externa para medir o serviço em si.
+
+BancoFalso entende:
+    SELECT * FROM <tabela> [ORDER BY <coluna> [DESC]]
+    SELECT COUNT(*) FROM <tabela>
+    INSERT INTO <tabela> (<colunas>) VALUES (%s, ...) [RETURNING <colunas>]
+
+RedisFalso implementa os comandos usados pelos serviços, com expiração,
+hashes e pipelines (WATCH não detecta conflitos).
+"""
+import re
+import threading
+import time
+from datetime import datetime
+
+# Colunas preenchidas pelo banco quando o INSERT não as informa
+PADROES = {
+    'usuarios': {'data_criacao': datetime.now},
+    'logs': {'data_log': datetime.now},
+    'posts': {'autor': lambda: 'Anônimo', 'data_criacao': datetime.now},
+}
+UNICOS = {
+    'usuarios': ('email',),
+}
+
+_SELECT = re.compile(r"SELECT \* FROM (\w+)(?: ORDER BY (\w+)( DESC)?)?\s*;?\s*$", re.I)
+_COUNT = re.compile(r"SELECT COUNT\(\*\) FROM (\w+)\s*;?\s*$", re.I)
+_INSERT = re.compile(
+    r"INSERT INTO (\w+) \(([^)]*)\) VALUES \(([^)]*)\)(?: RETURNING (.+?))?\s*;?\s*$",
+    re.I | re.S
+)
+
+class ErroBancoFalso(Exception):
+    """Consulta não suportada ou violação de restrição"""
+
+class BancoFalso:
+    """PostgreSQL em memória: tabelas como listas de dicts em ordem de id"""
+
+    def __init__(self):
+        self.tabelas = {}
+        self._proximo_id = {}
+        self._unicos = {}
+        self._lock = threading.Lock()
+
+    def inserir(self, tabela, **valores):
+        """Insere uma linha, preenchendo id e colunas padrão; retorna a linha"""
+        with self._lock:
+            return self._inserir(tabela, valores)
+
+    def _inserir(self, tabela, valores):
+        linhas = self.tabelas.setdefault(tabela, [])
+        for coluna, padrao in PADROES.get(tabela, {}).items():
+            if valores.get(coluna) is None:
+                valores[coluna] = padrao()
+        for coluna in UNICOS.get(tabela, ()):
+            if valores[coluna] in self._unicos.get((tabela, coluna), ()):
+                raise ErroBancoFalso(f'duplicate key value violates unique constraint "{tabela}_{coluna}_key"')
+        for coluna in UNICOS.get(tabela, ()):
+            self._unicos.setdefault((tabela, coluna), set()).add(valores[coluna])
+        self._proximo_id[tabela] = self._proximo_id.get(tabela, 0) + 1
+        linha = {'id': self._proximo_id[tabela], **valores}
+        linhas.append(linha)
+        return linha
+
+    def executar(self, sql, parametros=()):
+        """Executa a consulta; retorna a lista de linhas (dicts) do resultado"""
+        sql = ' '.join(sql.split())
+        with self._lock:
+            encontrado = _SELECT.match(sql)
+            if encontrado:
+                tabela, coluna, decrescente = encontrado.groups()
+                linhas = list(self.tabelas.get(tabela, []))
+                if coluna and coluna != 'id':
+                    linhas.sort(key=lambda linha: linha[coluna])
+                if decrescente:
+                    linhas.reverse()
+                return [dict(linha) for linha in linhas]
+
+            encontrado = _COUNT.match(sql)
+            if encontrado:
+                return [{'count': len(self.tabelas.get(encontrado.group(1), []))}]
+
+            encontrado = _INSERT.match(sql)
+            if encontrado:
+                tabela, colunas, _, retorno = encontrado.groups()
+                colunas = [coluna.strip() for coluna in colunas.split(',')]
+                linha = self._inserir(tabela, dict(zip(colunas, parametros)))
+                if not retorno:
+                    return []
+                return [{coluna.strip(): linha[coluna.strip()] for coluna in retorno.split(',')}]
+
+        raise ErroBancoFalso(f"Consulta não suportada pelo banco falso: {sql}")
+
+    def conectar(self):
+        """Substituto de conectar_db() dos serviços"""
+        return ConexaoFalsa(self)
+
+class ConexaoFalsa:
+    def __init__(self, banco):
+        self._banco = banco
+
+    def cursor(self, cursor_factory=None):
+        # RealDictCursor devolve dicts; o cursor padrão, tuplas
+        return CursorFalso(self._banco, como_dict=cursor_factory is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+class CursorFalso:
+    def __init__(self, banco, como_dict):
+        self._banco = banco
+        self._como_dict = como_dict
+        self._linhas = []
+
+    def execute(self, sql, parametros=()):
+        linhas = self._banco.executar(sql, parametros)
+        self._linhas = linhas if self._como_dict else [tuple(linha.values()) for linha in linhas]
+
+    def fetchall(self):
+        linhas, self._linhas = self._linhas, []
+        return linhas
+
+    def fetchone(self):
+        return self._linhas.pop(0) if self._linhas else None
+
+    def close(self):
+        pass
+
+class RedisFalso:
+    """Redis em memória; valores em bytes, como com decode_responses=False"""
+
+    def __init__(self):
+        self._dados = {}
+        self._expira = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _bytes(valor):
+        if isinstance(valor, bytes):
+            return valor
+        return str(valor).encode('utf-8')
+
+    def _vivo(self, chave):
+        expira = self._expira.get(chave)
+        if expira is not None and expira <= time.monotonic():
+            self._dados.pop(chave, None)
+            self._expira.pop(chave, None)
+        return chave in self._dados
+
+    def ping(self):
+        return True
+
+    def get(self, chave):
+        with self._lock:
+            return self._dados.get(chave) if self._vivo(chave) else None
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = self._bytes(valor)
+            self._expira.pop(chave, None)
+            return True
+
+    def setex(self, chave, segundos, valor):
+        with self._lock:
+            self.set(chave, valor)
+            return self.expire(chave, segundos)
+
+    def delete(self, *chaves):
+        with self._lock:
+            removidas = sum(1 for chave in chaves if self._vivo(chave))
+            for chave in chaves:
+                self._dados.pop(chave, None)
+                self._expira.pop(chave, None)
+            return removidas
+
+    def incr(self, chave):
+        with self._lock:
+            valor = int(self.get(chave) or 0) + 1
+            self._dados[chave] = self._bytes(valor)
+            return valor
+
+    def expire(self, chave, segundos):
+        with self._lock:
+            if not self._vivo(chave):
+                return False
+            self._expira[chave] = time.monotonic() + segundos
+            return True
+
+    def ttl(self, chave):
+        with self._lock:
+            if not self._vivo(chave):
+                return -2
+            expira = self._expira.get(chave)
+            return -1 if expira is None else round(expira - time.monotonic())
+
+    def hset(self, chave, campo, valor):
+        with self._lock:
+            if not self._vivo(chave):
+                self._dados[chave] = {}
+            novo = campo not in self._dados[chave]
+            self._dados[chave][self._bytes(campo)] = self._bytes(valor)
+            return int(novo)
+
+    def hget(self, chave, campo):
+        with self._lock:
+            if not self._vivo(chave):
+                return None
+            return self._dados[chave].get(self._bytes(campo))
+
+    def hmget(self, chave, campos):
+        with self._lock:
+            return [self.hget(chave, campo) for campo in campos]
+
+    def hkeys(self, chave):
+        with self._lock:
+            return list(self._dados[chave]) if self._vivo(chave) else []
+
+    def pipeline(self):
+        return PipelineFalso(self)
+
+class PipelineFalso:
+    """
+    Pipeline com a semântica do redis-py: comandos enfileirados até
+    execute(); após watch(), executados na hora até multi()
+    """
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._fila = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self._fila = []
+
+    def watch(self, *chaves):
+        self._fila = None
+
+    def multi(self):
+        self._fila = []
+
+    def execute(self):
+        with self._redis._lock:
+            resultados = [comando(*args) for comando, args in self._fila or []]
+        self._fila = []
+        return resultados
+
+    def __getattr__(self, nome):
+        comando = getattr(self._redis, nome)
+
+        def enfileirar(*args):
+            if self._fila is None:
+                return comando(*args)
+            self._fila.append((comando, args))
+            return self
+        return enfileirar
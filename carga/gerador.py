@@ -0,0 +1,219 @@
+"""
+Gerador de carga em malha aberta (open-loop)
+
+As requisições são disparadas nos instantes agendados pela taxa alvo,
+independentemente das respostas anteriores: um servidor lento não reduz
+a carga oferecida, como acontece com usuários reais. A latência é medida
+a partir do instante agendado (e não do envio efetivo), para não esconder
+filas do lado do cliente (coordinated omission).
+
+O cenário (um dict, normalmente lido de carga/cenarios/*.json):
+    alvo            URL base do serviço
+    rps             taxa alvo, em requisições por segundo
+    duracao_s       duração da medição
+    aquecimento_s   período inicial disparado mas fora do relatório
+    chegadas        "constante" (intervalo fixo) ou "poisson"
+    timeout_s       timeout de cada requisição
+    max_em_voo      limite de requisições simultâneas; acima dele a
+                    requisição agendada é descartada e contada
+    semente         semente da escolha das requisições e dos ids
+    requisicoes     lista de {nome, metodo, caminho, corpo?, peso?,
+                    ids?: [min, max], alvo?, status_esperado?: [...]}
+
+Em caminho e corpo, "{i}" vira o número sequencial da requisição,
+"{id}" um inteiro aleatório em ids e "{execucao}" um identificador da
+execução (para e-mails únicos entre execuções). Um valor do corpo igual
+a "{id}" ou "{i}" vira inteiro.
+"""
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+
+PERCENTIS = (('p50', 50), ('p90', 90), ('p95', 95), ('p99', 99), ('p999', 99.9))
+
+def percentil(ordenados, p):
+    """Percentil pelo método nearest-rank de uma lista já ordenada"""
+    if not ordenados:
+        return None
+    posicao = max(0, min(len(ordenados) - 1, int(len(ordenados) * p / 100 + 0.5) - 1))
+    return ordenados[posicao]
+
+def resumo_latencias(latencias):
+    """min, percentis, max e média (ms) de uma lista de latências em ms"""
+    ordenados = sorted(latencias)
+    if not ordenados:
+        return None
+    resumo = {"min": round(ordenados[0], 3)}
+    for nome, p in PERCENTIS:
+        resumo[nome] = round(percentil(ordenados, p), 3)
+    resumo["max"] = round(ordenados[-1], 3)
+    resumo["media"] = round(sum(ordenados) / len(ordenados), 3)
+    return resumo
+
+def substituir(valor, variaveis):
+    """Aplica os placeholders em strings, listas e dicts do cenário"""
+    if isinstance(valor, str):
+        if valor in ('{i}', '{id}'):
+            return variaveis[valor[1:-1]]
+        for nome, conteudo in variaveis.items():
+            valor = valor.replace('{' + nome + '}', str(conteudo))
+        return valor
+    if isinstance(valor, list):
+        return [substituir(item, variaveis) for item in valor]
+    if isinstance(valor, dict):
+        return {chave: substituir(item, variaveis) for chave, item in valor.items()}
+    return valor
+
+class Estatisticas:
+    """Contadores e latências de um conjunto de requisições"""
+
+    def __init__(self):
+        self.enviadas = 0
+        self.concluidas = 0
+        self.sucesso = 0
+        self.erros = {}
+        self.latencias = []
+
+    def registrar(self, latencia_ms, erro=None):
+        self.concluidas += 1
+        self.latencias.append(latencia_ms)
+        if erro is None:
+            self.sucesso += 1
+        else:
+            self.erros[erro] = self.erros.get(erro, 0) + 1
+
+    def relatorio(self, duracao):
+        return {
+            "enviadas": self.enviadas,
+            "concluidas": self.concluidas,
+            "sucesso": self.sucesso,
+            "erros": dict(sorted(self.erros.items())),
+            "rps_obtido": round(self.concluidas / duracao, 2) if duracao else None,
+            "latencia_ms": resumo_latencias(self.latencias)
+        }
+
+class GeradorCarga:
+    """Executa um cenário em malha aberta e produz o relatório"""
+
+    def __init__(self, cenario, transporte=None):
+        """
+        Args:
+            cenario: dict do cenário (ver docstring do módulo)
+            transporte: transporte do httpx (ex.: TransporteWSGI); None usa a rede
+        """
+        self.cenario = cenario
+        self.transporte = transporte
+        self.rps = float(cenario['rps'])
+        self.duracao = float(cenario['duracao_s'])
+        self.aquecimento = float(cenario.get('aquecimento_s', 0))
+        self.chegadas = cenario.get('chegadas', 'constante')
+        self.timeout = float(cenario.get('timeout_s', 10))
+        self.max_em_voo = int(cenario.get('max_em_voo', 1000))
+        self.aleatorio = random.Random(cenario.get('semente'))
+        self.execucao = uuid.uuid4().hex[:8]
+
+        self.requisicoes = cenario['requisicoes']
+        self.pesos = [requisicao.get('peso', 1) for requisicao in self.requisicoes]
+
+        self.total = Estatisticas()
+        self.por_requisicao = {requisicao['nome']: Estatisticas() for requisicao in self.requisicoes}
+        self.descartadas = 0
+        self.em_voo = 0
+
+    def _intervalo(self):
+        if self.chegadas == 'poisson':
+            return self.aleatorio.expovariate(self.rps)
+        return 1 / self.rps
+
+    def _montar(self, requisicao, i):
+        """(método, url, corpo) da i-ésima requisição"""
+        ids = requisicao.get('ids')
+        variaveis = {
+            'i': i,
+            'id': self.aleatorio.randint(ids[0], ids[1]) if ids else i,
+            'execucao': self.execucao
+        }
+        url = requisicao.get('alvo', self.cenario['alvo']).rstrip('/') + substituir(requisicao['caminho'], variaveis)
+        corpo = substituir(requisicao['corpo'], variaveis) if 'corpo' in requisicao else None
+        return requisicao.get('metodo', 'GET').upper(), url, corpo
+
+    async def _disparar(self, cliente, requisicao, montada, agendado, medida):
+        metodo, url, corpo = montada
+        esperados = requisicao.get('status_esperado')
+        erro = None
+        try:
+            resposta = await cliente.request(metodo, url, json=corpo)
+            if esperados is not None and resposta.status_code not in esperados:
+                erro = f"status_{resposta.status_code}"
+            elif esperados is None and resposta.status_code >= 400:
+                erro = f"status_{resposta.status_code}"
+        except httpx.TimeoutException:
+            erro = "timeout"
+        except httpx.TransportError:
+            erro = "conexao"
+        finally:
+            self.em_voo -= 1
+        latencia_ms = (time.perf_counter() - agendado) * 1000
+        if medida:
+            self.total.registrar(latencia_ms, erro)
+            self.por_requisicao[requisicao['nome']].registrar(latencia_ms, erro)
+
+    async def executar(self):
+        """Executa o cenário e retorna o relatório (dict)"""
+        limites = httpx.Limits(max_connections=self.max_em_voo, max_keepalive_connections=self.max_em_voo)
+        async with httpx.AsyncClient(transport=self.transporte, limits=limites, timeout=self.timeout) as cliente:
+            tarefas = set()
+            inicio = time.perf_counter()
+            inicio_medicao = inicio + self.aquecimento
+            fim = inicio_medicao + self.duracao
+            agendado = inicio
+            i = 0
+            while agendado < fim:
+                espera = agendado - time.perf_counter()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+
+                requisicao = self.aleatorio.choices(self.requisicoes, self.pesos)[0]
+                medida = agendado >= inicio_medicao
+                if self.em_voo >= self.max_em_voo:
+                    if medida:
+                        self.descartadas += 1
+                else:
+                    self.em_voo += 1
+                    if medida:
+                        self.total.enviadas += 1
+                        self.por_requisicao[requisicao['nome']].enviadas += 1
+                    # Montada aqui, e não na tarefa: os ids saem do mesmo gerador
+                    # aleatório que as chegadas, na ordem do agendamento
+                    montada = self._montar(requisicao, i)
+                    tarefa = asyncio.create_task(self._disparar(cliente, requisicao, montada, agendado, medida))
+                    tarefas.add(tarefa)
+                    tarefa.add_done_callback(tarefas.discard)
+
+                i += 1
+                agendado += self._intervalo()
+
+            if tarefas:
+                await asyncio.wait(tarefas)
+
+        relatorio = {
+            "cenario": self.cenario.get('nome'),
+            "alvo": self.cenario['alvo'],
+            "modo": "local" if self.transporte is not None else "rede",
+            "rps_alvo": self.rps,
+            "chegadas": self.chegadas,
+            "duracao_s": self.duracao,
+            "aquecimento_s": self.aquecimento,
+            "descartadas": self.descartadas,
+            **self.total.relatorio(self.duracao),
+            "por_requisicao": {
+                nome: estatisticas.relatorio(self.duracao)
+                for nome, estatisticas in self.por_requisicao.items()
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+        return relatorio
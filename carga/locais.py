@@ -0,0 +1,164 @@
+"""
+Montagem dos serviços de cada desafio em processo, sem rede
+
+Cada função montar_desafioN(dados) carrega o(s) app.py do desafio, troca
+PostgreSQL e Redis pelos stand-ins de carga.falsos, liga as chamadas
+entre serviços por AdaptadorWSGI e popula os dados iniciais. Retorna
+{url base: aplicação WSGI}, com as mesmas portas do docker-compose, para
+que os cenários usem o mesmo "alvo" nos dois modos.
+"""
+import importlib.util
+import os
+import sys
+import types
+from datetime import datetime, timedelta
+
+import requests
+
+from carga.falsos import BancoFalso, RedisFalso
+from carga.transporte import AdaptadorWSGI
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A linha de log por requisição da instrumentação iria para o mesmo stdout
+# do relatório; pode ser reativada com INSTRUMENTACAO_LOG=true
+os.environ.setdefault('INSTRUMENTACAO_LOG', 'false')
+# Em processo todas as requisições vêm do mesmo cliente, e os
+# microbenchmarks chamam a mesma rota sem pausa: o limite de taxa do
+# gateway recusaria a maior parte; pode ser reativado com LIMITE_HABILITADO=true
+os.environ.setdefault('LIMITE_HABILITADO', 'false')
+
+# Tamanho dos lotes ao popular o desafio5 (LOTE_MAX_ESCRITAS dos serviços)
+LOTE_CARGA = 1000
+
+def carregar(nome, caminho):
+    """Importa um app.py pelo caminho, sob um nome de módulo próprio"""
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    spec = importlib.util.spec_from_file_location(nome, os.path.join(RAIZ, caminho))
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def sessao_local(apps):
+    """Sessão do requests com as URLs base dadas ligadas às aplicações"""
+    sessao = requests.Session()
+    for url, app in apps.items():
+        sessao.mount(url, AdaptadorWSGI(app))
+    return sessao
+
+def popular_lotes(cliente, caminho, chave, itens):
+    """Envia os itens à rota de lote em blocos de LOTE_CARGA; retorna os resultados por item"""
+    resultados = []
+    for inicio in range(0, len(itens), LOTE_CARGA):
+        resposta = cliente.post(caminho, json={chave: itens[inicio:inicio + LOTE_CARGA]})
+        resultado = resposta.get_json()
+        if resposta.status_code != 200 or resultado['falhas']:
+            raise RuntimeError(f"Falha ao popular {caminho}: {resposta.status_code} {resultado}")
+        resultados.extend(resultado['resultados'])
+    return resultados
+
+def montar_desafio1(dados):
+    servidor = carregar('carga_desafio1_servidor', 'desafio1/servidor/app.py')
+    return {"http://localhost:8080": servidor.app}
+
+def montar_desafio2(dados):
+    banco = BancoFalso()
+    for i in range(dados.get('usuarios', 0)):
+        banco.inserir('usuarios', nome=f"Usuário {i}", email=f"usuario{i}@example.com")
+    for i in range(dados.get('logs', 0)):
+        banco.inserir('logs', mensagem=f"Usuário {i} criado")
+
+    modulo = carregar('carga_desafio2_app', 'desafio2/app/app.py')
+    modulo.conectar_db = banco.conectar
+    return {"http://localhost:5000": modulo.app}
+
+def montar_desafio3(dados):
+    banco = BancoFalso()
+    redis = RedisFalso()
+    for i in range(dados.get('posts', 0)):
+        banco.inserir('posts', titulo=f"Post {i}", conteudo=f"Conteúdo do post {i}. " * 10, autor=f"Autor {i % 50}")
+
+    modulo = carregar('carga_desafio3_web', 'desafio3/web/app.py')
+    modulo.conectar_db = banco.conectar
+    modulo.conectar_redis = lambda: redis
+    return {"http://localhost:5000": modulo.app}
+
+def montar_desafio4(dados):
+    servico_a = carregar('carga_desafio4_servico_a', 'desafio4/servico-a/app.py')
+    servico_b = carregar('carga_desafio4_servico_b', 'desafio4/servico-b/app.py')
+
+    perfis = ('administrador', 'editor', 'leitor')
+    agora = datetime.now()
+    proximo_id = max(usuario['id'] for usuario in servico_a.USUARIOS) + 1
+    servico_a.USUARIOS.extend({
+        "id": proximo_id + i,
+        "nome": f"Usuário {i}",
+        "email": f"usuario{i}@email.com",
+        "ativo": i % 5 != 0,
+        "data_cadastro": (agora - timedelta(days=i % 720)).isoformat(),
+        "perfil": perfis[i % len(perfis)]
+    } for i in range(dados.get('usuarios', 0)))
+
+    # O servico-b chama requests.get(SERVICO_A_URL/...) no módulo
+    sessao = sessao_local({servico_b.SERVICO_A_URL: servico_a.app})
+    servico_b.requests = types.SimpleNamespace(get=sessao.get, exceptions=requests.exceptions)
+    return {
+        "http://localhost:5001": servico_a.app,
+        "http://localhost:5002": servico_b.app
+    }
+
+def montar_desafio5(dados):
+    usuarios = carregar('carga_desafio5_usuarios', 'desafio5/usuarios/app.py')
+    pedidos = carregar('carga_desafio5_pedidos', 'desafio5/pedidos/app.py')
+    gateway = carregar('carga_desafio5_gateway', 'desafio5/gateway/app.py')
+
+    upstreams = {
+        gateway.USUARIOS_SERVICE_URL: usuarios.app,
+        gateway.PEDIDOS_SERVICE_URL: pedidos.app
+    }
+    for sessao in [*gateway.SESSOES.values(), gateway.SESSAO_PADRAO]:
+        for url, app in upstreams.items():
+            sessao.mount(url, AdaptadorWSGI(app))
+
+    perfis = ('cliente', 'vendedor', 'administrador')
+    total_usuarios = dados.get('usuarios', 0)
+    popular_lotes(usuarios.app.test_client(), '/api/usuarios/lote', 'usuarios', [{
+        "nome": f"Usuário {i}",
+        "email": f"usuario{i}@email.com",
+        "perfil": perfis[i % len(perfis)]
+    } for i in range(total_usuarios)])
+
+    # Todo pedido nasce pendente; os demais status vão num segundo lote,
+    # como alterações de status dos pedidos já criados
+    cliente_pedidos = pedidos.app.test_client()
+    criados = popular_lotes(cliente_pedidos, '/api/pedidos/lote', 'pedidos', [{
+        "usuario_id": 1 + i % max(total_usuarios, 1),
+        "itens": [{"produto": f"Produto {i % 100}", "quantidade": 1 + i % 3, "preco": 10.0 + i % 90}]
+    } for i in range(dados.get('pedidos', 0))])
+    status = ('pendente', 'processando', 'enviado', 'entregue')
+    popular_lotes(cliente_pedidos, '/api/pedidos/lote', 'pedidos', [{
+        "id": resultado['pedido']['id'],
+        "status": status[i % len(status)]
+    } for i, resultado in enumerate(criados) if i % len(status)])
+
+    return {
+        "http://localhost:5000": gateway.app,
+        "http://localhost:5001": usuarios.app,
+        "http://localhost:5002": pedidos.app
+    }
+
+MONTADORES = {
+    'desafio1': montar_desafio1,
+    'desafio2': montar_desafio2,
+    'desafio3': montar_desafio3,
+    'desafio4': montar_desafio4,
+    'desafio5': montar_desafio5,
+}
+
+def montar(desafio, dados=None):
+    """Aplicações locais do desafio, {url base: aplicação WSGI}"""
+    if desafio not in MONTADORES:
+        raise ValueError(f"Desafio sem montagem local: {desafio}")
+    return MONTADORES[desafio](dados or {})
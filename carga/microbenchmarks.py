@@ -0,0 +1,161 @@
+"""
+Microbenchmarks das rotas mais pesadas dos serviços
+
+Cada benchmark chama uma rota pelo test client do Flask, no mesmo
+processo, com dados sintéticos de tamanho configurável (carga.locais:
+PostgreSQL e Redis em memória; gateway e servico-b ligados aos serviços
+de que dependem sem rede). Mede só o handler e o que ele chama, sem
+servidor HTTP.
+
+Resultados podem ser salvos como baseline e comparados em execuções
+seguintes; a comparação falha (código de saída 1) quando a mediana de
+algum benchmark piora mais que --limite por cento.
+
+Uso (a partir da raiz do repositório):
+    python -m carga.microbenchmarks --tamanho 10000 --salvar baseline.json
+    python -m carga.microbenchmarks --tamanho 10000 --comparar baseline.json
+    python -m carga.microbenchmarks --tamanho 1000000 --filtro desafio5 --rodadas 5
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from carga.locais import montar
+
+# (nome, desafio, url base do serviço, caminho)
+BENCHMARKS = [
+    ('desafio2.listar_usuarios', 'desafio2', 'http://localhost:5000', '/usuarios'),
+    ('desafio2.listar_logs', 'desafio2', 'http://localhost:5000', '/logs'),
+    ('desafio3.listar_posts', 'desafio3', 'http://localhost:5000', '/api/posts'),
+    ('desafio3.listar_posts_cache', 'desafio3', 'http://localhost:5000', '/api/posts/cache'),
+    ('desafio4.listar_usuarios', 'desafio4', 'http://localhost:5001', '/api/usuarios'),
+    ('desafio4.estatisticas', 'desafio4', 'http://localhost:5001', '/api/usuarios/estatisticas/resumo'),
+    ('desafio4.usuarios_relatorio', 'desafio4', 'http://localhost:5002', '/api/usuarios/relatorio'),
+    ('desafio5.listar_usuarios', 'desafio5', 'http://localhost:5001', '/api/usuarios?limit=50&perfil=cliente'),
+    ('desafio5.estatisticas_usuarios', 'desafio5', 'http://localhost:5001', '/api/usuarios/estatisticas/resumo'),
+    ('desafio5.estatisticas_pedidos', 'desafio5', 'http://localhost:5002', '/api/pedidos/estatisticas/resumo'),
+    ('desafio5.listar_pedidos_usuario', 'desafio5', 'http://localhost:5002', '/api/pedidos/usuario/7'),
+    ('desafio5.gateway_usuarios_com_pedidos', 'desafio5', 'http://localhost:5000', '/usuarios-com-pedidos?limit=50'),
+]
+
+def dados_sinteticos(desafio, tamanho):
+    """Quantidade de registros de cada tabela/serviço do desafio"""
+    return {
+        'desafio2': {'usuarios': tamanho, 'logs': tamanho},
+        'desafio3': {'posts': tamanho},
+        'desafio4': {'usuarios': tamanho},
+        'desafio5': {'usuarios': tamanho, 'pedidos': tamanho},
+    }[desafio]
+
+def medir(cliente, caminho, rodadas, aquecimento, tempo_max):
+    """Tempos (s) de cada rodada; para antes de rodadas se passar de tempo_max (mínimo de 3)"""
+    for _ in range(aquecimento):
+        cliente.get(caminho)
+
+    tempos = []
+    inicio = time.perf_counter()
+    while len(tempos) < rodadas:
+        antes = time.perf_counter()
+        resposta = cliente.get(caminho)
+        tempos.append(time.perf_counter() - antes)
+        if resposta.status_code != 200:
+            raise RuntimeError(f"{caminho} respondeu {resposta.status_code}: {resposta.get_data(as_text=True)[:200]}")
+        if len(tempos) >= 3 and time.perf_counter() - inicio > tempo_max:
+            break
+    return tempos
+
+def resumo(tempos):
+    """Estatísticas em ms, no formato salvo na baseline"""
+    ms = [tempo * 1000 for tempo in tempos]
+    mediana = statistics.median(ms)
+    return {
+        "rodadas": len(ms),
+        "min": round(min(ms), 3),
+        "max": round(max(ms), 3),
+        "media": round(statistics.mean(ms), 3),
+        "mediana": round(mediana, 3),
+        "desvio": round(statistics.stdev(ms), 3) if len(ms) > 1 else 0.0,
+        "ops": round(1000 / mediana, 2) if mediana else None
+    }
+
+def executar(tamanho, filtro, rodadas, aquecimento, tempo_max):
+    """Executa os benchmarks selecionados e retorna {nome: resumo}"""
+    selecionados = [b for b in BENCHMARKS if not filtro or any(f in b[0] for f in filtro)]
+    montados = {}
+    resultados = {}
+    for nome, desafio, url, caminho in selecionados:
+        if desafio not in montados:
+            print(f"Montando {desafio} com {dados_sinteticos(desafio, tamanho)}...", file=sys.stderr)
+            inicio = time.perf_counter()
+            montados[desafio] = montar(desafio, dados_sinteticos(desafio, tamanho))
+            print(f"  pronto em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+        cliente = montados[desafio][url].test_client()
+        resultados[nome] = resumo(medir(cliente, caminho, rodadas, aquecimento, tempo_max))
+        r = resultados[nome]
+        print(f"{nome:<42}{r['mediana']:>11.3f}{r['min']:>11.3f}{r['max']:>11.3f}{r['desvio']:>10.3f}{r['rodadas']:>8}")
+    return resultados
+
+def comparar(resultados, baseline, limite):
+    """Imprime a variação das medianas; retorna os nomes que pioraram mais que limite %"""
+    regressoes = []
+    print(f"\n{'Benchmark':<42}{'baseline':>11}{'atual':>11}{'variação':>11}")
+    for nome, atual in resultados.items():
+        anterior = baseline['resultados'].get(nome)
+        if anterior is None:
+            print(f"{nome:<42}{'-':>11}{atual['mediana']:>11.3f}{'novo':>11}")
+            continue
+        variacao = (atual['mediana'] - anterior['mediana']) / anterior['mediana'] * 100
+        marca = ''
+        if variacao > limite:
+            regressoes.append(nome)
+            marca = '  << regressão'
+        print(f"{nome:<42}{anterior['mediana']:>11.3f}{atual['mediana']:>11.3f}{variacao:>+10.1f}%{marca}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanho', type=int, default=10000, help="registros por tabela/serviço (padrão 10000)")
+    parser.add_argument('--filtro', action='append', help="executa só benchmarks cujo nome contém o texto (repetível)")
+    parser.add_argument('--rodadas', type=int, default=20)
+    parser.add_argument('--aquecimento', type=int, default=2, help="chamadas descartadas antes de medir")
+    parser.add_argument('--tempo-max', type=float, default=10, help="segundos por benchmark, no máximo")
+    parser.add_argument('--salvar', help="grava os resultados como baseline neste arquivo")
+    parser.add_argument('--comparar', help="compara as medianas com a baseline deste arquivo")
+    parser.add_argument('--limite', type=float, default=10, help="piora máxima da mediana, em %% (padrão 10)")
+    args = parser.parse_args()
+
+    print(f"{'Benchmark (ms)':<42}{'mediana':>11}{'min':>11}{'max':>11}{'desvio':>10}{'rodadas':>8}")
+    resultados = executar(args.tamanho, args.filtro, args.rodadas, args.aquecimento, args.tempo_max)
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                "tamanho": args.tamanho,
+                "maquina": {
+                    "python": platform.python_version(),
+                    "plataforma": platform.platform(),
+                    "cpus": os.cpu_count()
+                },
+                "timestamp": datetime.now().isoformat(),
+                "resultados": resultados
+            }, arquivo, ensure_ascii=False, indent=2)
+            arquivo.write('\n')
+        print(f"\nBaseline salva em {args.salvar}", file=sys.stderr)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)
+        if baseline.get('tamanho') != args.tamanho:
+            print(f"Aviso: baseline com tamanho {baseline.get('tamanho')}, execução com {args.tamanho}", file=sys.stderr)
+        regressoes = comparar(resultados, baseline, args.limite)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressão(ões) acima de {args.limite}%: {', '.join(regressoes)}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
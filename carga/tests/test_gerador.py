@@ -0,0 +1,116 @@
+"""Gerador de carga: placeholders, percentis e disparo em malha aberta"""
+import asyncio
+
+import httpx
+import pytest
+
+from carga.gerador import GeradorCarga, percentil, resumo_latencias, substituir
+
+
+def cenario(**extras):
+    base = {
+        'alvo': 'http://servico:5000',
+        'rps': 100,
+        'duracao_s': 0.2,
+        'semente': 1,
+        'requisicoes': [{'nome': 'listar', 'caminho': '/itens'}]
+    }
+    base.update(extras)
+    return base
+
+
+def executar(dados, tratar):
+    """Executa o cenário com as requisições atendidas por tratar(request)"""
+    return asyncio.run(GeradorCarga(dados, httpx.MockTransport(tratar)).executar())
+
+
+def test_percentil_nearest_rank():
+    valores = list(range(1, 101))
+    assert percentil(valores, 50) == 50
+    assert percentil(valores, 99) == 99
+    assert percentil(valores, 99.9) == 100
+    assert percentil([7], 50) == 7
+    assert percentil([], 50) is None
+    assert resumo_latencias([]) is None
+    assert resumo_latencias([3, 1, 2]) == {
+        'min': 1, 'p50': 2, 'p90': 3, 'p95': 3, 'p99': 3, 'p999': 3, 'max': 3, 'media': 2
+    }
+
+
+def test_substituir_placeholders():
+    variaveis = {'i': 3, 'id': 42, 'execucao': 'abc'}
+    assert substituir('/users/{id}?n={i}', variaveis) == '/users/42?n=3'
+    assert substituir({'usuario_id': '{id}', 'email': 'u{i}-{execucao}@x.com', 'itens': ['{i}', 1]}, variaveis) == {
+        'usuario_id': 42, 'email': 'u3-abc@x.com', 'itens': [3, 1]
+    }
+
+
+def test_dispara_na_taxa_alvo_e_monta_as_requisicoes():
+    recebidas = []
+
+    def tratar(request):
+        recebidas.append((request.method, str(request.url), request.content))
+        return httpx.Response(201)
+
+    relatorio = executar(cenario(requisicoes=[{
+        'nome': 'criar', 'metodo': 'post', 'caminho': '/users/{id}', 'ids': [5, 5],
+        'corpo': {'id': '{id}', 'n': '{i}'}, 'status_esperado': [201]
+    }]), tratar)
+
+    assert relatorio['enviadas'] == relatorio['concluidas'] == relatorio['sucesso'] == len(recebidas) == 20
+    assert relatorio['modo'] == 'local'
+    assert relatorio['erros'] == {}
+    assert relatorio['por_requisicao']['criar']['enviadas'] == 20
+    assert {(metodo, url) for metodo, url, _ in recebidas} == {('POST', 'http://servico:5000/users/5')}
+    assert recebidas[3][2] == b'{"id": 5, "n": 3}'
+
+
+def test_aquecimento_fica_fora_do_relatorio():
+    recebidas = []
+    relatorio = executar(cenario(aquecimento_s=0.1), lambda request: recebidas.append(1) or httpx.Response(200))
+    assert len(recebidas) == 30
+    assert relatorio['enviadas'] == 20
+
+
+def test_erros_por_tipo():
+    respostas = iter([
+        httpx.Response(500),
+        httpx.Response(404),
+        httpx.ConnectError("recusada"),
+        httpx.ReadTimeout("lenta")
+    ] * 5)
+
+    def tratar(request):
+        resposta = next(respostas)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    relatorio = executar(cenario(), tratar)
+    assert relatorio['sucesso'] == 0
+    assert relatorio['erros'] == {'conexao': 5, 'status_404': 5, 'status_500': 5, 'timeout': 5}
+
+
+def test_servidor_lento_nao_reduz_a_carga_oferecida():
+    async def tratar(request):
+        await asyncio.sleep(0.1)
+        return httpx.Response(200)
+
+    relatorio = executar(cenario(max_em_voo=4), tratar)
+    # Malha aberta: acima de max_em_voo as agendadas são descartadas, não adiadas
+    assert relatorio['enviadas'] + relatorio['descartadas'] == 20
+    assert relatorio['descartadas'] > 0
+    assert relatorio['latencia_ms']['min'] >= 100
+
+
+@pytest.mark.parametrize('chegadas', ['constante', 'poisson'])
+def test_semente_reproduz_a_sequencia(chegadas):
+    def urls():
+        vistas = []
+        executar(
+            cenario(chegadas=chegadas, requisicoes=[{'nome': 'obter', 'caminho': '/u/{id}', 'ids': [1, 1000]}]),
+            lambda request: vistas.append(str(request.url)) or httpx.Response(200)
+        )
+        return vistas
+
+    assert urls() == urls()
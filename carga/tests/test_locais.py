@@ -0,0 +1,98 @@
+"""Montagem local dos desafios e transportes em processo"""
+import asyncio
+import sys
+from collections import Counter
+
+import httpx
+import pytest
+from flask import Flask, request
+
+import plataforma.persistencia as persistencia
+from carga.locais import montar, sessao_local
+from carga.transporte import AdaptadorWSGI, TransporteWSGI, origem
+
+
+@pytest.fixture(autouse=True)
+def sem_persistencia(monkeypatch):
+    monkeypatch.setattr(persistencia, 'PERSISTENCIA_DIR', None)
+
+
+@pytest.fixture
+def eco():
+    app = Flask(__name__)
+
+    @app.route('/eco', methods=['GET', 'POST'])
+    def responder():
+        return {
+            'metodo': request.method,
+            'args': request.args.to_dict(),
+            'corpo': request.get_data(as_text=True),
+            'encoding': request.headers.get('Accept-Encoding')
+        }
+
+    return app
+
+
+def test_origem_explicita_a_porta():
+    assert origem('http://localhost/x') == 'http://localhost:80'
+    assert origem('https://servico/x') == 'https://servico:443'
+    assert origem('http://localhost:5000/x?y=1') == 'http://localhost:5000'
+
+
+def test_adaptador_wsgi(eco):
+    sessao = sessao_local({'http://servico:5000': eco})
+    resposta = sessao.post('http://servico:5000/eco?a=1', data='corpo', headers={'Accept-Encoding': 'gzip'})
+    assert resposta.status_code == 200
+    assert resposta.json() == {'metodo': 'POST', 'args': {'a': '1'}, 'corpo': 'corpo', 'encoding': 'identity'}
+    assert isinstance(sessao.get_adapter('http://servico:5000/eco'), AdaptadorWSGI)
+
+
+def test_transporte_despacha_pela_origem(eco):
+    async def cenario():
+        transporte = TransporteWSGI({'http://servico:5000': eco}, threads=2)
+        async with httpx.AsyncClient(transport=transporte) as cliente:
+            resposta = await cliente.get('http://servico:5000/eco?b=2')
+            assert resposta.json()['args'] == {'b': '2'}
+            with pytest.raises(httpx.ConnectError):
+                await cliente.get('http://outro:5000/eco')
+
+    asyncio.run(cenario())
+
+
+def test_desafio_sem_montagem():
+    with pytest.raises(ValueError, match='desafio9'):
+        montar('desafio9')
+
+
+@pytest.mark.parametrize('desafio, dados, rota, esperado', [
+    ('desafio2', {'usuarios': 7, 'logs': 3}, 'http://localhost:5000/usuarios', 7),
+    ('desafio2', {'usuarios': 7, 'logs': 3}, 'http://localhost:5000/logs', 3),
+    ('desafio3', {'posts': 5}, 'http://localhost:5000/api/posts', 5)
+])
+def test_desafios_com_bancos_falsos(desafio, dados, rota, esperado):
+    resposta = sessao_local(montar(desafio, dados)).get(rota)
+    assert resposta.status_code == 200
+    assert len(resposta.json()) == esperado
+
+
+def test_desafio4_liga_o_servico_b_ao_a():
+    sessao = sessao_local(montar('desafio4', {'usuarios': 10}))
+    resposta = sessao.get('http://localhost:5002/api/usuarios/formatados')
+    assert resposta.status_code == 200
+
+
+def test_desafio5_popula_os_status_dos_pedidos():
+    apps = montar('desafio5', {'usuarios': 20, 'pedidos': 40})
+    pedidos = sys.modules['carga_desafio5_pedidos']
+    iniciais = Counter(pedido['status'] for pedido in pedidos.PEDIDOS_INICIAIS)
+
+    sessao = sessao_local(apps)
+    resumo = sessao.get('http://localhost:5002/api/pedidos/estatisticas/resumo').json()
+    assert resumo['total_pedidos'] == len(pedidos.PEDIDOS_INICIAIS) + 40
+    carregados = Counter(resumo['distribuicao_status']) - iniciais
+    assert carregados == {'pendente': 10, 'processando': 10, 'enviado': 10, 'entregue': 10}
+
+    # O gateway chama os serviços carregados, sem rede
+    resposta = sessao.get('http://localhost:5000/users?limit=5')
+    assert resposta.status_code == 200
+    assert len(resposta.json()['usuarios']) == 5
@@ -0,0 +1,86 @@
+"""
+Transportes que entregam requisições HTTP a aplicações WSGI em processo
+
+- TransporteWSGI: transporte do httpx.AsyncClient usado pelo gerador de
+  carga no modo local; despacha pela origem da URL (esquema://host:porta)
+  e executa a aplicação em um pool de threads, como faria o servidor
+- AdaptadorWSGI: adaptador do requests, para que serviços que chamam
+  outros serviços (gateway do desafio5, servico-b do desafio4) falem com
+  as aplicações carregadas no mesmo processo
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+from werkzeug.test import Client
+
+def origem(url):
+    """esquema://host:porta de uma URL, com a porta padrão explícita"""
+    partes = urlsplit(str(url))
+    porta = partes.port or (443 if partes.scheme == 'https' else 80)
+    return f"{partes.scheme}://{partes.hostname}:{porta}"
+
+class TransporteWSGI(httpx.AsyncBaseTransport):
+    """Transporte assíncrono do httpx sobre aplicações WSGI locais"""
+
+    def __init__(self, apps, threads=16):
+        """
+        Args:
+            apps: {url base: aplicação WSGI}
+            threads: threads atendendo as requisições (como os workers do servidor)
+        """
+        self._transportes = {origem(url): httpx.WSGITransport(app=app) for url, app in apps.items()}
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    def _atender(self, transporte, requisicao):
+        resposta = transporte.handle_request(requisicao)
+        corpo = b''.join(resposta.stream)
+        return httpx.Response(resposta.status_code, headers=resposta.headers, content=corpo)
+
+    async def handle_async_request(self, requisicao):
+        transporte = self._transportes.get(origem(requisicao.url))
+        if transporte is None:
+            raise httpx.ConnectError(f"Nenhuma aplicação local para {requisicao.url}", request=requisicao)
+        await requisicao.aread()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._atender, transporte, requisicao)
+
+    async def aclose(self):
+        self._executor.shutdown(wait=False)
+
+class AdaptadorWSGI(requests.adapters.BaseAdapter):
+    """Adaptador do requests que entrega as requisições a uma aplicação WSGI"""
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        partes = urlsplit(request.url)
+        cabecalhos = dict(request.headers)
+        # Corpo sempre sem compressão: não há rede para economizar
+        cabecalhos['Accept-Encoding'] = 'identity'
+        resposta_wsgi = Client(self.app, use_cookies=False).open(
+            path=partes.path,
+            query_string=partes.query,
+            method=request.method,
+            headers=cabecalhos,
+            data=request.body
+        )
+
+        resposta = requests.models.Response()
+        resposta.status_code = resposta_wsgi.status_code
+        resposta.reason = resposta_wsgi.status.partition(' ')[2]
+        resposta.headers = CaseInsensitiveDict(resposta_wsgi.headers.items())
+        resposta.encoding = requests.utils.get_encoding_from_headers(resposta.headers)
+        resposta._content = resposta_wsgi.get_data()
+        resposta.url = request.url
+        resposta.request = request
+        resposta.connection = self
+        return resposta
+
+    def close(self):
+        pass
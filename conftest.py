@@ -0,0 +1,21 @@
+"""
+Configuração do pytest para os testes do repositório
+
+Os serviços importam o pacote plataforma a partir da raiz (como com
+PYTHONPATH=. nos containers); os testes de cada serviço ficam em
+<serviço>/tests e carregam o app.py com carga.locais.carregar.
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+# Sem a linha de log por requisição e sem o limite de taxa do gateway, que
+# os testes que dependem dele religam no próprio módulo
+os.environ.setdefault('INSTRUMENTACAO_LOG', 'false')
+os.environ.setdefault('LIMITE_HABILITADO', 'false')
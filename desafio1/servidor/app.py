@@ -1,7 +1,16 @@
 from flask import Flask
 from datetime import datetime
 
+from plataforma.compressao import instalar_compressao
+from plataforma.instrumentacao import instalar_instrumentacao
+from plataforma.perfilador import instalar_perfilador
+from plataforma.serializacao import instalar_json
+
 app = Flask(__name__)
+instalar_instrumentacao(app)
+instalar_compressao(app)
+instalar_json(app)
+instalar_perfilador(app)
 
 @app.route('/')
 def inicio():
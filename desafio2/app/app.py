@@ -4,7 +4,16 @@ from psycopg2.extras import RealDictCursor
 from datetime import datetime
 import os
 
+from plataforma.compressao import instalar_compressao
+from plataforma.instrumentacao import instalar_instrumentacao
+from plataforma.perfilador import instalar_perfilador
+from plataforma.serializacao import instalar_json
+
 app = Flask(__name__)
+instalar_instrumentacao(app)
+instalar_compressao(app)
+instalar_json(app)
+instalar_perfilador(app)
 
 DB_HOST = os.getenv('DB_HOST', 'db')
 DB_USER = os.getenv('DB_USER', 'usuario')
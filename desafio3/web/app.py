@@ -1,13 +1,21 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 import redis
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime
 import os
 import time
-import json
+
+from plataforma.compressao import CorpoComprimido, definir_corpo, escolher_codificacao, instalar_compressao
+from plataforma.instrumentacao import instalar_instrumentacao
+from plataforma.perfilador import instalar_perfilador
+from plataforma.serializacao import instalar_json, serializar
 
 app = Flask(__name__)
+instalar_instrumentacao(app)
+instalar_compressao(app)
+instalar_json(app)
+instalar_perfilador(app)
 
 # Configurações
 DB_HOST = os.getenv('DB_HOST', 'db')
@@ -19,6 +27,12 @@ DB_PORT = os.getenv('DB_PORT', '5432')
 REDIS_HOST = os.getenv('REDIS_HOST', 'cache')
 REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
 
+# Cache de posts: hash com o corpo da resposta já serializado ('corpo') e
+# as versões comprimidas ('gzip', 'br'), gravadas no primeiro acerto de cada
+# codificação e reaproveitadas nos seguintes
+POSTS_CACHE = 'posts_cache'
+POSTS_CACHE_TTL = 60
+
 def conectar_db():
     """Conecta ao banco de dados PostgreSQL"""
     try:
@@ -37,7 +51,7 @@ def conectar_db():
 def conectar_redis():
     """Conecta ao Redis"""
     try:
-        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
         r.ping()
         return r
     except Exception as e:
@@ -109,7 +123,7 @@ def criar_post():
         # Invalidar cache
         r = conectar_redis()
         if r:
-            r.delete('posts_cache')
+            r.delete(POSTS_CACHE)
         
         return jsonify({
             "id": novo_post[0],
@@ -122,6 +136,45 @@ def criar_post():
         conn.close()
         return jsonify({"erro": str(e)}), 500
 
+def posts_do_cache(r):
+    """
+    Resposta de GET /api/posts/cache a partir do Redis, ou None se não houver cache
+    
+    O corpo é enviado como foi salvo, sem desserializar e serializar de novo;
+    a versão na codificação aceita pelo cliente vem do mesmo hash ou, no
+    primeiro acerto, é comprimida e gravada nele.
+    """
+    accept_encoding = request.headers.get('Accept-Encoding')
+    codificacao = escolher_codificacao(accept_encoding)
+    campos = ['corpo', codificacao] if codificacao else ['corpo']
+    try:
+        valores = r.hmget(POSTS_CACHE, campos)
+    except redis.RedisError:
+        return None
+    if valores[0] is None:
+        return None
+    
+    variantes = {codificacao: valores[1]} if codificacao and valores[1] is not None else None
+    corpo = CorpoComprimido(valores[0], variantes)
+    resposta = definir_corpo(Response(content_type='application/json'), corpo, accept_encoding)
+    
+    if variantes is None and resposta.headers.get('Content-Encoding') == codificacao:
+        guardar_variante(r, corpo.dados, codificacao, corpo.variante(codificacao))
+    return resposta
+
+def guardar_variante(r, dados, codificacao, comprimido):
+    """Grava a versão comprimida no hash, se o cache ainda for o mesmo corpo"""
+    with r.pipeline() as pipe:
+        try:
+            pipe.watch(POSTS_CACHE)
+            if pipe.hget(POSTS_CACHE, 'corpo') != dados:
+                return  # invalidado ou substituído enquanto comprimia
+            pipe.multi()
+            pipe.hset(POSTS_CACHE, codificacao, comprimido)
+            pipe.execute()
+        except redis.RedisError:
+            pass
+
 @app.route('/api/posts/cache', methods=['GET'])
 def listar_posts_cache():
     """Lista posts com cache"""
@@ -129,13 +182,9 @@ def listar_posts_cache():
     
     # Tentar obter do cache
     if r:
-        cached = r.get('posts_cache')
-        if cached:
-            return jsonify({
-                "fonte": "cache",
-                "dados": json.loads(cached),
-                "timestamp": datetime.now().isoformat()
-            }), 200
+        resposta = posts_do_cache(r)
+        if resposta is not None:
+            return resposta
     
     # Se não está em cache, buscar do banco
     conn = conectar_db()
@@ -150,15 +199,22 @@ def listar_posts_cache():
         conn.close()
         
         posts_dict = [dict(p) for p in posts]
+        timestamp = datetime.now().isoformat()
         
-        # Armazenar em cache por 60 segundos
+        # Armazenar em cache por POSTS_CACHE_TTL segundos a resposta que os
+        # acertos vão devolver (timestamp = momento da leitura do banco)
         if r:
-            r.setex('posts_cache', 60, json.dumps(posts_dict, default=str))
+            corpo = serializar({"fonte": "cache", "dados": posts_dict, "timestamp": timestamp})
+            with r.pipeline() as pipe:
+                pipe.delete(POSTS_CACHE)
+                pipe.hset(POSTS_CACHE, 'corpo', corpo)
+                pipe.expire(POSTS_CACHE, POSTS_CACHE_TTL)
+                pipe.execute()
         
         return jsonify({
             "fonte": "banco_de_dados",
             "dados": posts_dict,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp
         }), 200
     except Exception as e:
         conn.close()
@@ -2,7 +2,18 @@ from flask import Flask, jsonify, request
 from datetime import datetime, timedelta
 import random
 
+from plataforma.compressao import instalar_compressao
+from plataforma.instrumentacao import instalar_instrumentacao
+from plataforma.perfilador import instalar_perfilador
+from plataforma.rastreamento import instalar_rastreamento
+from plataforma.serializacao import instalar_json
+
 app = Flask(__name__)
+instalar_rastreamento(app, 'servico-a')
+instalar_instrumentacao(app)
+instalar_compressao(app)
+instalar_json(app)
+instalar_perfilador(app)
 
 # Dados em memória
 USUARIOS = [
@@ -3,7 +3,18 @@ import requests
 from datetime import datetime
 import time
 
+from plataforma.compressao import instalar_compressao
+from plataforma.instrumentacao import instalar_instrumentacao
+from plataforma.perfilador import instalar_perfilador
+from plataforma.rastreamento import instalar_rastreamento
+from plataforma.serializacao import instalar_json
+
 app = Flask(__name__)
+instalar_rastreamento(app, 'servico-b')
+instalar_instrumentacao(app)
+instalar_compressao(app)
+instalar_json(app)
+instalar_perfilador(app)
 
 SERVICO_A_URL = "http://servico-a:5001"
 
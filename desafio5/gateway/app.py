@@ -1,16 +1,650 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from functools import wraps
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import OrderedDict, deque
+from urllib.parse import urlencode
 from datetime import datetime
+import contextvars
+import math
 import os
+import threading
+import time
+
+from plataforma.compressao import CorpoComprimido, definir_corpo, instalar_compressao
+from plataforma.instrumentacao import instalar_instrumentacao
+from plataforma.perfilador import instalar_perfilador
+from plataforma.rastreamento import instalar_rastreamento
+from plataforma.serializacao import desserializar, instalar_json
 
 app = Flask(__name__)
+instalar_rastreamento(app, 'gateway')
+instalar_instrumentacao(app)
+instalar_compressao(app)
+instalar_json(app)
+instalar_perfilador(app)
 
 USUARIOS_SERVICE_URL = os.getenv('USUARIOS_SERVICE_URL', 'http://localhost:5001')
 PEDIDOS_SERVICE_URL = os.getenv('PEDIDOS_SERVICE_URL', 'http://localhost:5002')
-REQUEST_TIMEOUT = 5
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 5))
+
+# Pool de conexões keep-alive por serviço
+POOL_CONEXOES = int(os.getenv('POOL_CONEXOES', 10))
+POOL_TAMANHO = int(os.getenv('POOL_TAMANHO', 20))
+POOL_BLOQUEAR = os.getenv('POOL_BLOQUEAR', 'false').lower() == 'true'
+
+METODOS_SUPORTADOS = ('GET', 'POST', 'PUT', 'DELETE')
+
+# Cabeçalhos dos serviços repassados ao cliente (e guardados no cache)
+CABECALHOS_REPASSADOS = ('Link',)
+
+# Circuit breaker por serviço: abre quando a taxa de falhas nas últimas
+# BREAKER_JANELA chamadas passa de BREAKER_TAXA_FALHA
+BREAKER_JANELA = int(os.getenv('BREAKER_JANELA', 20))
+BREAKER_MIN_CHAMADAS = int(os.getenv('BREAKER_MIN_CHAMADAS', 10))
+BREAKER_TAXA_FALHA = float(os.getenv('BREAKER_TAXA_FALHA', 0.5))
+BREAKER_TEMPO_ABERTO = float(os.getenv('BREAKER_TEMPO_ABERTO', 10))
+BREAKER_SONDAS = int(os.getenv('BREAKER_SONDAS', 1))
+
+# Timeout adaptativo: percentil da latência observada multiplicado por um
+# fator, limitado entre TIMEOUT_MIN e REQUEST_TIMEOUT
+TIMEOUT_PERCENTIL = float(os.getenv('TIMEOUT_PERCENTIL', 99))
+TIMEOUT_FATOR = float(os.getenv('TIMEOUT_FATOR', 3))
+TIMEOUT_MIN = float(os.getenv('TIMEOUT_MIN', 1))
+TIMEOUT_AMOSTRAS = int(os.getenv('TIMEOUT_AMOSTRAS', 200))
+TIMEOUT_AMOSTRAS_MIN = 20
+
+# GETs idênticos simultâneos compartilham uma única chamada ao serviço
+COALESCER_GETS = os.getenv('COALESCER_GETS', 'true').lower() == 'true'
+
+# Composição concorrente: threads para chamadas paralelas, orçamento total
+# (segundos) de cada rota composta e quantidade de IDs por consulta em lote
+COMPOSICAO_WORKERS = int(os.getenv('COMPOSICAO_WORKERS', 16))
+COMPOSICAO_ORCAMENTO = float(os.getenv('COMPOSICAO_ORCAMENTO', 8))
+COMPOSICAO_LOTE = int(os.getenv('COMPOSICAO_LOTE', 50))
+
+# Cache de respostas: TTL (segundos) por rota, 0 desativa o cache da rota
+CACHE_TTL = {
+    '/users': float(os.getenv('CACHE_TTL_USERS', 5)),
+    '/users/stats': float(os.getenv('CACHE_TTL_USERS_STATS', 10)),
+    '/orders': float(os.getenv('CACHE_TTL_ORDERS', 5)),
+    '/orders/stats': float(os.getenv('CACHE_TTL_ORDERS_STATS', 10)),
+    '/dashboard': float(os.getenv('CACHE_TTL_DASHBOARD', 10))
+}
+CACHE_MAX_ENTRADAS = int(os.getenv('CACHE_MAX_ENTRADAS', 1024))
+# Gerações do cache no Redis, para que uma escrita invalide o cache de todos
+# os workers/réplicas (vazio: cada processo invalida só o próprio cache)
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', os.getenv('LIMITE_REDIS_URL', ''))
+
+# Rotas em cache afetadas pelas escritas em cada recurso
+CACHE_INVALIDACAO = {
+    'users': ('/users', '/users/stats', '/dashboard'),
+    'orders': ('/orders', '/orders/stats', '/dashboard')
+}
+
+# Paginação das listagens (/users, /orders) e das rotas de composição
+POR_PAGINA_PADRAO = int(os.getenv('POR_PAGINA_PADRAO', 50))
+POR_PAGINA_MAX = int(os.getenv('POR_PAGINA_MAX', 200))
+
+# Limite de taxa (token bucket): requisições por segundo e rajada por
+# cliente, por cliente em cada rota e por rota somando todos os clientes
+LIMITE_HABILITADO = os.getenv('LIMITE_HABILITADO', 'true').lower() == 'true'
+LIMITE_TAXA_CLIENTE = float(os.getenv('LIMITE_TAXA_CLIENTE', 200))
+LIMITE_RAJADA_CLIENTE = float(os.getenv('LIMITE_RAJADA_CLIENTE', 400))
+LIMITE_TAXA_ROTA = float(os.getenv('LIMITE_TAXA_ROTA', 100))
+LIMITE_RAJADA_ROTA = float(os.getenv('LIMITE_RAJADA_ROTA', 200))
+# Rotas compostas custam várias chamadas aos serviços: limites próprios
+LIMITE_ROTAS = {
+    '/dashboard': (float(os.getenv('LIMITE_TAXA_DASHBOARD', 20)), float(os.getenv('LIMITE_RAJADA_DASHBOARD', 40))),
+    '/usuarios-com-pedidos': (float(os.getenv('LIMITE_TAXA_COMPOSICAO', 20)), float(os.getenv('LIMITE_RAJADA_COMPOSICAO', 40)))
+}
+# Teto de cada rota para todos os clientes juntos (taxa 0 desativa): trocar
+# de identidade não passa dele
+LIMITE_TAXA_ROTA_GLOBAL = float(os.getenv('LIMITE_TAXA_ROTA_GLOBAL', 1000))
+LIMITE_RAJADA_ROTA_GLOBAL = float(os.getenv('LIMITE_RAJADA_ROTA_GLOBAL', 2000))
+LIMITE_ROTAS_GLOBAL = {
+    '/dashboard': (float(os.getenv('LIMITE_TAXA_DASHBOARD_GLOBAL', 100)), float(os.getenv('LIMITE_RAJADA_DASHBOARD_GLOBAL', 200))),
+    '/usuarios-com-pedidos': (float(os.getenv('LIMITE_TAXA_COMPOSICAO_GLOBAL', 100)), float(os.getenv('LIMITE_RAJADA_COMPOSICAO_GLOBAL', 200)))
+}
+# O cliente é o IP da conexão. Só atrás de um proxy confiável, que define
+# ou sobrescreve esses cabeçalhos, valem o cabeçalho de identificação e o
+# X-Forwarded-For; sem ele, o cliente escolheria a própria identidade
+LIMITE_CABECALHO_CLIENTE = os.getenv('LIMITE_CABECALHO_CLIENTE', 'X-Client-Id')
+LIMITE_CONFIAR_PROXY = os.getenv('LIMITE_CONFIAR_PROXY', 'false').lower() == 'true'
+LIMITE_MAX_CLIENTES = int(os.getenv('LIMITE_MAX_CLIENTES', 10000))
+# Backend compartilhado entre workers/réplicas (vazio: memória do processo)
+LIMITE_REDIS_URL = os.getenv('LIMITE_REDIS_URL', '')
+LIMITE_REDIS_TIMEOUT = float(os.getenv('LIMITE_REDIS_TIMEOUT', 0.05))
+LIMITE_REDIS_REPOUSO = float(os.getenv('LIMITE_REDIS_REPOUSO', 5))
+
+# Chamadas simultâneas por serviço em cada processo, em
+# LIMITE_CONCORRENCIA_<SERVIÇO> (0 desativa); além disso a chamada é
+# recusada com 503 em vez de esperar por uma conexão do pool
+LIMITE_CONCORRENCIA_PADRAO = POOL_TAMANHO
+LIMITE_RETRY_AFTER = int(os.getenv('LIMITE_RETRY_AFTER', 1))
+
+def criar_sessao():
+    """Cria uma sessão HTTP que reaproveita conexões (keep-alive) através de um pool"""
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(
+        pool_connections=POOL_CONEXOES,
+        pool_maxsize=POOL_TAMANHO,
+        pool_block=POOL_BLOQUEAR
+    )
+    sessao.mount('http://', adaptador)
+    sessao.mount('https://', adaptador)
+    # Na rede interna, comprimir nos serviços e descomprimir aqui só gasta CPU;
+    # a compressão para o cliente é feita na saída do gateway
+    sessao.headers['Accept-Encoding'] = 'identity'
+    return sessao
+
+UPSTREAMS = {
+    "usuarios": USUARIOS_SERVICE_URL,
+    "pedidos": PEDIDOS_SERVICE_URL
+}
+
+SESSOES = {nome: criar_sessao() for nome in UPSTREAMS}
+SESSAO_PADRAO = criar_sessao()
+
+def obter_upstream(url):
+    """Retorna o nome do serviço dono da URL (ou None)"""
+    for nome, base in UPSTREAMS.items():
+        if url.startswith(base):
+            return nome
+    return None
+
+def obter_sessao(url):
+    """Retorna a sessão do serviço dono da URL (ou uma sessão genérica)"""
+    return SESSOES.get(obter_upstream(url), SESSAO_PADRAO)
+
+def estatisticas_conexoes():
+    """
+    Estatísticas de reuso de conexões de cada serviço
+    
+    Returns:
+        dict: por serviço, requisições feitas, conexões abertas,
+              requisições que reaproveitaram conexão e conexões ociosas no pool
+    """
+    estatisticas = {}
+    for nome, sessao in SESSOES.items():
+        requisicoes = 0
+        conexoes = 0
+        ociosas = 0
+        for adaptador in set(sessao.adapters.values()):
+            pools = adaptador.poolmanager.pools
+            for chave in list(pools.keys()):
+                pool = pools.get(chave)
+                if pool is None:
+                    continue
+                requisicoes += pool.num_requests
+                conexoes += pool.num_connections
+                if pool.pool is not None:
+                    ociosas += sum(1 for conexao in list(pool.pool.queue) if conexao is not None)
+        estatisticas[nome] = {
+            "requisicoes": requisicoes,
+            "conexoes_abertas": conexoes,
+            "conexoes_reutilizadas": max(requisicoes - conexoes, 0),
+            "conexoes_ociosas": ociosas,
+            "tamanho_pool": POOL_TAMANHO
+        }
+    return estatisticas
+
+# ============================================================================
+# LIMITE DE TAXA E CONTROLE DE ADMISSÃO
+# ============================================================================
+
+class BaldesMemoria:
+    """
+    Token buckets em memória do processo, em LRU limitado a max_chaves
+    
+    Cada balde tem taxa (fichas por segundo) e rajada (capacidade); uma
+    requisição consome uma ficha de cada balde envolvido, só se todos
+    tiverem ficha. Com vários workers, cada um tem os próprios baldes.
+    """
+    
+    def __init__(self, max_chaves):
+        self.max_chaves = max_chaves
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def consumir(self, baldes):
+        """
+        Args:
+            baldes: lista de (chave, taxa, rajada)
+        
+        Returns:
+            float: 0 se a requisição foi admitida, senão segundos até haver fichas
+        """
+        agora = time.monotonic()
+        with self._lock:
+            fichas = []
+            espera = 0.0
+            for chave, taxa, rajada in baldes:
+                estado = self._baldes.get(chave)
+                disponiveis = rajada if estado is None else min(rajada, estado[0] + (agora - estado[1]) * taxa)
+                fichas.append(disponiveis)
+                if disponiveis < 1:
+                    espera = max(espera, (1 - disponiveis) / taxa)
+            
+            for (chave, _, _), disponiveis in zip(baldes, fichas):
+                self._baldes[chave] = (disponiveis - 1 if espera == 0 else disponiveis, agora)
+                self._baldes.move_to_end(chave)
+            while len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+            return espera
+
+# Mesmo algoritmo do BaldesMemoria, atômico no Redis; o relógio é o do
+# Redis, comum a todos os gateways. Números voltam como texto porque o
+# Redis trunca os números do Lua para inteiros.
+SCRIPT_BALDES = """
+local relogio = redis.call('TIME')
+local agora = tonumber(relogio[1]) + tonumber(relogio[2]) / 1000000
+local fichas = {}
+local espera = 0
+for i, chave in ipairs(KEYS) do
+    local taxa = tonumber(ARGV[2 * i - 1])
+    local rajada = tonumber(ARGV[2 * i])
+    local estado = redis.call('HMGET', chave, 'fichas', 'instante')
+    local disponiveis = rajada
+    if estado[1] then
+        disponiveis = math.min(rajada, tonumber(estado[1]) + math.max(agora - tonumber(estado[2]), 0) * taxa)
+    end
+    fichas[i] = disponiveis
+    if disponiveis < 1 then
+        espera = math.max(espera, (1 - disponiveis) / taxa)
+    end
+end
+for i, chave in ipairs(KEYS) do
+    local disponiveis = fichas[i]
+    if espera == 0 then
+        disponiveis = disponiveis - 1
+    end
+    redis.call('HSET', chave, 'fichas', tostring(disponiveis), 'instante', tostring(agora))
+    -- Um balde parado enche em rajada / taxa segundos; depois disso é igual a um novo
+    redis.call('PEXPIRE', chave, math.ceil(tonumber(ARGV[2 * i]) / tonumber(ARGV[2 * i - 1]) * 1000) + 1000)
+end
+return tostring(espera)
+"""
+
+class BaldesRedis:
+    """
+    Token buckets no Redis, compartilhados por todos os workers e réplicas
+    
+    Se o Redis falhar, usa os baldes em memória do processo por
+    LIMITE_REDIS_REPOUSO segundos antes de tentar de novo: o limite fica
+    por worker nesse intervalo, mas o gateway não para nem espera o Redis.
+    """
+    
+    def __init__(self, url, reserva):
+        import redis
+        self._reserva = reserva
+        self._cliente = redis.Redis.from_url(
+            url,
+            socket_timeout=LIMITE_REDIS_TIMEOUT,
+            socket_connect_timeout=LIMITE_REDIS_TIMEOUT
+        )
+        self._script = self._cliente.register_script(SCRIPT_BALDES)
+        self._indisponivel_ate = 0
+        self.falhas = 0
+    
+    def consumir(self, baldes):
+        if time.monotonic() < self._indisponivel_ate:
+            return self._reserva.consumir(baldes)
+        try:
+            espera = self._script(
+                keys=[f"limite:{chave}" for chave, _, _ in baldes],
+                args=[valor for _, taxa, rajada in baldes for valor in (taxa, rajada)]
+            )
+            return float(espera)
+        except Exception as e:
+            self.falhas += 1
+            self._indisponivel_ate = time.monotonic() + LIMITE_REDIS_REPOUSO
+            print(f"Limite de taxa: Redis indisponível ({e}); usando memória por {LIMITE_REDIS_REPOUSO:g}s", flush=True)
+            return self._reserva.consumir(baldes)
+
+def criar_baldes():
+    """Baldes no Redis se LIMITE_REDIS_URL estiver definido, senão em memória"""
+    memoria = BaldesMemoria(LIMITE_MAX_CLIENTES)
+    if not LIMITE_REDIS_URL:
+        return memoria
+    try:
+        return BaldesRedis(LIMITE_REDIS_URL, memoria)
+    except ImportError:
+        print("LIMITE_REDIS_URL definido sem o pacote redis; limite de taxa em memória", flush=True)
+        return memoria
 
-def fazer_requisicao(metodo, url, dados=None, params=None):
+BALDES = criar_baldes()
+
+def identificar_cliente(req):
+    """
+    Identidade do cliente para o limite de taxa (Flask ou Quart request)
+    
+    Por padrão, o IP da conexão. Com LIMITE_CONFIAR_PROXY, o cabeçalho
+    LIMITE_CABECALHO_CLIENTE ou, na falta dele, o último IP do
+    X-Forwarded-For, o que o proxy acrescentou (os anteriores vêm do cliente).
+    """
+    if LIMITE_CONFIAR_PROXY:
+        cliente = req.headers.get(LIMITE_CABECALHO_CLIENTE)
+        if cliente:
+            return f"id:{cliente}"
+        encaminhado = req.headers.get('X-Forwarded-For', '').split(',')[-1].strip()
+        if encaminhado:
+            return f"ip:{encaminhado}"
+    return f"ip:{req.remote_addr}"
+
+def baldes_requisicao(req):
+    """(chave, taxa, rajada) do cliente, do cliente na rota e da rota, ou [] se a rota não é limitada"""
+    # Só as rotas do gateway (gateway_*) são limitadas: health, documentação,
+    # métricas e perfilador ficam de fora
+    if not LIMITE_HABILITADO or req.url_rule is None or not req.endpoint.startswith('gateway_'):
+        return []
+    cliente = identificar_cliente(req)
+    rota = f"{req.method} {req.url_rule.rule}"
+    taxa, rajada = LIMITE_ROTAS.get(req.url_rule.rule, (LIMITE_TAXA_ROTA, LIMITE_RAJADA_ROTA))
+    baldes = [
+        (cliente, LIMITE_TAXA_CLIENTE, LIMITE_RAJADA_CLIENTE),
+        (f"{cliente}|{rota}", taxa, rajada)
+    ]
+    taxa_global, rajada_global = LIMITE_ROTAS_GLOBAL.get(
+        req.url_rule.rule, (LIMITE_TAXA_ROTA_GLOBAL, LIMITE_RAJADA_ROTA_GLOBAL)
+    )
+    if taxa_global > 0:
+        baldes.append((f"rota|{rota}", taxa_global, rajada_global))
+    return baldes
+
+def resposta_limite(espera):
+    """Corpo, status e cabeçalhos do 429"""
+    return {
+        "erro": "Limite de requisições excedido",
+        "retry_after_s": round(espera, 3)
+    }, 429, {'Retry-After': str(max(math.ceil(espera), 1))}
+
+class ServicoSaturado(Exception):
+    """Chamada recusada porque o serviço já tem o máximo de chamadas em andamento"""
+    
+    def __init__(self, servico):
+        super().__init__(f"Serviço {servico} sobrecarregado; tente novamente em instantes")
+        self.servico = servico
+
+class LimiteConcorrencia:
+    """
+    Máximo de chamadas simultâneas a um serviço neste processo
+    
+    Não enfileira: acima do limite a chamada falha na hora (503), antes que
+    as requisições se acumulem esperando conexão e estourem o timeout.
+    """
+    
+    def __init__(self, nome, maximo):
+        self.nome = nome
+        self.maximo = maximo
+        self.em_andamento = 0
+        self.recusadas = 0
+        self._lock = threading.Lock()
+    
+    def entrar(self):
+        with self._lock:
+            if self.maximo and self.em_andamento >= self.maximo:
+                self.recusadas += 1
+                raise ServicoSaturado(self.nome)
+            self.em_andamento += 1
+    
+    def sair(self):
+        with self._lock:
+            self.em_andamento -= 1
+    
+    def situacao(self):
+        with self._lock:
+            return {"em_andamento": self.em_andamento, "maximo": self.maximo, "recusadas": self.recusadas}
+
+def criar_limites_concorrencia(padrao):
+    """Um LimiteConcorrencia por serviço, de LIMITE_CONCORRENCIA_<SERVIÇO> ou padrao"""
+    return {
+        nome: LimiteConcorrencia(nome, int(os.getenv(f'LIMITE_CONCORRENCIA_{nome.upper()}', padrao)))
+        for nome in UPSTREAMS
+    }
+
+CONCORRENCIA = criar_limites_concorrencia(LIMITE_CONCORRENCIA_PADRAO)
+
+@app.before_request
+def limitar_taxa():
+    """Recusa com 429 a requisição que excede o limite do cliente ou da rota"""
+    baldes = baldes_requisicao(request)
+    if not baldes:
+        return None
+    espera = BALDES.consumir(baldes)
+    if espera > 0:
+        return resposta_limite(espera)
+    return None
+
+@app.after_request
+def sugerir_nova_tentativa(resposta):
+    """503 (serviço saturado, circuit breaker aberto, serviço fora) com Retry-After"""
+    if resposta.status_code == 503 and 'Retry-After' not in resposta.headers:
+        resposta.headers['Retry-After'] = str(LIMITE_RETRY_AFTER)
+    return resposta
+
+# ============================================================================
+# CIRCUIT BREAKER E TIMEOUT ADAPTATIVO
+# ============================================================================
+
+class CircuitoAberto(Exception):
+    """Chamada recusada porque o circuit breaker do serviço está aberto"""
+    
+    def __init__(self, servico):
+        super().__init__(f"Serviço {servico} temporariamente indisponível (circuit breaker aberto)")
+        self.servico = servico
+
+class CircuitBreaker:
+    """
+    Circuit breaker de um serviço, com janela deslizante de resultados
+    
+    Estados:
+        fechado: chamadas passam normalmente
+        aberto: chamadas falham imediatamente até BREAKER_TEMPO_ABERTO expirar
+        meio_aberto: até BREAKER_SONDAS chamadas de teste; sucesso fecha, falha reabre
+    
+    Também guarda as latências das chamadas bem-sucedidas para derivar o timeout.
+    
+    Cada mudança de estado inicia um novo ciclo. permitir() devolve uma
+    permissão (ciclo, sonda) que a chamada entrega a registrar(): só as
+    sondas do meio-aberto atual decidem se o circuito fecha ou reabre, e
+    chamadas iniciadas em um ciclo anterior (ex.: liberadas com o circuito
+    ainda fechado e concluídas depois que ele abriu) não alteram o estado.
+    """
+    
+    def __init__(self, nome):
+        self.nome = nome
+        self.estado = 'fechado'
+        self._resultados = deque(maxlen=BREAKER_JANELA)
+        self._latencias = deque(maxlen=TIMEOUT_AMOSTRAS)
+        self._aberto_ate = 0
+        self._sondas = 0
+        self._ciclo = 0
+        self._lock = threading.Lock()
+    
+    def permitir(self):
+        """Retorna a permissão da chamada, a entregar em registrar, ou None se recusada"""
+        with self._lock:
+            if self.estado == 'aberto':
+                if time.monotonic() < self._aberto_ate:
+                    return None
+                self._mudar('meio_aberto')
+                self._sondas = 0
+            if self.estado == 'meio_aberto':
+                if self._sondas >= BREAKER_SONDAS:
+                    return None
+                self._sondas += 1
+                return (self._ciclo, True)
+            return (self._ciclo, False)
+    
+    def registrar(self, permissao, sucesso, latencia=None):
+        """Registra o resultado de uma chamada feita com a permissão de permitir()"""
+        ciclo, sonda = permissao
+        with self._lock:
+            if sucesso and latencia is not None:
+                self._latencias.append(latencia)
+            
+            if ciclo != self._ciclo:
+                return
+            
+            if sonda:
+                self._sondas -= 1
+                if sucesso:
+                    self._mudar('fechado')
+                    self._resultados.clear()
+                else:
+                    self._abrir()
+                return
+            
+            self._resultados.append(sucesso)
+            if len(self._resultados) >= BREAKER_MIN_CHAMADAS and self._taxa_falha() >= BREAKER_TAXA_FALHA:
+                self._abrir()
+    
+    def _mudar(self, estado):
+        self.estado = estado
+        self._ciclo += 1
+    
+    def _abrir(self):
+        self._mudar('aberto')
+        self._aberto_ate = time.monotonic() + BREAKER_TEMPO_ABERTO
+        self._resultados.clear()
+    
+    def _taxa_falha(self):
+        if not self._resultados:
+            return 0.0
+        return self._resultados.count(False) / len(self._resultados)
+    
+    def timeout(self):
+        """Timeout derivado do percentil TIMEOUT_PERCENTIL das latências observadas"""
+        with self._lock:
+            if len(self._latencias) < TIMEOUT_AMOSTRAS_MIN:
+                return REQUEST_TIMEOUT
+            latencias = sorted(self._latencias)
+        indice = min(int(len(latencias) * TIMEOUT_PERCENTIL / 100), len(latencias) - 1)
+        return min(max(latencias[indice] * TIMEOUT_FATOR, TIMEOUT_MIN), REQUEST_TIMEOUT)
+    
+    def situacao(self):
+        """Estado do breaker para o health check"""
+        timeout = self.timeout()
+        with self._lock:
+            return {
+                "estado": self.estado,
+                "taxa_falha": round(self._taxa_falha(), 2),
+                "chamadas_na_janela": len(self._resultados),
+                "timeout_s": round(timeout, 3),
+                "reabre_em_s": round(max(self._aberto_ate - time.monotonic(), 0), 1) if self.estado == 'aberto' else 0
+            }
+
+BREAKERS = {nome: CircuitBreaker(nome) for nome in UPSTREAMS}
+
+class RequisicoesEmVoo:
+    """
+    Coalescência de requisições: chamadas idênticas feitas enquanto a
+    primeira ainda está em andamento aguardam e recebem o mesmo resultado.
+    Nada é guardado após a conclusão, então não há dados antigos.
+    """
+    
+    def __init__(self):
+        self._em_voo = {}
+        self._lock = threading.Lock()
+        self.compartilhadas = 0
+    
+    def executar(self, chave, funcao, timeout):
+        with self._lock:
+            chamada = self._em_voo.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._em_voo[chave] = {"evento": threading.Event()}
+            else:
+                self.compartilhadas += 1
+        
+        if not lider:
+            if not chamada["evento"].wait(timeout):
+                raise requests.exceptions.Timeout(f"Timeout aguardando requisição em andamento: {chave[0]}")
+            if "erro" in chamada:
+                raise chamada["erro"]
+            return chamada["resposta"]
+        
+        try:
+            resposta = funcao()
+            resposta.content  # carrega o corpo antes de compartilhar
+            chamada["resposta"] = resposta
+            return resposta
+        except Exception as e:
+            chamada["erro"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_voo[chave]
+            chamada["evento"].set()
+
+EM_VOO = RequisicoesEmVoo()
+
+def _executar(metodo, url, dados=None, params=None, timeout=None):
+    """
+    Executa a requisição na sessão do serviço e retorna a resposta bruta
+    
+    Passa pelo circuit breaker do serviço (falha imediata com CircuitoAberto
+    quando aberto) e usa o timeout adaptativo, limitado pelo timeout recebido.
+    Acima do limite de chamadas simultâneas ao serviço, falha com
+    ServicoSaturado. GETs idênticos em andamento são coalescidos em uma
+    única chamada (e ocupam uma só vaga no limite).
+    """
+    nome = obter_upstream(url)
+    breaker = BREAKERS.get(nome)
+    concorrencia = CONCORRENCIA.get(nome)
+    if breaker is not None:
+        timeout = min(timeout or REQUEST_TIMEOUT, breaker.timeout())
+    timeout = timeout or REQUEST_TIMEOUT
+    
+    def chamar():
+        # A vaga é reservada antes do breaker: uma sonda do meio-aberto
+        # recusada por falta de vaga nunca seria registrada
+        if concorrencia is not None:
+            concorrencia.entrar()
+        try:
+            if breaker is not None:
+                permissao = breaker.permitir()
+                if permissao is None:
+                    raise CircuitoAberto(breaker.nome)
+            
+            inicio = time.monotonic()
+            sucesso = False
+            try:
+                resposta = obter_sessao(url).request(
+                    metodo,
+                    url,
+                    params=params,
+                    json=dados,
+                    timeout=timeout
+                )
+                sucesso = resposta.status_code < 500
+                return resposta
+            finally:
+                if breaker is not None:
+                    breaker.registrar(permissao, sucesso, time.monotonic() - inicio)
+        finally:
+            if concorrencia is not None:
+                concorrencia.sair()
+    
+    if metodo != 'GET' or not COALESCER_GETS:
+        return chamar()
+    
+    chave = (url, urlencode(sorted((params or {}).items())))
+    return EM_VOO.executar(chave, chamar, timeout)
+
+def _erro_requisicao(erro, url):
+    """Converte uma exceção de requisição em (erro, status_code)"""
+    if isinstance(erro, (CircuitoAberto, ServicoSaturado)):
+        return {"erro": str(erro)}, 503
+    if isinstance(erro, requests.exceptions.Timeout):
+        return {"erro": f"Timeout ao conectar com o serviço: {url}"}, 504
+    if isinstance(erro, requests.exceptions.ConnectionError):
+        return {"erro": f"Erro ao conectar com o serviço: {url}"}, 503
+    return {"erro": f"Erro na requisição: {str(erro)}"}, 500
+
+def fazer_requisicao(metodo, url, dados=None, params=None, timeout=None):
     """
     Faz uma requisição HTTP ao serviço especificado
     
@@ -19,54 +653,340 @@ def fazer_requisicao(metodo, url, dados=None, params=None):
         url: URL completa do serviço
         dados: dados para POST/PUT (JSON)
         params: parâmetros de query
+        timeout: timeout em segundos (padrão REQUEST_TIMEOUT)
     
     Returns:
         tuple: (resposta_json, status_code) ou (erro, status_code)
     """
+    if metodo not in METODOS_SUPORTADOS:
+        return {"erro": "Método HTTP não suportado"}, 400
+    
     try:
-        if metodo == 'GET':
-            resposta = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        elif metodo == 'POST':
-            resposta = requests.post(url, json=dados, timeout=REQUEST_TIMEOUT)
-        elif metodo == 'PUT':
-            resposta = requests.put(url, json=dados, timeout=REQUEST_TIMEOUT)
-        elif metodo == 'DELETE':
-            resposta = requests.delete(url, timeout=REQUEST_TIMEOUT)
-        else:
-            return {"erro": "Método HTTP não suportado"}, 400
+        resposta = _executar(metodo, url, dados=dados, params=params, timeout=timeout)
         
         if resposta.status_code == 204:
             return {}, 204
         
         try:
-            dados_resposta = resposta.json()
-        except:
+            dados_resposta = desserializar(resposta.content)
+        except ValueError:
             dados_resposta = {"mensagem": resposta.text}
         
         return dados_resposta, resposta.status_code
     
-    except requests.exceptions.Timeout:
-        return {"erro": f"Timeout ao conectar com o serviço: {url}"}, 504
-    except requests.exceptions.ConnectionError:
-        return {"erro": f"Erro ao conectar com o serviço: {url}"}, 503
     except Exception as e:
-        return {"erro": f"Erro na requisição: {str(e)}"}, 500
+        return _erro_requisicao(e, url)
 
-def verificar_servicos():
-    """Verifica se os microsserviços estão disponíveis"""
+def encaminhar(metodo, url, dados=None, params=None):
+    """
+    Encaminha a requisição ao serviço e repassa o corpo sem decodificá-lo
+    
+    Evita o custo de resposta.json() + jsonify nas rotas que apenas fazem proxy.
+    
+    Returns:
+        Response: resposta com os bytes, status e Content-Type do serviço
+    """
+    if metodo not in METODOS_SUPORTADOS:
+        return jsonify({"erro": "Método HTTP não suportado"}), 400
+    
     try:
-        resp_usuarios = requests.get(f"{USUARIOS_SERVICE_URL}/health", timeout=REQUEST_TIMEOUT)
-        resp_pedidos = requests.get(f"{PEDIDOS_SERVICE_URL}/health", timeout=REQUEST_TIMEOUT)
-        
-        return {
-            "usuarios": resp_usuarios.status_code == 200,
-            "pedidos": resp_pedidos.status_code == 200
-        }
-    except:
+        resposta = _executar(metodo, url, dados=dados, params=params)
+    except Exception as e:
+        erro, status_code = _erro_requisicao(e, url)
+        return jsonify(erro), status_code
+    
+    return Response(
+        resposta.content,
+        status=resposta.status_code,
+        content_type=resposta.headers.get('Content-Type', 'application/json'),
+        headers={nome: resposta.headers[nome] for nome in CABECALHOS_REPASSADOS if nome in resposta.headers}
+    )
+
+def parametros_listagem(*filtros):
+    """
+    Parâmetros repassados às listagens paginadas dos serviços
+    
+    Inclui os filtros informados, cursor e sort; limit usa POR_PAGINA_PADRAO
+    quando o cliente não informa, para que nenhuma listagem pelo gateway
+    traga a coleção inteira.
+    """
+    params = {nome: request.args[nome] for nome in filtros + ('cursor', 'sort') if request.args.get(nome)}
+    params['limit'] = request.args.get('limit') or POR_PAGINA_PADRAO
+    return params
+
+# ============================================================================
+# COMPOSIÇÃO CONCORRENTE
+# ============================================================================
+
+EXECUTOR_COMPOSICAO = ThreadPoolExecutor(
+    max_workers=COMPOSICAO_WORKERS,
+    thread_name_prefix='composicao'
+)
+
+def prazo_composicao():
+    """Retorna o instante limite (time.monotonic) de uma rota composta"""
+    return time.monotonic() + COMPOSICAO_ORCAMENTO
+
+def compor(chamadas, prazo=None):
+    """
+    Executa chamadas independentes aos serviços em paralelo
+    
+    Cada chamada recebe como timeout o menor valor entre REQUEST_TIMEOUT
+    e o tempo restante até o prazo; chamadas não concluídas até o prazo
+    são canceladas e retornam 504.
+    
+    Args:
+        chamadas: dict nome -> (metodo, url, params)
+        prazo: instante limite em time.monotonic() (padrão: agora + COMPOSICAO_ORCAMENTO)
+    
+    Returns:
+        dict: nome -> (resposta_json, status_code)
+    """
+    if prazo is None:
+        prazo = prazo_composicao()
+    
+    restante = prazo - time.monotonic()
+    if restante <= 0:
         return {
-            "usuarios": False,
-            "pedidos": False
+            nome: ({"erro": "Orçamento de tempo da composição esgotado"}, 504)
+            for nome in chamadas
         }
+    
+    timeout = min(REQUEST_TIMEOUT, restante)
+    # Cada chamada roda em uma cópia do contexto da requisição, para que a
+    # instrumentação e o rastreamento a atribuam à requisição que a originou
+    futuros = {
+        nome: EXECUTOR_COMPOSICAO.submit(
+            contextvars.copy_context().run,
+            fazer_requisicao, metodo, url, params=params, timeout=timeout
+        )
+        for nome, (metodo, url, params) in chamadas.items()
+    }
+    concluidos, _ = wait(futuros.values(), timeout=restante)
+    
+    resultados = {}
+    for nome, futuro in futuros.items():
+        if futuro in concluidos:
+            resultados[nome] = futuro.result()
+        else:
+            futuro.cancel()
+            resultados[nome] = ({"erro": f"Tempo limite da composição excedido: {chamadas[nome][1]}"}, 504)
+    return resultados
+
+def verificar_servicos():
+    """Verifica em paralelo se os microsserviços estão disponíveis"""
+    resultados = compor({
+        nome: ('GET', f"{url}/health", None)
+        for nome, url in UPSTREAMS.items()
+    })
+    return {nome: status_code == 200 for nome, (_, status_code) in resultados.items()}
+
+# ============================================================================
+# CACHE DE RESPOSTAS
+# ============================================================================
+
+class GeracoesRedis:
+    """
+    Contadores de geração das rotas em cache no Redis, comuns a todos os workers
+    
+    Uma escrita em qualquer worker incrementa as gerações das rotas
+    afetadas, e cada worker compara a geração guardada na entrada com a
+    atual antes de servi-la. Se o Redis falhar, por LIMITE_REDIS_REPOUSO
+    segundos o cache não guarda nem serve respostas: servir sem conferir
+    poderia devolver dados anteriores a uma escrita feita em outro worker.
+    """
+    
+    def __init__(self, url):
+        import redis
+        self._cliente = redis.Redis.from_url(
+            url,
+            socket_timeout=LIMITE_REDIS_TIMEOUT,
+            socket_connect_timeout=LIMITE_REDIS_TIMEOUT
+        )
+        self._indisponivel_ate = 0
+        self.falhas = 0
+    
+    def _falhou(self, erro):
+        self.falhas += 1
+        self._indisponivel_ate = time.monotonic() + LIMITE_REDIS_REPOUSO
+        print(f"Cache: Redis indisponível ({erro}); cache desligado por {LIMITE_REDIS_REPOUSO:g}s", flush=True)
+    
+    def ler(self, rota):
+        """Geração atual da rota, ou None se o Redis estiver indisponível"""
+        if time.monotonic() < self._indisponivel_ate:
+            return None
+        try:
+            return int(self._cliente.get(f"cache:geracao:{rota}") or 0)
+        except Exception as e:
+            self._falhou(e)
+            return None
+    
+    def incrementar(self, rotas):
+        try:
+            with self._cliente.pipeline(transaction=False) as pipeline:
+                for rota in rotas:
+                    pipeline.incr(f"cache:geracao:{rota}")
+                pipeline.execute()
+        except Exception as e:
+            self._falhou(e)
+
+class CacheRespostas:
+    """
+    Cache LRU em memória de respostas do gateway, com TTL por entrada
+    
+    Cada rota tem um contador de geração incrementado na invalidação; uma
+    resposta só é guardada se a geração da rota não mudou desde o início
+    da requisição, evitando gravar dados anteriores a uma escrita.
+    
+    Sem gerações compartilhadas, a invalidação vale só para o processo que
+    atendeu a escrita: com vários workers ou réplicas, os demais podem
+    servir a resposta anterior até o TTL expirar. Com GeracoesRedis, cada
+    entrada guarda também a geração do Redis e só é servida se ela ainda
+    for a atual, então uma escrita em qualquer processo invalida todos (ao
+    custo de uma consulta ao Redis por requisição em cache).
+    """
+    
+    def __init__(self, max_entradas, compartilhadas=None):
+        self.max_entradas = max_entradas
+        self.compartilhadas = compartilhadas
+        self._entradas = OrderedDict()
+        self._geracoes = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+    
+    def geracao(self, rota):
+        """Geração da rota a informar em guardar, ou None se a resposta não pode ser guardada"""
+        with self._lock:
+            local = self._geracoes.get(rota, 0)
+        if self.compartilhadas is None:
+            return local, None
+        compartilhada = self.compartilhadas.ler(rota)
+        if compartilhada is None:
+            return None
+        return local, compartilhada
+    
+    def obter(self, chave):
+        """Retorna (corpo, status_code, content_type, cabecalhos) ou None se ausente/expirada"""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] < time.monotonic():
+                del self._entradas[chave]
+                entrada = None
+            if entrada is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+        
+        # Consulta ao Redis fora do lock; uma entrada de geração antiga foi
+        # invalidada por uma escrita em outro processo
+        if self.compartilhadas is not None and self.compartilhadas.ler(chave[0]) != entrada[2]:
+            with self._lock:
+                if self._entradas.get(chave) is entrada:
+                    del self._entradas[chave]
+                self.falhas += 1
+            return None
+        
+        with self._lock:
+            self.acertos += 1
+        return entrada[1]
+    
+    def guardar(self, chave, valor, ttl, geracao):
+        if geracao is None:
+            return
+        local, compartilhada = geracao
+        rota = chave[0]
+        with self._lock:
+            if self._geracoes.get(rota, 0) != local:
+                return
+            self._entradas[chave] = (time.monotonic() + ttl, valor, compartilhada)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+    
+    def invalidar(self, rotas):
+        with self._lock:
+            for rota in rotas:
+                self._geracoes[rota] = self._geracoes.get(rota, 0) + 1
+            for chave in [c for c in self._entradas if c[0] in rotas]:
+                del self._entradas[chave]
+        if self.compartilhadas is not None:
+            self.compartilhadas.incrementar(rotas)
+    
+    def estatisticas(self):
+        with self._lock:
+            estatisticas = {
+                "entradas": len(self._entradas),
+                "acertos": self.acertos,
+                "falhas": self.falhas
+            }
+        estatisticas["compartilhado"] = self.compartilhadas is not None
+        if self.compartilhadas is not None:
+            estatisticas["falhas_redis"] = self.compartilhadas.falhas
+        return estatisticas
+
+def criar_cache():
+    """Cache com gerações no Redis se CACHE_REDIS_URL estiver definido"""
+    if not CACHE_REDIS_URL:
+        return CacheRespostas(CACHE_MAX_ENTRADAS)
+    try:
+        return CacheRespostas(CACHE_MAX_ENTRADAS, GeracoesRedis(CACHE_REDIS_URL))
+    except ImportError:
+        print("CACHE_REDIS_URL definido sem o pacote redis; invalidação do cache por processo", flush=True)
+        return CacheRespostas(CACHE_MAX_ENTRADAS)
+
+CACHE = criar_cache()
+
+def _query_normalizada():
+    """Parâmetros de query ordenados, para que a ordem não altere a chave do cache"""
+    return urlencode(sorted(
+        (nome, valor)
+        for nome, valores in request.args.lists()
+        for valor in valores
+    ))
+
+def cache_resposta(funcao):
+    """Decorator: serve rotas GET do cache, usando o TTL configurado em CACHE_TTL"""
+    @wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        rota = request.path
+        ttl = CACHE_TTL.get(rota, 0)
+        if ttl <= 0:
+            return funcao(*args, **kwargs)
+        
+        chave = (rota, _query_normalizada())
+        accept_encoding = request.headers.get('Accept-Encoding')
+        em_cache = CACHE.obter(chave)
+        if em_cache is not None:
+            corpo, status_code, content_type, cabecalhos = em_cache
+            resposta = Response(status=status_code, content_type=content_type, headers=cabecalhos)
+            resposta.headers['X-Cache'] = 'HIT'
+            return definir_corpo(resposta, corpo, accept_encoding)
+        
+        geracao = CACHE.geracao(rota)
+        resposta = app.make_response(funcao(*args, **kwargs))
+        resposta.headers['X-Cache'] = 'MISS'
+        if resposta.status_code != 200:
+            return resposta
+        
+        # Guarda o corpo com as versões comprimidas, calculadas uma única vez
+        corpo = CorpoComprimido(resposta.get_data())
+        cabecalhos = {nome: resposta.headers[nome] for nome in CABECALHOS_REPASSADOS if nome in resposta.headers}
+        CACHE.guardar(chave, (corpo, resposta.status_code, resposta.content_type, cabecalhos), ttl, geracao)
+        return definir_corpo(resposta, corpo, accept_encoding)
+    return envoltorio
+
+def invalida_cache(recurso):
+    """Decorator: invalida as rotas em cache afetadas por uma escrita no recurso"""
+    def decorador(funcao):
+        @wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                CACHE.invalidar(CACHE_INVALIDACAO[recurso])
+        return envoltorio
+    return decorador
 
 # ============================================================================
 # HEALTH CHECK
@@ -82,6 +1002,12 @@ def health():
         "status": status,
         "servico": "API Gateway",
         "servicos": servicos,
+        "conexoes": estatisticas_conexoes(),
+        "cache": CACHE.estatisticas(),
+        "requisicoes_coalescidas": EM_VOO.compartilhadas,
+        "circuit_breakers": {nome: breaker.situacao() for nome, breaker in BREAKERS.items()},
+        "concorrencia": {nome: limite.situacao() for nome, limite in CONCORRENCIA.items()},
+        "limite_taxa": "redis" if isinstance(BALDES, BaldesRedis) else "memoria",
         "timestamp": datetime.now().isoformat()
     }), 200
 
@@ -90,26 +1016,19 @@ def health():
 # ============================================================================
 
 @app.route('/users', methods=['GET'])
+@cache_resposta
 def gateway_listar_usuarios():
     """
     GET /users
-    Lista todos os usuários
-    Query params: ativo, perfil
+    Lista os usuários, paginados por cursor
+    Query params: ativo, perfil, limit (padrão POR_PAGINA_PADRAO), cursor, sort
     Encaminha para: GET /api/usuarios
     """
-    params = {}
-    if request.args.get('ativo'):
-        params['ativo'] = request.args.get('ativo')
-    if request.args.get('perfil'):
-        params['perfil'] = request.args.get('perfil')
-    
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'GET',
         f"{USUARIOS_SERVICE_URL}/api/usuarios",
-        params=params
+        params=parametros_listagem('ativo', 'perfil')
     )
-    
-    return jsonify(dados), status_code
 
 @app.route('/users/<int:usuario_id>', methods=['GET'])
 def gateway_obter_usuario(usuario_id):
@@ -118,14 +1037,13 @@ def gateway_obter_usuario(usuario_id):
     Obtém detalhes de um usuário específico
     Encaminha para: GET /api/usuarios/<id>
     """
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'GET',
         f"{USUARIOS_SERVICE_URL}/api/usuarios/{usuario_id}"
     )
-    
-    return jsonify(dados), status_code
 
 @app.route('/users', methods=['POST'])
+@invalida_cache('users')
 def gateway_criar_usuario():
     """
     POST /users
@@ -135,15 +1053,29 @@ def gateway_criar_usuario():
     """
     dados_entrada = request.get_json()
     
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'POST',
         f"{USUARIOS_SERVICE_URL}/api/usuarios",
         dados=dados_entrada
     )
-    
-    return jsonify(dados), status_code
+
+@app.route('/users/batch', methods=['POST'])
+@invalida_cache('users')
+def gateway_lote_usuarios():
+    """
+    POST /users/batch
+    Cria e atualiza usuários em lote (até 1000 por requisição)
+    Body: { usuarios: [ {nome, email, ...} para criar | {id, ...campos} para atualizar ] }
+    Encaminha para: POST /api/usuarios/lote
+    """
+    return encaminhar(
+        'POST',
+        f"{USUARIOS_SERVICE_URL}/api/usuarios/lote",
+        dados=request.get_json(silent=True)
+    )
 
 @app.route('/users/<int:usuario_id>', methods=['PUT'])
+@invalida_cache('users')
 def gateway_atualizar_usuario(usuario_id):
     """
     PUT /users/<id>
@@ -152,67 +1084,56 @@ def gateway_atualizar_usuario(usuario_id):
     """
     dados_entrada = request.get_json()
     
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'PUT',
         f"{USUARIOS_SERVICE_URL}/api/usuarios/{usuario_id}",
         dados=dados_entrada
     )
-    
-    return jsonify(dados), status_code
 
 @app.route('/users/<int:usuario_id>', methods=['DELETE'])
+@invalida_cache('users')
 def gateway_deletar_usuario(usuario_id):
     """
     DELETE /users/<id>
     Deleta um usuário
     Encaminha para: DELETE /api/usuarios/<id>
     """
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'DELETE',
         f"{USUARIOS_SERVICE_URL}/api/usuarios/{usuario_id}"
     )
-    
-    return jsonify(dados), status_code
 
 @app.route('/users/stats', methods=['GET'])
+@cache_resposta
 def gateway_stats_usuarios():
     """
     GET /users/stats
     Retorna estatísticas dos usuários
     Encaminha para: GET /api/usuarios/estatisticas/resumo
     """
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'GET',
         f"{USUARIOS_SERVICE_URL}/api/usuarios/estatisticas/resumo"
     )
-    
-    return jsonify(dados), status_code
 
 # ============================================================================
 # ENDPOINTS DE PEDIDOS - Gateway expõe /orders
 # ============================================================================
 
 @app.route('/orders', methods=['GET'])
+@cache_resposta
 def gateway_listar_pedidos():
     """
     GET /orders
-    Lista todos os pedidos
-    Query params: usuario_id, status
+    Lista os pedidos, paginados por cursor
+    Query params: usuario_id, status, limit (padrão POR_PAGINA_PADRAO), cursor, sort
     Encaminha para: GET /api/pedidos
     """
-    params = {}
-    if request.args.get('usuario_id'):
-        params['usuario_id'] = request.args.get('usuario_id')
-    if request.args.get('status'):
-        params['status'] = request.args.get('status')
-    
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'GET',
         f"{PEDIDOS_SERVICE_URL}/api/pedidos",
-        params=params
+        params=parametros_listagem('usuario_id', 'status')
     )
-    
-    return jsonify(dados), status_code
 
 @app.route('/orders/<int:pedido_id>', methods=['GET'])
 def gateway_obter_pedido(pedido_id):
@@ -221,14 +1142,13 @@ def gateway_obter_pedido(pedido_id):
     Obtém detalhes de um pedido específico
     Encaminha para: GET /api/pedidos/<id>
     """
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'GET',
         f"{PEDIDOS_SERVICE_URL}/api/pedidos/{pedido_id}"
     )
-    
-    return jsonify(dados), status_code
 
 @app.route('/orders', methods=['POST'])
+@invalida_cache('orders')
 def gateway_criar_pedido():
     """
     POST /orders
@@ -238,15 +1158,29 @@ def gateway_criar_pedido():
     """
     dados_entrada = request.get_json()
     
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'POST',
         f"{PEDIDOS_SERVICE_URL}/api/pedidos",
         dados=dados_entrada
     )
-    
-    return jsonify(dados), status_code
+
+@app.route('/orders/batch', methods=['POST'])
+@invalida_cache('orders')
+def gateway_lote_pedidos():
+    """
+    POST /orders/batch
+    Cria pedidos e altera status em lote (até 1000 por requisição)
+    Body: { pedidos: [ {usuario_id, itens} para criar | {id, status} para alterar o status ] }
+    Encaminha para: POST /api/pedidos/lote
+    """
+    return encaminhar(
+        'POST',
+        f"{PEDIDOS_SERVICE_URL}/api/pedidos/lote",
+        dados=request.get_json(silent=True)
+    )
 
 @app.route('/orders/<int:pedido_id>', methods=['PUT'])
+@invalida_cache('orders')
 def gateway_atualizar_pedido(pedido_id):
     """
     PUT /orders/<id>
@@ -255,27 +1189,24 @@ def gateway_atualizar_pedido(pedido_id):
     """
     dados_entrada = request.get_json()
     
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'PUT',
         f"{PEDIDOS_SERVICE_URL}/api/pedidos/{pedido_id}",
         dados=dados_entrada
     )
-    
-    return jsonify(dados), status_code
 
 @app.route('/orders/<int:pedido_id>', methods=['DELETE'])
+@invalida_cache('orders')
 def gateway_deletar_pedido(pedido_id):
     """
     DELETE /orders/<id>
     Cancela um pedido
     Encaminha para: DELETE /api/pedidos/<id>
     """
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'DELETE',
         f"{PEDIDOS_SERVICE_URL}/api/pedidos/{pedido_id}"
     )
-    
-    return jsonify(dados), status_code
 
 @app.route('/orders/user/<int:usuario_id>', methods=['GET'])
 def gateway_pedidos_usuario(usuario_id):
@@ -284,47 +1215,62 @@ def gateway_pedidos_usuario(usuario_id):
     Lista todos os pedidos de um usuário
     Encaminha para: GET /api/pedidos/usuario/<id>
     """
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'GET',
         f"{PEDIDOS_SERVICE_URL}/api/pedidos/usuario/{usuario_id}"
     )
-    
-    return jsonify(dados), status_code
 
 @app.route('/orders/stats', methods=['GET'])
+@cache_resposta
 def gateway_stats_pedidos():
     """
     GET /orders/stats
     Retorna estatísticas dos pedidos
     Encaminha para: GET /api/pedidos/estatisticas/resumo
     """
-    dados, status_code = fazer_requisicao(
+    return encaminhar(
         'GET',
         f"{PEDIDOS_SERVICE_URL}/api/pedidos/estatisticas/resumo"
     )
+
+@app.route('/orders/stats/series', methods=['GET'])
+def gateway_serie_pedidos():
+    """
+    GET /orders/stats/series
+    Retorna a série temporal de pedidos por dia ou hora
+    Query params: granularidade, inicio, fim, status
+    Encaminha para: GET /api/pedidos/estatisticas/serie
+    """
+    params = {
+        nome: request.args.get(nome)
+        for nome in ('granularidade', 'inicio', 'fim', 'status')
+        if request.args.get(nome)
+    }
     
-    return jsonify(dados), status_code
+    return encaminhar(
+        'GET',
+        f"{PEDIDOS_SERVICE_URL}/api/pedidos/estatisticas/serie",
+        params=params
+    )
 
 # ============================================================================
 # ENDPOINTS DE COMPOSIÇÃO - Orquestra os dois serviços
 # ============================================================================
 
 @app.route('/dashboard', methods=['GET'])
+@cache_resposta
 def gateway_dashboard():
     """
     GET /dashboard
     Dashboard consolidado com informações de usuários e pedidos
-    Orquestra chamadas aos dois serviços
+    Orquestra chamadas aos dois serviços em paralelo
     """
-    usuarios_resp, usuarios_status = fazer_requisicao(
-        'GET',
-        f"{USUARIOS_SERVICE_URL}/api/usuarios/estatisticas/resumo"
-    )
-    
-    pedidos_resp, pedidos_status = fazer_requisicao(
-        'GET',
-        f"{PEDIDOS_SERVICE_URL}/api/pedidos/estatisticas/resumo"
-    )
+    resultados = compor({
+        "usuarios": ('GET', f"{USUARIOS_SERVICE_URL}/api/usuarios/estatisticas/resumo", None),
+        "pedidos": ('GET', f"{PEDIDOS_SERVICE_URL}/api/pedidos/estatisticas/resumo", None)
+    })
+    usuarios_resp, usuarios_status = resultados["usuarios"]
+    pedidos_resp, pedidos_status = resultados["pedidos"]
     
     if usuarios_status != 200 or pedidos_status != 200:
         return jsonify({
@@ -344,38 +1290,88 @@ def gateway_dashboard():
 def gateway_usuarios_com_pedidos():
     """
     GET /usuarios-com-pedidos
-    Retorna lista de usuários com seus respectivos pedidos
-    Orquestra chamadas aos dois serviços
+    Retorna lista paginada de usuários com seus respectivos pedidos
+    Query params:
+    - limit, cursor, sort, ativo, perfil: paginação por cursor; o serviço
+      de usuários devolve apenas a página pedida
+    - pagina (padrão 1), por_pagina (padrão 50): paginação por número de
+      página, usada quando limit e cursor não são informados; repassada
+      ao serviço de usuários como limit/offset, com ativo, perfil e sort
+    Orquestra chamadas aos dois serviços: uma para os usuários e
+    consultas em lote paralelas (COMPOSICAO_LOTE IDs cada) para os
+    pedidos dos usuários da página
     """
+    prazo = prazo_composicao()
     try:
-        usuarios_resp, usuarios_status = fazer_requisicao(
-            'GET',
-            f"{USUARIOS_SERVICE_URL}/api/usuarios"
-        )
+        por_cursor = 'limit' in request.args or 'cursor' in request.args
+        if por_cursor:
+            params = parametros_listagem('ativo', 'perfil')
+        else:
+            try:
+                pagina = int(request.args.get('pagina', 1))
+                por_pagina = int(request.args.get('por_pagina', POR_PAGINA_PADRAO))
+            except ValueError:
+                return jsonify({"erro": "pagina e por_pagina devem ser números"}), 400
+            
+            if pagina < 1 or por_pagina < 1:
+                return jsonify({"erro": "pagina e por_pagina devem ser maiores que zero"}), 400
+            por_pagina = min(por_pagina, POR_PAGINA_MAX)
+            # O serviço de usuários devolve só a página, já filtrada
+            params = {nome: request.args[nome] for nome in ('ativo', 'perfil', 'sort') if request.args.get(nome)}
+            params.update(limit=por_pagina, offset=(pagina - 1) * por_pagina)
         
+        usuarios_resp, usuarios_status = compor({
+            "usuarios": ('GET', f"{USUARIOS_SERVICE_URL}/api/usuarios", params)
+        }, prazo)["usuarios"]
+        
+        if usuarios_status == 400:
+            return jsonify(usuarios_resp), 400
         if usuarios_status != 200:
             return jsonify({"erro": "Erro ao obter usuários"}), usuarios_status
         
-        usuarios = usuarios_resp.get('usuarios', [])
-        resultado = []
+        usuarios_pagina = usuarios_resp.get('usuarios', [])
+        total_usuarios = usuarios_resp.get('total', len(usuarios_pagina))
         
-        for usuario in usuarios:
-            usuario_id = usuario['id']
-            pedidos_resp, pedidos_status = fazer_requisicao(
-                'GET',
-                f"{PEDIDOS_SERVICE_URL}/api/pedidos/usuario/{usuario_id}"
-            )
-            
-            usuario_com_pedidos = {
+        lotes = {}
+        for i in range(0, len(usuarios_pagina), COMPOSICAO_LOTE):
+            ids = ",".join(str(u['id']) for u in usuarios_pagina[i:i + COMPOSICAO_LOTE])
+            lotes[i] = ('GET', f"{PEDIDOS_SERVICE_URL}/api/pedidos/usuarios", {"ids": ids})
+        
+        pedidos_por_usuario = {}
+        for pedidos_resp, pedidos_status in compor(lotes, prazo).values():
+            if pedidos_status == 200:
+                pedidos_por_usuario.update(pedidos_resp.get('pedidos_por_usuario', {}))
+        
+        resultado = []
+        for usuario in usuarios_pagina:
+            pedidos_usuario = pedidos_por_usuario.get(str(usuario['id']), {})
+            resultado.append({
                 "usuario": usuario,
-                "pedidos": pedidos_resp.get('pedidos', []) if pedidos_status == 200 else [],
-                "total_pedidos": pedidos_resp.get('total_pedidos', 0) if pedidos_status == 200 else 0,
-                "valor_total_pedidos": pedidos_resp.get('valor_total', 0) if pedidos_status == 200 else 0
-            }
-            resultado.append(usuario_com_pedidos)
+                "pedidos": pedidos_usuario.get('pedidos', []),
+                "total_pedidos": pedidos_usuario.get('total_pedidos', 0),
+                "valor_total_pedidos": pedidos_usuario.get('valor_total', 0)
+            })
+        
+        if por_cursor:
+            proximo_cursor = usuarios_resp.get('proximo_cursor')
+            cabecalhos = {}
+            if proximo_cursor:
+                proximo = {nome: valor for nome, valor in request.args.items() if nome not in ('limit', 'cursor')}
+                proximo.update(limit=params['limit'], cursor=proximo_cursor)
+                cabecalhos['Link'] = f'<?{urlencode(proximo)}>; rel="next"'
+            return jsonify({
+                "total_usuarios": total_usuarios,
+                "limit": int(params['limit']),
+                "proximo_cursor": proximo_cursor,
+                "usuarios_com_pedidos": resultado,
+                "timestamp": datetime.now().isoformat()
+            }), 200, cabecalhos
         
         return jsonify({
-            "total_usuarios": len(usuarios),
+            "total_usuarios": total_usuarios,
+            "pagina": pagina,
+            "por_pagina": por_pagina,
+            "total_paginas": (total_usuarios + por_pagina - 1) // por_pagina,
             "usuarios_com_pedidos": resultado,
             "timestamp": datetime.now().isoformat()
         }), 200
@@ -387,44 +1383,49 @@ def gateway_usuarios_com_pedidos():
 # ROTA RAIZ E DOCUMENTAÇÃO
 # ============================================================================
 
+DOCUMENTACAO = {
+    "titulo": "API Gateway - Arquitetura de Microsserviços",
+    "versao": "1.0.0",
+    "descricao": "Gateway centralizando acesso a microsserviços de usuários e pedidos",
+    "endpoints": {
+        "saude": {
+            "GET /health": "Health check do gateway e seus serviços"
+        },
+        "usuarios": {
+            "GET /users": "Lista usuários (ativo, perfil, limit, cursor, sort)",
+            "GET /users/<id>": "Obtém detalhes de um usuário",
+            "POST /users": "Cria novo usuário",
+            "POST /users/batch": "Cria e atualiza usuários em lote",
+            "PUT /users/<id>": "Atualiza usuário",
+            "DELETE /users/<id>": "Deleta usuário",
+            "GET /users/stats": "Estatísticas de usuários"
+        },
+        "pedidos": {
+            "GET /orders": "Lista pedidos (usuario_id, status, limit, cursor, sort)",
+            "GET /orders/<id>": "Obtém detalhes de um pedido",
+            "GET /orders/user/<usuario_id>": "Lista pedidos de um usuário",
+            "POST /orders": "Cria novo pedido",
+            "POST /orders/batch": "Cria pedidos e altera status em lote",
+            "PUT /orders/<id>": "Atualiza pedido",
+            "DELETE /orders/<id>": "Cancela pedido",
+            "GET /orders/stats": "Estatísticas de pedidos",
+            "GET /orders/stats/series": "Série temporal de pedidos (granularidade, inicio, fim, status)"
+        },
+        "composicao": {
+            "GET /dashboard": "Dashboard consolidado",
+            "GET /usuarios-com-pedidos": "Usuários com seus pedidos (paginado: limit e cursor, ou pagina e por_pagina)"
+        }
+    },
+    "servicos_internos": {
+        "usuarios_service": USUARIOS_SERVICE_URL,
+        "pedidos_service": PEDIDOS_SERVICE_URL
+    }
+}
+
 @app.route('/', methods=['GET'])
 def documentacao():
     """Retorna documentação da API Gateway"""
-    return jsonify({
-        "titulo": "API Gateway - Arquitetura de Microsserviços",
-        "versao": "1.0.0",
-        "descricao": "Gateway centralizando acesso a microsserviços de usuários e pedidos",
-        "endpoints": {
-            "saude": {
-                "GET /health": "Health check do gateway e seus serviços"
-            },
-            "usuarios": {
-                "GET /users": "Lista todos os usuários",
-                "GET /users/<id>": "Obtém detalhes de um usuário",
-                "POST /users": "Cria novo usuário",
-                "PUT /users/<id>": "Atualiza usuário",
-                "DELETE /users/<id>": "Deleta usuário",
-                "GET /users/stats": "Estatísticas de usuários"
-            },
-            "pedidos": {
-                "GET /orders": "Lista todos os pedidos",
-                "GET /orders/<id>": "Obtém detalhes de um pedido",
-                "GET /orders/user/<usuario_id>": "Lista pedidos de um usuário",
-                "POST /orders": "Cria novo pedido",
-                "PUT /orders/<id>": "Atualiza pedido",
-                "DELETE /orders/<id>": "Cancela pedido",
-                "GET /orders/stats": "Estatísticas de pedidos"
-            },
-            "composicao": {
-                "GET /dashboard": "Dashboard consolidado",
-                "GET /usuarios-com-pedidos": "Usuários com seus pedidos"
-            }
-        },
-        "servicos_internos": {
-            "usuarios_service": USUARIOS_SERVICE_URL,
-            "pedidos_service": PEDIDOS_SERVICE_URL
-        }
-    }), 200
+    return jsonify(DOCUMENTACAO), 200
 
 @app.errorhandler(404)
 def nao_encontrado(error):
@@ -0,0 +1,704 @@
+"""
+API Gateway - variante ASGI
+
+Mesmas rotas do app.py, com handlers assíncronos (Quart) e um cliente HTTP
+assíncrono (httpx) com pool de conexões keep-alive por serviço. Uma chamada
+ao serviço não ocupa uma thread enquanto aguarda a resposta, então um único
+processo mantém milhares de requisições encaminhadas em andamento.
+
+Configuração, circuit breakers e cache de respostas são os do app.py;
+aqui ficam apenas as partes que fazem I/O.
+
+Seleção na inicialização (ver README):
+    WEB_APP=app_async:app WEB_WORKER_CLASS=uvicorn.workers.UvicornWorker
+"""
+from quart import Quart, Response, jsonify, request
+from functools import wraps
+import httpx
+from urllib.parse import urlencode
+from datetime import datetime
+import asyncio
+import os
+import time
+
+from plataforma.compressao import CorpoComprimido, definir_corpo, instalar_compressao
+from plataforma.instrumentacao import instalar_instrumentacao
+from plataforma.perfilador import instalar_perfilador
+from plataforma.rastreamento import instalar_rastreamento
+from plataforma.serializacao import desserializar, instalar_json
+from app import (
+    USUARIOS_SERVICE_URL, PEDIDOS_SERVICE_URL, REQUEST_TIMEOUT,
+    METODOS_SUPORTADOS, CABECALHOS_REPASSADOS, COALESCER_GETS,
+    COMPOSICAO_ORCAMENTO, COMPOSICAO_LOTE, CACHE_TTL, CACHE_INVALIDACAO,
+    POR_PAGINA_PADRAO, POR_PAGINA_MAX, UPSTREAMS, BREAKERS, CACHE,
+    DOCUMENTACAO, LIMITE_RETRY_AFTER, BALDES, BaldesRedis, CircuitoAberto,
+    ServicoSaturado, baldes_requisicao, criar_limites_concorrencia,
+    obter_upstream, resposta_limite
+)
+
+app = Quart(__name__)
+instalar_rastreamento(app, 'gateway')
+instalar_instrumentacao(app)
+instalar_compressao(app)
+instalar_json(app)
+instalar_perfilador(app)
+
+# Pool de conexões por serviço: conexões simultâneas e conexões ociosas
+# mantidas abertas; requisições além do limite aguardam uma conexão livre
+ASYNC_MAX_CONEXOES = int(os.getenv('ASYNC_MAX_CONEXOES', 200))
+ASYNC_CONEXOES_OCIOSAS = int(os.getenv('ASYNC_CONEXOES_OCIOSAS', 50))
+
+# ============================================================================
+# CLIENTES HTTP
+# ============================================================================
+
+CLIENTES = {}
+ESTATISTICAS = {nome: {"requisicoes": 0, "em_andamento": 0} for nome in UPSTREAMS}
+
+# Sem thread bloqueada por chamada, o limite natural é o do pool: acima
+# dele a chamada esperaria uma conexão livre
+CONCORRENCIA = criar_limites_concorrencia(ASYNC_MAX_CONEXOES)
+
+def obter_cliente(nome):
+    """
+    Retorna o cliente do serviço (None para URLs de fora dos serviços)
+    
+    Os clientes são criados na primeira chamada, dentro do event loop do
+    worker, e não na importação: com preload, o processo principal não
+    deve abrir conexões que os workers herdariam.
+    """
+    cliente = CLIENTES.get(nome)
+    if cliente is None:
+        cliente = CLIENTES[nome] = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ASYNC_MAX_CONEXOES,
+                max_keepalive_connections=ASYNC_CONEXOES_OCIOSAS
+            ),
+            timeout=REQUEST_TIMEOUT,
+            headers={'Accept-Encoding': 'identity'}
+        )
+    return cliente
+
+@app.after_serving
+async def fechar_clientes():
+    """Fecha as conexões abertas ao encerrar o worker"""
+    clientes = list(CLIENTES.values())
+    CLIENTES.clear()
+    await asyncio.gather(*(cliente.aclose() for cliente in clientes))
+
+class RequisicoesEmVoo:
+    """
+    Coalescência de requisições: GETs idênticos feitos enquanto o primeiro
+    ainda está em andamento aguardam o mesmo future e recebem o mesmo
+    resultado. Nada é guardado após a conclusão.
+    """
+    
+    def __init__(self):
+        self._em_voo = {}
+        self.compartilhadas = 0
+    
+    async def executar(self, chave, funcao, timeout):
+        futuro = self._em_voo.get(chave)
+        if futuro is not None:
+            self.compartilhadas += 1
+            try:
+                resposta, erro = await asyncio.wait_for(asyncio.shield(futuro), timeout)
+            except asyncio.TimeoutError:
+                raise httpx.TimeoutException(f"Timeout aguardando requisição em andamento: {chave[0]}")
+            if erro is not None:
+                raise erro
+            return resposta
+        
+        # O future guarda (resposta, erro) em vez de uma exceção, para não
+        # gerar avisos de exceção não lida quando ninguém estava aguardando
+        futuro = self._em_voo[chave] = asyncio.get_running_loop().create_future()
+        try:
+            resposta = await funcao()
+            futuro.set_result((resposta, None))
+            return resposta
+        except Exception as e:
+            futuro.set_result((None, e))
+            raise
+        finally:
+            del self._em_voo[chave]
+            if not futuro.done():
+                # Chamada cancelada (prazo da composição esgotado)
+                futuro.set_result((None, httpx.TimeoutException(f"Requisição cancelada: {chave[0]}")))
+
+EM_VOO = RequisicoesEmVoo()
+
+async def _executar(metodo, url, dados=None, params=None, timeout=None):
+    """
+    Executa a requisição no cliente do serviço e retorna a resposta bruta
+    
+    Mesmo comportamento do app.py: limite de chamadas simultâneas, circuit
+    breaker, timeout adaptativo e coalescência de GETs idênticos.
+    """
+    nome = obter_upstream(url)
+    breaker = BREAKERS.get(nome)
+    concorrencia = CONCORRENCIA.get(nome)
+    if breaker is not None:
+        timeout = min(timeout or REQUEST_TIMEOUT, breaker.timeout())
+    timeout = timeout or REQUEST_TIMEOUT
+    
+    async def chamar():
+        if concorrencia is not None:
+            concorrencia.entrar()
+        try:
+            if breaker is not None:
+                permissao = breaker.permitir()
+                if permissao is None:
+                    raise CircuitoAberto(breaker.nome)
+            
+            estatisticas = ESTATISTICAS.get(nome)
+            if estatisticas is not None:
+                estatisticas["requisicoes"] += 1
+                estatisticas["em_andamento"] += 1
+            inicio = time.monotonic()
+            sucesso = False
+            try:
+                resposta = await obter_cliente(nome).request(
+                    metodo,
+                    url,
+                    params=params,
+                    json=dados,
+                    timeout=timeout
+                )
+                sucesso = resposta.status_code < 500
+                return resposta
+            finally:
+                if estatisticas is not None:
+                    estatisticas["em_andamento"] -= 1
+                if breaker is not None:
+                    breaker.registrar(permissao, sucesso, time.monotonic() - inicio)
+        finally:
+            if concorrencia is not None:
+                concorrencia.sair()
+    
+    if metodo != 'GET' or not COALESCER_GETS:
+        return await chamar()
+    
+    chave = (url, urlencode(sorted((params or {}).items())))
+    return await EM_VOO.executar(chave, chamar, timeout)
+
+def _erro_requisicao(erro, url):
+    """Converte uma exceção de requisição em (erro, status_code)"""
+    if isinstance(erro, (CircuitoAberto, ServicoSaturado)):
+        return {"erro": str(erro)}, 503
+    if isinstance(erro, httpx.TimeoutException):
+        return {"erro": f"Timeout ao conectar com o serviço: {url}"}, 504
+    if isinstance(erro, httpx.TransportError):
+        return {"erro": f"Erro ao conectar com o serviço: {url}"}, 503
+    return {"erro": f"Erro na requisição: {str(erro)}"}, 500
+
+async def fazer_requisicao(metodo, url, dados=None, params=None, timeout=None):
+    """
+    Faz uma requisição HTTP ao serviço especificado
+    
+    Returns:
+        tuple: (resposta_json, status_code) ou (erro, status_code)
+    """
+    if metodo not in METODOS_SUPORTADOS:
+        return {"erro": "Método HTTP não suportado"}, 400
+    
+    try:
+        resposta = await _executar(metodo, url, dados=dados, params=params, timeout=timeout)
+        
+        if resposta.status_code == 204:
+            return {}, 204
+        
+        try:
+            dados_resposta = desserializar(resposta.content)
+        except ValueError:
+            dados_resposta = {"mensagem": resposta.text}
+        
+        return dados_resposta, resposta.status_code
+    
+    except Exception as e:
+        return _erro_requisicao(e, url)
+
+async def encaminhar(metodo, url, dados=None, params=None):
+    """Encaminha a requisição ao serviço e repassa o corpo sem decodificá-lo"""
+    if metodo not in METODOS_SUPORTADOS:
+        return jsonify({"erro": "Método HTTP não suportado"}), 400
+    
+    try:
+        resposta = await _executar(metodo, url, dados=dados, params=params)
+    except Exception as e:
+        erro, status_code = _erro_requisicao(e, url)
+        return jsonify(erro), status_code
+    
+    return Response(
+        resposta.content,
+        status=resposta.status_code,
+        content_type=resposta.headers.get('Content-Type', 'application/json'),
+        headers={nome: resposta.headers[nome] for nome in CABECALHOS_REPASSADOS if nome in resposta.headers}
+    )
+
+def parametros_listagem(*filtros):
+    """Parâmetros repassados às listagens paginadas dos serviços (ver app.py)"""
+    params = {nome: request.args[nome] for nome in filtros + ('cursor', 'sort') if request.args.get(nome)}
+    params['limit'] = request.args.get('limit') or POR_PAGINA_PADRAO
+    return params
+
+# ============================================================================
+# LIMITE DE TAXA
+# ============================================================================
+
+@app.before_request
+async def limitar_taxa():
+    """Recusa com 429 a requisição que excede o limite do cliente ou da rota (ver app.py)"""
+    baldes = baldes_requisicao(request)
+    if not baldes:
+        return None
+    if isinstance(BALDES, BaldesRedis):
+        # Chamada bloqueante ao Redis fora do event loop
+        espera = await asyncio.to_thread(BALDES.consumir, baldes)
+    else:
+        espera = BALDES.consumir(baldes)
+    if espera > 0:
+        return resposta_limite(espera)
+    return None
+
+@app.after_request
+async def sugerir_nova_tentativa(resposta):
+    """503 (serviço saturado, circuit breaker aberto, serviço fora) com Retry-After"""
+    if resposta.status_code == 503 and 'Retry-After' not in resposta.headers:
+        resposta.headers['Retry-After'] = str(LIMITE_RETRY_AFTER)
+    return resposta
+
+# ============================================================================
+# COMPOSIÇÃO CONCORRENTE
+# ============================================================================
+
+def prazo_composicao():
+    """Retorna o instante limite (time.monotonic) de uma rota composta"""
+    return time.monotonic() + COMPOSICAO_ORCAMENTO
+
+async def compor(chamadas, prazo=None):
+    """
+    Executa chamadas independentes aos serviços em paralelo
+    
+    Mesmo contrato do compor do app.py, com tarefas no event loop no lugar
+    do pool de threads: chamadas não concluídas até o prazo são canceladas
+    e retornam 504.
+    
+    Args:
+        chamadas: dict nome -> (metodo, url, params)
+        prazo: instante limite em time.monotonic() (padrão: agora + COMPOSICAO_ORCAMENTO)
+    
+    Returns:
+        dict: nome -> (resposta_json, status_code)
+    """
+    if not chamadas:
+        return {}
+    if prazo is None:
+        prazo = prazo_composicao()
+    
+    restante = prazo - time.monotonic()
+    if restante <= 0:
+        return {
+            nome: ({"erro": "Orçamento de tempo da composição esgotado"}, 504)
+            for nome in chamadas
+        }
+    
+    timeout = min(REQUEST_TIMEOUT, restante)
+    tarefas = {
+        nome: asyncio.create_task(fazer_requisicao(metodo, url, params=params, timeout=timeout))
+        for nome, (metodo, url, params) in chamadas.items()
+    }
+    concluidas, _ = await asyncio.wait(tarefas.values(), timeout=restante)
+    
+    resultados = {}
+    for nome, tarefa in tarefas.items():
+        if tarefa in concluidas:
+            resultados[nome] = tarefa.result()
+        else:
+            tarefa.cancel()
+            resultados[nome] = ({"erro": f"Tempo limite da composição excedido: {chamadas[nome][1]}"}, 504)
+    return resultados
+
+async def verificar_servicos():
+    """Verifica em paralelo se os microsserviços estão disponíveis"""
+    resultados = await compor({
+        nome: ('GET', f"{url}/health", None)
+        for nome, url in UPSTREAMS.items()
+    })
+    return {nome: status_code == 200 for nome, (_, status_code) in resultados.items()}
+
+# ============================================================================
+# CACHE DE RESPOSTAS
+# ============================================================================
+
+def _query_normalizada():
+    """Parâmetros de query ordenados, para que a ordem não altere a chave do cache"""
+    return urlencode(sorted(
+        (nome, valor)
+        for nome, valores in request.args.lists()
+        for valor in valores
+    ))
+
+async def _no_cache(metodo, *args):
+    """Chama um método do CACHE; com gerações no Redis, fora do event loop"""
+    if CACHE.compartilhadas is not None:
+        return await asyncio.to_thread(metodo, *args)
+    return metodo(*args)
+
+def cache_resposta(funcao):
+    """Decorator: serve rotas GET do cache, usando o TTL configurado em CACHE_TTL"""
+    @wraps(funcao)
+    async def envoltorio(*args, **kwargs):
+        rota = request.path
+        ttl = CACHE_TTL.get(rota, 0)
+        if ttl <= 0:
+            return await funcao(*args, **kwargs)
+        
+        chave = (rota, _query_normalizada())
+        accept_encoding = request.headers.get('Accept-Encoding')
+        em_cache = await _no_cache(CACHE.obter, chave)
+        if em_cache is not None:
+            corpo, status_code, content_type, cabecalhos = em_cache
+            resposta = Response(b'', status=status_code, content_type=content_type, headers=cabecalhos)
+            resposta.headers['X-Cache'] = 'HIT'
+            return definir_corpo(resposta, corpo, accept_encoding)
+        
+        geracao = await _no_cache(CACHE.geracao, rota)
+        resposta = await app.make_response(await funcao(*args, **kwargs))
+        resposta.headers['X-Cache'] = 'MISS'
+        if resposta.status_code != 200:
+            return resposta
+        
+        corpo = CorpoComprimido(await resposta.get_data())
+        cabecalhos = {nome: resposta.headers[nome] for nome in CABECALHOS_REPASSADOS if nome in resposta.headers}
+        CACHE.guardar(chave, (corpo, resposta.status_code, resposta.content_type, cabecalhos), ttl, geracao)
+        return definir_corpo(resposta, corpo, accept_encoding)
+    return envoltorio
+
+def invalida_cache(recurso):
+    """Decorator: invalida as rotas em cache afetadas por uma escrita no recurso"""
+    def decorador(funcao):
+        @wraps(funcao)
+        async def envoltorio(*args, **kwargs):
+            try:
+                return await funcao(*args, **kwargs)
+            finally:
+                await _no_cache(CACHE.invalidar, CACHE_INVALIDACAO[recurso])
+        return envoltorio
+    return decorador
+
+# ============================================================================
+# HEALTH CHECK
+# ============================================================================
+
+@app.route('/health', methods=['GET'])
+async def health():
+    """Health check do API Gateway"""
+    servicos = await verificar_servicos()
+    status = "healthy" if all(servicos.values()) else "degraded"
+    
+    return jsonify({
+        "status": status,
+        "servico": "API Gateway",
+        "modo": "asgi",
+        "servicos": servicos,
+        "conexoes": {
+            nome: dict(estatisticas, max_conexoes=ASYNC_MAX_CONEXOES)
+            for nome, estatisticas in ESTATISTICAS.items()
+        },
+        "cache": CACHE.estatisticas(),
+        "requisicoes_coalescidas": EM_VOO.compartilhadas,
+        "circuit_breakers": {nome: breaker.situacao() for nome, breaker in BREAKERS.items()},
+        "concorrencia": {nome: limite.situacao() for nome, limite in CONCORRENCIA.items()},
+        "limite_taxa": "redis" if isinstance(BALDES, BaldesRedis) else "memoria",
+        "timestamp": datetime.now().isoformat()
+    }), 200
+
+# ============================================================================
+# ENDPOINTS DE USUÁRIOS - Gateway expõe /users
+# ============================================================================
+
+@app.route('/users', methods=['GET'])
+@cache_resposta
+async def gateway_listar_usuarios():
+    """GET /users -> GET /api/usuarios (ativo, perfil, limit, cursor, sort)"""
+    return await encaminhar(
+        'GET',
+        f"{USUARIOS_SERVICE_URL}/api/usuarios",
+        params=parametros_listagem('ativo', 'perfil')
+    )
+
+@app.route('/users/<int:usuario_id>', methods=['GET'])
+async def gateway_obter_usuario(usuario_id):
+    """GET /users/<id> -> GET /api/usuarios/<id>"""
+    return await encaminhar('GET', f"{USUARIOS_SERVICE_URL}/api/usuarios/{usuario_id}")
+
+@app.route('/users', methods=['POST'])
+@invalida_cache('users')
+async def gateway_criar_usuario():
+    """POST /users -> POST /api/usuarios"""
+    return await encaminhar(
+        'POST',
+        f"{USUARIOS_SERVICE_URL}/api/usuarios",
+        dados=await request.get_json()
+    )
+
+@app.route('/users/batch', methods=['POST'])
+@invalida_cache('users')
+async def gateway_lote_usuarios():
+    """POST /users/batch -> POST /api/usuarios/lote"""
+    return await encaminhar(
+        'POST',
+        f"{USUARIOS_SERVICE_URL}/api/usuarios/lote",
+        dados=await request.get_json(silent=True)
+    )
+
+@app.route('/users/<int:usuario_id>', methods=['PUT'])
+@invalida_cache('users')
+async def gateway_atualizar_usuario(usuario_id):
+    """PUT /users/<id> -> PUT /api/usuarios/<id>"""
+    return await encaminhar(
+        'PUT',
+        f"{USUARIOS_SERVICE_URL}/api/usuarios/{usuario_id}",
+        dados=await request.get_json()
+    )
+
+@app.route('/users/<int:usuario_id>', methods=['DELETE'])
+@invalida_cache('users')
+async def gateway_deletar_usuario(usuario_id):
+    """DELETE /users/<id> -> DELETE /api/usuarios/<id>"""
+    return await encaminhar('DELETE', f"{USUARIOS_SERVICE_URL}/api/usuarios/{usuario_id}")
+
+@app.route('/users/stats', methods=['GET'])
+@cache_resposta
+async def gateway_stats_usuarios():
+    """GET /users/stats -> GET /api/usuarios/estatisticas/resumo"""
+    return await encaminhar('GET', f"{USUARIOS_SERVICE_URL}/api/usuarios/estatisticas/resumo")
+
+# ============================================================================
+# ENDPOINTS DE PEDIDOS - Gateway expõe /orders
+# ============================================================================
+
+@app.route('/orders', methods=['GET'])
+@cache_resposta
+async def gateway_listar_pedidos():
+    """GET /orders -> GET /api/pedidos (usuario_id, status, limit, cursor, sort)"""
+    return await encaminhar(
+        'GET',
+        f"{PEDIDOS_SERVICE_URL}/api/pedidos",
+        params=parametros_listagem('usuario_id', 'status')
+    )
+
+@app.route('/orders/<int:pedido_id>', methods=['GET'])
+async def gateway_obter_pedido(pedido_id):
+    """GET /orders/<id> -> GET /api/pedidos/<id>"""
+    return await encaminhar('GET', f"{PEDIDOS_SERVICE_URL}/api/pedidos/{pedido_id}")
+
+@app.route('/orders', methods=['POST'])
+@invalida_cache('orders')
+async def gateway_criar_pedido():
+    """POST /orders -> POST /api/pedidos"""
+    return await encaminhar(
+        'POST',
+        f"{PEDIDOS_SERVICE_URL}/api/pedidos",
+        dados=await request.get_json()
+    )
+
+@app.route('/orders/batch', methods=['POST'])
+@invalida_cache('orders')
+async def gateway_lote_pedidos():
+    """POST /orders/batch -> POST /api/pedidos/lote"""
+    return await encaminhar(
+        'POST',
+        f"{PEDIDOS_SERVICE_URL}/api/pedidos/lote",
+        dados=await request.get_json(silent=True)
+    )
+
+@app.route('/orders/<int:pedido_id>', methods=['PUT'])
+@invalida_cache('orders')
+async def gateway_atualizar_pedido(pedido_id):
+    """PUT /orders/<id> -> PUT /api/pedidos/<id>"""
+    return await encaminhar(
+        'PUT',
+        f"{PEDIDOS_SERVICE_URL}/api/pedidos/{pedido_id}",
+        dados=await request.get_json()
+    )
+
+@app.route('/orders/<int:pedido_id>', methods=['DELETE'])
+@invalida_cache('orders')
+async def gateway_deletar_pedido(pedido_id):
+    """DELETE /orders/<id> -> DELETE /api/pedidos/<id>"""
+    return await encaminhar('DELETE', f"{PEDIDOS_SERVICE_URL}/api/pedidos/{pedido_id}")
+
+@app.route('/orders/user/<int:usuario_id>', methods=['GET'])
+async def gateway_pedidos_usuario(usuario_id):
+    """GET /orders/user/<id> -> GET /api/pedidos/usuario/<id>"""
+    return await encaminhar('GET', f"{PEDIDOS_SERVICE_URL}/api/pedidos/usuario/{usuario_id}")
+
+@app.route('/orders/stats', methods=['GET'])
+@cache_resposta
+async def gateway_stats_pedidos():
+    """GET /orders/stats -> GET /api/pedidos/estatisticas/resumo"""
+    return await encaminhar('GET', f"{PEDIDOS_SERVICE_URL}/api/pedidos/estatisticas/resumo")
+
+@app.route('/orders/stats/series', methods=['GET'])
+async def gateway_serie_pedidos():
+    """GET /orders/stats/series -> GET /api/pedidos/estatisticas/serie"""
+    params = {
+        nome: request.args.get(nome)
+        for nome in ('granularidade', 'inicio', 'fim', 'status')
+        if request.args.get(nome)
+    }
+    
+    return await encaminhar(
+        'GET',
+        f"{PEDIDOS_SERVICE_URL}/api/pedidos/estatisticas/serie",
+        params=params
+    )
+
+# ============================================================================
+# ENDPOINTS DE COMPOSIÇÃO - Orquestra os dois serviços
+# ============================================================================
+
+@app.route('/dashboard', methods=['GET'])
+@cache_resposta
+async def gateway_dashboard():
+    """
+    GET /dashboard
+    Dashboard consolidado com informações de usuários e pedidos
+    Orquestra chamadas aos dois serviços em paralelo
+    """
+    resultados = await compor({
+        "usuarios": ('GET', f"{USUARIOS_SERVICE_URL}/api/usuarios/estatisticas/resumo", None),
+        "pedidos": ('GET', f"{PEDIDOS_SERVICE_URL}/api/pedidos/estatisticas/resumo", None)
+    })
+    usuarios_resp, usuarios_status = resultados["usuarios"]
+    pedidos_resp, pedidos_status = resultados["pedidos"]
+    
+    if usuarios_status != 200 or pedidos_status != 200:
+        return jsonify({
+            "erro": "Erro ao obter dados dos serviços",
+            "usuarios_status": usuarios_status,
+            "pedidos_status": pedidos_status
+        }), 503
+    
+    return jsonify({
+        "titulo": "Dashboard de Usuários e Pedidos",
+        "usuarios": usuarios_resp,
+        "pedidos": pedidos_resp,
+        "timestamp": datetime.now().isoformat()
+    }), 200
+
+@app.route('/usuarios-com-pedidos', methods=['GET'])
+async def gateway_usuarios_com_pedidos():
+    """
+    GET /usuarios-com-pedidos
+    Retorna lista paginada de usuários com seus respectivos pedidos
+    Mesmos parâmetros do app.py: limit, cursor, sort, ativo, perfil
+    (paginação por cursor) ou pagina e por_pagina
+    """
+    prazo = prazo_composicao()
+    try:
+        por_cursor = 'limit' in request.args or 'cursor' in request.args
+        if por_cursor:
+            params = parametros_listagem('ativo', 'perfil')
+        else:
+            try:
+                pagina = int(request.args.get('pagina', 1))
+                por_pagina = int(request.args.get('por_pagina', POR_PAGINA_PADRAO))
+            except ValueError:
+                return jsonify({"erro": "pagina e por_pagina devem ser números"}), 400
+            
+            if pagina < 1 or por_pagina < 1:
+                return jsonify({"erro": "pagina e por_pagina devem ser maiores que zero"}), 400
+            por_pagina = min(por_pagina, POR_PAGINA_MAX)
+            # O serviço de usuários devolve só a página, já filtrada
+            params = {nome: request.args[nome] for nome in ('ativo', 'perfil', 'sort') if request.args.get(nome)}
+            params.update(limit=por_pagina, offset=(pagina - 1) * por_pagina)
+        
+        usuarios_resp, usuarios_status = (await compor({
+            "usuarios": ('GET', f"{USUARIOS_SERVICE_URL}/api/usuarios", params)
+        }, prazo))["usuarios"]
+        
+        if usuarios_status == 400:
+            return jsonify(usuarios_resp), 400
+        if usuarios_status != 200:
+            return jsonify({"erro": "Erro ao obter usuários"}), usuarios_status
+        
+        usuarios_pagina = usuarios_resp.get('usuarios', [])
+        total_usuarios = usuarios_resp.get('total', len(usuarios_pagina))
+        
+        lotes = {}
+        for i in range(0, len(usuarios_pagina), COMPOSICAO_LOTE):
+            ids = ",".join(str(u['id']) for u in usuarios_pagina[i:i + COMPOSICAO_LOTE])
+            lotes[i] = ('GET', f"{PEDIDOS_SERVICE_URL}/api/pedidos/usuarios", {"ids": ids})
+        
+        pedidos_por_usuario = {}
+        for pedidos_resp, pedidos_status in (await compor(lotes, prazo)).values():
+            if pedidos_status == 200:
+                pedidos_por_usuario.update(pedidos_resp.get('pedidos_por_usuario', {}))
+        
+        resultado = []
+        for usuario in usuarios_pagina:
+            pedidos_usuario = pedidos_por_usuario.get(str(usuario['id']), {})
+            resultado.append({
+                "usuario": usuario,
+                "pedidos": pedidos_usuario.get('pedidos', []),
+                "total_pedidos": pedidos_usuario.get('total_pedidos', 0),
+                "valor_total_pedidos": pedidos_usuario.get('valor_total', 0)
+            })
+        
+        if por_cursor:
+            proximo_cursor = usuarios_resp.get('proximo_cursor')
+            cabecalhos = {}
+            if proximo_cursor:
+                proximo = {nome: valor for nome, valor in request.args.items() if nome not in ('limit', 'cursor')}
+                proximo.update(limit=params['limit'], cursor=proximo_cursor)
+                cabecalhos['Link'] = f'<?{urlencode(proximo)}>; rel="next"'
+            return jsonify({
+                "total_usuarios": total_usuarios,
+                "limit": int(params['limit']),
+                "proximo_cursor": proximo_cursor,
+                "usuarios_com_pedidos": resultado,
+                "timestamp": datetime.now().isoformat()
+            }), 200, cabecalhos
+        
+        return jsonify({
+            "total_usuarios": total_usuarios,
+            "pagina": pagina,
+            "por_pagina": por_pagina,
+            "total_paginas": (total_usuarios + por_pagina - 1) // por_pagina,
+            "usuarios_com_pedidos": resultado,
+            "timestamp": datetime.now().isoformat()
+        }), 200
+    
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
+
+# ============================================================================
+# ROTA RAIZ E DOCUMENTAÇÃO
+# ============================================================================
+
+@app.route('/', methods=['GET'])
+async def documentacao():
+    """Retorna documentação da API Gateway"""
+    return jsonify(dict(DOCUMENTACAO, modo="asgi")), 200
+
+@app.errorhandler(404)
+async def nao_encontrado(error):
+    """Tratamento para rotas não encontradas"""
+    return jsonify({
+        "erro": "Rota não encontrada",
+        "mensagem": "Visite GET / para documentação",
+        "timestamp": datetime.now().isoformat()
+    }), 404
+
+@app.errorhandler(405)
+async def metodo_nao_permitido(error):
+    """Tratamento para métodos não permitidos"""
+    return jsonify({
+        "erro": "Método não permitido",
+        "timestamp": datetime.now().isoformat()
+    }), 405
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000, debug=False)
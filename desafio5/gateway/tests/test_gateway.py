@@ -0,0 +1,853 @@
+"""API Gateway (app.py e a variante ASGI): rotas compostas, cache, coalescência, circuit breaker e limites"""
+import asyncio
+import contextvars
+import gzip
+import sys
+import threading
+import time
+from itertools import count
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import plataforma.compressao as compressao
+import plataforma.persistencia as persistencia
+from carga.locais import carregar
+from carga.transporte import AdaptadorWSGI
+
+_CARGAS = count()
+
+
+class AdaptadorRegistrado(AdaptadorWSGI):
+    """AdaptadorWSGI que anota as URLs recebidas pelo serviço"""
+
+    def __init__(self, app, chamadas):
+        super().__init__(app)
+        self.chamadas = chamadas
+
+    def send(self, request, **kwargs):
+        self.chamadas.append(request.url)
+        return super().send(request, **kwargs)
+
+
+class AdaptadorFora(BaseAdapter):
+    """Serviço fora do ar: toda requisição falha na conexão"""
+
+    def send(self, request, **kwargs):
+        raise requests.exceptions.ConnectionError(f"Conexão recusada: {request.url}")
+
+    def close(self):
+        pass
+
+
+class Relogio:
+    """time.monotonic controlado pelo teste"""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def monotonic(self):
+        return self.agora
+
+
+def ligar(gateway, url, adaptador):
+    for sessao in [*gateway.SESSOES.values(), gateway.SESSAO_PADRAO]:
+        sessao.mount(url, adaptador)
+
+
+def montar_gateway(servicos, chamadas):
+    """Instância nova do gateway ligada aos serviços sem rede"""
+    usuarios, pedidos = servicos
+    modulo = carregar(f"teste_gateway_{next(_CARGAS)}", 'desafio5/gateway/app.py')
+    ligar(modulo, modulo.USUARIOS_SERVICE_URL, AdaptadorRegistrado(usuarios.app, chamadas))
+    ligar(modulo, modulo.PEDIDOS_SERVICE_URL, AdaptadorRegistrado(pedidos.app, chamadas))
+    return modulo
+
+
+@pytest.fixture
+def servicos(monkeypatch):
+    """Instâncias novas de usuarios e pedidos, sem diário"""
+    monkeypatch.setattr(persistencia, 'PERSISTENCIA_DIR', None)
+    n = next(_CARGAS)
+    return (
+        carregar(f"teste_gateway_usuarios_{n}", 'desafio5/usuarios/app.py'),
+        carregar(f"teste_gateway_pedidos_{n}", 'desafio5/pedidos/app.py')
+    )
+
+
+@pytest.fixture
+def chamadas():
+    """URLs chamadas pelo gateway nos serviços, em ordem"""
+    return []
+
+
+@pytest.fixture
+def gateway(servicos, chamadas):
+    return montar_gateway(servicos, chamadas)
+
+
+@pytest.fixture
+def cliente(gateway):
+    return gateway.app.test_client()
+
+
+def query(url):
+    return parse_qs(urlsplit(url).query)
+
+
+# ============================================================================
+# ROTAS COMPOSTAS
+# ============================================================================
+
+def test_usuarios_com_pedidos_pagina_no_servico(servicos, cliente, chamadas):
+    resposta = cliente.get('/usuarios-com-pedidos?pagina=2&por_pagina=2&ativo=true')
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+
+    # Uma única chamada aos usuários, já com a página e os filtros
+    usuarios = [url for url in chamadas if urlsplit(url).path == '/api/usuarios']
+    assert len(usuarios) == 1
+    assert query(usuarios[0]) == {'ativo': ['true'], 'limit': ['2'], 'offset': ['2']}
+
+    ativos = servicos[0].app.test_client().get('/api/usuarios?ativo=true').get_json()
+    ids = [item['usuario']['id'] for item in corpo['usuarios_com_pedidos']]
+    assert ids == [usuario['id'] for usuario in ativos['usuarios'][2:4]]
+    assert corpo['total_usuarios'] == ativos['total']
+    assert corpo['total_paginas'] == (ativos['total'] + 1) // 2
+
+    # Pedidos só dos usuários da página
+    lotes = [url for url in chamadas if urlsplit(url).path == '/api/pedidos/usuarios']
+    assert [query(url)['ids'] for url in lotes] == [[','.join(map(str, ids))]]
+
+
+def test_usuarios_com_pedidos_ultima_pagina_vazia(cliente, chamadas):
+    corpo = cliente.get('/usuarios-com-pedidos?pagina=50').get_json()
+    assert corpo['usuarios_com_pedidos'] == []
+    assert corpo['total_usuarios'] > 0
+    assert not any('/api/pedidos/usuarios' in url for url in chamadas)
+
+
+def test_usuarios_com_pedidos_por_cursor(cliente, chamadas):
+    vistos = []
+    parametros = {'limit': 2, 'sort': '-nome', 'perfil': 'cliente'}
+    while True:
+        resposta = cliente.get('/usuarios-com-pedidos', query_string=parametros)
+        assert resposta.status_code == 200
+        corpo = resposta.get_json()
+        vistos.extend(item['usuario'] for item in corpo['usuarios_com_pedidos'])
+        if not corpo['proximo_cursor']:
+            break
+        parametros['cursor'] = corpo['proximo_cursor']
+
+    assert {usuario['perfil'] for usuario in vistos} == {'cliente'}
+    assert [usuario['nome'] for usuario in vistos] == sorted((u['nome'] for u in vistos), reverse=True)
+    assert all(query(url)['perfil'] == ['cliente'] for url in chamadas if urlsplit(url).path == '/api/usuarios')
+
+
+@pytest.mark.parametrize('parametros', ['pagina=0', 'por_pagina=abc', 'pagina=1&sort=senha'])
+def test_usuarios_com_pedidos_parametros_invalidos(cliente, parametros):
+    assert cliente.get(f'/usuarios-com-pedidos?{parametros}').status_code == 400
+
+
+# ============================================================================
+# COMPOSIÇÃO CONCORRENTE
+# ============================================================================
+
+def test_compor_executa_as_chamadas_em_paralelo(gateway, monkeypatch):
+    requisicao = contextvars.ContextVar('requisicao')
+    recebidos = {}
+
+    def lenta(metodo, url, params=None, timeout=None):
+        time.sleep(0.2)
+        recebidos[url] = (requisicao.get(None), timeout)
+        return {"url": url}, 200
+
+    monkeypatch.setattr(gateway, 'fazer_requisicao', lenta)
+    requisicao.set('r1')
+    inicio = time.monotonic()
+    resultados = gateway.compor({
+        nome: ('GET', f"http://servico/{nome}", None) for nome in ('a', 'b', 'c', 'd')
+    })
+
+    assert time.monotonic() - inicio < 0.6
+    assert resultados == {nome: ({"url": f"http://servico/{nome}"}, 200) for nome in ('a', 'b', 'c', 'd')}
+    # Contexto da requisição copiado para as threads; timeout limitado pelo orçamento
+    assert {contexto for contexto, _ in recebidos.values()} == {'r1'}
+    assert all(0 < timeout <= gateway.REQUEST_TIMEOUT for _, timeout in recebidos.values())
+
+
+def test_compor_retorna_504_para_o_que_estoura_o_prazo(gateway, monkeypatch):
+    def chamada(metodo, url, params=None, timeout=None):
+        time.sleep(1 if url.endswith('lenta') else 0)
+        return {}, 200
+
+    monkeypatch.setattr(gateway, 'fazer_requisicao', chamada)
+    resultados = gateway.compor({
+        'rapida': ('GET', 'http://servico/rapida', None),
+        'lenta': ('GET', 'http://servico/lenta', None)
+    }, prazo=time.monotonic() + 0.2)
+
+    assert resultados['rapida'] == ({}, 200)
+    assert resultados['lenta'][1] == 504
+
+
+def test_compor_com_orcamento_esgotado_nao_chama(gateway, monkeypatch):
+    monkeypatch.setattr(gateway, 'fazer_requisicao', lambda *args, **kwargs: pytest.fail("não deveria chamar"))
+    resultados = gateway.compor({'a': ('GET', 'http://servico/a', None)}, prazo=time.monotonic() - 1)
+    assert resultados['a'][1] == 504
+
+
+def test_dashboard_compoe_os_dois_servicos(cliente, chamadas):
+    corpo = cliente.get('/dashboard').get_json()
+    assert corpo['usuarios']['total_usuarios'] > 0
+    assert corpo['pedidos']['total_pedidos'] > 0
+    assert sorted(urlsplit(url).path for url in chamadas) == [
+        '/api/pedidos/estatisticas/resumo', '/api/usuarios/estatisticas/resumo'
+    ]
+
+
+# ============================================================================
+# COALESCÊNCIA
+# ============================================================================
+
+class RespostaFalsa:
+    content = b'{}'
+
+
+def em_paralelo(quantidade, funcao):
+    """Executa funcao em várias threads; retorna (resultados, erros)"""
+    resultados, erros = [], []
+
+    def alvo():
+        try:
+            resultados.append(funcao())
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=alvo) for _ in range(quantidade)]
+    for thread in threads:
+        thread.start()
+    return threads, resultados, erros
+
+
+def test_requisicoes_identicas_em_andamento_sao_coalescidas(gateway):
+    em_voo = gateway.RequisicoesEmVoo()
+    liberar, chamadas = threading.Event(), []
+    resposta = RespostaFalsa()
+
+    def upstream():
+        chamadas.append(1)
+        liberar.wait(5)
+        return resposta
+
+    threads, resultados, erros = em_paralelo(5, lambda: em_voo.executar(('u', ''), upstream, 5))
+    while em_voo.compartilhadas < 4:
+        time.sleep(0.01)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+
+    assert chamadas == [1] and erros == []
+    assert resultados == [resposta] * 5
+    # Concluída, nada fica guardado: a próxima chamada vai ao serviço
+    assert em_voo.executar(('u', ''), upstream, 5) is resposta
+    assert chamadas == [1, 1]
+
+
+def test_erro_da_requisicao_chega_a_todos_os_que_aguardavam(gateway):
+    em_voo = gateway.RequisicoesEmVoo()
+    liberar = threading.Event()
+
+    def upstream():
+        liberar.wait(5)
+        raise gateway.requests.exceptions.ConnectionError("recusada")
+
+    threads, resultados, erros = em_paralelo(3, lambda: em_voo.executar(('u', ''), upstream, 5))
+    while em_voo.compartilhadas < 2:
+        time.sleep(0.01)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+
+    assert resultados == []
+    assert [str(e) for e in erros] == ["recusada"] * 3
+
+
+def test_quem_aguarda_respeita_o_proprio_timeout(gateway):
+    em_voo = gateway.RequisicoesEmVoo()
+    liberar = threading.Event()
+    threads, _, _ = em_paralelo(1, lambda: em_voo.executar(('u', ''), lambda: liberar.wait(5) and RespostaFalsa(), 5))
+    while not em_voo._em_voo:
+        time.sleep(0.01)
+
+    with pytest.raises(gateway.requests.exceptions.Timeout):
+        em_voo.executar(('u', ''), pytest.fail, 0.05)
+    liberar.set()
+    threads[0].join()
+
+
+def test_gets_concorrentes_fazem_uma_chamada_ao_servico(servicos, chamadas, gateway, monkeypatch):
+    original = servicos[0].listar_usuarios
+    liberar = threading.Event()
+
+    def lenta(*args, **kwargs):
+        liberar.wait(5)
+        return original(*args, **kwargs)
+
+    monkeypatch.setitem(servicos[0].app.view_functions, 'listar_usuarios', lenta)
+    url = f"{gateway.USUARIOS_SERVICE_URL}/api/usuarios"
+    threads, resultados, erros = em_paralelo(4, lambda: gateway.fazer_requisicao('GET', url, params={'limit': 3}))
+    while gateway.EM_VOO.compartilhadas < 3:
+        time.sleep(0.01)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+
+    assert erros == [] and len(chamadas) == 1
+    assert {status for _, status in resultados} == {200}
+    assert len({len(corpo['usuarios']) for corpo, _ in resultados}) == 1
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    """redis.Redis.from_url devolvendo clientes de um único servidor fakeredis"""
+    fakeredis = pytest.importorskip('fakeredis')
+    import redis
+    servidor = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, 'from_url', classmethod(lambda cls, url, **kwargs: fakeredis.FakeRedis(server=servidor)))
+    return servidor
+
+
+def usar_cache_compartilhado(gateway, monkeypatch):
+    cache = gateway.CacheRespostas(100, gateway.GeracoesRedis('redis://teste'))
+    monkeypatch.setattr(gateway, 'CACHE', cache)
+    return cache
+
+
+def test_escritas_invalidam_o_cache(cliente):
+    assert cliente.get('/users').headers['X-Cache'] == 'MISS'
+    resposta = cliente.get('/users')
+    assert resposta.headers['X-Cache'] == 'HIT'
+    total = resposta.get_json()['total']
+
+    assert cliente.post('/users', json={"nome": "Nova", "email": "nova@email.com"}).status_code == 201
+    resposta = cliente.get('/users')
+    assert resposta.headers['X-Cache'] == 'MISS'
+    assert resposta.get_json()['total'] == total + 1
+
+    cliente.get('/users')
+    lote = cliente.post('/users/batch', json={"usuarios": [{"nome": "Lote", "email": "lote@email.com"}]})
+    assert lote.get_json()['resultados'][0]['status'] == 201
+    resposta = cliente.get('/users')
+    assert resposta.headers['X-Cache'] == 'MISS'
+    assert resposta.get_json()['total'] == total + 2
+
+
+def test_cache_descarta_resposta_anterior_a_invalidacao(gateway):
+    cache = gateway.CacheRespostas(max_entradas=10)
+    chave = ('/users', '')
+    geracao = cache.geracao('/users')
+
+    # Uma escrita terminou enquanto a leitura estava em andamento
+    cache.invalidar(('/users',))
+    cache.guardar(chave, 'antigo', 60, geracao)
+    assert cache.obter(chave) is None
+
+    cache.guardar(chave, 'novo', 60, cache.geracao('/users'))
+    assert cache.obter(chave) == 'novo'
+
+
+def test_sem_redis_a_invalidacao_e_por_processo(servicos, chamadas):
+    # Dois workers do gateway diante dos mesmos serviços
+    worker_a = montar_gateway(servicos, chamadas).app.test_client()
+    worker_b = montar_gateway(servicos, chamadas).app.test_client()
+    total = worker_b.get('/users').get_json()['total']
+
+    worker_a.post('/users', json={"nome": "Nova", "email": "nova@email.com"})
+    resposta = worker_b.get('/users')
+    assert resposta.headers['X-Cache'] == 'HIT'
+    assert resposta.get_json()['total'] == total
+
+
+def test_geracoes_no_redis_invalidam_todos_os_workers(servicos, chamadas, redis_falso, monkeypatch):
+    worker_a = montar_gateway(servicos, chamadas)
+    worker_b = montar_gateway(servicos, chamadas)
+    usar_cache_compartilhado(worker_a, monkeypatch)
+    usar_cache_compartilhado(worker_b, monkeypatch)
+    cliente_a, cliente_b = worker_a.app.test_client(), worker_b.app.test_client()
+
+    total = cliente_b.get('/users').get_json()['total']
+    assert cliente_b.get('/users').headers['X-Cache'] == 'HIT'
+
+    cliente_a.post('/users', json={"nome": "Nova", "email": "nova@email.com"})
+    resposta = cliente_b.get('/users')
+    assert resposta.headers['X-Cache'] == 'MISS'
+    assert resposta.get_json()['total'] == total + 1
+    assert cliente_b.get('/users').headers['X-Cache'] == 'HIT'
+
+    # /orders não é afetada por escritas em usuários
+    cliente_b.get('/orders')
+    cliente_a.post('/users', json={"nome": "Outra", "email": "outra@email.com"})
+    assert cliente_b.get('/orders').headers['X-Cache'] == 'HIT'
+
+
+def test_redis_fora_desliga_o_cache(gateway, cliente, redis_falso, monkeypatch):
+    cache = usar_cache_compartilhado(gateway, monkeypatch)
+    cliente.get('/users')
+    assert cliente.get('/users').headers['X-Cache'] == 'HIT'
+
+    redis_falso.connected = False
+    assert cliente.get('/users').headers['X-Cache'] == 'MISS'
+    assert cliente.get('/users').headers['X-Cache'] == 'MISS'
+    assert cache.estatisticas()['falhas_redis'] == 1
+
+
+def test_cache_reaproveita_a_versao_comprimida(cliente, monkeypatch):
+    monkeypatch.setattr(compressao, 'COMPRESSAO_MIN_BYTES', 1)
+    comprimidos = []
+    original = compressao.comprimir
+    monkeypatch.setattr(compressao, 'comprimir', lambda dados, cod: comprimidos.append(cod) or original(dados, cod))
+
+    simples = cliente.get('/users')
+    assert 'Content-Encoding' not in simples.headers
+    for _ in range(2):
+        resposta = cliente.get('/users', headers={'Accept-Encoding': 'gzip'})
+        assert resposta.headers['X-Cache'] == 'HIT'
+        assert resposta.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in resposta.headers['Vary']
+        assert gzip.decompress(resposta.data) == simples.data
+    assert comprimidos == ['gzip']
+
+
+# ============================================================================
+# CIRCUIT BREAKER
+# ============================================================================
+
+@pytest.fixture
+def relogio(gateway, monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(gateway, 'time', relogio)
+    return relogio
+
+
+@pytest.fixture
+def breaker(gateway, relogio, monkeypatch):
+    monkeypatch.setattr(gateway, 'BREAKER_MIN_CHAMADAS', 4)
+    monkeypatch.setattr(gateway, 'BREAKER_TAXA_FALHA', 0.5)
+    monkeypatch.setattr(gateway, 'BREAKER_TEMPO_ABERTO', 10)
+    monkeypatch.setattr(gateway, 'BREAKER_SONDAS', 1)
+    return gateway.CircuitBreaker('usuarios')
+
+
+def abrir(breaker):
+    for _ in range(4):
+        breaker.registrar(breaker.permitir(), False)
+    assert breaker.estado == 'aberto'
+
+
+def test_breaker_abre_sonda_e_fecha(breaker, relogio):
+    # Abaixo do mínimo de chamadas a janela não abre o circuito
+    for sucesso in (False, False, True):
+        breaker.registrar(breaker.permitir(), sucesso)
+    assert breaker.estado == 'fechado'
+    breaker.registrar(breaker.permitir(), False)
+    assert breaker.estado == 'aberto'
+    assert breaker.permitir() is None
+
+    # Passado o tempo aberto, uma única sonda; a falha dela reabre
+    relogio.agora += 10
+    sonda = breaker.permitir()
+    assert sonda is not None
+    assert breaker.estado == 'meio_aberto'
+    assert breaker.permitir() is None
+    breaker.registrar(sonda, False)
+    assert breaker.estado == 'aberto'
+    assert breaker.permitir() is None
+
+    # A sonda bem-sucedida fecha e zera a janela
+    relogio.agora += 10
+    breaker.registrar(breaker.permitir(), True)
+    assert breaker.estado == 'fechado'
+    assert breaker.situacao()['chamadas_na_janela'] == 0
+
+
+def test_chamada_anterior_ao_meio_aberto_nao_decide_a_sonda(breaker, relogio):
+    # Liberada com o circuito fechado, concluída só depois que ele abriu
+    atrasada = breaker.permitir()
+    abrir(breaker)
+    relogio.agora += 10
+    sonda = breaker.permitir()
+
+    breaker.registrar(atrasada, True)
+    assert breaker.estado == 'meio_aberto'
+    assert breaker.permitir() is None
+
+    breaker.registrar(sonda, False)
+    assert breaker.estado == 'aberto'
+
+
+def test_sonda_de_um_meio_aberto_anterior_e_ignorada(breaker, relogio, monkeypatch):
+    abrir(breaker)
+    relogio.agora += 10
+    antiga = breaker.permitir()
+    # Outra chamada reabre o circuito enquanto a sonda antiga segue em andamento
+    breaker._abrir()
+    relogio.agora += 10
+    atual = breaker.permitir()
+
+    breaker.registrar(antiga, True)
+    assert breaker.estado == 'meio_aberto'
+    assert breaker.permitir() is None
+    breaker.registrar(atual, True)
+    assert breaker.estado == 'fechado'
+
+
+def test_chamada_do_ciclo_anterior_nao_entra_na_janela(breaker, relogio):
+    atrasada = breaker.permitir()
+    abrir(breaker)
+    relogio.agora += 10
+    breaker.registrar(breaker.permitir(), True)
+    breaker.registrar(atrasada, False)
+    assert breaker.estado == 'fechado'
+    assert breaker.situacao()['chamadas_na_janela'] == 0
+
+
+def test_servico_fora_abre_o_circuito_com_retry_after(gateway, cliente, monkeypatch):
+    monkeypatch.setattr(gateway, 'BREAKER_MIN_CHAMADAS', 3)
+    monkeypatch.setattr(gateway, 'BREAKER_TEMPO_ABERTO', 60)
+    ligar(gateway, gateway.USUARIOS_SERVICE_URL, AdaptadorFora())
+
+    for _ in range(3):
+        resposta = cliente.get('/users/1')
+        assert resposta.status_code == 503
+        assert 'Erro ao conectar' in resposta.get_json()['erro']
+    assert gateway.BREAKERS['usuarios'].estado == 'aberto'
+
+    resposta = cliente.get('/users/1')
+    assert resposta.status_code == 503
+    assert 'circuit breaker aberto' in resposta.get_json()['erro']
+    assert resposta.headers['Retry-After'] == str(gateway.LIMITE_RETRY_AFTER)
+
+    # Os pedidos têm o próprio breaker
+    assert cliente.get('/orders/101').status_code == 200
+
+
+# ============================================================================
+# LIMITE DE TAXA E CONCORRÊNCIA
+# ============================================================================
+
+def test_baldes_em_memoria(relogio, gateway):
+    baldes = gateway.BaldesMemoria(max_chaves=3)
+    cliente_e_rota = [('cliente', 10, 5), ('cliente|GET /users', 1, 2)]
+
+    assert baldes.consumir(cliente_e_rota) == 0
+    assert baldes.consumir(cliente_e_rota) == 0
+    assert baldes.consumir(cliente_e_rota) == pytest.approx(1.0)
+
+    # A recusa pela rota não gasta a ficha do cliente
+    assert baldes.consumir([('cliente', 10, 5), ('cliente|GET /orders', 1, 2)]) == 0
+    relogio.agora += 0.5
+    assert baldes.consumir(cliente_e_rota) == pytest.approx(0.5)
+    relogio.agora += 0.5
+    assert baldes.consumir(cliente_e_rota) == 0
+
+    # LRU: acima de max_chaves sai o balde usado há mais tempo
+    baldes.consumir([('outro', 1, 1)])
+    assert list(baldes._baldes) == ['cliente', 'cliente|GET /users', 'outro']
+
+
+def test_script_lua_no_redis(gateway, redis_falso):
+    pytest.importorskip('lupa')
+    import fakeredis
+
+    baldes = gateway.BaldesRedis('redis://teste', gateway.BaldesMemoria(10))
+    outro_gateway = gateway.BaldesRedis('redis://teste', gateway.BaldesMemoria(10))
+    cliente_e_rota = [('cliente', 0.001, 10), ('cliente|GET /users', 0.001, 2)]
+
+    assert baldes.consumir(cliente_e_rota) == 0
+    # Baldes compartilhados: a segunda ficha é consumida por outro gateway
+    assert outro_gateway.consumir(cliente_e_rota) == 0
+    assert baldes.consumir(cliente_e_rota) == pytest.approx(1000, rel=0.01)
+    assert baldes.falhas == 0
+
+    # Recusada pela rota, a requisição não gastou a ficha do cliente
+    redis_teste = fakeredis.FakeRedis(server=redis_falso)
+    assert float(redis_teste.hget('limite:cliente', 'fichas')) == pytest.approx(8, abs=0.01)
+    assert redis_teste.pttl('limite:cliente') > 0
+
+
+def test_redis_indisponivel_usa_memoria(gateway, relogio, redis_falso):
+    import redis
+    baldes = gateway.BaldesRedis('redis://teste', gateway.BaldesMemoria(10))
+
+    def fora(**kwargs):
+        raise redis.exceptions.ConnectionError("Redis fora")
+    baldes._script = fora
+
+    balde = [('cliente', 1, 1)]
+    assert baldes.consumir(balde) == 0
+    assert baldes.consumir(balde) == pytest.approx(1.0)
+    assert baldes.falhas == 1
+
+    # Só volta a tentar o Redis depois do repouso
+    relogio.agora += gateway.LIMITE_REDIS_REPOUSO
+    assert baldes.consumir(balde) == 0
+    assert baldes.falhas == 2
+
+
+@pytest.fixture
+def limitado(gateway, monkeypatch):
+    """Limite de taxa ligado, com baldes novos em memória"""
+    monkeypatch.setattr(gateway, 'LIMITE_HABILITADO', True)
+    monkeypatch.setattr(gateway, 'BALDES', gateway.BaldesMemoria(100))
+    return gateway
+
+
+def de(ip, **cabecalhos):
+    """Argumentos do test_client para uma requisição vinda de ip"""
+    return {'environ_base': {'REMOTE_ADDR': ip}, 'headers': cabecalhos}
+
+
+def test_rota_limitada_por_ip(limitado, cliente, monkeypatch):
+    monkeypatch.setattr(limitado, 'LIMITE_TAXA_ROTA', 0.1)
+    monkeypatch.setattr(limitado, 'LIMITE_RAJADA_ROTA', 2)
+
+    assert cliente.get('/users/1', **de('10.0.0.1')).status_code == 200
+    assert cliente.get('/users/1', **de('10.0.0.1')).status_code == 200
+    # Sem proxy confiável, cabeçalhos não mudam a identidade
+    resposta = cliente.get('/users/1', **de('10.0.0.1', **{'X-Client-Id': 'novo', 'X-Forwarded-For': '10.9.9.9'}))
+    assert resposta.status_code == 429
+    assert resposta.headers['Retry-After'] == '10'
+
+    # Outro cliente, outra rota e o health check não são afetados
+    assert cliente.get('/users/1', **de('10.0.0.2')).status_code == 200
+    assert cliente.get('/orders/101', **de('10.0.0.1')).status_code == 200
+    assert cliente.get('/health', **de('10.0.0.1')).status_code != 429
+
+
+@pytest.mark.parametrize('cabecalhos, sem_proxy, com_proxy', [
+    ({}, 'ip:10.0.0.254', 'ip:10.0.0.254'),
+    # O último IP é o que o proxy acrescentou; os anteriores o cliente pode forjar
+    ({'X-Forwarded-For': '1.2.3.4, 192.168.0.7'}, 'ip:10.0.0.254', 'ip:192.168.0.7'),
+    ({'X-Client-Id': 'app-1', 'X-Forwarded-For': '192.168.0.7'}, 'ip:10.0.0.254', 'id:app-1')
+])
+def test_identidade_so_confia_no_proxy_se_configurado(limitado, monkeypatch, cabecalhos, sem_proxy, com_proxy):
+    with limitado.app.test_request_context('/', **de('10.0.0.254', **cabecalhos)) as contexto:
+        assert limitado.identificar_cliente(contexto.request) == sem_proxy
+        monkeypatch.setattr(limitado, 'LIMITE_CONFIAR_PROXY', True)
+        assert limitado.identificar_cliente(contexto.request) == com_proxy
+
+
+def test_trocar_de_identidade_nao_passa_do_limite_da_rota(limitado, cliente, monkeypatch):
+    monkeypatch.setattr(limitado, 'LIMITE_CONFIAR_PROXY', True)
+    monkeypatch.setattr(limitado, 'LIMITE_TAXA_ROTA_GLOBAL', 0.1)
+    monkeypatch.setattr(limitado, 'LIMITE_RAJADA_ROTA_GLOBAL', 3)
+
+    respostas = [cliente.get('/users/1', **de('10.0.0.254', **{'X-Client-Id': f"cliente-{i}"})) for i in range(5)]
+    assert [resposta.status_code for resposta in respostas] == [200, 200, 200, 429, 429]
+    assert cliente.get('/orders/101', **de('10.0.0.254', **{'X-Client-Id': 'cliente-9'})).status_code == 200
+
+    # A rota composta tem o próprio teto global
+    monkeypatch.setitem(limitado.LIMITE_ROTAS_GLOBAL, '/dashboard', (0.1, 1))
+    assert cliente.get('/dashboard', **de('10.0.0.1')).status_code == 200
+    assert cliente.get('/dashboard', **de('10.0.0.2')).status_code == 429
+
+
+def test_teto_global_desativado(limitado, monkeypatch):
+    monkeypatch.setattr(limitado, 'LIMITE_TAXA_ROTA_GLOBAL', 0)
+    with limitado.app.test_request_context('/users/1', **de('10.0.0.1')) as contexto:
+        contexto.match_request()
+        baldes = limitado.baldes_requisicao(contexto.request)
+    assert [chave for chave, _, _ in baldes] == ['ip:10.0.0.1', 'ip:10.0.0.1|GET /users/<int:usuario_id>']
+
+
+def test_limite_de_concorrencia(gateway, cliente, monkeypatch):
+    limite = gateway.LimiteConcorrencia('usuarios', 1)
+    limite.entrar()
+    with pytest.raises(gateway.ServicoSaturado):
+        limite.entrar()
+    limite.sair()
+    limite.entrar()
+    assert limite.situacao() == {"em_andamento": 1, "maximo": 1, "recusadas": 1}
+
+    # Sem vaga, a rota responde 503 na hora, sem chamar o serviço
+    monkeypatch.setitem(gateway.CONCORRENCIA, 'usuarios', limite)
+    resposta = cliente.get('/users/1')
+    assert resposta.status_code == 503
+    assert 'Retry-After' in resposta.headers
+    assert gateway.BREAKERS['usuarios'].situacao()['chamadas_na_janela'] == 0
+    limite.sair()
+    assert cliente.get('/users/1').status_code == 200
+
+
+# ============================================================================
+# VARIANTE ASGI
+# ============================================================================
+
+class TransporteWSGI:
+    """Transporte assíncrono do httpx que atende pela aplicação WSGI, em uma thread"""
+
+    def __init__(self, app, chamadas):
+        self.cliente = app.test_client(use_cookies=False)
+        self.chamadas = chamadas
+
+    async def handle_async_request(self, request):
+        self.chamadas.append(str(request.url))
+        corpo = await request.aread()
+        resposta = await asyncio.to_thread(
+            self.cliente.open,
+            request.url.raw_path.decode(),
+            method=request.method,
+            headers=list(request.headers.items()),
+            data=corpo
+        )
+        return httpx.Response(resposta.status_code, headers=list(resposta.headers.items()), content=resposta.get_data())
+
+    async def aclose(self):
+        pass
+
+
+class TransporteFora:
+    """Serviço fora do ar para o httpx"""
+
+    async def handle_async_request(self, request):
+        raise httpx.ConnectError(f"Conexão recusada: {request.url}", request=request)
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def assincrono(gateway, servicos, chamadas, monkeypatch):
+    """app_async.py sobre o gateway de teste, com os clientes httpx ligados aos serviços"""
+    pytest.importorskip('quart')
+    monkeypatch.setitem(sys.modules, 'app', gateway)
+    modulo = carregar(f"teste_gateway_async_{next(_CARGAS)}", 'desafio5/gateway/app_async.py')
+    for nome, servico in zip(('usuarios', 'pedidos'), servicos):
+        modulo.CLIENTES[nome] = httpx.AsyncClient(transport=TransporteWSGI(servico.app, chamadas))
+    return modulo
+
+
+def test_asgi_responde_como_o_wsgi(assincrono, cliente):
+    async def cenario():
+        cliente_async = assincrono.app.test_client()
+        for rota in ('/users?limit=2', '/orders/101', '/orders/user/1', '/users/stats'):
+            resposta = await cliente_async.get(rota)
+            esperado = cliente.get(rota)
+            assert resposta.status_code == esperado.status_code == 200
+            corpo, corpo_esperado = await resposta.get_json(), esperado.get_json()
+            corpo.pop('timestamp', None)
+            corpo_esperado.pop('timestamp', None)
+            assert corpo == corpo_esperado
+
+        assert (await cliente_async.get('/users/9999')).status_code == 404
+
+    asyncio.run(cenario())
+
+
+def test_asgi_compoe_e_pagina(assincrono, chamadas):
+    async def cenario():
+        cliente_async = assincrono.app.test_client()
+        corpo = await (await cliente_async.get('/dashboard')).get_json()
+        assert corpo['usuarios']['total_usuarios'] > 0
+        assert corpo['pedidos']['total_pedidos'] > 0
+
+        chamadas.clear()
+        resposta = await cliente_async.get('/usuarios-com-pedidos?pagina=2&por_pagina=2&ativo=true')
+        assert resposta.status_code == 200
+        usuarios = [url for url in chamadas if urlsplit(url).path == '/api/usuarios']
+        assert [query(url) for url in usuarios] == [{'ativo': ['true'], 'limit': ['2'], 'offset': ['2']}]
+
+    asyncio.run(cenario())
+
+
+def test_asgi_cache_e_invalidacao(assincrono):
+    async def cenario():
+        cliente_async = assincrono.app.test_client()
+        assert (await cliente_async.get('/users')).headers['X-Cache'] == 'MISS'
+        resposta = await cliente_async.get('/users')
+        assert resposta.headers['X-Cache'] == 'HIT'
+        total = (await resposta.get_json())['total']
+
+        criado = await cliente_async.post('/users', json={"nome": "Nova", "email": "nova@email.com"})
+        assert criado.status_code == 201
+        resposta = await cliente_async.get('/users')
+        assert resposta.headers['X-Cache'] == 'MISS'
+        assert (await resposta.get_json())['total'] == total + 1
+
+    asyncio.run(cenario())
+
+
+def test_asgi_coalesce_gets_identicos(assincrono, chamadas):
+    async def cenario():
+        url = f"{assincrono.USUARIOS_SERVICE_URL}/api/usuarios"
+        resultados = await asyncio.gather(*(
+            assincrono.fazer_requisicao('GET', url, params={'limit': 3}) for _ in range(5)
+        ))
+        assert len(chamadas) == 1
+        assert assincrono.EM_VOO.compartilhadas == 4
+        assert {status for _, status in resultados} == {200}
+
+    asyncio.run(cenario())
+
+
+def test_asgi_erro_coalescido_chega_a_todos(assincrono):
+    async def cenario():
+        em_voo = assincrono.RequisicoesEmVoo()
+
+        async def falha():
+            await asyncio.sleep(0.05)
+            raise httpx.ConnectError("recusada")
+
+        resultados = await asyncio.gather(
+            *(em_voo.executar(('u', ''), falha, 5) for _ in range(3)),
+            return_exceptions=True
+        )
+        assert [str(erro) for erro in resultados] == ["recusada"] * 3
+
+    asyncio.run(cenario())
+
+
+def test_asgi_compor_estoura_o_prazo(assincrono, monkeypatch):
+    async def chamada(metodo, url, params=None, timeout=None):
+        await asyncio.sleep(1 if url.endswith('lenta') else 0)
+        return {}, 200
+
+    async def cenario():
+        monkeypatch.setattr(assincrono, 'fazer_requisicao', chamada)
+        resultados = await assincrono.compor({
+            'rapida': ('GET', 'http://servico/rapida', None),
+            'lenta': ('GET', 'http://servico/lenta', None)
+        }, prazo=time.monotonic() + 0.2)
+        assert resultados['rapida'] == ({}, 200)
+        assert resultados['lenta'][1] == 504
+
+    asyncio.run(cenario())
+
+
+def test_asgi_servico_fora_abre_o_circuito(assincrono, gateway, monkeypatch):
+    monkeypatch.setattr(gateway, 'BREAKER_MIN_CHAMADAS', 3)
+    monkeypatch.setattr(gateway, 'BREAKER_TEMPO_ABERTO', 60)
+    assincrono.CLIENTES['usuarios'] = httpx.AsyncClient(transport=TransporteFora())
+
+    async def cenario():
+        cliente_async = assincrono.app.test_client()
+        for _ in range(3):
+            resposta = await cliente_async.get('/users/1')
+            assert resposta.status_code == 503
+        assert assincrono.BREAKERS['usuarios'].estado == 'aberto'
+
+        resposta = await cliente_async.get('/users/1')
+        assert resposta.status_code == 503
+        assert 'circuit breaker aberto' in (await resposta.get_json())['erro']
+        assert resposta.headers['Retry-After'] == str(gateway.LIMITE_RETRY_AFTER)
+        assert (await cliente_async.get('/orders/101')).status_code == 200
+
+    asyncio.run(cenario())
@@ -1,10 +1,39 @@
 from flask import Flask, jsonify, request
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import math
 import random
+import sys
+import threading
+
+from plataforma.compressao import instalar_compressao
+from plataforma.instrumentacao import instalar_instrumentacao
+from plataforma.paginacao import PaginacaoInvalida, ler_offset, ler_paginacao, link_proximo, paginar
+from plataforma.perfilador import instalar_perfilador
+from plataforma.persistencia import criar_diario
+from plataforma.rastreamento import instalar_rastreamento
+from plataforma.serializacao import instalar_json
 
 app = Flask(__name__)
+instalar_rastreamento(app, 'pedidos')
+instalar_instrumentacao(app)
+instalar_compressao(app)
+instalar_json(app)
+instalar_perfilador(app)
+
+# Limite de usuários por consulta em lote
+LOTE_MAX_USUARIOS = 500
+
+# Limite de operações por requisição de escrita em lote
+LOTE_MAX_ESCRITAS = 1000
+
+# Campos aceitos em ?sort= na listagem, com o tipo do valor guardado no cursor
+CAMPOS_ORDENACAO = {'id': int, 'usuario_id': int, 'data_pedido': str, 'status': str, 'total': float}
+
+# Limite de períodos por consulta de série temporal
+SERIE_MAX_PERIODOS = {'dia': 366, 'hora': 24 * 31}
+
 # Dados em memória
-PEDIDOS = [
+PEDIDOS_INICIAIS = [
     {
         "id": 101,
         "usuario_id": 1,
@@ -57,12 +86,402 @@ PEDIDOS = [
     }
 ]
 
+STATUS_VALIDOS = ['pendente', 'processando', 'enviado', 'entregue', 'cancelado']
+
+def calcular_total(itens):
+    return sum(item.get('quantidade', 1) * item.get('preco', 0) for item in itens)
+
+def numero_finito(valor):
+    """False para NaN, infinito e inteiros grandes demais para um float"""
+    try:
+        return math.isfinite(valor)
+    except OverflowError:
+        return False
+
+def validar_pedido(dados):
+    """Retorna a mensagem de erro do pedido a criar, ou None se for válido"""
+    if not isinstance(dados, dict) or 'usuario_id' not in dados or 'itens' not in dados:
+        return "usuario_id e itens são obrigatórios"
+    if not isinstance(dados['usuario_id'], int) or isinstance(dados['usuario_id'], bool):
+        return "usuario_id deve ser um número inteiro"
+    if not isinstance(dados['itens'], list) or len(dados['itens']) == 0:
+        return "itens deve ser uma lista não vazia"
+    for item in dados['itens']:
+        if not isinstance(item, dict):
+            return "cada item deve ser um objeto"
+        quantidade, preco = item.get('quantidade', 1), item.get('preco', 0)
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (quantidade, preco)):
+            return "quantidade e preco dos itens devem ser números"
+        # NaN e Infinity são aceitos pelo parser JSON, mas não somam nos agregados
+        if not (numero_finito(quantidade) and numero_finito(preco)):
+            return "quantidade e preco dos itens devem ser números finitos"
+    if not numero_finito(calcular_total(dados['itens'])):
+        return "total do pedido excede o valor máximo"
+    return None
+
+def normalizar_status(status):
+    """Forma canônica (minúscula, interna) do status, usada nos pedidos e índices"""
+    return sys.intern(status.strip().lower())
+
+def intersectar(indices):
+    """
+    Interseção de conjuntos de ids, começando pelo menor
+    
+    Cada passo percorre apenas o resultado parcial e consulta o próximo
+    índice, de modo que o custo é limitado pelo filtro mais seletivo.
+    """
+    indices = sorted(indices, key=len)
+    resultado = set(indices[0])
+    for indice in indices[1:]:
+        if not resultado:
+            break
+        resultado = {i for i in resultado if i in indice}
+    return resultado
+
+class RepositorioPedidos:
+    """
+    Armazena os pedidos em memória com índices secundários
+    
+    - por id: dict id -> pedido
+    - por usuário: dict usuario_id -> {id: pedido}
+    - por status: dict status -> set(ids)
+    
+    Os índices são mantidos na criação e na mudança de status, e os IDs
+    novos vêm de uma sequência, sem varrer os pedidos existentes. O status
+    é normalizado (normalizar_status) ao ser gravado, então os filtros são
+    consultas diretas aos índices, combinadas por interseção.
+    
+    Também mantém agregados incrementais (valor total em centavos, contagem
+    por status e quantidade/valor por usuário), para que as estatísticas
+    sejam calculadas em tempo constante.
+    
+    Para séries temporais, data_pedido é interpretada uma única vez na
+    criação e o pedido é somado em baldes por dia e por hora (quantidade e
+    valor, no total e por status); uma série de N períodos lê N baldes.
+    
+    Com um diário (plataforma.persistencia) conectado, cada escrita é
+    registrada no log e a resposta só é liberada após o fsync.
+    """
+    
+    def __init__(self, pedidos=()):
+        self._lock = threading.RLock()
+        self._diario = None
+        self.carregar({"pedidos": pedidos})
+    
+    def carregar(self, estado):
+        """Substitui todo o conteúdo pelos pedidos do estado informado"""
+        with self._lock:
+            self._limpar()
+            for pedido in estado['pedidos']:
+                self._indexar(pedido)
+    
+    def exportar(self):
+        """
+        Cópia do estado para o snapshot do diário (serializada fora do lock)
+        
+        Basta copiar cada pedido: as escritas trocam o status no dict do
+        pedido, mas nunca alteram a lista de itens.
+        """
+        return {"pedidos": [dict(pedido) for pedido in self._por_id.values()]}
+    
+    def aplicar(self, registro):
+        """Reaplica um registro do diário durante a recuperação"""
+        if registro['op'] == 'criar':
+            self._indexar(registro['pedido'])
+        elif registro['op'] == 'status':
+            self._alterar_status(self._por_id[registro['id']], registro['status'])
+    
+    def conectar_diario(self, diario, pedidos_iniciais):
+        """Recupera os pedidos do diário (ou grava os iniciais) e passa a registrar as escritas"""
+        if not diario.abrir(self.carregar, self.aplicar, self.exportar, self._lock):
+            self.carregar({"pedidos": pedidos_iniciais})
+            diario.snapshot()
+        self._diario = diario
+    
+    def _limpar(self):
+        self._por_id = {}
+        self._por_usuario = {}
+        self._por_status = {}
+        self._valor_total_centavos = 0
+        self._contagem_status = {}
+        self._totais_usuario = {}
+        self._datas = {}
+        self._baldes = {'dia': {}, 'hora': {}}
+        self._proximo_id = 101
+    
+    def _indexar(self, pedido):
+        """
+        Inclui o pedido nos índices e agregados
+        
+        As chaves e valores derivados (usuário, status, total em centavos e
+        baldes de tempo) são calculados antes de qualquer alteração, e uma
+        falha no meio desfaz os passos já aplicados: um pedido inválido
+        (ex.: usuario_id não hasheável) não fica indexado pela metade.
+        """
+        pedido_id, usuario_id = pedido['id'], pedido['usuario_id']
+        hash(pedido_id), hash(usuario_id)
+        proximo_id = max(self._proximo_id, pedido_id + 1)
+        status = normalizar_status(pedido['status'])
+        centavos = round(pedido['total'] * 100)
+        data = datetime.fromisoformat(pedido['data_pedido'])
+        
+        desfazer = []
+        try:
+            self._por_id[pedido_id] = pedido
+            desfazer.append(lambda: self._por_id.pop(pedido_id))
+            self._por_usuario.setdefault(usuario_id, {})[pedido_id] = pedido
+            desfazer.append(lambda: self._remover_do_usuario(usuario_id, pedido_id))
+            self._por_status.setdefault(status, set()).add(pedido_id)
+            desfazer.append(lambda: self._por_status[status].discard(pedido_id))
+            self._somar_agregados(usuario_id, status, centavos, 1)
+            desfazer.append(lambda: self._somar_agregados(usuario_id, status, centavos, -1))
+            self._datas[pedido_id] = data
+            desfazer.append(lambda: self._datas.pop(pedido_id))
+            for granularidade, chave in self._chaves_balde(data).items():
+                self._somar_balde(granularidade, chave, status, centavos, 1)
+                desfazer.append(lambda g=granularidade, c=chave: self._somar_balde(g, c, status, centavos, -1))
+        except Exception:
+            for passo in reversed(desfazer):
+                passo()
+            raise
+        
+        pedido['status'] = status
+        self._proximo_id = proximo_id
+    
+    def _remover_do_usuario(self, usuario_id, pedido_id):
+        pedidos = self._por_usuario[usuario_id]
+        pedidos.pop(pedido_id, None)
+        if not pedidos:
+            del self._por_usuario[usuario_id]
+    
+    def _somar_agregados(self, usuario_id, status, centavos, sinal):
+        """Soma (sinal 1) ou subtrai (sinal -1) o pedido dos agregados gerais e do usuário"""
+        self._valor_total_centavos += sinal * centavos
+        self._contar_status(status, sinal)
+        totais = self._totais_usuario.setdefault(usuario_id, [0, 0])
+        totais[0] += sinal
+        totais[1] += sinal * centavos
+        if not totais[0]:
+            del self._totais_usuario[usuario_id]
+    
+    def _chaves_balde(self, data):
+        return {
+            'dia': data.date(),
+            'hora': data.replace(minute=0, second=0, microsecond=0)
+        }
+    
+    def _somar_balde(self, granularidade, chave, status, centavos, sinal):
+        """Soma (sinal 1) ou subtrai (sinal -1) o pedido de um balde de tempo (total e status)"""
+        baldes = self._baldes[granularidade]
+        balde = baldes.setdefault(chave, [0, 0, {}])
+        balde[0] += sinal
+        balde[1] += sinal * centavos
+        por_status = balde[2].setdefault(status, [0, 0])
+        por_status[0] += sinal
+        por_status[1] += sinal * centavos
+        if not por_status[0]:
+            del balde[2][status]
+        if not balde[0]:
+            del baldes[chave]
+    
+    def _contar_status(self, status, delta):
+        contagem = self._contagem_status.get(status, 0) + delta
+        if contagem:
+            self._contagem_status[status] = contagem
+        else:
+            self._contagem_status.pop(status, None)
+    
+    def todos(self):
+        with self._lock:
+            return list(self._por_id.values())
+    
+    def obter(self, pedido_id):
+        return self._por_id.get(pedido_id)
+    
+    def por_usuario(self, usuario_id):
+        with self._lock:
+            return list(self._por_usuario.get(usuario_id, {}).values())
+    
+    def totais_usuario(self, usuario_id):
+        """Retorna (quantidade de pedidos, valor total) de um usuário"""
+        with self._lock:
+            quantidade, centavos = self._totais_usuario.get(usuario_id, (0, 0))
+        return quantidade, round(centavos / 100, 2)
+    
+    def resumo(self):
+        """Retorna (quantidade de pedidos, valor total, distribuição por status)"""
+        with self._lock:
+            return (
+                len(self._por_id),
+                round(self._valor_total_centavos / 100, 2),
+                dict(self._contagem_status)
+            )
+    
+    def por_usuarios(self, usuario_ids):
+        """Retorna dict usuario_id -> [pedidos] para vários usuários"""
+        with self._lock:
+            return {
+                usuario_id: list(self._por_usuario.get(usuario_id, {}).values())
+                for usuario_id in usuario_ids
+            }
+    
+    def listar(self, usuario_id=None, status=None):
+        """Lista pedidos (em ordem de id) filtrando por usuário e/ou status, sem diferenciar maiúsculas"""
+        with self._lock:
+            indices = []
+            if usuario_id is not None:
+                indices.append(self._por_usuario.get(usuario_id, {}))
+            if status is not None:
+                indices.append(self._por_status.get(normalizar_status(status), set()))
+            
+            if not indices:
+                return list(self._por_id.values())
+            return [self._por_id[i] for i in sorted(intersectar(indices))]
+    
+    def criar(self, usuario_id, itens):
+        """Cria um pedido pendente e retorna o pedido criado"""
+        total = calcular_total(itens)
+        with self._lock:
+            novo_pedido = self._novo_pedido(usuario_id, itens, total)
+            lsn = self._registrar({"op": "criar", "pedido": novo_pedido})
+        self._aguardar(lsn)
+        return novo_pedido
+    
+    def _novo_pedido(self, usuario_id, itens, total):
+        novo_pedido = {
+            "id": self._proximo_id,
+            "usuario_id": usuario_id,
+            "data_pedido": datetime.now().isoformat(),
+            "status": "pendente",
+            "total": round(total, 2),
+            "itens": itens
+        }
+        self._indexar(novo_pedido)
+        return novo_pedido
+    
+    def aplicar_lote(self, operacoes):
+        """
+        Executa várias criações e mudanças de status com uma única aquisição do lock
+        
+        Os registros do diário são anexados em sequência e a espera pelo
+        fsync acontece uma vez, ao final, então o lote inteiro é gravado no
+        mesmo group commit.
+        
+        Args:
+            operacoes: lista de ('criar', usuario_id, itens) ou ('status', pedido_id, status),
+                já validadas
+        
+        Returns:
+            list: o pedido resultante de cada operação, ou None se o pedido não existir
+        """
+        operacoes = [
+            (op[0], op[1], op[2], calcular_total(op[2]) if op[0] == 'criar' else None)
+            for op in operacoes
+        ]
+        resultados = []
+        lsn = None
+        try:
+            with self._lock:
+                for tipo, chave, valor, total in operacoes:
+                    if tipo == 'criar':
+                        pedido = self._novo_pedido(chave, valor, total)
+                        lsn = self._registrar({"op": "criar", "pedido": pedido})
+                    else:
+                        pedido = self._por_id.get(chave)
+                        if pedido is not None:
+                            self._alterar_status(pedido, valor)
+                            lsn = self._registrar({"op": "status", "id": chave, "status": pedido['status']})
+                    resultados.append(pedido)
+        finally:
+            # Os registros já anexados são aguardados mesmo se uma operação falhar
+            self._aguardar(lsn)
+        return resultados
+    
+    def atualizar_status(self, pedido, status):
+        """Altera o status do pedido mantendo índices e agregados"""
+        with self._lock:
+            self._alterar_status(pedido, status)
+            lsn = self._registrar({"op": "status", "id": pedido['id'], "status": status})
+        self._aguardar(lsn)
+        return pedido
+    
+    def _alterar_status(self, pedido, status):
+        status = normalizar_status(status)
+        self._por_status[pedido['status']].discard(pedido['id'])
+        self._contar_status(pedido['status'], -1)
+        self._mover_status_baldes(pedido, pedido['status'], status)
+        pedido['status'] = status
+        self._contar_status(status, 1)
+        self._por_status.setdefault(status, set()).add(pedido['id'])
+    
+    def _registrar(self, registro):
+        """Anexa o registro ao diário (se houver); chamado com o lock adquirido"""
+        if self._diario is None:
+            return None
+        return self._diario.anexar(registro)
+    
+    def _aguardar(self, lsn):
+        if lsn is not None:
+            self._diario.aguardar(lsn)
+    
+    def _mover_status_baldes(self, pedido, status_anterior, status_novo):
+        """Transfere o pedido entre status nos baldes, sem alterar o total do balde"""
+        centavos = round(pedido['total'] * 100)
+        for granularidade, chave in self._chaves_balde(self._datas[pedido['id']]).items():
+            por_status = self._baldes[granularidade][chave][2]
+            anterior = por_status[status_anterior]
+            anterior[0] -= 1
+            anterior[1] -= centavos
+            if not anterior[0]:
+                del por_status[status_anterior]
+            novo = por_status.setdefault(status_novo, [0, 0])
+            novo[0] += 1
+            novo[1] += centavos
+    
+    def serie(self, periodos, granularidade, status=None):
+        """
+        Retorna a série temporal de pedidos
+        
+        Args:
+            periodos: chaves dos baldes (date para 'dia', datetime na hora cheia para 'hora')
+            granularidade: 'dia' ou 'hora'
+            status: se informado, considera apenas pedidos com esse status
+        
+        Returns:
+            list: um dict por período com pedidos, valor_total e por_status
+        """
+        baldes = self._baldes[granularidade]
+        serie = []
+        with self._lock:
+            for periodo in periodos:
+                pedidos, centavos, por_status = baldes.get(periodo, (0, 0, {}))
+                ponto = {"periodo": periodo.isoformat()}
+                if status is not None:
+                    pedidos, centavos = por_status.get(status, (0, 0))
+                else:
+                    ponto["por_status"] = {
+                        s: {"pedidos": n, "valor_total": round(c / 100, 2)}
+                        for s, (n, c) in por_status.items()
+                    }
+                ponto["pedidos"] = pedidos
+                ponto["valor_total"] = round(centavos / 100, 2)
+                serie.append(ponto)
+        return serie
+
+PEDIDOS = RepositorioPedidos()
+DIARIO = criar_diario('pedidos')
+if DIARIO is None:
+    PEDIDOS.carregar({"pedidos": PEDIDOS_INICIAIS})
+else:
+    PEDIDOS.conectar_diario(DIARIO, PEDIDOS_INICIAIS)
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check do microsserviço de pedidos"""
     return jsonify({
         "status": "healthy",
         "servico": "Microsserviço de Pedidos",
+        "persistencia": DIARIO.recuperacao if DIARIO else None,
         "timestamp": datetime.now().isoformat()
     }), 200
 
@@ -73,27 +492,36 @@ def listar_pedidos():
     Query params opcionais:
     - usuario_id: ID do usuário para filtrar pedidos
     - status: status do pedido (pendente/processando/enviado/entregue)
+    - limit, cursor: paginação por cursor (sem eles, retorna todos)
+    - offset: itens a pular antes da página, em vez de cursor (paginação por número de página)
+    - sort: id/usuario_id/data_pedido/status/total, prefixo - para decrescente
     """
     try:
-        pedidos = PEDIDOS.copy()
+        try:
+            limit, cursor, sort = ler_paginacao(request.args, CAMPOS_ORDENACAO)
+            offset = ler_offset(request.args, cursor)
+        except PaginacaoInvalida as e:
+            return jsonify({"erro": str(e)}), 400
         
         usuario_id = request.args.get('usuario_id')
         if usuario_id:
             try:
-                usuario_id_int = int(usuario_id)
-                pedidos = [p for p in pedidos if p['usuario_id'] == usuario_id_int]
+                usuario_id = int(usuario_id)
             except ValueError:
                 return jsonify({"erro": "usuario_id deve ser um número"}), 400
+        else:
+            usuario_id = None
         
-        status = request.args.get('status')
-        if status:
-            pedidos = [p for p in pedidos if p['status'].lower() == status.lower()]
+        status = request.args.get('status') or None
+        pedidos = PEDIDOS.listar(usuario_id=usuario_id, status=status)
+        pagina, proximo_cursor = paginar(pedidos, limit, cursor, sort, offset)
         
         return jsonify({
             "total": len(pedidos),
-            "pedidos": pedidos,
+            "pedidos": pagina,
+            "proximo_cursor": proximo_cursor,
             "timestamp": datetime.now().isoformat()
-        }), 200
+        }), 200, link_proximo(request.args, proximo_cursor, limit)
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
 
@@ -101,7 +529,7 @@ def listar_pedidos():
 def obter_pedido(pedido_id):
     """Obtém detalhes de um pedido específico"""
     try:
-        pedido = next((p for p in PEDIDOS if p['id'] == pedido_id), None)
+        pedido = PEDIDOS.obter(pedido_id)
         if not pedido:
             return jsonify({"erro": f"Pedido {pedido_id} não encontrado"}), 404
         
@@ -116,28 +544,14 @@ def obter_pedido(pedido_id):
 def criar_pedido():
     """Cria um novo pedido"""
     try:
-        dados = request.get_json()
-        
-        if not dados or 'usuario_id' not in dados or 'itens' not in dados:
-            return jsonify({"erro": "usuario_id e itens são obrigatórios"}), 400
-        
-        if not isinstance(dados['itens'], list) or len(dados['itens']) == 0:
-            return jsonify({"erro": "itens deve ser uma lista não vazia"}), 400
-        
-        novo_id = max([p['id'] for p in PEDIDOS]) + 1
-        
-        total = sum(item.get('quantidade', 1) * item.get('preco', 0) for item in dados['itens'])
+        # silent: JSON inválido (inclusive NaN/Infinity, que o orjson recusa) vira 400 na validação
+        dados = request.get_json(silent=True)
         
-        novo_pedido = {
-            "id": novo_id,
-            "usuario_id": dados['usuario_id'],
-            "data_pedido": datetime.now().isoformat(),
-            "status": "pendente",
-            "total": round(total, 2),
-            "itens": dados['itens']
-        }
+        erro = validar_pedido(dados)
+        if erro:
+            return jsonify({"erro": erro}), 400
         
-        PEDIDOS.append(novo_pedido)
+        novo_pedido = PEDIDOS.criar(dados['usuario_id'], dados['itens'])
         
         return jsonify({
             "mensagem": "Pedido criado com sucesso",
@@ -147,21 +561,80 @@ def criar_pedido():
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
 
+@app.route('/api/pedidos/lote', methods=['POST'])
+def processar_lote_pedidos():
+    """
+    Cria pedidos e altera status em lote
+    Body: {"pedidos": [...]}, cada item sendo
+    - {"usuario_id", "itens"}: cria um pedido
+    - {"id", "status"}: altera o status de um pedido existente
+    Cada item é validado separadamente; os válidos são gravados juntos.
+    Retorna um resultado por item, na ordem: indice, status (código HTTP
+    que o item teria isoladamente) e pedido ou erro.
+    """
+    try:
+        dados = request.get_json(silent=True)
+        lote = dados.get('pedidos') if isinstance(dados, dict) else None
+        if not isinstance(lote, list) or not lote:
+            return jsonify({"erro": "pedidos deve ser uma lista não vazia"}), 400
+        if len(lote) > LOTE_MAX_ESCRITAS:
+            return jsonify({"erro": f"Máximo de {LOTE_MAX_ESCRITAS} pedidos por lote"}), 400
+        
+        resultados = [None] * len(lote)
+        operacoes = []
+        indices = []
+        for indice, item in enumerate(lote):
+            if isinstance(item, dict) and 'id' in item:
+                if not isinstance(item['id'], int) or isinstance(item['id'], bool):
+                    resultados[indice] = {"indice": indice, "status": 400, "erro": "id deve ser um número inteiro"}
+                    continue
+                status = item.get('status')
+                status = normalizar_status(status) if isinstance(status, str) else None
+                if status not in STATUS_VALIDOS:
+                    resultados[indice] = {"indice": indice, "status": 400, "erro": f"Status inválido. Válidos: {STATUS_VALIDOS}"}
+                    continue
+                operacoes.append(('status', item['id'], status))
+            else:
+                erro = validar_pedido(item)
+                if erro:
+                    resultados[indice] = {"indice": indice, "status": 400, "erro": erro}
+                    continue
+                operacoes.append(('criar', item['usuario_id'], item['itens']))
+            indices.append(indice)
+        
+        for indice, operacao, pedido in zip(indices, operacoes, PEDIDOS.aplicar_lote(operacoes)):
+            if pedido is None:
+                resultados[indice] = {"indice": indice, "status": 404, "erro": f"Pedido {operacao[1]} não encontrado"}
+            else:
+                status_code = 201 if operacao[0] == 'criar' else 200
+                resultados[indice] = {"indice": indice, "status": status_code, "pedido": pedido}
+        
+        sucesso = sum(1 for resultado in resultados if resultado['status'] < 400)
+        return jsonify({
+            "total": len(resultados),
+            "sucesso": sucesso,
+            "falhas": len(resultados) - sucesso,
+            "resultados": resultados,
+            "timestamp": datetime.now().isoformat()
+        }), 200
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
+
 @app.route('/api/pedidos/<int:pedido_id>', methods=['PUT'])
 def atualizar_pedido(pedido_id):
     """Atualiza um pedido existente"""
     try:
-        pedido = next((p for p in PEDIDOS if p['id'] == pedido_id), None)
+        pedido = PEDIDOS.obter(pedido_id)
         if not pedido:
             return jsonify({"erro": f"Pedido {pedido_id} não encontrado"}), 404
         
         dados = request.get_json()
         
         if 'status' in dados:
-            status_validos = ['pendente', 'processando', 'enviado', 'entregue', 'cancelado']
-            if dados['status'] not in status_validos:
-                return jsonify({"erro": f"Status inválido. Válidos: {status_validos}"}), 400
-            pedido['status'] = dados['status']
+            status = normalizar_status(dados['status']) if isinstance(dados['status'], str) else None
+            if status not in STATUS_VALIDOS:
+                return jsonify({"erro": f"Status inválido. Válidos: {STATUS_VALIDOS}"}), 400
+            PEDIDOS.atualizar_status(pedido, status)
         
         return jsonify({
             "mensagem": "Pedido atualizado com sucesso",
@@ -175,14 +648,14 @@ def atualizar_pedido(pedido_id):
 def cancelar_pedido(pedido_id):
     """Cancela um pedido"""
     try:
-        pedido = next((p for p in PEDIDOS if p['id'] == pedido_id), None)
+        pedido = PEDIDOS.obter(pedido_id)
         if not pedido:
             return jsonify({"erro": f"Pedido {pedido_id} não encontrado"}), 404
         
         if pedido['status'] == 'entregue':
             return jsonify({"erro": "Não é possível cancelar pedido entregue"}), 409
         
-        pedido['status'] = 'cancelado'
+        PEDIDOS.atualizar_status(pedido, 'cancelado')
         
         return jsonify({
             "mensagem": f"Pedido {pedido_id} cancelado com sucesso",
@@ -196,13 +669,53 @@ def cancelar_pedido(pedido_id):
 def listar_pedidos_usuario(usuario_id):
     """Lista todos os pedidos de um usuário específico"""
     try:
-        pedidos = [p for p in PEDIDOS if p['usuario_id'] == usuario_id]
+        pedidos = PEDIDOS.por_usuario(usuario_id)
+        total_pedidos, valor_total = PEDIDOS.totais_usuario(usuario_id)
         
         return jsonify({
             "usuario_id": usuario_id,
-            "total_pedidos": len(pedidos),
+            "total_pedidos": total_pedidos,
             "pedidos": pedidos,
-            "valor_total": round(sum(p['total'] for p in pedidos), 2),
+            "valor_total": valor_total,
+            "timestamp": datetime.now().isoformat()
+        }), 200
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
+
+@app.route('/api/pedidos/usuarios', methods=['GET'])
+def listar_pedidos_usuarios():
+    """
+    Lista os pedidos de vários usuários em uma única requisição
+    Query params:
+    - ids: IDs dos usuários separados por vírgula (ex: ids=1,2,3)
+    """
+    try:
+        ids = request.args.get('ids', '')
+        try:
+            usuario_ids = [int(i) for i in ids.split(',') if i.strip()]
+        except ValueError:
+            return jsonify({"erro": "ids deve conter apenas números separados por vírgula"}), 400
+        
+        if not usuario_ids:
+            return jsonify({"erro": "ids é obrigatório"}), 400
+        
+        if len(usuario_ids) > LOTE_MAX_USUARIOS:
+            return jsonify({"erro": f"Máximo de {LOTE_MAX_USUARIOS} usuários por consulta"}), 400
+        
+        agrupados = PEDIDOS.por_usuarios(usuario_ids)
+        
+        resultado = {}
+        for usuario_id, pedidos in agrupados.items():
+            total_pedidos, valor_total = PEDIDOS.totais_usuario(usuario_id)
+            resultado[str(usuario_id)] = {
+                "total_pedidos": total_pedidos,
+                "pedidos": pedidos,
+                "valor_total": valor_total
+            }
+        
+        return jsonify({
+            "total_usuarios": len(resultado),
+            "pedidos_por_usuario": resultado,
             "timestamp": datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -212,13 +725,7 @@ def listar_pedidos_usuario(usuario_id):
 def estatisticas_pedidos():
     """Retorna estatísticas sobre os pedidos"""
     try:
-        total = len(PEDIDOS)
-        valor_total = sum(p['total'] for p in PEDIDOS)
-        
-        status_dist = {}
-        for pedido in PEDIDOS:
-            s = pedido['status']
-            status_dist[s] = status_dist.get(s, 0) + 1
+        total, valor_total, status_dist = PEDIDOS.resumo()
         
         return jsonify({
             "total_pedidos": total,
@@ -230,5 +737,94 @@ def estatisticas_pedidos():
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
 
+def _ler_data(texto):
+    """
+    datetime.fromisoformat sem fuso horário
+
+    As datas dos pedidos (e as chaves dos baldes) não têm fuso: são o
+    relógio do servidor, em UTC nos containers. Uma data com offset é
+    convertida para UTC antes de perder o fuso, pois datetimes com e sem
+    fuso não podem ser comparados.
+    """
+    data = datetime.fromisoformat(texto)
+    if data.tzinfo is not None:
+        data = data.astimezone(timezone.utc).replace(tzinfo=None)
+    return data
+
+def _periodos(inicio, fim, granularidade, maximo):
+    """
+    Lista as chaves de balde de inicio até fim (inclusive)
+    
+    A quantidade de períodos é calculada antes de montar a lista; acima de
+    maximo retorna None sem criar nenhuma chave, então um intervalo enorme
+    (ex.: séculos por hora) é recusado em tempo constante.
+    """
+    if granularidade == 'dia':
+        primeiro, ultimo, passo = inicio.date(), fim.date(), timedelta(days=1)
+    else:
+        primeiro = inicio.replace(minute=0, second=0, microsecond=0)
+        ultimo = fim.replace(minute=0, second=0, microsecond=0)
+        passo = timedelta(hours=1)
+    
+    quantidade = (ultimo - primeiro) // passo + 1
+    if quantidade > maximo:
+        return None
+    return [primeiro + i * passo for i in range(quantidade)]
+
+@app.route('/api/pedidos/estatisticas/serie', methods=['GET'])
+def serie_pedidos():
+    """
+    Série temporal de quantidade e valor dos pedidos
+    Query params opcionais:
+    - granularidade: dia (padrão) ou hora
+    - inicio, fim: datas ISO (padrão: últimos 30 dias ou últimas 24 horas)
+    - status: considera apenas pedidos com esse status
+    """
+    try:
+        granularidade = request.args.get('granularidade', 'dia')
+        if granularidade not in SERIE_MAX_PERIODOS:
+            return jsonify({"erro": "granularidade deve ser 'dia' ou 'hora'"}), 400
+        
+        try:
+            fim = _ler_data(request.args['fim']) if request.args.get('fim') else datetime.now()
+            if request.args.get('inicio'):
+                inicio = _ler_data(request.args['inicio'])
+            elif granularidade == 'dia':
+                inicio = fim - timedelta(days=29)
+            else:
+                inicio = fim - timedelta(hours=23)
+        except ValueError:
+            return jsonify({"erro": "inicio e fim devem estar no formato ISO (AAAA-MM-DD ou AAAA-MM-DDTHH:MM)"}), 400
+        
+        if inicio > fim:
+            return jsonify({"erro": "inicio deve ser anterior a fim"}), 400
+        
+        status = request.args.get('status') or None
+        if status is not None:
+            status = normalizar_status(status)
+        if status is not None and status not in STATUS_VALIDOS:
+            return jsonify({"erro": f"Status inválido. Válidos: {STATUS_VALIDOS}"}), 400
+        
+        periodos = _periodos(inicio, fim, granularidade, SERIE_MAX_PERIODOS[granularidade])
+        if periodos is None:
+            return jsonify({
+                "erro": f"Máximo de {SERIE_MAX_PERIODOS[granularidade]} períodos por consulta ({granularidade})"
+            }), 400
+        
+        serie = PEDIDOS.serie(periodos, granularidade, status)
+        
+        return jsonify({
+            "granularidade": granularidade,
+            "inicio": periodos[0].isoformat(),
+            "fim": periodos[-1].isoformat(),
+            "status": status,
+            "total_pedidos": sum(p['pedidos'] for p in serie),
+            "valor_total": round(sum(p['valor_total'] for p in serie), 2),
+            "serie": serie,
+            "timestamp": datetime.now().isoformat()
+        }), 200
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5002, debug=False)
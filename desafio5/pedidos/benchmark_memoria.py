@@ -0,0 +1,122 @@
+"""
+Compara memória e tempo de consulta entre a lista de dicts e o armazenamento colunar
+
+Uso:
+    python benchmark_memoria.py --pedidos 1000000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from colunar import STATUS, PedidosColunar, np
+
+PRODUTOS = ['Laptop', 'Mouse', 'Teclado', 'Headset', 'Monitor 27"', 'Webcam', 'SSD 1TB', 'Cabo HDMI']
+
+def gerar_pedidos(quantidade, usuarios, semente=42):
+    """Gera pedidos sintéticos no mesmo formato do microsserviço"""
+    aleatorio = random.Random(semente)
+    agora = datetime.now()
+    pedidos = []
+    for i in range(quantidade):
+        itens = [
+            {
+                "produto": aleatorio.choice(PRODUTOS),
+                "quantidade": aleatorio.randint(1, 3),
+                "preco": round(aleatorio.uniform(5, 500), 2)
+            }
+            for _ in range(aleatorio.randint(1, 3))
+        ]
+        pedidos.append({
+            "id": 101 + i,
+            "usuario_id": aleatorio.randint(1, usuarios),
+            "data_pedido": (agora - timedelta(minutes=aleatorio.randint(0, 525600))).isoformat(),
+            "status": aleatorio.choice(STATUS),
+            "total": round(sum(item['quantidade'] * item['preco'] for item in itens), 2),
+            "itens": itens
+        })
+    return pedidos
+
+def somar_por_usuario(pedidos):
+    """Valor total por usuário sobre a lista de dicts"""
+    valores = {}
+    for p in pedidos:
+        valores[p['usuario_id']] = valores.get(p['usuario_id'], 0.0) + p['total']
+    return {u: round(v, 2) for u, v in valores.items()}
+
+def medir_memoria(construir):
+    """Retorna (objeto, bytes alocados) para a função construtora"""
+    gc.collect()
+    tracemalloc.start()
+    inicio = tracemalloc.get_traced_memory()[0]
+    objeto = construir()
+    fim = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objeto, fim - inicio
+
+def cronometrar(funcao, repeticoes=5):
+    """Melhor tempo (ms) entre as repetições"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pedidos', type=int, default=100000)
+    parser.add_argument('--usuarios', type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"Gerando {args.pedidos} pedidos de {args.usuarios} usuários...")
+    dados_fonte = gerar_pedidos(args.pedidos, args.usuarios)
+
+    # Cópia dos dicts; as strings continuam compartilhadas com a fonte, o que
+    # subestima a memória da representação em dicts
+    dicts, memoria_dicts = medir_memoria(lambda: [
+        {**p, "itens": [dict(item) for item in p['itens']]} for p in dados_fonte
+    ])
+    colunar, memoria_colunar = medir_memoria(lambda: PedidosColunar.de_pedidos(dados_fonte))
+    del dados_fonte
+
+    usuario_alvo = dicts[0]['usuario_id']
+    inicio_janela = datetime.now() - timedelta(days=90)
+
+    consultas = {
+        "filtro usuario_id + status": (
+            lambda: [p for p in dicts if p['usuario_id'] == usuario_alvo and p['status'] == 'entregue'],
+            lambda: colunar.filtrar(usuario_id=usuario_alvo, status='entregue')
+        ),
+        "receita últimos 90 dias": (
+            lambda: sum(p['total'] for p in dicts if datetime.fromisoformat(p['data_pedido']) >= inicio_janela),
+            lambda: colunar.agregar(colunar.filtrar(inicio=inicio_janela))['valor_total']
+        ),
+        "distribuição por status": (
+            lambda: {s: sum(1 for p in dicts if p['status'] == s) for s in STATUS},
+            lambda: colunar.agregar()['distribuicao_status']
+        ),
+        "valor por usuário": (
+            lambda: somar_por_usuario(dicts),
+            colunar.valor_por_usuario
+        )
+    }
+
+    print()
+    print(f"NumPy: {'sim' if np is not None else 'não (laços Python)'}")
+    print()
+    print(f"{'Memória':<30}{'dicts':>15}{'colunar':>15}{'redução':>10}")
+    print(f"{'total (MB)':<30}{memoria_dicts / 2**20:>15.1f}{memoria_colunar / 2**20:>15.1f}"
+          f"{memoria_dicts / max(memoria_colunar, 1):>9.1f}x")
+    print(f"{'por pedido (bytes)':<30}{memoria_dicts / args.pedidos:>15.0f}{memoria_colunar / args.pedidos:>15.0f}")
+    print()
+    print(f"{'Consulta (ms)':<30}{'dicts':>15}{'colunar':>15}{'ganho':>10}")
+    for nome, (com_dicts, com_colunar) in consultas.items():
+        tempo_dicts = cronometrar(com_dicts, repeticoes=3)
+        tempo_colunar = cronometrar(com_colunar, repeticoes=3)
+        print(f"{nome:<30}{tempo_dicts:>15.1f}{tempo_colunar:>15.1f}{tempo_dicts / max(tempo_colunar, 1e-9):>9.1f}x")
+
+if __name__ == '__main__':
+    main()
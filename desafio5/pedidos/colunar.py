@@ -0,0 +1,306 @@
+"""
+Armazenamento colunar de pedidos para análises
+
+Cada campo do pedido fica em um array compacto (módulo array), em vez de
+um dict por pedido com strings ISO e dicts de itens:
+
+- ids, usuario_ids: inteiros de 64 bits
+- status: código de 1 byte (índice em STATUS)
+- totais: float de 64 bits
+- datas: microssegundos desde 1970-01-01 (int64)
+- itens: tabela lateral indexada por deslocamento; o pedido da linha i
+  tem os itens itens_inicio[i]:itens_inicio[i + 1], e os nomes de produto
+  são codificados em um dicionário; quantidades e preços são float de 64
+  bits, pois a API aceita quantidades fracionárias
+
+Com NumPy instalado, filtros e agregações são vetorizados sobre as
+colunas (sem cópia, via np.frombuffer); sem NumPy, usam laços simples.
+
+Não é usado pelo serviço: o app.py guarda os pedidos em RepositorioPedidos.
+Este módulo serve ao benchmark_memoria.py e a análises fora do serviço
+(ex.: carregar um export dos pedidos e agregar em massa).
+
+Os valores são validados na entrada (adicionar, atualizar_status,
+filtrar), pois os arrays aceitariam silenciosamente um float truncado
+ou falhariam no meio de um pedido, deixando colunas de tamanhos
+diferentes: ids e usuario_ids devem ser inteiros de 64 bits, totais,
+quantidades e preços números finitos, e o status um de STATUS.
+"""
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STATUS = ('pendente', 'processando', 'enviado', 'entregue', 'cancelado')
+CODIGO_STATUS = {status: codigo for codigo, status in enumerate(STATUS)}
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+EPOCA = datetime(1970, 1, 1)
+MICROSSEGUNDO = timedelta(microseconds=1)
+
+def para_micros(data):
+    """
+    Converte datetime (ou string ISO) em microssegundos desde a época
+
+    Datas sem fuso são gravadas como estão; com fuso, são convertidas para
+    UTC antes, pois não podem ser subtraídas da época (sem fuso).
+    """
+    if isinstance(data, str):
+        data = datetime.fromisoformat(data)
+    if data.tzinfo is not None:
+        data = data.astimezone(timezone.utc).replace(tzinfo=None)
+    return (data - EPOCA) // MICROSSEGUNDO
+
+def de_micros(micros):
+    """Converte microssegundos desde a época em datetime"""
+    return EPOCA + timedelta(microseconds=micros)
+
+def _inteiro(valor, campo):
+    """Valida um inteiro para as colunas int64"""
+    if not isinstance(valor, int) or isinstance(valor, bool):
+        raise TypeError(f"{campo} deve ser um inteiro, não {type(valor).__name__}")
+    if not INT64_MIN <= valor <= INT64_MAX:
+        raise ValueError(f"{campo} não cabe em 64 bits: {valor}")
+    return valor
+
+def _real(valor, campo):
+    """Valida e converte um número finito para as colunas float64"""
+    if not isinstance(valor, (int, float)) or isinstance(valor, bool):
+        raise TypeError(f"{campo} deve ser um número, não {type(valor).__name__}")
+    try:
+        valor = float(valor)
+    except OverflowError:
+        raise ValueError(f"{campo} não cabe em um float: {valor}")
+    if not math.isfinite(valor):
+        raise ValueError(f"{campo} deve ser finito: {valor}")
+    return valor
+
+def _codigo_status(status):
+    """Código do status (sem diferenciar maiúsculas, como no serviço)"""
+    codigo = CODIGO_STATUS.get(status.strip().lower()) if isinstance(status, str) else None
+    if codigo is None:
+        raise ValueError(f"status inválido: {status!r}")
+    return codigo
+
+def _numero(valor):
+    """Quantidade da coluna float de volta ao formato da API (2.0 -> 2)"""
+    return int(valor) if valor.is_integer() else valor
+
+class PedidosColunar:
+    """Pedidos armazenados em colunas, para filtros e agregações em massa"""
+
+    def __init__(self):
+        self.ids = array('q')
+        self.usuario_ids = array('q')
+        self.status = array('b')
+        self.totais = array('d')
+        self.datas = array('q')
+
+        self.itens_inicio = array('q', [0])
+        self.itens_produto = array('l')
+        self.itens_quantidade = array('d')
+        self.itens_preco = array('d')
+        self._produtos = []
+        self._codigo_produto = {}
+        self._ids_ordenados = True
+
+    @classmethod
+    def de_pedidos(cls, pedidos):
+        """Cria o armazenamento a partir de uma lista de pedidos em dict"""
+        colunar = cls()
+        for pedido in pedidos:
+            colunar.adicionar(pedido)
+        return colunar
+
+    def __len__(self):
+        return len(self.ids)
+
+    def adicionar(self, pedido):
+        """
+        Adiciona um pedido (dict no formato da API) e retorna a linha
+
+        Todos os campos são validados e convertidos antes da gravação: um
+        pedido inválido lança TypeError ou ValueError sem alterar as colunas.
+        """
+        pedido_id = _inteiro(pedido['id'], 'id')
+        usuario_id = _inteiro(pedido['usuario_id'], 'usuario_id')
+        codigo_status = _codigo_status(pedido['status'])
+        total = _real(pedido['total'], 'total')
+        data = _inteiro(para_micros(pedido['data_pedido']), 'data_pedido')
+        itens = []
+        for item in pedido['itens']:
+            produto = item.get('produto', '')
+            if not isinstance(produto, str):
+                raise TypeError(f"produto deve ser texto, não {type(produto).__name__}")
+            itens.append((
+                produto,
+                _real(item.get('quantidade', 1), 'quantidade'),
+                _real(item.get('preco', 0), 'preco')
+            ))
+
+        if self.ids and pedido_id <= self.ids[-1]:
+            self._ids_ordenados = False
+
+        self.ids.append(pedido_id)
+        self.usuario_ids.append(usuario_id)
+        self.status.append(codigo_status)
+        self.totais.append(total)
+        self.datas.append(data)
+
+        for produto, quantidade, preco in itens:
+            codigo = self._codigo_produto.get(produto)
+            if codigo is None:
+                codigo = self._codigo_produto[produto] = len(self._produtos)
+                self._produtos.append(produto)
+            self.itens_produto.append(codigo)
+            self.itens_quantidade.append(quantidade)
+            self.itens_preco.append(preco)
+        self.itens_inicio.append(len(self.itens_produto))
+
+        return len(self.ids) - 1
+
+    def linha(self, pedido_id):
+        """Retorna a linha do pedido ou None"""
+        if self._ids_ordenados:
+            linha = bisect_left(self.ids, pedido_id)
+            if linha < len(self.ids) and self.ids[linha] == pedido_id:
+                return linha
+            return None
+        try:
+            return self.ids.index(pedido_id)
+        except ValueError:
+            return None
+
+    def pedido(self, linha):
+        """Reconstrói o pedido da linha no formato dict da API"""
+        inicio, fim = self.itens_inicio[linha], self.itens_inicio[linha + 1]
+        return {
+            "id": self.ids[linha],
+            "usuario_id": self.usuario_ids[linha],
+            "data_pedido": de_micros(self.datas[linha]).isoformat(),
+            "status": STATUS[self.status[linha]],
+            "total": self.totais[linha],
+            "itens": [
+                {
+                    "produto": self._produtos[self.itens_produto[i]],
+                    "quantidade": _numero(self.itens_quantidade[i]),
+                    "preco": self.itens_preco[i]
+                }
+                for i in range(inicio, fim)
+            ]
+        }
+
+    def atualizar_status(self, linha, status):
+        self.status[linha] = _codigo_status(status)
+
+    def filtrar(self, usuario_id=None, status=None, inicio=None, fim=None):
+        """
+        Retorna as linhas que atendem a todos os filtros informados
+
+        Args:
+            usuario_id: ID do usuário
+            status: status do pedido
+            inicio, fim: intervalo [inicio, fim) de data_pedido (datetime)
+
+        Returns:
+            list: números das linhas, em ordem
+        """
+        usuario_id = _inteiro(usuario_id, 'usuario_id') if usuario_id is not None else None
+        codigo = _codigo_status(status) if status is not None else None
+        inicio = para_micros(inicio) if inicio is not None else None
+        fim = para_micros(fim) if fim is not None else None
+
+        if np is not None:
+            mascara = np.ones(len(self.ids), dtype=bool)
+            if usuario_id is not None:
+                mascara &= np.frombuffer(self.usuario_ids, dtype=np.int64) == usuario_id
+            if codigo is not None:
+                mascara &= np.frombuffer(self.status, dtype=np.int8) == codigo
+            if inicio is not None or fim is not None:
+                datas = np.frombuffer(self.datas, dtype=np.int64)
+                if inicio is not None:
+                    mascara &= datas >= inicio
+                if fim is not None:
+                    mascara &= datas < fim
+            return np.flatnonzero(mascara).tolist()
+
+        linhas = []
+        for i in range(len(self.ids)):
+            if usuario_id is not None and self.usuario_ids[i] != usuario_id:
+                continue
+            if codigo is not None and self.status[i] != codigo:
+                continue
+            if inicio is not None and self.datas[i] < inicio:
+                continue
+            if fim is not None and self.datas[i] >= fim:
+                continue
+            linhas.append(i)
+        return linhas
+
+    def agregar(self, linhas=None):
+        """
+        Agrega quantidade, valor total e distribuição por status
+
+        Args:
+            linhas: linhas a considerar (padrão: todas)
+
+        Returns:
+            dict: total_pedidos, valor_total, distribuicao_status
+        """
+        if np is not None:
+            totais = np.frombuffer(self.totais, dtype=np.float64)
+            status = np.frombuffer(self.status, dtype=np.int8)
+            if linhas is not None:
+                indices = np.asarray(linhas, dtype=np.int64)
+                totais = totais[indices]
+                status = status[indices]
+            contagem = np.bincount(status, minlength=len(STATUS)).tolist()
+            quantidade = int(totais.size)
+            valor_total = float(totais.sum())
+        else:
+            if linhas is None:
+                linhas = range(len(self.ids))
+            contagem = [0] * len(STATUS)
+            quantidade = 0
+            valor_total = 0.0
+            for i in linhas:
+                contagem[self.status[i]] += 1
+                valor_total += self.totais[i]
+                quantidade += 1
+
+        return {
+            "total_pedidos": quantidade,
+            "valor_total": round(valor_total, 2),
+            "distribuicao_status": {
+                STATUS[codigo]: n for codigo, n in enumerate(contagem) if n
+            }
+        }
+
+    def valor_por_usuario(self):
+        """Retorna dict usuario_id -> valor total dos pedidos"""
+        if np is not None and len(self.ids):
+            usuarios = np.frombuffer(self.usuario_ids, dtype=np.int64)
+            totais = np.frombuffer(self.totais, dtype=np.float64)
+            unicos, posicoes = np.unique(usuarios, return_inverse=True)
+            somas = np.bincount(posicoes, weights=totais)
+            return {int(u): round(float(v), 2) for u, v in zip(unicos, somas)}
+
+        valores = {}
+        for usuario_id, total in zip(self.usuario_ids, self.totais):
+            valores[usuario_id] = valores.get(usuario_id, 0.0) + total
+        return {u: round(v, 2) for u, v in valores.items()}
+
+    def bytes_usados(self):
+        """Memória ocupada pelas colunas e pelo dicionário de produtos"""
+        colunas = (
+            self.ids, self.usuario_ids, self.status, self.totais, self.datas,
+            self.itens_inicio, self.itens_produto, self.itens_quantidade, self.itens_preco
+        )
+        total = sum(coluna.buffer_info()[1] * coluna.itemsize for coluna in colunas)
+        return total + sum(len(produto.encode()) + 49 for produto in self._produtos)
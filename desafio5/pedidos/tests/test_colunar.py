@@ -0,0 +1,112 @@
+"""Armazenamento colunar: ida e volta dos pedidos, filtros, agregações e validação"""
+import copy
+from datetime import datetime, timedelta
+from itertools import count
+
+import pytest
+
+from carga.locais import carregar
+
+_CARGAS = count()
+
+PEDIDOS = [
+    {
+        "id": 101 + i,
+        "usuario_id": i % 3 + 1,
+        "data_pedido": (datetime(2025, 1, 1, 8) + timedelta(hours=7 * i)).isoformat(),
+        "status": ('pendente', 'enviado', 'entregue', 'cancelado')[i % 4],
+        "total": round(10.5 * (i + 1), 2),
+        "itens": [
+            {"produto": "Caneta", "quantidade": i % 2 + 1, "preco": 1.25},
+            {"produto": f"Livro {i % 2}", "quantidade": 0.5, "preco": 20.0}
+        ][:i % 2 + 1]
+    }
+    for i in range(12)
+]
+
+
+@pytest.fixture(params=['numpy', 'lacos'])
+def colunar(request, monkeypatch):
+    """Módulo colunar com e sem NumPy"""
+    modulo = carregar(f"teste_colunar_{next(_CARGAS)}", 'desafio5/pedidos/colunar.py')
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(modulo, 'np', None)
+    return modulo
+
+
+@pytest.fixture
+def pedidos(colunar):
+    return colunar.PedidosColunar.de_pedidos(PEDIDOS)
+
+
+def test_pedido_volta_no_formato_da_api(colunar, pedidos):
+    assert len(pedidos) == len(PEDIDOS)
+    for pedido in PEDIDOS:
+        assert pedidos.pedido(pedidos.linha(pedido['id'])) == pedido
+    assert pedidos.linha(999) is None
+
+
+def test_filtros_e_agregados_iguais_aos_da_lista(colunar, pedidos):
+    inicio, fim = datetime(2025, 1, 2), datetime(2025, 1, 3, 12)
+    linhas = pedidos.filtrar(usuario_id=2, status='Enviado', inicio=inicio)
+    esperados = [
+        i for i, p in enumerate(PEDIDOS)
+        if p['usuario_id'] == 2 and p['status'] == 'enviado' and datetime.fromisoformat(p['data_pedido']) >= inicio
+    ]
+    assert linhas == esperados
+
+    janela = [p for p in PEDIDOS if inicio <= datetime.fromisoformat(p['data_pedido']) < fim]
+    agregado = pedidos.agregar(pedidos.filtrar(inicio=inicio, fim=fim))
+    assert agregado['total_pedidos'] == len(janela)
+    assert agregado['valor_total'] == round(sum(p['total'] for p in janela), 2)
+
+    assert pedidos.agregar()['distribuicao_status'] == {
+        'pendente': 3, 'enviado': 3, 'entregue': 3, 'cancelado': 3
+    }
+    assert pedidos.valor_por_usuario() == {
+        u: round(sum(p['total'] for p in PEDIDOS if p['usuario_id'] == u), 2) for u in (1, 2, 3)
+    }
+
+
+def test_atualizar_status(colunar, pedidos):
+    linha = pedidos.linha(101)
+    pedidos.atualizar_status(linha, ' Entregue ')
+    assert pedidos.pedido(linha)['status'] == 'entregue'
+    with pytest.raises(ValueError):
+        pedidos.atualizar_status(linha, 'extraviado')
+    assert pedidos.pedido(linha)['status'] == 'entregue'
+
+
+@pytest.mark.parametrize('campo, valor, erro', [
+    ('id', '200', TypeError),
+    ('usuario_id', 1.9, TypeError),
+    ('usuario_id', True, TypeError),
+    ('usuario_id', 2 ** 63, ValueError),
+    ('status', 'extraviado', ValueError),
+    ('status', None, ValueError),
+    ('total', float('nan'), ValueError),
+    ('total', '10', TypeError),
+    ('itens', [{"produto": "X", "quantidade": 1, "preco": 1}, {"produto": "Y", "preco": float('inf')}], ValueError),
+    ('itens', [{"produto": "X", "quantidade": 10 ** 400}], ValueError),
+    ('itens', [{"produto": 7}], TypeError)
+])
+def test_pedido_invalido_nao_altera_as_colunas(colunar, pedidos, campo, valor, erro):
+    antes = [pedidos.pedido(linha) for linha in range(len(pedidos))]
+    pedido = dict(copy.deepcopy(PEDIDOS[0]), id=500)
+    pedido[campo] = valor
+
+    with pytest.raises(erro):
+        pedidos.adicionar(pedido)
+    assert len(pedidos) == len(antes)
+    assert len(pedidos.itens_inicio) == len(antes) + 1
+    assert len(pedidos.itens_quantidade) == len(pedidos.itens_preco) == pedidos.itens_inicio[-1]
+    assert [pedidos.pedido(linha) for linha in range(len(pedidos))] == antes
+
+
+def test_filtro_valida_os_argumentos(colunar, pedidos):
+    with pytest.raises(TypeError):
+        pedidos.filtrar(usuario_id='1')
+    with pytest.raises(ValueError):
+        pedidos.filtrar(status='extraviado')
@@ -0,0 +1,337 @@
+"""Serviço de pedidos: índices, validação, lote, série, paginação e recuperação do diário"""
+import base64
+import copy
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import count
+
+import pytest
+
+import plataforma.persistencia as persistencia
+from carga.locais import carregar
+
+_CARGAS = count()
+
+ITENS = [{"produto": "Caneta", "quantidade": 2, "preco": 1.5}]
+
+
+def carregar_servico(monkeypatch, diretorio=None):
+    """app.py do serviço em um módulo novo, com o diário em diretorio (ou sem diário)"""
+    monkeypatch.setattr(persistencia, 'PERSISTENCIA_DIR', str(diretorio) if diretorio else None)
+    return carregar(f"teste_pedidos_{next(_CARGAS)}", 'desafio5/pedidos/app.py')
+
+
+@pytest.fixture
+def servico(monkeypatch):
+    return carregar_servico(monkeypatch)
+
+
+@pytest.fixture
+def cliente(servico):
+    return servico.app.test_client()
+
+
+def cursor_bruto(valor):
+    return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip('=')
+
+
+# ============================================================================
+# ÍNDICES
+# ============================================================================
+
+def estado(repositorio):
+    """Cópia de todos os índices e agregados do repositório"""
+    return copy.deepcopy({
+        nome: valor for nome, valor in vars(repositorio).items()
+        if nome.startswith('_') and nome not in ('_lock', '_diario', '_somar_balde')
+    })
+
+
+@pytest.fixture
+def repositorio(servico):
+    return servico.RepositorioPedidos(copy.deepcopy(servico.PEDIDOS_INICIAIS))
+
+
+def test_pedido_com_usuario_invalido_nao_fica_indexado_pela_metade(repositorio):
+    antes = estado(repositorio)
+    with pytest.raises(TypeError):
+        repositorio.criar([1], ITENS)
+    assert estado(repositorio) == antes
+
+    criado = repositorio.criar(1, ITENS)
+    assert criado['id'] == antes['_proximo_id']
+    assert repositorio.listar(usuario_id=1)[-1] is criado
+
+
+def test_falha_no_meio_da_indexacao_desfaz_os_passos(repositorio, monkeypatch):
+    antes = estado(repositorio)
+    original = repositorio._somar_balde
+
+    def falha_na_hora(granularidade, *args):
+        if granularidade == 'hora':
+            raise MemoryError("sem memória")
+        return original(granularidade, *args)
+
+    monkeypatch.setattr(repositorio, '_somar_balde', falha_na_hora)
+    with pytest.raises(MemoryError):
+        repositorio.criar(7, ITENS)
+    assert estado(repositorio) == antes
+    assert repositorio.totais_usuario(7) == (0, 0)
+
+
+def test_criacao_com_erro_nao_chega_ao_diario(monkeypatch, tmp_path):
+    servico = carregar_servico(monkeypatch, tmp_path)
+    cliente = servico.app.test_client()
+    total = cliente.get('/api/pedidos').get_json()['total']
+    lsn = servico.DIARIO._ultimo_lsn
+
+    assert cliente.post('/api/pedidos', json={"usuario_id": [1], "itens": ITENS}).status_code >= 400
+    assert cliente.get('/api/pedidos').get_json()['total'] == total
+    assert servico.DIARIO._ultimo_lsn == lsn
+
+
+# ============================================================================
+# VALIDAÇÃO
+# ============================================================================
+
+PEDIDOS_INVALIDOS = [
+    ({"usuario_id": [1], "itens": ITENS}, 'usuario_id deve ser um número inteiro'),
+    ({"usuario_id": "1", "itens": ITENS}, 'usuario_id deve ser um número inteiro'),
+    ({"usuario_id": 1.0, "itens": ITENS}, 'usuario_id deve ser um número inteiro'),
+    ({"usuario_id": True, "itens": ITENS}, 'usuario_id deve ser um número inteiro'),
+    ({"usuario_id": 1, "itens": [{"produto": "X", "preco": float('nan')}]}, 'números finitos'),
+    ({"usuario_id": 1, "itens": [{"produto": "X", "quantidade": float('inf'), "preco": 1}]}, 'números finitos'),
+    ({"usuario_id": 1, "itens": [{"produto": "X", "quantidade": 10 ** 400, "preco": 1}]}, 'números finitos'),
+    ({"usuario_id": 1, "itens": [{"produto": "X", "quantidade": 10, "preco": 1e308}]}, 'valor máximo'),
+    ({"usuario_id": 1, "itens": [{"produto": "X", "preco": 1e308}, {"produto": "Y", "preco": 1e308}]}, 'valor máximo')
+]
+
+
+@pytest.mark.parametrize('pedido, mensagem', PEDIDOS_INVALIDOS)
+def test_validar_pedido(servico, pedido, mensagem):
+    assert mensagem in servico.validar_pedido(pedido)
+
+
+@pytest.mark.parametrize('pedido, mensagem', PEDIDOS_INVALIDOS)
+def test_pedido_invalido_retorna_400(cliente, pedido, mensagem):
+    total = cliente.get('/api/pedidos').get_json()['total']
+    # json.dumps escreve NaN, Infinity e inteiros grandes; conforme o parser
+    # do serviço, o corpo é recusado já na leitura ou na validação
+    resposta = cliente.post('/api/pedidos', data=json.dumps(pedido), content_type='application/json')
+    assert resposta.status_code == 400
+    assert cliente.get('/api/pedidos').get_json()['total'] == total
+
+
+
+@pytest.mark.parametrize('status', [5, None, True, ["enviado"], "extraviado"])
+def test_put_com_status_invalido_retorna_400(cliente, status):
+    antes = cliente.get('/api/pedidos/102').get_json()['pedido']
+    assert cliente.put('/api/pedidos/102', json={"status": status}).status_code == 400
+    assert cliente.get('/api/pedidos/102').get_json()['pedido'] == antes
+
+
+def test_status_e_normalizado(cliente):
+    corpo = cliente.put('/api/pedidos/102', json={"status": " Enviado "}).get_json()
+    assert corpo['pedido']['status'] == 'enviado'
+    assert 102 in [p['id'] for p in cliente.get('/api/pedidos?status=ENVIADO').get_json()['pedidos']]
+
+# ============================================================================
+# LOTE
+# ============================================================================
+
+def test_lote_retorna_status_por_item(cliente):
+    resposta = cliente.post('/api/pedidos/lote', json={"pedidos": [
+        {"usuario_id": 1, "itens": ITENS},
+        {"usuario_id": 1, "itens": []},
+        {"id": 102, "status": " Enviado "},
+        {"id": 9999, "status": "enviado"},
+        {"id": 102, "status": "extraviado"},
+        {"id": 102, "status": 5},
+        {"usuario_id": 2, "itens": [{"produto": "X", "quantidade": "2", "preco": 1}]}
+    ]})
+
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert [r['status'] for r in corpo['resultados']] == [201, 400, 200, 404, 400, 400, 400]
+    assert (corpo['total'], corpo['sucesso'], corpo['falhas']) == (7, 2, 5)
+    assert corpo['resultados'][0]['pedido']['total'] == 3.0
+    assert corpo['resultados'][2]['pedido']['status'] == 'enviado'
+
+    criado = corpo['resultados'][0]['pedido']
+    assert cliente.get(f"/api/pedidos/{criado['id']}").status_code == 200
+
+
+@pytest.mark.parametrize('pedido_id', [[1], {"id": 102}, "102", 102.0, True, None])
+def test_lote_com_id_invalido_falha_so_no_item(monkeypatch, tmp_path, pedido_id):
+    servico = carregar_servico(monkeypatch, tmp_path)
+    cliente = servico.app.test_client()
+    resposta = cliente.post('/api/pedidos/lote', json={"pedidos": [
+        {"usuario_id": 1, "itens": ITENS},
+        {"id": pedido_id, "status": "enviado"},
+        {"id": 102, "status": "enviado"}
+    ]})
+
+    assert resposta.status_code == 200
+    resultados = resposta.get_json()['resultados']
+    assert [r['status'] for r in resultados] == [201, 400, 200]
+    assert resultados[1]['erro'] == 'id deve ser um número inteiro'
+
+    # Os itens válidos foram gravados no diário antes da resposta
+    servico.DIARIO.fechar()
+    cliente = carregar_servico(monkeypatch, tmp_path).app.test_client()
+    assert cliente.get(f"/api/pedidos/{resultados[0]['pedido']['id']}").status_code == 200
+    assert cliente.get('/api/pedidos/102').get_json()['pedido']['status'] == 'enviado'
+
+
+@pytest.mark.parametrize('corpo', [
+    None,
+    {"pedidos": []},
+    {"pedidos": "muitos"},
+    {"usuarios": [{"usuario_id": 1, "itens": ITENS}]}
+])
+def test_lote_invalido(cliente, corpo):
+    assert cliente.post('/api/pedidos/lote', json=corpo).status_code == 400
+
+
+def test_lote_acima_do_limite(servico, cliente, monkeypatch):
+    monkeypatch.setattr(servico, 'LOTE_MAX_ESCRITAS', 2)
+    pedidos = [{"usuario_id": 1, "itens": ITENS}] * 3
+
+    assert cliente.post('/api/pedidos/lote', json={"pedidos": pedidos}).status_code == 400
+    assert cliente.post('/api/pedidos/lote', json={"pedidos": pedidos[:2]}).status_code == 200
+
+
+# ============================================================================
+# SÉRIE
+# ============================================================================
+
+def test_serie_aceita_datas_com_fuso(cliente):
+    fim = datetime.now(timezone.utc).replace(microsecond=0)
+    inicio = fim - timedelta(days=40)
+    esperado = cliente.get('/api/pedidos/estatisticas/serie', query_string={
+        'inicio': inicio.replace(tzinfo=None).isoformat(),
+        'fim': fim.replace(tzinfo=None).isoformat()
+    }).get_json()
+
+    # O mesmo instante em outro fuso e com sufixo Z
+    fuso = timezone(timedelta(hours=-3))
+    for parametros in (
+        {'inicio': inicio.astimezone(fuso).isoformat(), 'fim': fim.astimezone(fuso).isoformat()},
+        {'inicio': inicio.isoformat().replace('+00:00', 'Z'), 'fim': fim.isoformat().replace('+00:00', 'Z')}
+    ):
+        resposta = cliente.get('/api/pedidos/estatisticas/serie', query_string=parametros)
+        assert resposta.status_code == 200
+        corpo = resposta.get_json()
+        assert corpo['serie'] == esperado['serie']
+        assert corpo['inicio'] == esperado['inicio']
+
+
+@pytest.mark.parametrize('granularidade, inicio, fim, periodos', [
+    ('dia', '2024-01-01', '2024-12-31', 366),
+    ('dia', '2024-01-01T23:59', '2025-01-01T00:00', 367),
+    ('hora', '2025-01-01T00:59', '2025-01-31T23:00', 744),
+    ('hora', '2025-01-01T00:00', '2025-02-01T00:00', 745)
+])
+def test_serie_limita_a_quantidade_de_periodos(cliente, servico, granularidade, inicio, fim, periodos):
+    resposta = cliente.get('/api/pedidos/estatisticas/serie', query_string={
+        'granularidade': granularidade, 'inicio': inicio, 'fim': fim
+    })
+    if periodos > servico.SERIE_MAX_PERIODOS[granularidade]:
+        assert resposta.status_code == 400
+        assert 'Máximo' in resposta.get_json()['erro']
+    else:
+        assert resposta.status_code == 200
+        assert len(resposta.get_json()['serie']) == periodos
+
+
+def test_serie_recusa_intervalo_enorme_sem_montar_os_periodos(cliente):
+    inicio = time.monotonic()
+    resposta = cliente.get('/api/pedidos/estatisticas/serie', query_string={
+        'granularidade': 'hora', 'inicio': '0001-01-01', 'fim': '9999-12-31T23:59'
+    })
+    assert resposta.status_code == 400
+    assert time.monotonic() - inicio < 1
+
+
+def test_periodos_calculados_sem_laco(servico):
+    periodos = servico._periodos(datetime(9999, 12, 31, 20, 30), datetime(9999, 12, 31, 23, 59), 'hora', 10)
+    assert periodos == [datetime(9999, 12, 31, hora) for hora in (20, 21, 22, 23)]
+    assert servico._periodos(datetime(1, 1, 1), datetime(9999, 12, 31), 'dia', 366) is None
+
+
+# ============================================================================
+# PAGINAÇÃO
+# ============================================================================
+
+def test_paginacao_por_total_percorre_todos(cliente):
+    todos = cliente.get('/api/pedidos?sort=-total').get_json()['pedidos']
+
+    vistos = []
+    cursor = None
+    while True:
+        parametros = {'sort': '-total', 'limit': 2}
+        if cursor:
+            parametros['cursor'] = cursor
+        corpo = cliente.get('/api/pedidos', query_string=parametros).get_json()
+        vistos.extend(corpo['pedidos'])
+        cursor = corpo['proximo_cursor']
+        if cursor is None:
+            break
+
+    assert vistos == todos
+
+
+@pytest.mark.parametrize('query', [
+    'sort=produto',
+    'limit=0',
+    'cursor=abc',
+    f"cursor={cursor_bruto('id')}",
+    f"cursor={cursor_bruto(['id', 101, 101.5])}",
+    f"sort=total&cursor={cursor_bruto(['total', 'caro', 101])}",
+    f"sort=usuario_id&cursor={cursor_bruto(['usuario_id', 1.5, 101])}",
+    f"sort=status&cursor={cursor_bruto(['id', 101, 101])}"
+])
+def test_paginacao_invalida_retorna_400(cliente, query):
+    resposta = cliente.get(f'/api/pedidos?{query}')
+    assert resposta.status_code == 400
+    assert 'erro' in resposta.get_json()
+
+
+# ============================================================================
+# PERSISTÊNCIA
+# ============================================================================
+
+def test_reinicio_recupera_as_escritas(monkeypatch, tmp_path):
+    servico = carregar_servico(monkeypatch, tmp_path)
+    cliente = servico.app.test_client()
+    criado = cliente.post('/api/pedidos', json={"usuario_id": 2, "itens": ITENS}).get_json()['pedido']
+    cliente.put('/api/pedidos/102', json={"status": "enviado"})
+    cliente.delete(f"/api/pedidos/{criado['id']}")
+    cliente.post('/api/pedidos/lote', json={"pedidos": [{"usuario_id": 3, "itens": ITENS}]})
+    antes = {
+        rota: cliente.get(rota).get_json()
+        for rota in ('/api/pedidos', '/api/pedidos/usuario/2', '/api/pedidos?status=enviado')
+    }
+
+    # Outro processo no mesmo diretório, como após um restart do container
+    servico.DIARIO.fechar()
+    cliente = carregar_servico(monkeypatch, tmp_path).app.test_client()
+    for rota, corpo in antes.items():
+        recuperado = cliente.get(rota).get_json()
+        corpo.pop('timestamp', None)
+        recuperado.pop('timestamp', None)
+        assert recuperado == corpo
+    assert cliente.get('/health').get_json()['persistencia']['registros_reaplicados'] == 4
+
+    novo = cliente.post('/api/pedidos', json={"usuario_id": 1, "itens": ITENS}).get_json()['pedido']
+    assert novo['id'] > criado['id'] + 1
+
+
+def test_snapshot_nao_muda_com_escritas_depois_da_copia(servico, tmp_path):
+    diario = persistencia.Diario(str(tmp_path))
+    repositorio = servico.RepositorioPedidos()
+    repositorio.conectar_diario(diario, copy.deepcopy(servico.PEDIDOS_INICIAIS))
+    copia = repositorio.exportar()
+    repositorio.atualizar_status(repositorio.obter(101), 'cancelado')
+    assert {p['id']: p['status'] for p in copia['pedidos']}[101] == 'entregue'
@@ -1,10 +1,34 @@
 from flask import Flask, jsonify, request
 from datetime import datetime, timedelta
+import sys
+import threading
+
+from plataforma.compressao import instalar_compressao
+from plataforma.instrumentacao import instalar_instrumentacao
+from plataforma.paginacao import PaginacaoInvalida, ler_offset, ler_paginacao, link_proximo, paginar
+from plataforma.perfilador import instalar_perfilador
+from plataforma.persistencia import criar_diario
+from plataforma.rastreamento import instalar_rastreamento
+from plataforma.serializacao import instalar_json
 
 app = Flask(__name__)
+instalar_rastreamento(app, 'usuarios')
+instalar_instrumentacao(app)
+instalar_compressao(app)
+instalar_json(app)
+instalar_perfilador(app)
+
+# Campos aceitos em ?sort= na listagem, com o tipo do valor guardado no cursor
+CAMPOS_ORDENACAO = {'id': int, 'nome': str, 'email': str, 'perfil': str, 'data_cadastro': str}
+
+# Campos alteráveis por PUT e pelo lote
+CAMPOS_ATUALIZAVEIS = ('nome', 'email', 'ativo', 'perfil')
+
+# Limite de operações por requisição de escrita em lote
+LOTE_MAX_ESCRITAS = 1000
 
 # Dados em memória
-USUARIOS = [
+USUARIOS_INICIAIS = [
     {
         "id": 1,
         "nome": "Alice Silva",
@@ -47,12 +71,297 @@ USUARIOS = [
     }
 ]
 
+class EmailDuplicado(Exception):
+    """Email já pertence a outro usuário"""
+
+def normalizar_email(email):
+    """Forma canônica do email usada no índice de unicidade"""
+    return email.strip().lower()
+
+def normalizar_perfil(perfil):
+    """Forma canônica (minúscula, interna) do perfil, usada nos usuários e índices"""
+    return sys.intern(perfil.strip().lower())
+
+def intersectar(indices):
+    """
+    Interseção de conjuntos de ids, começando pelo menor
+    
+    Cada passo percorre apenas o resultado parcial e consulta o próximo
+    índice, de modo que o custo é limitado pelo filtro mais seletivo.
+    """
+    indices = sorted(indices, key=len)
+    resultado = set(indices[0])
+    for indice in indices[1:]:
+        if not resultado:
+            break
+        resultado = {i for i in resultado if i in indice}
+    return resultado
+
+def validar_campos(campos):
+    """Retorna a mensagem de erro dos campos informados, ou None se forem válidos"""
+    for campo in ('nome', 'email', 'perfil'):
+        if campo in campos and not isinstance(campos[campo], str):
+            return f"{campo} deve ser texto"
+    # Sem conversão: bool("false") seria True, o contrário do que foi enviado
+    if 'ativo' in campos and not isinstance(campos['ativo'], bool):
+        return "ativo deve ser true ou false"
+    return None
+
+def validar_usuario(dados):
+    """Retorna a mensagem de erro do usuário a criar, ou None se for válido"""
+    if not isinstance(dados, dict) or 'nome' not in dados or 'email' not in dados:
+        return "Nome e email são obrigatórios"
+    return validar_campos(dados)
+
+class RepositorioUsuarios:
+    """
+    Armazena os usuários em memória com índices
+    
+    - por id: dict id -> usuário (na ordem de criação)
+    - por email: dict email normalizado (sem espaços, minúsculo) -> id
+    - por perfil: dict perfil -> set(ids)
+    - por ativo: dict True/False -> set(ids)
+    
+    O perfil é normalizado ao ser gravado (minúsculo e interno) e ativo só
+    aceita booleanos (validar_campos), então os filtros da listagem são
+    consultas diretas aos índices, combinadas por interseção.
+    
+    Criação, atualização e remoção mantêm os dois índices sob o mesmo lock,
+    de modo que a verificação de email duplicado e a alteração acontecem de
+    forma atômica, em tempo constante.
+    
+    Com um diário (plataforma.persistencia) conectado, cada escrita é
+    registrada no log e a resposta só é liberada após o fsync.
+    """
+    
+    def __init__(self, usuarios=()):
+        self._lock = threading.RLock()
+        self._diario = None
+        self.carregar({"usuarios": usuarios})
+    
+    def carregar(self, estado):
+        """Substitui todo o conteúdo pelos usuários do estado informado"""
+        with self._lock:
+            self._por_id = {}
+            self._por_email = {}
+            self._por_perfil = {}
+            self._por_ativo = {True: set(), False: set()}
+            self._proximo_id = estado.get('proximo_id', 1)
+            for usuario in estado['usuarios']:
+                self._indexar(usuario)
+    
+    def exportar(self):
+        """Cópia do estado para o snapshot do diário (serializada fora do lock)"""
+        return {"usuarios": [dict(usuario) for usuario in self._por_id.values()], "proximo_id": self._proximo_id}
+    
+    def aplicar(self, registro):
+        """Reaplica um registro do diário durante a recuperação"""
+        if registro['op'] == 'criar':
+            self._indexar(registro['usuario'])
+        elif registro['op'] == 'atualizar':
+            self._alterar(self._por_id[registro['id']], registro['campos'])
+        elif registro['op'] == 'deletar':
+            self._remover(self._por_id[registro['id']])
+    
+    def conectar_diario(self, diario, usuarios_iniciais):
+        """Recupera os usuários do diário (ou grava os iniciais) e passa a registrar as escritas"""
+        if not diario.abrir(self.carregar, self.aplicar, self.exportar, self._lock):
+            self.carregar({"usuarios": usuarios_iniciais})
+            diario.snapshot()
+        self._diario = diario
+    
+    @staticmethod
+    def _normalizar(campos):
+        if 'perfil' in campos:
+            campos['perfil'] = normalizar_perfil(campos['perfil'])
+    
+    def _indexar(self, usuario):
+        self._normalizar(usuario)
+        self._por_id[usuario['id']] = usuario
+        self._por_email[normalizar_email(usuario['email'])] = usuario['id']
+        self._por_perfil.setdefault(usuario['perfil'], set()).add(usuario['id'])
+        self._por_ativo[usuario['ativo']].add(usuario['id'])
+        self._proximo_id = max(self._proximo_id, usuario['id'] + 1)
+    
+    def _desindexar_filtros(self, usuario):
+        ids_perfil = self._por_perfil[usuario['perfil']]
+        ids_perfil.discard(usuario['id'])
+        if not ids_perfil:
+            del self._por_perfil[usuario['perfil']]
+        self._por_ativo[usuario['ativo']].discard(usuario['id'])
+    
+    def _remover(self, usuario):
+        del self._por_id[usuario['id']]
+        del self._por_email[normalizar_email(usuario['email'])]
+        self._desindexar_filtros(usuario)
+    
+    def _alterar(self, usuario, campos):
+        self._normalizar(campos)
+        if 'email' in campos:
+            del self._por_email[normalizar_email(usuario['email'])]
+            self._por_email[normalizar_email(campos['email'])] = usuario['id']
+        self._desindexar_filtros(usuario)
+        usuario.update(campos)
+        self._por_perfil.setdefault(usuario['perfil'], set()).add(usuario['id'])
+        self._por_ativo[usuario['ativo']].add(usuario['id'])
+    
+    def _verificar_email(self, email, usuario_id=None):
+        dono = self._por_email.get(normalizar_email(email))
+        if dono is not None and dono != usuario_id:
+            raise EmailDuplicado(email)
+    
+    def todos(self):
+        with self._lock:
+            return list(self._por_id.values())
+    
+    def obter(self, usuario_id):
+        return self._por_id.get(usuario_id)
+    
+    def listar(self, ativo=None, perfil=None):
+        """Lista usuários (em ordem de id) filtrando por ativo e/ou perfil, sem diferenciar maiúsculas"""
+        with self._lock:
+            indices = []
+            if ativo is not None:
+                indices.append(self._por_ativo[ativo])
+            if perfil is not None:
+                indices.append(self._por_perfil.get(normalizar_perfil(perfil), set()))
+            
+            if not indices:
+                return list(self._por_id.values())
+            return [self._por_id[i] for i in sorted(intersectar(indices))]
+    
+    def resumo(self):
+        """Retorna (total, ativos, distribuição por perfil) a partir dos índices"""
+        with self._lock:
+            return (
+                len(self._por_id),
+                len(self._por_ativo[True]),
+                {perfil: len(ids) for perfil, ids in self._por_perfil.items()}
+            )
+    
+    def obter_por_email(self, email):
+        usuario_id = self._por_email.get(normalizar_email(email))
+        return self._por_id.get(usuario_id) if usuario_id is not None else None
+    
+    def criar(self, dados):
+        """Cria um usuário; lança EmailDuplicado se o email já estiver cadastrado"""
+        with self._lock:
+            novo_usuario = self._novo_usuario(dados)
+            lsn = self._registrar({"op": "criar", "usuario": novo_usuario})
+        self._aguardar(lsn)
+        return novo_usuario
+    
+    def _novo_usuario(self, dados):
+        self._verificar_email(dados['email'])
+        novo_usuario = {
+            "id": self._proximo_id,
+            "nome": dados['nome'],
+            "email": dados['email'],
+            "ativo": dados.get('ativo', True),
+            "data_cadastro": datetime.now().isoformat(),
+            "perfil": dados.get('perfil', 'cliente')
+        }
+        self._indexar(novo_usuario)
+        return novo_usuario
+    
+    def atualizar(self, usuario_id, campos):
+        """
+        Atualiza os campos informados
+        
+        Returns:
+            dict: o usuário atualizado, ou None se não existir
+        
+        Raises:
+            EmailDuplicado: se o novo email pertencer a outro usuário
+        """
+        with self._lock:
+            usuario = self._por_id.get(usuario_id)
+            if usuario is None:
+                return None
+            if 'email' in campos:
+                self._verificar_email(campos['email'], usuario_id)
+            self._alterar(usuario, campos)
+            lsn = self._registrar({"op": "atualizar", "id": usuario_id, "campos": campos})
+        self._aguardar(lsn)
+        return usuario
+    
+    def aplicar_lote(self, operacoes):
+        """
+        Executa várias criações e atualizações com uma única aquisição do lock
+        
+        Os registros do diário são anexados em sequência e a espera pelo
+        fsync acontece uma vez, ao final, então o lote inteiro é gravado no
+        mesmo group commit. Emails repetidos dentro do próprio lote também
+        são detectados, pois cada operação já atualiza o índice.
+        
+        Args:
+            operacoes: lista de ('criar', dados) ou ('atualizar', usuario_id, campos),
+                já validadas
+        
+        Returns:
+            list: por operação, o usuário resultante, None se o usuário não
+            existir ou a exceção EmailDuplicado
+        """
+        resultados = []
+        lsn = None
+        try:
+            with self._lock:
+                for operacao in operacoes:
+                    try:
+                        if operacao[0] == 'criar':
+                            usuario = self._novo_usuario(operacao[1])
+                            lsn = self._registrar({"op": "criar", "usuario": usuario})
+                        else:
+                            _, usuario_id, campos = operacao
+                            usuario = self._por_id.get(usuario_id)
+                            if usuario is not None:
+                                if 'email' in campos:
+                                    self._verificar_email(campos['email'], usuario_id)
+                                self._alterar(usuario, campos)
+                                lsn = self._registrar({"op": "atualizar", "id": usuario_id, "campos": campos})
+                    except EmailDuplicado as e:
+                        usuario = e
+                    resultados.append(usuario)
+        finally:
+            # Os registros já anexados são aguardados mesmo se uma operação falhar
+            self._aguardar(lsn)
+        return resultados
+    
+    def deletar(self, usuario_id):
+        """Remove o usuário; retorna False se não existir"""
+        with self._lock:
+            usuario = self._por_id.get(usuario_id)
+            if usuario is None:
+                return False
+            self._remover(usuario)
+            lsn = self._registrar({"op": "deletar", "id": usuario_id})
+        self._aguardar(lsn)
+        return True
+    
+    def _registrar(self, registro):
+        """Anexa o registro ao diário (se houver); chamado com o lock adquirido"""
+        if self._diario is None:
+            return None
+        return self._diario.anexar(registro)
+    
+    def _aguardar(self, lsn):
+        if lsn is not None:
+            self._diario.aguardar(lsn)
+
+USUARIOS = RepositorioUsuarios()
+DIARIO = criar_diario('usuarios')
+if DIARIO is None:
+    USUARIOS.carregar({"usuarios": USUARIOS_INICIAIS})
+else:
+    USUARIOS.conectar_diario(DIARIO, USUARIOS_INICIAIS)
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check do microsserviço de usuários"""
     return jsonify({
         "status": "healthy",
         "servico": "Microsserviço de Usuários",
+        "persistencia": DIARIO.recuperacao if DIARIO else None,
         "timestamp": datetime.now().isoformat()
     }), 200
 
@@ -63,24 +372,30 @@ def listar_usuarios():
     Query params opcionais:
     - ativo: true/false (filtrar por status)
     - perfil: administrador/editor/leitor/vendedor/cliente (filtrar por perfil)
+    - limit, cursor: paginação por cursor (sem eles, retorna todos)
+    - offset: itens a pular antes da página, em vez de cursor (paginação por número de página)
+    - sort: id/nome/email/perfil/data_cadastro, prefixo - para decrescente
     """
     try:
-        usuarios = USUARIOS.copy()
+        try:
+            limit, cursor, sort = ler_paginacao(request.args, CAMPOS_ORDENACAO)
+            offset = ler_offset(request.args, cursor)
+        except PaginacaoInvalida as e:
+            return jsonify({"erro": str(e)}), 400
         
         ativo = request.args.get('ativo')
-        if ativo:
-            ativo_bool = ativo.lower() == 'true'
-            usuarios = [u for u in usuarios if u['ativo'] == ativo_bool]
+        ativo = ativo.lower() == 'true' if ativo else None
+        perfil = request.args.get('perfil') or None
         
-        perfil = request.args.get('perfil')
-        if perfil:
-            usuarios = [u for u in usuarios if u['perfil'].lower() == perfil.lower()]
+        usuarios = USUARIOS.listar(ativo=ativo, perfil=perfil)
+        pagina, proximo_cursor = paginar(usuarios, limit, cursor, sort, offset)
         
         return jsonify({
             "total": len(usuarios),
-            "usuarios": usuarios,
+            "usuarios": pagina,
+            "proximo_cursor": proximo_cursor,
             "timestamp": datetime.now().isoformat()
-        }), 200
+        }), 200, link_proximo(request.args, proximo_cursor, limit)
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
 
@@ -88,7 +403,7 @@ def listar_usuarios():
 def obter_usuario(usuario_id):
     """Obtém detalhes de um usuário específico"""
     try:
-        usuario = next((u for u in USUARIOS if u['id'] == usuario_id), None)
+        usuario = USUARIOS.obter(usuario_id)
         if not usuario:
             return jsonify({"erro": f"Usuário {usuario_id} não encontrado"}), 404
         
@@ -105,30 +420,78 @@ def criar_usuario():
     try:
         dados = request.get_json()
         
-        if not dados or 'nome' not in dados or 'email' not in dados:
-            return jsonify({"erro": "Nome e email são obrigatórios"}), 400
-        
-        if any(u['email'] == dados['email'] for u in USUARIOS):
-            return jsonify({"erro": "Email já cadastrado"}), 409
+        erro = validar_usuario(dados)
+        if erro:
+            return jsonify({"erro": erro}), 400
         
-        novo_id = max([u['id'] for u in USUARIOS]) + 1
-        
-        novo_usuario = {
-            "id": novo_id,
-            "nome": dados['nome'],
-            "email": dados['email'],
-            "ativo": dados.get('ativo', True),
-            "data_cadastro": datetime.now().isoformat(),
-            "perfil": dados.get('perfil', 'cliente')
-        }
-        
-        USUARIOS.append(novo_usuario)
+        novo_usuario = USUARIOS.criar(dados)
         
         return jsonify({
             "mensagem": "Usuário criado com sucesso",
             "usuario": novo_usuario,
             "timestamp": datetime.now().isoformat()
         }), 201
+    except EmailDuplicado:
+        return jsonify({"erro": "Email já cadastrado"}), 409
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
+
+@app.route('/api/usuarios/lote', methods=['POST'])
+def processar_lote_usuarios():
+    """
+    Cria e atualiza usuários em lote
+    Body: {"usuarios": [...]}, cada item sendo
+    - {"nome", "email", "ativo"?, "perfil"?}: cria um usuário
+    - {"id", ...campos}: atualiza os campos informados de um usuário existente
+    Cada item é validado separadamente; os válidos são gravados juntos.
+    Retorna um resultado por item, na ordem: indice, status (código HTTP
+    que o item teria isoladamente) e usuario ou erro.
+    """
+    try:
+        dados = request.get_json(silent=True)
+        lote = dados.get('usuarios') if isinstance(dados, dict) else None
+        if not isinstance(lote, list) or not lote:
+            return jsonify({"erro": "usuarios deve ser uma lista não vazia"}), 400
+        if len(lote) > LOTE_MAX_ESCRITAS:
+            return jsonify({"erro": f"Máximo de {LOTE_MAX_ESCRITAS} usuários por lote"}), 400
+        
+        resultados = [None] * len(lote)
+        operacoes = []
+        indices = []
+        for indice, item in enumerate(lote):
+            if isinstance(item, dict) and 'id' in item:
+                campos = {campo: item[campo] for campo in CAMPOS_ATUALIZAVEIS if campo in item}
+                if not isinstance(item['id'], int) or isinstance(item['id'], bool):
+                    erro = "id deve ser um número inteiro"
+                else:
+                    erro = validar_campos(campos)
+                operacao = ('atualizar', item['id'], campos)
+            else:
+                erro = validar_usuario(item)
+                operacao = ('criar', item)
+            if erro:
+                resultados[indice] = {"indice": indice, "status": 400, "erro": erro}
+                continue
+            operacoes.append(operacao)
+            indices.append(indice)
+        
+        for indice, operacao, usuario in zip(indices, operacoes, USUARIOS.aplicar_lote(operacoes)):
+            if isinstance(usuario, EmailDuplicado):
+                resultados[indice] = {"indice": indice, "status": 409, "erro": "Email já cadastrado"}
+            elif usuario is None:
+                resultados[indice] = {"indice": indice, "status": 404, "erro": f"Usuário {operacao[1]} não encontrado"}
+            else:
+                status_code = 201 if operacao[0] == 'criar' else 200
+                resultados[indice] = {"indice": indice, "status": status_code, "usuario": usuario}
+        
+        sucesso = sum(1 for resultado in resultados if resultado['status'] < 400)
+        return jsonify({
+            "total": len(resultados),
+            "sucesso": sucesso,
+            "falhas": len(resultados) - sucesso,
+            "resultados": resultados,
+            "timestamp": datetime.now().isoformat()
+        }), 200
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
 
@@ -136,28 +499,23 @@ def criar_usuario():
 def atualizar_usuario(usuario_id):
     """Atualiza um usuário existente"""
     try:
-        usuario = next((u for u in USUARIOS if u['id'] == usuario_id), None)
-        if not usuario:
-            return jsonify({"erro": f"Usuário {usuario_id} não encontrado"}), 404
-        
         dados = request.get_json()
+        campos = {campo: dados[campo] for campo in CAMPOS_ATUALIZAVEIS if campo in dados}
+        erro = validar_campos(campos)
+        if erro:
+            return jsonify({"erro": erro}), 400
         
-        if 'nome' in dados:
-            usuario['nome'] = dados['nome']
-        if 'email' in dados:
-            if any(u['id'] != usuario_id and u['email'] == dados['email'] for u in USUARIOS):
-                return jsonify({"erro": "Email já cadastrado"}), 409
-            usuario['email'] = dados['email']
-        if 'ativo' in dados:
-            usuario['ativo'] = dados['ativo']
-        if 'perfil' in dados:
-            usuario['perfil'] = dados['perfil']
+        usuario = USUARIOS.atualizar(usuario_id, campos)
+        if not usuario:
+            return jsonify({"erro": f"Usuário {usuario_id} não encontrado"}), 404
         
         return jsonify({
             "mensagem": "Usuário atualizado com sucesso",
             "usuario": usuario,
             "timestamp": datetime.now().isoformat()
         }), 200
+    except EmailDuplicado:
+        return jsonify({"erro": "Email já cadastrado"}), 409
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
 
@@ -165,12 +523,9 @@ def atualizar_usuario(usuario_id):
 def deletar_usuario(usuario_id):
     """Deleta um usuário"""
     try:
-        usuario = next((u for u in USUARIOS if u['id'] == usuario_id), None)
-        if not usuario:
+        if not USUARIOS.deletar(usuario_id):
             return jsonify({"erro": f"Usuário {usuario_id} não encontrado"}), 404
         
-        USUARIOS.remove(usuario)
-        
         return jsonify({
             "mensagem": f"Usuário {usuario_id} deletado com sucesso",
             "timestamp": datetime.now().isoformat()
@@ -182,15 +537,9 @@ def deletar_usuario(usuario_id):
 def estatisticas_usuarios():
     """Retorna estatísticas sobre os usuários"""
     try:
-        total = len(USUARIOS)
-        ativos = len([u for u in USUARIOS if u['ativo']])
+        total, ativos, perfis = USUARIOS.resumo()
         inativos = total - ativos
         
-        perfis = {}
-        for usuario in USUARIOS:
-            perfil = usuario['perfil']
-            perfis[perfil] = perfis.get(perfil, 0) + 1
-        
         return jsonify({
             "total_usuarios": total,
             "usuarios_ativos": ativos,
@@ -0,0 +1,192 @@
+"""Serviço de usuários: lote, validação, paginação e recuperação do diário"""
+import base64
+import json
+from itertools import count
+from urllib.parse import parse_qs
+
+import pytest
+
+import plataforma.persistencia as persistencia
+from carga.locais import carregar
+
+_CARGAS = count()
+
+
+def carregar_servico(monkeypatch, diretorio=None):
+    """app.py do serviço em um módulo novo, com o diário em diretorio (ou sem diário)"""
+    monkeypatch.setattr(persistencia, 'PERSISTENCIA_DIR', str(diretorio) if diretorio else None)
+    return carregar(f"teste_usuarios_{next(_CARGAS)}", 'desafio5/usuarios/app.py')
+
+
+@pytest.fixture
+def servico(monkeypatch):
+    return carregar_servico(monkeypatch)
+
+
+@pytest.fixture
+def cliente(servico):
+    return servico.app.test_client()
+
+
+def cursor_bruto(valor):
+    return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip('=')
+
+
+# ============================================================================
+# LOTE
+# ============================================================================
+
+def test_lote_retorna_status_por_item(cliente):
+    resposta = cliente.post('/api/usuarios/lote', json={"usuarios": [
+        {"nome": "Nova", "email": "nova@email.com"},
+        {"nome": "Sem email"},
+        {"id": 1, "perfil": "Editor"},
+        {"id": 9999, "nome": "Ninguém"},
+        {"nome": "Repetida", "email": "ALICE@email.com"},
+        {"id": 1, "ativo": "false"},
+        {"nome": "Outra", "email": "nova@email.com"}
+    ]})
+
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert [r['status'] for r in corpo['resultados']] == [201, 400, 200, 404, 409, 400, 409]
+    assert [r['indice'] for r in corpo['resultados']] == list(range(7))
+    assert (corpo['total'], corpo['sucesso'], corpo['falhas']) == (7, 2, 5)
+    assert corpo['resultados'][2]['usuario']['perfil'] == 'editor'
+
+    criado = corpo['resultados'][0]['usuario']
+    assert cliente.get(f"/api/usuarios/{criado['id']}").status_code == 200
+    assert cliente.get('/api/usuarios/1').get_json()['usuario']['ativo'] is True
+
+
+@pytest.mark.parametrize('usuario_id', [[1], {"id": 1}, "1", 1.0, True, None])
+def test_lote_com_id_invalido_falha_so_no_item(monkeypatch, tmp_path, usuario_id):
+    servico = carregar_servico(monkeypatch, tmp_path)
+    cliente = servico.app.test_client()
+    resposta = cliente.post('/api/usuarios/lote', json={"usuarios": [
+        {"nome": "Antes", "email": "antes@email.com"},
+        {"id": usuario_id, "nome": "Inválido"},
+        {"id": 1, "nome": "Alice Souza"}
+    ]})
+
+    assert resposta.status_code == 200
+    resultados = resposta.get_json()['resultados']
+    assert [r['status'] for r in resultados] == [201, 400, 200]
+    assert resultados[1]['erro'] == 'id deve ser um número inteiro'
+
+    # Os itens válidos foram gravados no diário antes da resposta
+    servico.DIARIO.fechar()
+    cliente = carregar_servico(monkeypatch, tmp_path).app.test_client()
+    assert cliente.get(f"/api/usuarios/{resultados[0]['usuario']['id']}").status_code == 200
+    assert cliente.get('/api/usuarios/1').get_json()['usuario']['nome'] == 'Alice Souza'
+
+
+@pytest.mark.parametrize('corpo', [
+    None,
+    {"usuarios": []},
+    {"usuarios": {"nome": "Nova"}},
+    {"outros": [{"nome": "Nova", "email": "nova@email.com"}]}
+])
+def test_lote_invalido(cliente, corpo):
+    resposta = cliente.post('/api/usuarios/lote', json=corpo)
+    assert resposta.status_code == 400
+
+
+def test_lote_acima_do_limite(servico, cliente, monkeypatch):
+    monkeypatch.setattr(servico, 'LOTE_MAX_ESCRITAS', 2)
+    usuarios = [{"nome": f"U{i}", "email": f"u{i}@email.com"} for i in range(3)]
+
+    resposta = cliente.post('/api/usuarios/lote', json={"usuarios": usuarios})
+    assert resposta.status_code == 400
+    assert cliente.post('/api/usuarios/lote', json={"usuarios": usuarios[:2]}).status_code == 200
+
+
+# ============================================================================
+# VALIDAÇÃO
+# ============================================================================
+
+@pytest.mark.parametrize('ativo', ["false", 0, 1, None])
+def test_ativo_precisa_ser_booleano(cliente, ativo):
+    assert cliente.put('/api/usuarios/1', json={"ativo": ativo}).status_code == 400
+    assert cliente.post('/api/usuarios', json={"nome": "N", "email": "n@email.com", "ativo": ativo}).status_code == 400
+    assert cliente.get('/api/usuarios/1').get_json()['usuario']['ativo'] is True
+
+
+def test_filtro_ativo(cliente):
+    inativo = cliente.post('/api/usuarios', json={"nome": "N", "email": "n@email.com", "ativo": False}).get_json()['usuario']
+    inativos = cliente.get('/api/usuarios?ativo=false').get_json()['usuarios']
+    assert inativo in inativos
+    assert all(usuario['ativo'] is False for usuario in inativos)
+    assert inativo not in cliente.get('/api/usuarios?ativo=true').get_json()['usuarios']
+
+
+# ============================================================================
+# PAGINAÇÃO
+# ============================================================================
+
+def test_paginacao_segue_o_link_ate_o_fim(cliente):
+    todos = cliente.get('/api/usuarios?sort=-nome').get_json()['usuarios']
+
+    vistos = []
+    query = 'sort=-nome&limit=2'
+    while query:
+        resposta = cliente.get(f'/api/usuarios?{query}')
+        assert resposta.status_code == 200
+        vistos.extend(resposta.get_json()['usuarios'])
+        link = resposta.headers.get('Link')
+        query = link[2:link.index('>')] if link else None
+        if query:
+            assert parse_qs(query)['cursor'] == [resposta.get_json()['proximo_cursor']]
+
+    assert vistos == todos
+
+
+@pytest.mark.parametrize('query', [
+    'sort=senha',
+    'limit=abc',
+    'limit=-1',
+    'cursor=%%%',
+    f"cursor={cursor_bruto(['id', 1])}",
+    f"cursor={cursor_bruto(['id', 1, 'x'])}",
+    f"cursor={cursor_bruto({'id': 1})}",
+    f"sort=nome&cursor={cursor_bruto(['nome', 10, 1])}",
+    f"sort=email&cursor={cursor_bruto(['nome', 'a', 1])}"
+])
+def test_paginacao_invalida_retorna_400(cliente, query):
+    resposta = cliente.get(f'/api/usuarios?{query}')
+    assert resposta.status_code == 400
+    assert 'erro' in resposta.get_json()
+
+
+# ============================================================================
+# PERSISTÊNCIA
+# ============================================================================
+
+def test_reinicio_recupera_as_escritas(monkeypatch, tmp_path):
+    servico = carregar_servico(monkeypatch, tmp_path)
+    cliente = servico.app.test_client()
+    criado = cliente.post('/api/usuarios', json={"nome": "Nova", "email": "nova@email.com"}).get_json()['usuario']
+    cliente.put('/api/usuarios/1', json={"nome": "Alice Souza", "ativo": False})
+    cliente.delete('/api/usuarios/2')
+    cliente.post('/api/usuarios/lote', json={"usuarios": [{"nome": "Lote", "email": "lote@email.com"}]})
+    antes = cliente.get('/api/usuarios').get_json()['usuarios']
+    inativos = cliente.get('/api/usuarios?ativo=false').get_json()['total']
+
+    # Outro processo no mesmo diretório, como após um restart do container
+    servico.DIARIO.fechar()
+    cliente = carregar_servico(monkeypatch, tmp_path).app.test_client()
+    assert cliente.get('/api/usuarios').get_json()['usuarios'] == antes
+    assert cliente.get('/api/usuarios/2').status_code == 404
+    assert cliente.get('/api/usuarios?ativo=false').get_json()['total'] == inativos
+    assert cliente.get('/health').get_json()['persistencia']['registros_reaplicados'] == 4
+
+    # Índices reconstruídos: o email continua único e os ids não se repetem
+    assert cliente.post('/api/usuarios', json={"nome": "X", "email": "NOVA@email.com"}).status_code == 409
+    novo = cliente.post('/api/usuarios', json={"nome": "Y", "email": "y@email.com"}).get_json()['usuario']
+    assert novo['id'] > criado['id'] + 1
+
+
+def test_segundo_processo_no_mesmo_diretorio_falha(monkeypatch, tmp_path):
+    carregar_servico(monkeypatch, tmp_path)
+    with pytest.raises(persistencia.DiarioEmUso):
+        carregar_servico(monkeypatch, tmp_path)
@@ -0,0 +1,8 @@
+"""
+Módulos compartilhados pelos serviços dos desafios
+
+Nos containers, o diretório é copiado ao lado do app.py (via
+additional_contexts do Docker Compose); para executar localmente, rode a
+partir da raiz do repositório com PYTHONPATH=. ou instale as dependências
+e use `python -m`.
+"""
@@ -0,0 +1,101 @@
+"""
+Mede o custo de serialização das maiores listagens dos serviços
+
+Compara o provedor JSON padrão do Flask (antes) com o ProvedorJSON (depois)
+gerando a resposta do jsonify para conteúdos no formato de:
+
+- GET /api/posts             (desafio3, linhas do PostgreSQL com datetime)
+- GET /usuarios e GET /logs  (desafio2)
+- GET /usuarios-com-pedidos  (desafio5, página de usuários com pedidos)
+
+Uso (a partir da raiz do repositório):
+    python -m plataforma.benchmark_json --itens 2000
+    python -m plataforma.benchmark_json --sem-orjson   # fallback da biblioteca padrão
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+def conteudos(itens):
+    """Conteúdos de cada listagem, com itens registros (ou usuários)"""
+    agora = datetime.now()
+    posts = [{
+        "id": i,
+        "titulo": f"Post número {i}",
+        "conteudo": "Conteúdo do post com acentuação e um texto razoável. " * 4,
+        "autor": f"Autor {i % 50}",
+        "data_criacao": agora - timedelta(minutes=i)
+    } for i in range(itens)]
+    usuarios = [{
+        "id": i,
+        "nome": f"Usuário {i}",
+        "email": f"usuario{i}@email.com",
+        "data_criacao": agora - timedelta(hours=i)
+    } for i in range(itens)]
+    logs = [{
+        "id": i,
+        "mensagem": f"Usuário {i % 100} criado com sucesso",
+        "data_log": agora - timedelta(seconds=i)
+    } for i in range(itens)]
+    usuarios_com_pedidos = {
+        "total_usuarios": itens,
+        "limit": 50,
+        "proximo_cursor": "WyJpZCIsNTAsNTBd",
+        "usuarios_com_pedidos": [{
+            "usuario": {"id": u, "nome": f"Usuário {u}", "email": f"usuario{u}@email.com",
+                        "ativo": True, "perfil": "cliente",
+                        "data_cadastro": (agora - timedelta(days=u)).isoformat()},
+            "pedidos": [{
+                "id": u * 100 + p, "usuario_id": u, "status": "entregue", "total": 159.9,
+                "data_pedido": (agora - timedelta(hours=p)).isoformat(),
+                "itens": [{"produto": "Teclado", "quantidade": 2, "preco": 79.95}]
+            } for p in range(itens // 50)],
+            "total_pedidos": itens // 50,
+            "valor_total_pedidos": 159.9 * (itens // 50)
+        } for u in range(50)],
+        "timestamp": agora.isoformat()
+    }
+    return {
+        "GET /api/posts": posts,
+        "GET /usuarios": usuarios,
+        "GET /logs": logs,
+        "GET /usuarios-com-pedidos": usuarios_com_pedidos
+    }
+
+def medir(app, conteudo, repeticoes):
+    """Mediana em ms de app.json.response(conteudo), o que o jsonify executa"""
+    tempos = []
+    with app.app_context():
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            app.json.response(conteudo)
+            tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--itens', type=int, default=1000)
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--sem-orjson', action='store_true', help="mede o fallback da biblioteca padrão")
+    args = parser.parse_args()
+
+    if args.sem_orjson:
+        sys.modules['orjson'] = None  # faz o import do orjson falhar
+
+    from flask import Flask
+    from plataforma.serializacao import instalar_json, orjson
+
+    antes = Flask('antes')
+    depois = instalar_json(Flask('depois'))
+
+    print(f"ProvedorJSON com {'orjson' if orjson is not None else 'json (biblioteca padrão)'}")
+    print(f"{'Listagem':<28}{'antes (ms)':>12}{'depois (ms)':>13}{'ganho':>9}")
+    for nome, conteudo in conteudos(args.itens).items():
+        tempo_antes = medir(antes, conteudo, args.repeticoes)
+        tempo_depois = medir(depois, conteudo, args.repeticoes)
+        print(f"{nome:<28}{tempo_antes:>12.2f}{tempo_depois:>13.2f}{tempo_antes / tempo_depois:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
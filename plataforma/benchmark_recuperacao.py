@@ -0,0 +1,115 @@
+"""
+Mede a vazão de escrita do diário e o tempo de recuperação
+
+- escrita: N threads registrando alterações, com e sem group commit
+- recuperação: reaplicando apenas o log vs. snapshot + cauda do log
+
+Uso (a partir da raiz do repositório):
+    python -m plataforma.benchmark_recuperacao --registros 100000 --threads 16
+"""
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+from plataforma.persistencia import Diario
+
+class Estado:
+    """Estado mínimo no formato esperado pelo Diario: pedidos por id"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.pedidos = {}
+
+    def carregar(self, estado):
+        self.pedidos = {pedido['id']: pedido for pedido in estado['pedidos']}
+
+    def exportar(self):
+        return {"pedidos": list(self.pedidos.values())}
+
+    def aplicar(self, registro):
+        if registro['op'] == 'criar':
+            self.pedidos[registro['pedido']['id']] = registro['pedido']
+        elif registro['op'] == 'status':
+            self.pedidos[registro['id']]['status'] = registro['status']
+
+    def alterar(self, diario, i):
+        with self.lock:
+            if i % 4 == 3 and self.pedidos:
+                pedido_id = next(iter(self.pedidos))
+                self.pedidos[pedido_id]['status'] = 'entregue'
+                lsn = diario.anexar({"op": "status", "id": pedido_id, "status": 'entregue'})
+            else:
+                pedido = {"id": i, "usuario_id": i % 1000, "status": 'pendente', "total": 10.0, "itens": []}
+                self.pedidos[i] = pedido
+                lsn = diario.anexar({"op": "criar", "pedido": pedido})
+        diario.aguardar(lsn)
+
+def medir_escrita(diretorio, registros, threads, intervalo_grupo, registros_snapshot):
+    """Retorna (registros/s, estado) após gravar os registros com N threads"""
+    estado = Estado()
+    diario = Diario(diretorio, intervalo_grupo=intervalo_grupo, registros_snapshot=registros_snapshot)
+    diario.abrir(estado.carregar, estado.aplicar, estado.exportar, estado.lock)
+
+    proximo = iter(range(registros))
+    lock_proximo = threading.Lock()
+
+    def trabalhar():
+        while True:
+            with lock_proximo:
+                i = next(proximo, None)
+            if i is None:
+                return
+            estado.alterar(diario, i)
+
+    inicio = time.perf_counter()
+    trabalhadores = [threading.Thread(target=trabalhar) for _ in range(threads)]
+    for t in trabalhadores:
+        t.start()
+    for t in trabalhadores:
+        t.join()
+    return registros / (time.perf_counter() - inicio), estado
+
+def medir_recuperacao(diretorio):
+    """Retorna as estatísticas de recuperação de um diretório existente"""
+    estado = Estado()
+    diario = Diario(diretorio)
+    diario.abrir(estado.carregar, estado.aplicar, estado.exportar, estado.lock)
+    return diario.recuperacao, len(estado.pedidos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--registros', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--grupo-ms', type=float, default=2)
+    args = parser.parse_args()
+
+    base = tempfile.mkdtemp(prefix='diario-')
+    try:
+        print(f"{'Escrita':<40}{'registros/s':>15}")
+        cenarios = {
+            "1 thread": (1, 0),
+            f"{args.threads} threads": (args.threads, 0),
+            f"{args.threads} threads, espera de {args.grupo_ms:g} ms": (args.threads, args.grupo_ms / 1000),
+        }
+        for i, (nome, (threads, intervalo)) in enumerate(cenarios.items()):
+            vazao, _ = medir_escrita(f"{base}/escrita-{i}", args.registros, threads, intervalo, 0)
+            print(f"{nome:<40}{vazao:>15.0f}")
+
+        # Mesmo volume de registros, com e sem snapshots periódicos
+        medir_escrita(f"{base}/so-log", args.registros, args.threads, 0, 0)
+        medir_escrita(f"{base}/snapshot", args.registros, args.threads, 0,
+                      max(args.registros // 4, 1))
+
+        print()
+        print(f"{'Recuperação':<40}{'reaplicados':>15}{'tempo (ms)':>15}{'pedidos':>10}")
+        for nome, diretorio in (("apenas log", "so-log"), ("snapshot + cauda do log", "snapshot")):
+            recuperacao, pedidos = medir_recuperacao(f"{base}/{diretorio}")
+            print(f"{nome:<40}{recuperacao['registros_reaplicados']:>15}"
+                  f"{recuperacao['tempo_total_ms']:>15.1f}{pedidos:>10}")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Compressão das respostas HTTP
+
+Comprime com br (quando o pacote brotli está instalado) ou gzip, conforme
+o Accept-Encoding do cliente, as respostas JSON e de texto a partir de
+COMPRESSAO_MIN_BYTES; abaixo disso, o custo de comprimir não compensa.
+Respostas que podem variar conforme o Accept-Encoding recebem
+Vary: Accept-Encoding, para que caches intermediários não entreguem a
+versão comprimida a quem não a aceita.
+
+Uso pelo serviço:
+    app = Flask(__name__)     # ou Quart
+    instalar_compressao(app)
+
+Respostas em cache: guarde um CorpoComprimido e use definir_corpo() ao
+servir. Cada codificação é comprimida uma única vez e reaproveitada nos
+acertos seguintes; a resposta já sai com Content-Encoding, e o hook não a
+comprime de novo.
+
+Variáveis de ambiente:
+    COMPRESSAO_MIN_BYTES    tamanho mínimo do corpo para comprimir (padrão 1024)
+    COMPRESSAO_NIVEL_GZIP   nível do gzip, 1-9 (padrão 6)
+    COMPRESSAO_NIVEL_BR     qualidade do brotli, 0-11 (padrão 5)
+"""
+import gzip
+import inspect
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSAO_MIN_BYTES = int(os.getenv('COMPRESSAO_MIN_BYTES', 1024))
+COMPRESSAO_NIVEL_GZIP = int(os.getenv('COMPRESSAO_NIVEL_GZIP', 6))
+COMPRESSAO_NIVEL_BR = int(os.getenv('COMPRESSAO_NIVEL_BR', 5))
+
+# Em ordem de preferência quando o cliente aceita mais de uma
+CODIFICACOES = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def escolher_codificacao(accept_encoding):
+    """
+    Escolhe a codificação a partir do cabeçalho Accept-Encoding
+
+    Returns:
+        str: 'br' ou 'gzip', ou None se o cliente não aceita nenhuma delas
+    """
+    if not accept_encoding:
+        return None
+
+    aceitas = {}
+    for parte in accept_encoding.split(','):
+        nome, _, parametros = parte.partition(';')
+        peso = 1.0
+        for parametro in parametros.split(';'):
+            chave, _, valor = parametro.strip().partition('=')
+            if chave == 'q':
+                try:
+                    peso = float(valor)
+                except ValueError:
+                    peso = 0.0
+        aceitas[nome.strip().lower()] = peso
+
+    melhor, melhor_peso = None, 0.0
+    for codificacao in CODIFICACOES:
+        peso = aceitas.get(codificacao, aceitas.get('*', 0.0))
+        if peso > melhor_peso:
+            melhor, melhor_peso = codificacao, peso
+    return melhor
+
+def comprimir(dados, codificacao):
+    """Comprime os bytes com a codificação informada ('br' ou 'gzip')"""
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=COMPRESSAO_NIVEL_BR)
+    return gzip.compress(dados, compresslevel=COMPRESSAO_NIVEL_GZIP, mtime=0)
+
+class CorpoComprimido:
+    """Corpo de uma resposta em cache com as versões comprimidas já calculadas"""
+
+    def __init__(self, dados, variantes=None):
+        """
+        Args:
+            dados: corpo original (bytes)
+            variantes: versões já comprimidas, {codificação: bytes} (ex.: lidas de um cache externo)
+        """
+        self.dados = dados
+        self._variantes = dict(variantes or {})
+
+    def variante(self, codificacao):
+        """Bytes na codificação pedida (None para o corpo original)"""
+        if codificacao is None:
+            return self.dados
+        dados = self._variantes.get(codificacao)
+        if dados is None:
+            # Duas threads podem comprimir ao mesmo tempo no primeiro acesso;
+            # o resultado é o mesmo, e fica guardado o último
+            dados = self._variantes[codificacao] = comprimir(self.dados, codificacao)
+        return dados
+
+def _elegivel(resposta):
+    """Resposta bem-sucedida, em memória, JSON ou texto, ainda sem Content-Encoding"""
+    mimetype = resposta.mimetype or ''
+    return (
+        200 <= resposta.status_code < 300
+        and resposta.status_code != 204
+        and not getattr(resposta, 'direct_passthrough', False)
+        and not getattr(resposta, 'is_streamed', False)
+        and 'Content-Encoding' not in resposta.headers
+        and (mimetype == 'application/json' or mimetype.startswith('text/'))
+    )
+
+def definir_corpo(resposta, corpo, accept_encoding):
+    """
+    Coloca o corpo na resposta, comprimido quando elegível e grande o bastante
+
+    Args:
+        resposta: Response do Flask ou do Quart
+        corpo: bytes ou CorpoComprimido (reaproveita as versões já comprimidas)
+        accept_encoding: cabeçalho Accept-Encoding da requisição
+
+    Returns:
+        A mesma resposta
+    """
+    if not isinstance(corpo, CorpoComprimido):
+        corpo = CorpoComprimido(corpo)
+
+    codificacao = None
+    if _elegivel(resposta) and len(corpo.dados) >= COMPRESSAO_MIN_BYTES:
+        resposta.vary.add('Accept-Encoding')
+        codificacao = escolher_codificacao(accept_encoding)
+
+    resposta.set_data(corpo.variante(codificacao))
+    if codificacao is not None:
+        resposta.headers['Content-Encoding'] = codificacao
+    return resposta
+
+def instalar_compressao(app):
+    """Registra a compressão das respostas na aplicação (Flask ou Quart)"""
+    if inspect.iscoroutinefunction(type(app).__call__):
+        from quart import request
+
+        @app.after_request
+        async def comprimir_resposta(resposta):
+            if _elegivel(resposta):
+                definir_corpo(resposta, await resposta.get_data(), request.headers.get('Accept-Encoding'))
+            return resposta
+    else:
+        from flask import request
+
+        @app.after_request
+        def comprimir_resposta(resposta):
+            if _elegivel(resposta):
+                definir_corpo(resposta, resposta.get_data(), request.headers.get('Accept-Encoding'))
+            return resposta
+    return app
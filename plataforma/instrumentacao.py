@@ -0,0 +1,381 @@
+"""
+Instrumentação das requisições: tempo gasto em banco, Redis e serviços HTTP
+
+Mede as chamadas ao PostgreSQL (psycopg2), ao Redis (redis-py) e a outros
+serviços (requests e httpx) e soma os tempos por tipo dentro de cada
+requisição. Ao responder, o serviço:
+
+- envia o cabeçalho Server-Timing, visível na aba de rede do navegador:
+      Server-Timing: db;dur=4.21;desc="3 chamadas", redis;dur=0.35;desc="2 chamadas", total;dur=6.02
+- opcionalmente, escreve uma linha JSON em stdout com os mesmos tempos
+  (INSTRUMENTACAO_LOG; desligada por padrão, pois o log de acesso do
+  gunicorn já registra cada requisição)
+- alimenta os histogramas servidos em /metrics (formato de texto do
+  Prometheus): duração das requisições por rota e das chamadas por tipo
+
+As bibliotecas são instrumentadas ao instalar (psycopg2.connect, métodos
+de redis.Redis, requests.Session.send e httpx.AsyncClient.send), sem
+alterar o código das rotas. Chamadas feitas em threads próprias (ex.:
+composição do gateway) só entram na requisição se a thread executar em
+uma cópia do contexto (contextvars.copy_context().run). Chamadas
+paralelas são somadas, então o tempo de um tipo pode passar do total.
+
+Os histogramas são por processo: com vários workers do gunicorn, cada
+leitura de /metrics mostra o worker que a atendeu.
+
+Uso pelo serviço:
+    app = Flask(__name__)     # ou Quart
+    instalar_instrumentacao(app)
+
+Variáveis de ambiente:
+    INSTRUMENTACAO_HABILITADA   false desativa tudo, inclusive /metrics (padrão true)
+    INSTRUMENTACAO_LOG          linha JSON por requisição em stdout (padrão false)
+    INSTRUMENTACAO_ROTA         rota das métricas (padrão /metrics)
+"""
+import contextvars
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from urllib.parse import urlsplit
+
+from plataforma.serializacao import serializar
+
+INSTRUMENTACAO_HABILITADA = os.getenv('INSTRUMENTACAO_HABILITADA', 'true').lower() == 'true'
+INSTRUMENTACAO_LOG = os.getenv('INSTRUMENTACAO_LOG', 'false').lower() == 'true'
+INSTRUMENTACAO_ROTA = os.getenv('INSTRUMENTACAO_ROTA', '/metrics')
+
+# Limites superiores (ms) dos buckets dos histogramas
+LIMITES_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Ordem dos tipos no Server-Timing e no log
+TIPOS = ('db', 'redis', 'http')
+
+# Chamadas da requisição em andamento: lista de (tipo, alvo, ms), ou None fora de requisições
+_CHAMADAS = contextvars.ContextVar('instrumentacao_chamadas', default=None)
+
+class Histograma:
+    """Histograma cumulativo de latências (ms) com buckets fixos"""
+
+    def __init__(self):
+        self.contagens = [0] * (len(LIMITES_MS) + 1)
+        self.soma = 0.0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, ms):
+        with self._lock:
+            self.contagens[bisect_left(LIMITES_MS, ms)] += 1
+            self.soma += ms
+            self.total += 1
+
+    def retrato(self):
+        """(contagens acumuladas por bucket, soma, total)"""
+        with self._lock:
+            contagens, soma, total = list(self.contagens), self.soma, self.total
+        acumuladas = []
+        acumulado = 0
+        for contagem in contagens:
+            acumulado += contagem
+            acumuladas.append(acumulado)
+        return acumuladas, soma, total
+
+# (métrica, rótulos) -> Histograma
+HISTOGRAMAS = {}
+_HISTOGRAMAS_LOCK = threading.Lock()
+
+DESCRICOES = {
+    'requisicao_duracao_ms': 'Duração das requisições atendidas pelo serviço',
+    'dependencia_duracao_ms': 'Duração das chamadas ao banco, ao Redis e a outros serviços',
+}
+
+def _histograma(metrica, rotulos):
+    chave = (metrica, rotulos)
+    histograma = HISTOGRAMAS.get(chave)
+    if histograma is None:
+        with _HISTOGRAMAS_LOCK:
+            histograma = HISTOGRAMAS.setdefault(chave, Histograma())
+    return histograma
+
+def registrar(tipo, alvo, duracao):
+    """Registra uma chamada de duracao segundos no histograma e na requisição atual"""
+    ms = duracao * 1000
+    _histograma('dependencia_duracao_ms', (('tipo', tipo), ('alvo', alvo))).observar(ms)
+    chamadas = _CHAMADAS.get()
+    if chamadas is not None:
+        chamadas.append((tipo, alvo, ms))
+
+@contextmanager
+def medir(tipo, alvo=''):
+    """Mede o bloco como uma chamada do tipo (db, redis, http...)"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(tipo, alvo, time.perf_counter() - inicio)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def texto_metricas():
+    """Histogramas no formato de texto do Prometheus"""
+    linhas = []
+    for metrica, descricao in DESCRICOES.items():
+        linhas.append(f"# HELP {metrica} {descricao}")
+        linhas.append(f"# TYPE {metrica} histogram")
+        series = sorted((rotulos, histograma) for (nome, rotulos), histograma in list(HISTOGRAMAS.items())
+                        if nome == metrica)
+        for rotulos, histograma in series:
+            acumuladas, soma, total = histograma.retrato()
+            base = ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos)
+            for limite, acumulado in zip((*LIMITES_MS, '+Inf'), acumuladas):
+                linhas.append(f'{metrica}_bucket{{{base},le="{limite}"}} {acumulado}')
+            linhas.append(f'{metrica}_sum{{{base}}} {soma:.3f}')
+            linhas.append(f'{metrica}_count{{{base}}} {total}')
+    return '\n'.join(linhas) + '\n'
+
+# ============================================================================
+# INSTRUMENTAÇÃO DAS BIBLIOTECAS
+# ============================================================================
+
+_BIBLIOTECAS_LOCK = threading.Lock()
+_bibliotecas_instrumentadas = False
+
+def _operacao_sql(sql):
+    """Primeira palavra da consulta (SELECT, INSERT...), usada como alvo"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    partes = str(sql).split(None, 1)
+    return partes[0].upper() if partes else ''
+
+class CursorInstrumentado:
+    """Cursor do psycopg2 com execute/executemany medidos"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, *args, **kwargs):
+        with medir('db', _operacao_sql(sql)):
+            return self._cursor.execute(sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        with medir('db', _operacao_sql(sql)):
+            return self._cursor.executemany(sql, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *excecao):
+        return self._cursor.__exit__(*excecao)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+def _instrumentar_psycopg2():
+    try:
+        import psycopg2
+        import psycopg2.extensions
+    except ImportError:
+        return
+
+    class ConexaoInstrumentada(psycopg2.extensions.connection):
+        def cursor(self, *args, **kwargs):
+            return CursorInstrumentado(super().cursor(*args, **kwargs))
+
+        def commit(self):
+            with medir('db', 'COMMIT'):
+                return super().commit()
+
+    conectar = psycopg2.connect
+
+    @wraps(conectar)
+    def conectar_instrumentado(*args, **kwargs):
+        kwargs.setdefault('connection_factory', ConexaoInstrumentada)
+        with medir('db', 'CONNECT'):
+            return conectar(*args, **kwargs)
+
+    psycopg2.connect = conectar_instrumentado
+
+def _instrumentar_redis():
+    try:
+        import redis.client
+    except ImportError:
+        return
+
+    def envolver(classe, metodo, alvo):
+        original = getattr(classe, metodo)
+
+        @wraps(original)
+        def instrumentado(self, *args, **kwargs):
+            with medir('redis', alvo(args)):
+                return original(self, *args, **kwargs)
+        setattr(classe, metodo, instrumentado)
+
+    comando = lambda args: str(args[0]).upper() if args else ''
+    envolver(redis.client.Redis, 'execute_command', comando)
+    # Pipeline: comandos só enfileiram; mede o envio (ou os comandos após WATCH)
+    envolver(redis.client.Pipeline, 'execute', lambda args: 'PIPELINE')
+    envolver(redis.client.Pipeline, 'immediate_execute_command', comando)
+
+def _alvo_http(url):
+    return urlsplit(str(url)).netloc
+
+def _instrumentar_requests():
+    try:
+        import requests
+    except ImportError:
+        return
+
+    enviar = requests.Session.send
+
+    @wraps(enviar)
+    def enviar_instrumentado(self, requisicao, **kwargs):
+        with medir('http', _alvo_http(requisicao.url)):
+            return enviar(self, requisicao, **kwargs)
+
+    requests.Session.send = enviar_instrumentado
+
+def _instrumentar_httpx():
+    try:
+        import httpx
+    except ImportError:
+        return
+
+    enviar = httpx.AsyncClient.send
+
+    @wraps(enviar)
+    async def enviar_instrumentado(self, requisicao, **kwargs):
+        with medir('http', _alvo_http(requisicao.url)):
+            return await enviar(self, requisicao, **kwargs)
+
+    httpx.AsyncClient.send = enviar_instrumentado
+
+def instrumentar_bibliotecas():
+    """Instrumenta as bibliotecas instaladas (uma única vez por processo)"""
+    global _bibliotecas_instrumentadas
+    with _BIBLIOTECAS_LOCK:
+        if _bibliotecas_instrumentadas:
+            return
+        _instrumentar_psycopg2()
+        _instrumentar_redis()
+        _instrumentar_requests()
+        _instrumentar_httpx()
+        _bibliotecas_instrumentadas = True
+
+# ============================================================================
+# INSTRUMENTAÇÃO DAS REQUISIÇÕES
+# ============================================================================
+
+def resumo_chamadas(chamadas):
+    """{tipo: (quantidade, ms)} na ordem de TIPOS, depois os demais tipos"""
+    resumo = {}
+    for tipo, _, ms in chamadas:
+        quantidade, total = resumo.get(tipo, (0, 0.0))
+        resumo[tipo] = (quantidade + 1, total + ms)
+    ordem = {tipo: indice for indice, tipo in enumerate(TIPOS)}
+    return dict(sorted(resumo.items(), key=lambda item: ordem.get(item[0], len(TIPOS))))
+
+def server_timing(resumo, total_ms):
+    """Valor do cabeçalho Server-Timing"""
+    partes = [
+        f'{tipo};dur={ms:.2f};desc="{quantidade} chamada{"s" if quantidade != 1 else ""}"'
+        for tipo, (quantidade, ms) in resumo.items()
+    ]
+    partes.append(f'total;dur={total_ms:.2f}')
+    return ', '.join(partes)
+
+def _iniciar(g):
+    g._instrumentacao = (_CHAMADAS.set([]), time.perf_counter())
+
+def _finalizar(g, request, resposta):
+    estado = getattr(g, '_instrumentacao', None)
+    if estado is None:
+        return resposta
+    token, inicio = estado
+    total_ms = (time.perf_counter() - inicio) * 1000
+    chamadas = _CHAMADAS.get() or []
+    resumo = resumo_chamadas(chamadas)
+
+    rota = request.url_rule.rule if request.url_rule is not None else 'desconhecida'
+    _histograma('requisicao_duracao_ms', (('metodo', request.method), ('rota', rota))).observar(total_ms)
+    resposta.headers['Server-Timing'] = server_timing(resumo, total_ms)
+
+    if INSTRUMENTACAO_LOG:
+        linha = {
+            "evento": "requisicao",
+            "metodo": request.method,
+            "rota": rota,
+            "caminho": request.path,
+            "status": resposta.status_code,
+            "duracao_ms": round(total_ms, 3),
+            "chamadas": {
+                tipo: {"quantidade": quantidade, "ms": round(ms, 3)}
+                for tipo, (quantidade, ms) in resumo.items()
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+        print(serializar(linha, ordenar=False).decode('utf-8'), flush=True)
+    return resposta
+
+def _encerrar(g):
+    estado = getattr(g, '_instrumentacao', None)
+    if estado is not None:
+        try:
+            _CHAMADAS.reset(estado[0])
+        except ValueError:
+            # Token criado em outro contexto: a requisição já tem o seu próprio
+            pass
+        g._instrumentacao = None
+
+def instalar_instrumentacao(app):
+    """
+    Registra a instrumentação na aplicação (Flask ou Quart)
+
+    Deve ser chamada antes de instalar_compressao e instalar_json para que
+    o tempo total inclua os hooks deles (ex.: compressão da resposta).
+    """
+    if not INSTRUMENTACAO_HABILITADA:
+        return app
+    instrumentar_bibliotecas()
+
+    def metricas():
+        return app.response_class(texto_metricas(), mimetype='text/plain; version=0.0.4')
+    app.add_url_rule(INSTRUMENTACAO_ROTA, 'metricas', metricas, methods=['GET'])
+
+    if inspect.iscoroutinefunction(type(app).__call__):
+        from quart import g, request
+
+        @app.before_request
+        async def iniciar_instrumentacao():
+            _iniciar(g)
+
+        @app.after_request
+        async def finalizar_instrumentacao(resposta):
+            return _finalizar(g, request, resposta)
+
+        @app.teardown_request
+        async def encerrar_instrumentacao(excecao=None):
+            _encerrar(g)
+    else:
+        from flask import g, request
+
+        @app.before_request
+        def iniciar_instrumentacao():
+            _iniciar(g)
+
+        @app.after_request
+        def finalizar_instrumentacao(resposta):
+            return _finalizar(g, request, resposta)
+
+        @app.teardown_request
+        def encerrar_instrumentacao(excecao=None):
+            _encerrar(g)
+    return app
@@ -0,0 +1,193 @@
+"""
+Paginação por cursor para as listagens dos serviços
+
+O cursor é opaco para o cliente: codifica (sort, valor do campo, id) do
+último item da página em base64 url-safe. A página seguinte contém os
+itens estritamente depois desse ponto na ordem (campo, id), de modo que
+criações e remoções entre uma página e outra não duplicam nem pulam itens.
+
+Uso pelo serviço:
+    CAMPOS_ORDENACAO = {'id': int, 'nome': str, 'total': float}
+    limit, cursor, sort = ler_paginacao(request.args, CAMPOS_ORDENACAO)
+    itens = repositorio.listar(...)              # em ordem de id
+    pagina, proximo = paginar(itens, limit, cursor, sort)
+    return jsonify({...}), 200, link_proximo(request.args, proximo, limit)
+
+Sem limit nem cursor, a listagem continua completa (apenas ordenada por
+sort), para os clientes que já dependiam disso. Para paginação por número
+de página (usada pelo gateway), offset pula os primeiros itens da ordem:
+
+    offset = ler_offset(request.args, cursor)
+    pagina, proximo = paginar(itens, limit, cursor, sort, offset)
+"""
+import base64
+import heapq
+import json
+import os
+from bisect import bisect_left, bisect_right
+from urllib.parse import urlencode
+
+PAGINACAO_LIMITE_PADRAO = int(os.getenv('PAGINACAO_LIMITE_PADRAO', 50))
+PAGINACAO_LIMITE_MAX = int(os.getenv('PAGINACAO_LIMITE_MAX', 500))
+
+class PaginacaoInvalida(ValueError):
+    """Parâmetro de paginação inválido; o serviço responde 400"""
+
+def codificar_cursor(sort, valor, item_id):
+    dados = json.dumps([sort, valor, item_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(dados).decode().rstrip('=')
+
+def _do_tipo(valor, tipo):
+    """isinstance sem aceitar bool como número; float aceita também int"""
+    if isinstance(valor, bool):
+        return tipo is bool
+    if tipo is float:
+        return isinstance(valor, (int, float))
+    return isinstance(valor, tipo)
+
+def decodificar_cursor(cursor):
+    """Retorna (sort, valor, id) ou lança PaginacaoInvalida"""
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise PaginacaoInvalida("cursor inválido")
+    # O cursor vem do cliente: qualquer outro formato quebraria a comparação
+    # com os itens em paginar
+    if not isinstance(dados, list) or len(dados) != 3:
+        raise PaginacaoInvalida("cursor inválido")
+    sort, valor, item_id = dados
+    if not isinstance(sort, str) or not _do_tipo(item_id, int):
+        raise PaginacaoInvalida("cursor inválido")
+    return sort, valor, item_id
+
+def ler_paginacao(args, campos):
+    """
+    Lê limit, cursor e sort dos parâmetros da requisição
+
+    Args:
+        args: request.args
+        campos: dict campo -> tipo dos campos aceitos em sort (prefixo -
+                para ordem decrescente); o tipo valida o valor do cursor
+
+    Returns:
+        tuple: (limit ou None, cursor decodificado ou None, sort)
+
+    Raises:
+        PaginacaoInvalida: se algum parâmetro for inválido
+    """
+    sort = args.get('sort') or 'id'
+    if sort.lstrip('-') not in campos:
+        raise PaginacaoInvalida(f"sort deve ser um de: {', '.join(campos)} (prefixo - para decrescente)")
+
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+    if limit is None and cursor is None:
+        return None, None, sort
+
+    try:
+        limit = int(limit) if limit is not None else PAGINACAO_LIMITE_PADRAO
+    except ValueError:
+        raise PaginacaoInvalida("limit deve ser um número")
+    if limit < 1:
+        raise PaginacaoInvalida("limit deve ser maior que zero")
+    limit = min(limit, PAGINACAO_LIMITE_MAX)
+
+    if cursor is not None:
+        cursor = decodificar_cursor(cursor)
+        if cursor[0] != sort:
+            raise PaginacaoInvalida("cursor gerado com outro sort")
+        if not _do_tipo(cursor[1], campos[sort.lstrip('-')]):
+            raise PaginacaoInvalida("cursor inválido")
+    return limit, cursor, sort
+
+def ler_offset(args, cursor):
+    """
+    Lê offset (itens a pular antes da página) dos parâmetros da requisição
+
+    Returns:
+        int: offset, 0 se não informado
+
+    Raises:
+        PaginacaoInvalida: se não for um inteiro >= 0 ou vier junto com cursor
+    """
+    offset = args.get('offset')
+    if offset is None:
+        return 0
+    if cursor is not None:
+        raise PaginacaoInvalida("offset não pode ser usado junto com cursor")
+    try:
+        offset = int(offset)
+    except ValueError:
+        raise PaginacaoInvalida("offset deve ser um número")
+    if offset < 0:
+        raise PaginacaoInvalida("offset não pode ser negativo")
+    return offset
+
+def _id(item):
+    return item['id']
+
+def paginar(itens, limit=None, cursor=None, sort='id', offset=0):
+    """
+    Seleciona uma página de itens
+
+    Ordenando por id (o padrão), os itens já vêm em ordem e a página é uma
+    busca binária seguida de fatia; nos demais campos, seleciona apenas os
+    limit + 1 primeiros com um heap, sem ordenar a lista inteira.
+
+    Args:
+        itens: lista de dicts com 'id', em ordem crescente de id
+        limit: tamanho da página (None para todos)
+        cursor: (sort, valor, id) do último item da página anterior
+        sort: campo de ordenação, com prefixo - para decrescente
+        offset: itens a pular no início da ordem (sem cursor)
+
+    Returns:
+        tuple: (itens da página, próximo cursor ou None)
+    """
+    campo = sort.lstrip('-')
+    decrescente = sort.startswith('-')
+
+    def chave(item):
+        return (item[campo], item['id'])
+
+    if campo == 'id':
+        if decrescente:
+            fim = bisect_left(itens, cursor[2], key=_id) if cursor is not None else max(len(itens) - offset, 0)
+            inicio = 0 if limit is None else max(fim - limit - 1, 0)
+            pagina = itens[inicio:fim][::-1]
+        else:
+            inicio = bisect_right(itens, cursor[2], key=_id) if cursor is not None else offset
+            pagina = itens[inicio:] if limit is None else itens[inicio:inicio + limit + 1]
+    else:
+        if cursor is not None:
+            posicao = (cursor[1], cursor[2])
+            if decrescente:
+                itens = [item for item in itens if chave(item) < posicao]
+            else:
+                itens = [item for item in itens if chave(item) > posicao]
+        if limit is None:
+            pagina = sorted(itens, key=chave, reverse=decrescente)[offset:]
+        else:
+            selecionar = heapq.nlargest if decrescente else heapq.nsmallest
+            pagina = selecionar(offset + limit + 1, itens, key=chave)[offset:]
+
+    if limit is None or len(pagina) <= limit:
+        return list(pagina), None
+    pagina = pagina[:limit]
+    ultimo = pagina[-1]
+    return pagina, codificar_cursor(sort, ultimo[campo], ultimo['id'])
+
+def link_proximo(args, proximo_cursor, limit):
+    """
+    Cabeçalho Link para a próxima página
+
+    A referência é relativa (só a query string), então continua válida
+    quando a resposta é repassada pelo gateway em outra rota.
+    """
+    if proximo_cursor is None:
+        return {}
+    # A próxima página continua pelo cursor, que substitui o offset
+    params = {nome: valor for nome, valor in args.items() if nome not in ('limit', 'cursor', 'offset')}
+    params['limit'] = limit
+    params['cursor'] = proximo_cursor
+    return {'Link': f'<?{urlencode(params)}>; rel="next"'}
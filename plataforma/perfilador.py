@@ -0,0 +1,152 @@
+"""
+Perfilador por amostragem exposto como rota de depuração
+
+GET /debug/profile?seconds=N amostra, a cada PERFILADOR_INTERVALO_MS,
+a pilha de todas as threads do processo (sys._current_frames) durante N
+segundos e devolve as pilhas no formato "collapsed" (uma pilha por
+linha, quadros separados por ";" e a contagem de amostras no fim), o
+mesmo do py-spy e do flamegraph.pl, aceito também pelo speedscope:
+
+    MainThread;run (app.py:10);handle (servidor.py:42);listar_usuarios (app.py:36) 57
+
+O custo é o de ler as pilhas a cada intervalo, sem instrumentar chamadas:
+fora das requisições de perfil, nada muda no serviço. A rota só existe
+com PERFILADOR_HABILITADO=true e PERFILADOR_TOKEN definido, e exige
+Authorization: Bearer <token>. Uma amostragem por vez em cada processo;
+com vários workers do gunicorn, é perfilado o que atender a requisição.
+
+Uso pelo serviço:
+    app = Flask(__name__)     # ou Quart
+    instalar_perfilador(app)
+
+    curl -H "Authorization: Bearer $PERFILADOR_TOKEN" \\
+        "http://localhost:5000/debug/profile?seconds=10" > perfil.txt
+    flamegraph.pl perfil.txt > perfil.svg
+
+Parâmetros da rota:
+    seconds     duração da amostragem (padrão 5, máximo PERFILADOR_MAX_SEGUNDOS)
+    linhas      true agrupa por linha em execução em vez de por função
+
+Variáveis de ambiente:
+    PERFILADOR_HABILITADO       registra a rota (padrão false)
+    PERFILADOR_TOKEN            token exigido no cabeçalho Authorization
+    PERFILADOR_INTERVALO_MS     intervalo entre amostras (padrão 10)
+    PERFILADOR_MAX_SEGUNDOS     duração máxima de uma amostragem (padrão 60)
+"""
+import hmac
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PERFILADOR_HABILITADO = os.getenv('PERFILADOR_HABILITADO', 'false').lower() == 'true'
+PERFILADOR_TOKEN = os.getenv('PERFILADOR_TOKEN', '')
+PERFILADOR_INTERVALO_MS = float(os.getenv('PERFILADOR_INTERVALO_MS', 10))
+PERFILADOR_MAX_SEGUNDOS = float(os.getenv('PERFILADOR_MAX_SEGUNDOS', 60))
+
+ROTA = '/debug/profile'
+
+# Uma amostragem por vez: duas simultâneas dobrariam o custo e se mediriam
+_EM_ANDAMENTO = threading.Lock()
+
+def _quadro(frame, por_linha):
+    codigo = frame.f_code
+    linha = frame.f_lineno if por_linha else codigo.co_firstlineno
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{linha})"
+
+def amostrar(segundos, intervalo, por_linha=False):
+    """
+    Amostra as pilhas de todas as threads (exceto a que amostra)
+
+    Returns:
+        (Counter de pilha colapsada -> amostras, quantidade de amostragens)
+    """
+    propria = threading.get_ident()
+    pilhas = Counter()
+    amostragens = 0
+    fim = time.monotonic() + segundos
+    while time.monotonic() < fim:
+        nomes = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == propria:
+                continue
+            quadros = []
+            while frame is not None:
+                quadros.append(_quadro(frame, por_linha))
+                frame = frame.f_back
+            quadros.append(nomes.get(ident, f"thread-{ident}"))
+            pilhas[';'.join(reversed(quadros))] += 1
+        amostragens += 1
+        time.sleep(intervalo)
+    return pilhas, amostragens
+
+def colapsar(pilhas):
+    """Texto no formato collapsed, das pilhas mais frequentes para as menos"""
+    return ''.join(f"{pilha} {contagem}\n" for pilha, contagem in pilhas.most_common())
+
+def autorizado(cabecalho):
+    """Confere o Authorization: Bearer <token> em tempo constante"""
+    esquema, _, token = (cabecalho or '').partition(' ')
+    if esquema.lower() != 'bearer' or not token:
+        return False
+    return hmac.compare_digest(token.strip().encode('utf-8'), PERFILADOR_TOKEN.encode('utf-8'))
+
+def _validar(request):
+    """(erro, status) se a requisição não pode perfilar, ou (segundos, por_linha)"""
+    if not autorizado(request.headers.get('Authorization')):
+        return {"erro": "Token do perfilador ausente ou inválido"}, 401
+    try:
+        segundos = float(request.args.get('seconds', 5))
+    except ValueError:
+        return {"erro": "seconds deve ser um número"}, 400
+    if not 0 < segundos <= PERFILADOR_MAX_SEGUNDOS:
+        return {"erro": f"seconds deve estar entre 0 e {PERFILADOR_MAX_SEGUNDOS:g}"}, 400
+    por_linha = request.args.get('linhas', 'false').lower() == 'true'
+    return segundos, por_linha
+
+def _perfilar(segundos, por_linha):
+    """(corpo, status, cabeçalhos) da rota; 409 se já houver uma amostragem"""
+    if not _EM_ANDAMENTO.acquire(blocking=False):
+        return {"erro": "Já existe uma amostragem em andamento neste processo"}, 409, {}
+    try:
+        pilhas, amostragens = amostrar(segundos, PERFILADOR_INTERVALO_MS / 1000, por_linha)
+    finally:
+        _EM_ANDAMENTO.release()
+    cabecalhos = {
+        'Content-Type': 'text/plain; charset=utf-8',
+        'X-Perfilador-Amostragens': str(amostragens),
+        'X-Perfilador-Pid': str(os.getpid())
+    }
+    return colapsar(pilhas), 200, cabecalhos
+
+def instalar_perfilador(app):
+    """Registra GET /debug/profile na aplicação (Flask ou Quart), se habilitado"""
+    if not PERFILADOR_HABILITADO:
+        return app
+    if not PERFILADOR_TOKEN:
+        print("PERFILADOR_HABILITADO sem PERFILADOR_TOKEN; perfilador não registrado", flush=True)
+        return app
+
+    if inspect.iscoroutinefunction(type(app).__call__):
+        import asyncio
+        from quart import request
+
+        async def perfilar():
+            validacao = _validar(request)
+            if isinstance(validacao[0], dict):
+                return validacao
+            # Em outra thread: o laço de eventos segue atendendo e aparece nas amostras
+            return await asyncio.to_thread(_perfilar, *validacao)
+    else:
+        from flask import request
+
+        def perfilar():
+            validacao = _validar(request)
+            if isinstance(validacao[0], dict):
+                return validacao
+            return _perfilar(*validacao)
+
+    app.add_url_rule(ROTA, 'perfilador', perfilar, methods=['GET'])
+    return app
@@ -0,0 +1,430 @@
+"""
+Persistência opcional para serviços com dados em memória
+
+Write-ahead log (WAL) append-only com group commit, mais snapshots
+periódicos que compactam o log.
+
+Arquivos no diretório do serviço:
+    snapshot.json       estado completo e o LSN do último registro incluído
+    wal-<lsn>.log       registros JSON, um por linha, a partir de <lsn>
+
+Uso pelo serviço:
+    diario = criar_diario('pedidos')   # None se PERSISTENCIA_DIR não estiver definido
+    if diario:
+        existia = diario.abrir(carregar, aplicar, exportar, lock)
+        ...
+        with lock:
+            ...altera o estado em memória...
+            lsn = diario.anexar({"op": "criar", ...})
+        diario.aguardar(lsn)             # retorna após o fsync
+
+O registro é anexado sob o mesmo lock que protege o estado, de modo que a
+ordem do log é a ordem das alterações. A espera pelo fsync acontece fora
+do lock: as escritas que chegam enquanto um fsync está em andamento são
+gravadas juntas no fsync seguinte (group commit). PERSISTENCIA_GRUPO_MS
+acrescenta uma espera antes de cada gravação, útil apenas em discos com
+fsync muito caro.
+
+Na inicialização, o snapshot mais recente é carregado e apenas os
+registros posteriores a ele são reaplicados. Uma linha incompleta no fim
+de um segmento (queda durante a escrita) é removida do arquivo antes que
+novos registros possam ser anexados a ele.
+
+Se uma gravação falhar, os registros ainda não duráveis são descartados
+e o estado em memória é recarregado do disco, sob o lock do estado: a
+memória volta a ser exatamente o que está no log, e quem aguardava esses
+registros recebe IOError. As gravações seguintes tentam de novo, em um
+segmento novo.
+
+O diretório pertence a um único processo: abrir() adquire um flock
+exclusivo em diario.lock e falha com DiarioEmUso se outro processo (ou
+outro Diario no mesmo processo) já o tem, em vez de dois escritores
+intercalarem registros e snapshots no mesmo log. O flock é liberado por
+fechar() ou pelo fim do processo. Sem fcntl (Windows), não há trava.
+"""
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+PERSISTENCIA_DIR = os.getenv('PERSISTENCIA_DIR')
+PERSISTENCIA_GRUPO_MS = float(os.getenv('PERSISTENCIA_GRUPO_MS', 0))
+PERSISTENCIA_SNAPSHOT_REGISTROS = int(os.getenv('PERSISTENCIA_SNAPSHOT_REGISTROS', 10000))
+
+ARQUIVO_SNAPSHOT = 'snapshot.json'
+ARQUIVO_TRAVA = 'diario.lock'
+PREFIXO_WAL = 'wal-'
+
+class DiarioEmUso(Exception):
+    """O diretório do diário já está aberto por outro processo"""
+
+    def __init__(self, diretorio):
+        super().__init__(f"Diretório de persistência {diretorio} em uso por outro processo")
+        self.diretorio = diretorio
+
+def criar_diario(nome):
+    """Retorna o Diario do serviço em PERSISTENCIA_DIR/<nome>, ou None se desativado"""
+    if not PERSISTENCIA_DIR:
+        return None
+    return Diario(
+        os.path.join(PERSISTENCIA_DIR, nome),
+        intervalo_grupo=PERSISTENCIA_GRUPO_MS / 1000,
+        registros_snapshot=PERSISTENCIA_SNAPSHOT_REGISTROS
+    )
+
+def _fsync_diretorio(diretorio):
+    """Garante que criação/renomeação de arquivos no diretório seja durável"""
+    try:
+        fd = os.open(diretorio, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class Diario:
+    """Write-ahead log com group commit e snapshots periódicos"""
+
+    def __init__(self, diretorio, intervalo_grupo=0, registros_snapshot=10000):
+        self.diretorio = diretorio
+        self.intervalo_grupo = intervalo_grupo
+        self.registros_snapshot = registros_snapshot
+
+        self._carregar = None
+        self._aplicar = None
+        self._exportar = None
+        self._lock_estado = None
+        self._pendentes = []
+        self._ultimo_lsn = 0
+        self._lsn_duravel = 0
+        self._desde_snapshot = 0
+        # Faixas (primeiro lsn, último lsn, erro) de registros descartados
+        self._falhas = []
+        self._arquivo = None
+        self._tamanho_duravel = 0
+        self._condicao = threading.Condition()
+        self._escritor = None
+        self._pid = None
+        self._trava = None
+        self._fechado = False
+        self.recuperacao = {}
+
+    # ------------------------------------------------------------------
+    # Recuperação
+    # ------------------------------------------------------------------
+
+    def abrir(self, carregar, aplicar, exportar, lock):
+        """
+        Recupera o estado do disco e prepara o log para novas escritas
+
+        Args:
+            carregar: função(estado) que substitui o estado em memória pelo do snapshot
+            aplicar: função(registro) que reaplica um registro do log
+            exportar: função() que retorna uma cópia do estado completo, que não
+                mude com as escritas seguintes (chamada com o lock adquirido; a
+                serialização acontece depois, fora do lock)
+            lock: lock que protege o estado do serviço
+
+        Returns:
+            bool: True se havia estado salvo; False se o diretório estava vazio
+
+        Raises:
+            DiarioEmUso: se outro processo já abriu o diretório
+        """
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._travar()
+        self._carregar = carregar
+        self._aplicar = aplicar
+        self._exportar = exportar
+        self._lock_estado = lock
+        return self._recuperar()
+
+    def _travar(self):
+        """Adquire o flock exclusivo do diretório, sem esperar"""
+        if fcntl is None:
+            return
+        fd = os.open(os.path.join(self.diretorio, ARQUIVO_TRAVA), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise DiarioEmUso(self.diretorio)
+        self._trava = fd
+
+    def fechar(self):
+        """
+        Aguarda os registros pendentes, fecha o log e libera o diretório
+
+        Depois de fechado, anexar lança IOError. Lança IOError se a gravação
+        dos registros pendentes falhar (o diretório é liberado mesmo assim).
+        """
+        with self._condicao:
+            lsn = self._ultimo_lsn
+        try:
+            if lsn > self._lsn_duravel:
+                self.aguardar(lsn)
+        finally:
+            with self._condicao:
+                self._fechado = True
+                if self._arquivo is not None:
+                    self._arquivo.close()
+                    self._arquivo = None
+                self._condicao.notify_all()
+            if self._trava is not None:
+                # Fechar o descritor libera o flock
+                os.close(self._trava)
+                self._trava = None
+
+    def _recuperar(self):
+        """Carrega o snapshot e reaplica o log; retorna True se havia estado salvo"""
+        inicio = time.perf_counter()
+        lsn_snapshot = 0
+        existia = False
+
+        caminho_snapshot = os.path.join(self.diretorio, ARQUIVO_SNAPSHOT)
+        if os.path.exists(caminho_snapshot):
+            with open(caminho_snapshot, encoding='utf-8') as arquivo:
+                snapshot = json.load(arquivo)
+            self._carregar(snapshot['estado'])
+            lsn_snapshot = snapshot['lsn']
+            existia = True
+        tempo_snapshot = time.perf_counter() - inicio
+
+        ultimo_lsn = lsn_snapshot
+        reaplicados = 0
+        for caminho in self._segmentos():
+            completo = 0
+            with open(caminho, 'rb') as arquivo:
+                for linha in arquivo:
+                    try:
+                        if not linha.endswith(b'\n'):
+                            raise ValueError("linha sem fim")
+                        registro = json.loads(linha)
+                    except ValueError:
+                        # Última linha incompleta (queda durante a escrita)
+                        break
+                    completo += len(linha)
+                    existia = True
+                    if registro['lsn'] <= lsn_snapshot:
+                        continue
+                    self._aplicar(registro)
+                    ultimo_lsn = registro['lsn']
+                    reaplicados += 1
+            if completo < os.path.getsize(caminho):
+                # Sem isso, um registro anexado ao segmento ficaria na mesma
+                # linha que o pedaço incompleto e seria perdido na recuperação
+                self._truncar(caminho, completo)
+
+        self._ultimo_lsn = self._lsn_duravel = ultimo_lsn
+        self._desde_snapshot = reaplicados
+        self.recuperacao = {
+            "lsn": ultimo_lsn,
+            "snapshot_lsn": lsn_snapshot,
+            "registros_reaplicados": reaplicados,
+            "tempo_snapshot_ms": round(tempo_snapshot * 1000, 2),
+            "tempo_total_ms": round((time.perf_counter() - inicio) * 1000, 2)
+        }
+        return existia
+
+    @staticmethod
+    def _truncar(caminho, tamanho):
+        with open(caminho, 'r+b') as arquivo:
+            arquivo.truncate(tamanho)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+    def _segmentos(self):
+        nomes = sorted(
+            nome for nome in os.listdir(self.diretorio)
+            if nome.startswith(PREFIXO_WAL) and nome.endswith('.log')
+        )
+        return [os.path.join(self.diretorio, nome) for nome in nomes]
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def anexar(self, registro):
+        """
+        Enfileira um registro no log e retorna seu LSN
+
+        Deve ser chamado com o lock do estado adquirido, logo após a alteração.
+        """
+        if self._fechado:
+            raise IOError(f"Diário {self.diretorio} fechado")
+        self._garantir_escritor()
+        with self._condicao:
+            self._ultimo_lsn += 1
+            registro['lsn'] = self._ultimo_lsn
+            self._pendentes.append(json.dumps(registro, ensure_ascii=False, separators=(',', ':')))
+            self._condicao.notify_all()
+            return self._ultimo_lsn
+
+    def aguardar(self, lsn):
+        """Bloqueia até o registro lsn estar gravado em disco (fsync)"""
+        with self._condicao:
+            while True:
+                for primeiro, ultimo, erro in self._falhas:
+                    if primeiro <= lsn <= ultimo:
+                        raise IOError(f"Falha ao gravar o log: {erro}")
+                if self._lsn_duravel >= lsn:
+                    return
+                self._condicao.wait()
+
+    def registrar(self, registro):
+        """Anexa e aguarda a gravação; para chamadas fora de um lock de estado"""
+        self.aguardar(self.anexar(registro))
+
+    def _garantir_escritor(self):
+        # A thread é criada sob demanda (e recriada após um fork), para que
+        # servidores com preload não herdem uma thread morta do processo pai
+        if self._escritor is not None and self._pid == os.getpid():
+            return
+        with self._condicao:
+            if self._escritor is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._arquivo = None
+            self._escritor = threading.Thread(target=self._laco_escritor, name='diario-escritor', daemon=True)
+            self._escritor.start()
+
+    def _abrir_segmento(self, lsn_inicial):
+        if self._arquivo is not None:
+            self._arquivo.close()
+        caminho = os.path.join(self.diretorio, f"{PREFIXO_WAL}{lsn_inicial:015d}.log")
+        self._arquivo = open(caminho, 'a', encoding='utf-8')
+        self._tamanho_duravel = os.fstat(self._arquivo.fileno()).st_size
+        _fsync_diretorio(self.diretorio)
+
+    def _laco_escritor(self):
+        while True:
+            with self._condicao:
+                while not self._pendentes:
+                    if self._fechado:
+                        return
+                    self._condicao.wait()
+
+            # Espera opcional para acumular mais escritas no mesmo fsync
+            if self.intervalo_grupo > 0:
+                time.sleep(self.intervalo_grupo)
+
+            with self._condicao:
+                lote = self._pendentes
+                self._pendentes = []
+                ultimo = self._ultimo_lsn
+
+            try:
+                if self._arquivo is None:
+                    self._abrir_segmento(ultimo - len(lote) + 1)
+                self._arquivo.write('\n'.join(lote) + '\n')
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+                self._tamanho_duravel = os.fstat(self._arquivo.fileno()).st_size
+            except OSError as e:
+                self._descartar_pendentes(e)
+                continue
+
+            with self._condicao:
+                self._lsn_duravel = ultimo
+                self._desde_snapshot += len(lote)
+                self._condicao.notify_all()
+
+            if self.registros_snapshot and self._desde_snapshot >= self.registros_snapshot:
+                try:
+                    self._gravar_snapshot()
+                except OSError as e:
+                    print(f"Erro ao gravar snapshot: {e}")
+
+    def _descartar_pendentes(self, erro):
+        """
+        Desfaz uma gravação que falhou
+
+        O estado em memória já contém os registros não duráveis (o lote que
+        falhou e os anexados depois dele); sob o lock do estado, eles são
+        descartados, o segmento volta ao tamanho do último fsync e o estado
+        é recarregado do disco. Os LSNs descartados não são reutilizados,
+        então quem os aguarda recebe o erro mesmo após gravações seguintes.
+        """
+        print(f"Erro ao gravar o log: {erro}; desfazendo os registros não gravados", flush=True)
+        with self._lock_estado:
+            with self._condicao:
+                self._falhas.append((self._lsn_duravel + 1, self._ultimo_lsn, erro))
+                del self._falhas[:-100]
+                self._pendentes = []
+                self._condicao.notify_all()
+
+            arquivo, self._arquivo = self._arquivo, None
+            if arquivo is not None:
+                try:
+                    arquivo.close()
+                except OSError:
+                    pass
+                try:
+                    self._truncar(arquivo.name, self._tamanho_duravel)
+                except OSError as e:
+                    # A linha incompleta é removida na recuperação, e os próximos
+                    # registros vão para outro segmento
+                    print(f"Erro ao truncar {arquivo.name}: {e}", flush=True)
+
+            ultimo_lsn = self._ultimo_lsn
+            self._recuperar()
+            with self._condicao:
+                # Um registro do lote pode ter chegado ao disco sem o truncamento;
+                # os próximos LSNs continuam depois de todos os já entregues
+                self._ultimo_lsn = max(self._ultimo_lsn, ultimo_lsn)
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+
+    def snapshot(self):
+        """Grava um snapshot do estado inicial, antes de qualquer escrita no log"""
+        self._gravar_snapshot()
+
+    def _gravar_snapshot(self):
+        """
+        Grava o estado completo e descarta os segmentos do log já incluídos
+
+        O LSN e a cópia do estado (exportar) são obtidos sob o lock do
+        estado, então o snapshot contém exatamente os registros até esse
+        LSN. A serialização e o fsync acontecem fora do lock, sem bloquear
+        as escritas do serviço enquanto o estado inteiro é gravado.
+        """
+        with self._lock_estado:
+            with self._condicao:
+                lsn = self._ultimo_lsn
+            estado = self._exportar()
+
+        conteudo = json.dumps(
+            {"lsn": lsn, "estado": estado},
+            ensure_ascii=False,
+            separators=(',', ':')
+        )
+
+        caminho = os.path.join(self.diretorio, ARQUIVO_SNAPSHOT)
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+        _fsync_diretorio(self.diretorio)
+
+        # Segmentos antigos só têm registros <= lsn; novos registros vão para
+        # um segmento novo, aberto na próxima escrita
+        with self._condicao:
+            antigos = self._segmentos()
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+            self._desde_snapshot = 0
+        for segmento in antigos:
+            os.remove(segmento)
@@ -0,0 +1,403 @@
+"""
+Rastreamento distribuído com propagação W3C Trace Context
+
+Cada requisição atendida vira um span de servidor. Ele continua o trace
+recebido no cabeçalho traceparent ou inicia um novo. Cada chamada a
+outro serviço (requests ou httpx) vira um span de cliente, filho do span
+atual, e leva o traceparent adiante. Assim, um GET /usuarios-com-pedidos
+no gateway forma um único trace, com as chamadas aos serviços de usuários
+e de pedidos e os spans de servidor de cada um deles.
+
+Os spans terminados são exportados como linhas JSON, em stdout ou em um
+arquivo. A resposta leva X-Trace-Id, para achar o trace de uma requisição
+lenta. Para reconstruir o caminho crítico dos traces mais lentos:
+
+    python -m plataforma.rastreamento spans.jsonl --top 5
+    python -m plataforma.rastreamento spans.jsonl --trace <trace_id>
+
+Uso pelo serviço:
+    app = Flask(__name__)     # ou Quart
+    instalar_rastreamento(app, 'gateway')
+
+Chamadas feitas em threads próprias só entram no trace se a thread
+executar em uma cópia do contexto (contextvars.copy_context().run).
+
+Variáveis de ambiente:
+    RASTREAMENTO_HABILITADO     false desativa spans e propagação (padrão true)
+    RASTREAMENTO_SAIDA          "-" para stdout, ou caminho de arquivo (JSON lines);
+                                vazio não exporta, só propaga (padrão vazio)
+    RASTREAMENTO_AMOSTRAGEM     fração dos traces iniciados aqui que são exportados (padrão 1.0)
+    RASTREAMENTO_SERVICO        nome do serviço nos spans (padrão: o passado ao instalar)
+"""
+import argparse
+import contextvars
+import inspect
+import os
+import random
+import re
+import sys
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlsplit
+
+from plataforma.serializacao import desserializar, serializar
+
+RASTREAMENTO_HABILITADO = os.getenv('RASTREAMENTO_HABILITADO', 'true').lower() == 'true'
+RASTREAMENTO_SAIDA = os.getenv('RASTREAMENTO_SAIDA', '')
+RASTREAMENTO_AMOSTRAGEM = float(os.getenv('RASTREAMENTO_AMOSTRAGEM', 1.0))
+RASTREAMENTO_SERVICO = os.getenv('RASTREAMENTO_SERVICO', '')
+
+_TRACEPARENT = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# Span em andamento na requisição (ou chamada) atual
+_SPAN_ATUAL = contextvars.ContextVar('rastreamento_span', default=None)
+
+def _novo_id(bits):
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+def ler_traceparent(valor):
+    """(trace_id, span_id pai, amostrado) do cabeçalho traceparent, ou None se inválido"""
+    encontrado = _TRACEPARENT.match((valor or '').strip().lower())
+    if not encontrado:
+        return None
+    versao, trace_id, span_id, flags = encontrado.groups()
+    if versao == 'ff' or trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+class Span:
+    """Um trecho de trabalho de um trace: requisição atendida ou chamada feita"""
+
+    __slots__ = ('trace_id', 'span_id', 'pai_id', 'amostrado', 'servico', 'nome', 'tipo',
+                 'atributos', 'erro', 'inicio_us', '_inicio')
+
+    def __init__(self, nome, tipo, servico='', pai=None, trace_id=None, pai_id=None, amostrado=None):
+        if pai is not None:
+            trace_id, pai_id, amostrado = pai.trace_id, pai.span_id, pai.amostrado
+            servico = pai.servico
+        if trace_id is None:
+            trace_id = _novo_id(128)
+            amostrado = random.random() < RASTREAMENTO_AMOSTRAGEM
+        self.trace_id = trace_id
+        self.span_id = _novo_id(64)
+        self.pai_id = pai_id
+        self.amostrado = amostrado
+        self.servico = servico
+        self.nome = nome
+        self.tipo = tipo
+        self.atributos = {}
+        self.erro = False
+        self.inicio_us = time.time_ns() // 1000
+        self._inicio = time.perf_counter()
+
+    def traceparent(self):
+        """Cabeçalho traceparent para propagar este span como pai"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.amostrado else '00'}"
+
+    def terminar(self):
+        """Encerra o span e o exporta se o trace for amostrado"""
+        if self.amostrado:
+            exportar({
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "pai_id": self.pai_id,
+                "servico": self.servico,
+                "nome": self.nome,
+                "tipo": self.tipo,
+                "inicio_us": self.inicio_us,
+                "duracao_us": int((time.perf_counter() - self._inicio) * 1_000_000),
+                "erro": self.erro,
+                "atributos": self.atributos
+            })
+
+def span_atual():
+    """Span em andamento no contexto atual, ou None"""
+    return _SPAN_ATUAL.get()
+
+# ============================================================================
+# EXPORTAÇÃO
+# ============================================================================
+
+_EXPORTACAO_LOCK = threading.Lock()
+_arquivo = None
+_arquivo_pid = None
+
+def exportar(span):
+    """Escreve o span (dict) como uma linha JSON em RASTREAMENTO_SAIDA"""
+    global _arquivo, _arquivo_pid
+    if not RASTREAMENTO_SAIDA:
+        return
+    linha = serializar(span, ordenar=False) + b'\n'
+    with _EXPORTACAO_LOCK:
+        if RASTREAMENTO_SAIDA == '-':
+            sys.stdout.buffer.write(linha)
+            sys.stdout.flush()
+            return
+        # Reabre após o fork do gunicorn: cada worker com seu descritor, em modo append
+        if _arquivo is None or _arquivo_pid != os.getpid():
+            _arquivo = open(RASTREAMENTO_SAIDA, 'ab', buffering=0)
+            _arquivo_pid = os.getpid()
+        _arquivo.write(linha)
+
+# ============================================================================
+# CHAMADAS A OUTROS SERVIÇOS
+# ============================================================================
+
+_BIBLIOTECAS_LOCK = threading.Lock()
+_bibliotecas_instrumentadas = False
+
+def _span_cliente(metodo, url):
+    """Span de cliente filho do span atual, ou None fora de um trace"""
+    pai = _SPAN_ATUAL.get()
+    if pai is None:
+        return None
+    partes = urlsplit(str(url))
+    span = Span(f"{metodo} {partes.netloc}{partes.path}", 'cliente', pai=pai)
+    span.atributos = {"http.method": metodo, "http.url": str(url)}
+    return span
+
+def _concluir_cliente(span, resposta=None, excecao=None):
+    if resposta is not None:
+        span.atributos["http.status_code"] = resposta.status_code
+        span.erro = resposta.status_code >= 500
+    if excecao is not None:
+        span.atributos["erro"] = type(excecao).__name__
+        span.erro = True
+    span.terminar()
+
+def _rastrear_requests():
+    try:
+        import requests
+    except ImportError:
+        return
+
+    enviar = requests.Session.send
+
+    @wraps(enviar)
+    def enviar_rastreado(self, requisicao, **kwargs):
+        span = _span_cliente(requisicao.method, requisicao.url)
+        if span is None:
+            return enviar(self, requisicao, **kwargs)
+        requisicao.headers['traceparent'] = span.traceparent()
+        try:
+            resposta = enviar(self, requisicao, **kwargs)
+        except Exception as e:
+            _concluir_cliente(span, excecao=e)
+            raise
+        _concluir_cliente(span, resposta)
+        return resposta
+
+    requests.Session.send = enviar_rastreado
+
+def _rastrear_httpx():
+    try:
+        import httpx
+    except ImportError:
+        return
+
+    enviar = httpx.AsyncClient.send
+
+    @wraps(enviar)
+    async def enviar_rastreado(self, requisicao, **kwargs):
+        span = _span_cliente(requisicao.method, requisicao.url)
+        if span is None:
+            return await enviar(self, requisicao, **kwargs)
+        requisicao.headers['traceparent'] = span.traceparent()
+        try:
+            resposta = await enviar(self, requisicao, **kwargs)
+        except Exception as e:
+            _concluir_cliente(span, excecao=e)
+            raise
+        _concluir_cliente(span, resposta)
+        return resposta
+
+    httpx.AsyncClient.send = enviar_rastreado
+
+def rastrear_bibliotecas():
+    """Propaga o trace nas chamadas do requests e do httpx (uma única vez por processo)"""
+    global _bibliotecas_instrumentadas
+    with _BIBLIOTECAS_LOCK:
+        if _bibliotecas_instrumentadas:
+            return
+        _rastrear_requests()
+        _rastrear_httpx()
+        _bibliotecas_instrumentadas = True
+
+# ============================================================================
+# REQUISIÇÕES ATENDIDAS
+# ============================================================================
+
+def _iniciar(g, request, servico):
+    recebido = ler_traceparent(request.headers.get('traceparent'))
+    rota = request.url_rule.rule if request.url_rule is not None else request.path
+    if recebido is not None:
+        trace_id, pai_id, amostrado = recebido
+        span = Span(f"{request.method} {rota}", 'servidor', servico,
+                    trace_id=trace_id, pai_id=pai_id, amostrado=amostrado)
+    else:
+        span = Span(f"{request.method} {rota}", 'servidor', servico)
+    span.atributos = {"http.method": request.method, "http.route": rota, "http.target": request.full_path.rstrip('?')}
+    g._rastreamento = (span, _SPAN_ATUAL.set(span))
+
+def _finalizar(g, resposta):
+    estado = getattr(g, '_rastreamento', None)
+    if estado is not None:
+        span = estado[0]
+        span.atributos["http.status_code"] = resposta.status_code
+        span.erro = resposta.status_code >= 500
+        resposta.headers['X-Trace-Id'] = span.trace_id
+    return resposta
+
+def _encerrar(g, excecao):
+    estado = getattr(g, '_rastreamento', None)
+    if estado is None:
+        return
+    span, token = estado
+    g._rastreamento = None
+    if excecao is not None:
+        span.atributos["erro"] = type(excecao).__name__
+        span.erro = True
+    span.terminar()
+    try:
+        _SPAN_ATUAL.reset(token)
+    except ValueError:
+        # Token criado em outro contexto: a requisição já tem o seu próprio
+        pass
+
+def instalar_rastreamento(app, servico):
+    """Registra o rastreamento na aplicação (Flask ou Quart) com o nome do serviço"""
+    if not RASTREAMENTO_HABILITADO:
+        return app
+    servico = RASTREAMENTO_SERVICO or servico
+    rastrear_bibliotecas()
+
+    if inspect.iscoroutinefunction(type(app).__call__):
+        from quart import g, request
+
+        @app.before_request
+        async def iniciar_rastreamento():
+            _iniciar(g, request, servico)
+
+        @app.after_request
+        async def finalizar_rastreamento(resposta):
+            return _finalizar(g, resposta)
+
+        @app.teardown_request
+        async def encerrar_rastreamento(excecao=None):
+            _encerrar(g, excecao)
+    else:
+        from flask import g, request
+
+        @app.before_request
+        def iniciar_rastreamento():
+            _iniciar(g, request, servico)
+
+        @app.after_request
+        def finalizar_rastreamento(resposta):
+            return _finalizar(g, resposta)
+
+        @app.teardown_request
+        def encerrar_rastreamento(excecao=None):
+            _encerrar(g, excecao)
+    return app
+
+# ============================================================================
+# CAMINHO CRÍTICO (CLI)
+# ============================================================================
+
+def _fim(span):
+    return span['inicio_us'] + span['duracao_us']
+
+def caminho_critico(span, filhos):
+    """
+    Spans do caminho crítico a partir de span, em ordem de início
+
+    Partindo do fim do span, escolhe o filho que termina por último; antes
+    do início dele, o filho anterior que termina por último, e assim por
+    diante. Os filhos escolhidos são expandidos da mesma forma. O primeiro
+    filho é aceito mesmo terminando depois do pai: entre serviços, os
+    relógios podem divergir um pouco.
+    """
+    escolhidos = []
+    limite = _fim(span)
+    for filho in sorted(filhos.get(span['span_id'], []), key=_fim, reverse=True):
+        if not escolhidos or _fim(filho) <= limite:
+            escolhidos.append(filho)
+            limite = filho['inicio_us']
+    caminho = [span]
+    for filho in reversed(escolhidos):
+        caminho.extend(caminho_critico(filho, filhos))
+    return caminho
+
+def _imprimir_arvore(span, filhos, criticos, raiz_inicio, nivel=0):
+    marca = '*' if span['span_id'] in criticos else ' '
+    deslocamento = (span['inicio_us'] - raiz_inicio) / 1000
+    print(f"{marca} {deslocamento:>9.2f} {span['duracao_us'] / 1000:>9.2f}  "
+          f"{'  ' * nivel}{span['servico']}: {span['nome']}"
+          f"{'  [erro]' if span.get('erro') else ''}")
+    for filho in sorted(filhos.get(span['span_id'], []), key=lambda s: s['inicio_us']):
+        _imprimir_arvore(filho, filhos, criticos, raiz_inicio, nivel + 1)
+
+def analisar_trace(spans):
+    """Imprime a árvore do trace, com o caminho crítico marcado, e o tempo próprio de cada trecho dele"""
+    ids = {span['span_id'] for span in spans}
+    filhos = {}
+    raizes = []
+    for span in spans:
+        if span['pai_id'] in ids:
+            filhos.setdefault(span['pai_id'], []).append(span)
+        else:
+            raizes.append(span)
+    raiz = max(raizes, key=lambda s: s['duracao_us'])
+    caminho = caminho_critico(raiz, filhos)
+    criticos = {span['span_id'] for span in caminho}
+
+    print(f"\nTrace {raiz['trace_id']}: {raiz['servico']}: {raiz['nome']} "
+          f"({raiz['duracao_us'] / 1000:.2f} ms, {len(spans)} spans)")
+    print(f"  {'início ms':>9} {'dur. ms':>9}  (* = caminho crítico)")
+    _imprimir_arvore(raiz, filhos, criticos, raiz['inicio_us'])
+    for orfao in raizes:
+        if orfao is not raiz:
+            _imprimir_arvore(orfao, filhos, criticos, raiz['inicio_us'])
+
+    # Tempo próprio: duração menos a parte coberta pelos filhos críticos
+    print(f"\n  {'próprio ms':>10}  trecho do caminho crítico")
+    for span in caminho:
+        cobertos = sum(f['duracao_us'] for f in filhos.get(span['span_id'], []) if f['span_id'] in criticos)
+        proprio = max(span['duracao_us'] - cobertos, 0) / 1000
+        print(f"  {proprio:>10.2f}  {span['servico']}: {span['nome']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Caminho crítico dos traces exportados (JSON lines)")
+    parser.add_argument('arquivos', nargs='+', help="arquivos de spans (um por serviço, ou um compartilhado)")
+    parser.add_argument('--trace', help="analisa apenas este trace_id")
+    parser.add_argument('--top', type=int, default=5, help="quantidade de traces mais lentos (padrão 5)")
+    args = parser.parse_args()
+
+    traces = {}
+    for caminho in args.arquivos:
+        with open(caminho, 'rb') as arquivo:
+            for linha in arquivo:
+                # Aceita a saída de docker compose logs: ignora o que não é span
+                try:
+                    span = desserializar(linha)
+                except ValueError:
+                    continue
+                if isinstance(span, dict) and 'span_id' in span:
+                    traces.setdefault(span['trace_id'], []).append(span)
+
+    if args.trace:
+        if args.trace not in traces:
+            sys.exit(f"Trace {args.trace} não encontrado")
+        selecionados = [traces[args.trace]]
+    else:
+        # Duração do trace: a do seu span mais longo (a raiz, quando presente)
+        selecionados = sorted(traces.values(), key=lambda spans: max(s['duracao_us'] for s in spans), reverse=True)
+        selecionados = selecionados[:args.top]
+
+    for spans in selecionados:
+        analisar_trace(spans)
+
+if __name__ == '__main__':
+    main()
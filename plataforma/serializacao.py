@@ -0,0 +1,113 @@
+"""
+Serialização JSON dos serviços
+
+Provedor JSON do Flask que usa o orjson quando instalado e o json da
+biblioteca padrão caso contrário. Nos dois casos:
+
+- datetime, date e time em ISO 8601, o mesmo formato de isoformat() que os
+  serviços já usam nos campos que formatam à mão (o provedor padrão do
+  Flask usaria o formato de data HTTP, "Sun, 19 Oct 2025 16:34:34 GMT")
+- Decimal como string, como no provedor padrão do Flask
+- chaves não-string (ex.: ids inteiros) convertidas em string
+- chaves ordenadas e sem espaços, como o jsonify já fazia fora do debug
+
+A saída não é idêntica byte a byte entre os dois. Com o orjson:
+
+- NaN e Infinity viram null (a biblioteca padrão escreve NaN/Infinity,
+  que não é JSON válido)
+- chaves não-string são ordenadas depois de convertidas em string
+  ("10" antes de "9"); a biblioteca padrão ordena pelo valor original e
+  falha com chaves de tipos misturados
+- inteiros fora da faixa de 64 bits (em valores ou chaves) não são
+  aceitos pelo orjson; nesse caso o valor inteiro é serializado pela
+  biblioteca padrão
+- a leitura rejeita NaN/Infinity e lê inteiros acima de 64 bits como float
+
+Uso pelo serviço:
+    app = Flask(__name__)
+    instalar_json(app)
+
+serializar/desserializar servem para o mesmo formato fora do jsonify
+(ex.: valores guardados no Redis, respostas de outros serviços).
+"""
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _padrao(valor):
+    """Tipos que nenhum dos dois codificadores trata sozinho"""
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    if hasattr(valor, '__html__'):
+        return str(valor.__html__())
+    # Tratados nativamente pelo orjson; aqui só para a biblioteca padrão
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, uuid.UUID):
+        return str(valor)
+    if dataclasses.is_dataclass(valor) and not isinstance(valor, type):
+        return dataclasses.asdict(valor)
+    raise TypeError(f"Objeto do tipo {type(valor).__name__} não é serializável em JSON")
+
+def _serializar_padrao(valor, ordenar=True):
+    """Serializa com a biblioteca padrão e retorna bytes UTF-8"""
+    return json.dumps(
+        valor,
+        default=_padrao,
+        ensure_ascii=False,
+        sort_keys=ordenar,
+        separators=(',', ':')
+    ).encode('utf-8')
+
+if orjson is not None:
+    def serializar(valor, ordenar=True):
+        """Serializa em JSON e retorna bytes UTF-8"""
+        opcoes = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if ordenar else 0)
+        try:
+            return orjson.dumps(valor, default=_padrao, option=opcoes)
+        except orjson.JSONEncodeError as e:
+            # Inteiros além de 64 bits: a biblioteca padrão aceita qualquer tamanho
+            if '64-bit range' not in str(e):
+                raise
+            return _serializar_padrao(valor, ordenar)
+
+    def desserializar(dados):
+        """Desserializa JSON de str ou bytes; lança ValueError se inválido"""
+        return orjson.loads(dados)
+else:
+    serializar = _serializar_padrao
+
+    def desserializar(dados):
+        """Desserializa JSON de str ou bytes; lança ValueError se inválido"""
+        return json.loads(dados)
+
+class ProvedorJSON(JSONProvider):
+    """Provedor JSON do Flask baseado em serializar/desserializar"""
+
+    sort_keys = True
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return serializar(obj, self.sort_keys).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return desserializar(s)
+
+    def response(self, *args, **kwargs):
+        # Os bytes vão direto para a resposta, sem passar por str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(serializar(obj, self.sort_keys) + b'\n', mimetype=self.mimetype)
+
+def instalar_json(app):
+    """Registra o ProvedorJSON na aplicação (jsonify, request.get_json, retorno de dicts)"""
+    app.json = ProvedorJSON(app)
+    return app
@@ -0,0 +1,145 @@
+"""
+Inicialização dos serviços em modo de produção
+
+Executa a aplicação sob o gunicorn, com vários processos (workers) e
+threads por processo, em vez do servidor de desenvolvimento do Flask
+(app.run), que atende tudo em um único processo.
+
+Uso (no diretório do app.py):
+    python -m plataforma.servidor app:app
+
+Variáveis de ambiente:
+    WEB_APP               módulo:atributo que substitui o da linha de comando,
+                          para trocar a aplicação sem alterar o CMD da imagem
+                          (ex.: app_async:app na variante ASGI do gateway)
+    PORT                  porta (padrão 5000)
+    WEB_WORKERS           processos (padrão: 2 x CPUs + 1)
+    WEB_THREADS           threads por processo (padrão 4)
+    WEB_WORKER_CLASS      gthread (padrão), gevent, ou
+                          uvicorn.workers.UvicornWorker para aplicações ASGI
+    WEB_PRELOAD           importa a aplicação no processo principal antes do
+                          fork, compartilhando a memória (padrão false)
+    WEB_TIMEOUT           segundos sem resposta até reiniciar um worker (padrão 30)
+    WEB_GRACEFUL_TIMEOUT  segundos para concluir as requisições em andamento
+                          ao recarregar ou parar (padrão 30)
+    WEB_KEEPALIVE         segundos de keep-alive entre requisições (padrão 5)
+    WEB_MAX_REQUESTS      recicla o worker após N requisições; 0 desativa (padrão 0)
+    WEB_ACCESS_LOG        destino do log de acesso; '-' para stdout, vazio desativa (padrão -)
+    WEB_ESTADO_EM_MEMORIA serviço com dados mutáveis em memória: força um único
+                          worker, sem preload (padrão: true se PERSISTENCIA_DIR
+                          estiver definido, false caso contrário)
+
+Reload gracioso: `kill -HUP <pid do processo principal>` sobe workers novos
+e encerra os antigos após concluírem as requisições em andamento. Com
+WEB_PRELOAD=true o código é importado uma vez no processo principal, então o
+HUP não recarrega o código. Só vale para serviços sem estado em memória
+(ex.: o gateway).
+
+Serviços que guardam dados mutáveis em memória (desafio4 servico-a, desafio5
+usuarios e pedidos) rodam com WEB_ESTADO_EM_MEMORIA, que força um único
+worker sem preload, qualquer que seja WEB_WORKERS/WEB_PRELOAD: cada processo
+teria a sua cópia dos dados, e um worker nascido da memória do processo
+principal (preload) não teria as escritas feitas desde a importação. Eles
+escalam por threads (WEB_THREADS). O worker substituto de WEB_MAX_REQUESTS
+ou de um timeout só sobe depois que o anterior saiu, e recupera o estado do
+diário ao iniciar.
+
+Nesses serviços o HUP não é suportado: o worker novo sobe enquanto o antigo
+ainda atende, e os dois teriam estados divergentes (com o diário, o novo
+falha ao abrir o diretório, já travado pelo antigo). Para trocar o código,
+reinicie o processo (ex.: docker compose restart), que encerra o antigo
+antes de iniciar o novo.
+
+Sem o gunicorn instalado (execução local), usa app.run com threads, ou o
+uvicorn para aplicações ASGI.
+"""
+import argparse
+import importlib
+import inspect
+import multiprocessing
+import os
+import sys
+
+def _env_bool(nome, padrao):
+    return os.getenv(nome, str(padrao)).lower() in ('1', 'true', 'sim', 'yes')
+
+def estado_em_memoria():
+    """True se o serviço guarda dados mutáveis em memória (WEB_ESTADO_EM_MEMORIA ou PERSISTENCIA_DIR)"""
+    if os.getenv('WEB_ESTADO_EM_MEMORIA'):
+        return _env_bool('WEB_ESTADO_EM_MEMORIA', False)
+    return bool(os.getenv('PERSISTENCIA_DIR'))
+
+def configuracao():
+    """Configuração do gunicorn a partir das variáveis de ambiente"""
+    workers = int(os.getenv('WEB_WORKERS', 0)) or multiprocessing.cpu_count() * 2 + 1
+    preload = _env_bool('WEB_PRELOAD', False)
+    if estado_em_memoria() and (workers != 1 or preload):
+        print(
+            f"Estado em memória: usando 1 worker sem preload (pedido: {workers} worker(s), "
+            f"preload={str(preload).lower()})",
+            flush=True
+        )
+        workers, preload = 1, False
+    max_requests = int(os.getenv('WEB_MAX_REQUESTS', 0))
+    return {
+        'bind': f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}",
+        'workers': workers,
+        'threads': int(os.getenv('WEB_THREADS', 4)),
+        'worker_class': os.getenv('WEB_WORKER_CLASS', 'gthread'),
+        'preload_app': preload,
+        'timeout': int(os.getenv('WEB_TIMEOUT', 30)),
+        'graceful_timeout': int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': int(os.getenv('WEB_KEEPALIVE', 5)),
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests // 10,
+        'accesslog': os.getenv('WEB_ACCESS_LOG', '-') or None,
+    }
+
+def carregar_aplicacao(alvo):
+    """Importa 'modulo:atributo' a partir do diretório atual"""
+    modulo, _, atributo = alvo.partition(':')
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    return getattr(importlib.import_module(modulo), atributo or 'app')
+
+def _executar_sem_gunicorn(alvo, bind):
+    host, _, porta = bind.rpartition(':')
+    aplicacao = carregar_aplicacao(alvo)
+    if inspect.iscoroutinefunction(type(aplicacao).__call__):
+        import uvicorn
+        print("gunicorn não instalado; usando o uvicorn", flush=True)
+        uvicorn.run(aplicacao, host=host, port=int(porta))
+    else:
+        print("gunicorn não instalado; usando o servidor de desenvolvimento do Flask", flush=True)
+        aplicacao.run(host=host, port=int(porta), threaded=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Executa uma aplicação WSGI/ASGI sob o gunicorn")
+    parser.add_argument('alvo', help="módulo:atributo da aplicação, ex.: app:app")
+    args = parser.parse_args(argv)
+    alvo = os.getenv('WEB_APP') or args.alvo
+    config = configuracao()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        _executar_sem_gunicorn(alvo, config['bind'])
+        return
+
+    class Servidor(BaseApplication):
+        def load_config(self):
+            for chave, valor in config.items():
+                self.cfg.set(chave, valor)
+
+        def load(self):
+            return carregar_aplicacao(alvo)
+
+    print(
+        f"Iniciando {alvo} em {config['bind']}: {config['workers']} worker(s) "
+        f"{config['worker_class']} x {config['threads']} thread(s)",
+        flush=True
+    )
+    Servidor().run()
+
+if __name__ == '__main__':
+    main()
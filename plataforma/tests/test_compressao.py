@@ -0,0 +1,125 @@
+"""Compressão das respostas: negociação, elegibilidade e reaproveitamento das variantes"""
+import asyncio
+import gzip
+
+import pytest
+from flask import Flask, Response, jsonify
+
+from plataforma import compressao
+from plataforma.compressao import CorpoComprimido, escolher_codificacao, instalar_compressao
+
+GRANDE = {'itens': [{'id': i, 'nome': f"usuario {i}"} for i in range(200)]}
+
+
+@pytest.fixture
+def so_gzip(monkeypatch):
+    """Negociação sem depender do brotli estar instalado"""
+    monkeypatch.setattr(compressao, 'CODIFICACOES', ('gzip',))
+
+
+@pytest.mark.parametrize('cabecalho, esperado', [
+    (None, None),
+    ('', None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('GZIP, deflate', 'gzip'),
+    ('gzip;q=0', None),
+    ('gzip;q=abc', None),
+    ('*', 'gzip'),
+    ('*;q=0.5, gzip;q=0', None)
+])
+def test_escolhe_codificacao(so_gzip, cabecalho, esperado):
+    assert escolher_codificacao(cabecalho) == esperado
+
+
+def test_prefere_o_maior_peso(monkeypatch):
+    monkeypatch.setattr(compressao, 'CODIFICACOES', ('br', 'gzip'))
+    assert escolher_codificacao('gzip, br') == 'br'
+    assert escolher_codificacao('gzip;q=1, br;q=0.5') == 'gzip'
+
+
+def test_corpo_comprime_uma_vez_por_codificacao(monkeypatch):
+    chamadas = []
+    original = compressao.comprimir
+    monkeypatch.setattr(compressao, 'comprimir', lambda dados, cod: chamadas.append(cod) or original(dados, cod))
+
+    corpo = CorpoComprimido(b'x' * 4096)
+    assert corpo.variante(None) == b'x' * 4096
+    assert gzip.decompress(corpo.variante('gzip')) == b'x' * 4096
+    assert corpo.variante('gzip') is corpo.variante('gzip')
+    assert chamadas == ['gzip']
+
+    assert CorpoComprimido(b'x', {'gzip': b'pronto'}).variante('gzip') == b'pronto'
+
+
+def test_gzip_e_deterministico():
+    assert compressao.comprimir(b'abc' * 1000, 'gzip') == compressao.comprimir(b'abc' * 1000, 'gzip')
+
+
+@pytest.fixture
+def app(so_gzip):
+    app = Flask(__name__)
+    instalar_compressao(app)
+
+    @app.route('/grande')
+    def grande():
+        return jsonify(GRANDE)
+
+    @app.route('/pequena')
+    def pequena():
+        return jsonify({'ok': True})
+
+    @app.route('/erro')
+    def erro():
+        return jsonify(GRANDE), 500
+
+    @app.route('/binario')
+    def binario():
+        return Response(b'\0' * 4096, mimetype='application/octet-stream')
+
+    @app.route('/streaming')
+    def streaming():
+        return Response((b'x' * 4096 for _ in range(2)), mimetype='text/plain')
+
+    return app
+
+
+def test_comprime_json_grande(app):
+    resposta = app.test_client().get('/grande', headers={'Accept-Encoding': 'gzip'})
+    assert resposta.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in resposta.headers['Vary']
+    assert resposta.headers['Content-Length'] == str(len(resposta.data))
+    assert gzip.decompress(resposta.data) == app.test_client().get('/grande').data
+
+
+def test_sem_accept_encoding_marca_vary_e_nao_comprime(app):
+    resposta = app.test_client().get('/grande')
+    assert 'Content-Encoding' not in resposta.headers
+    assert 'Accept-Encoding' in resposta.headers['Vary']
+
+
+@pytest.mark.parametrize('rota', ['/pequena', '/erro', '/binario', '/streaming'])
+def test_respostas_nao_elegiveis_passam_intactas(app, rota):
+    resposta = app.test_client().get(rota, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resposta.headers
+    assert 'Accept-Encoding' not in resposta.headers.get('Vary', '')
+
+
+def test_quart(so_gzip):
+    quart = pytest.importorskip('quart')
+    app = quart.Quart(__name__)
+    instalar_compressao(app)
+
+    @app.route('/grande')
+    async def grande():
+        return GRANDE
+
+    async def cenario():
+        cliente = app.test_client()
+        resposta = await cliente.get('/grande', headers={'Accept-Encoding': 'gzip'})
+        assert resposta.headers['Content-Encoding'] == 'gzip'
+        comprimido = await resposta.get_data()
+        original = await (await cliente.get('/grande')).get_data()
+        assert gzip.decompress(comprimido) == original
+
+    asyncio.run(cenario())
@@ -0,0 +1,204 @@
+"""Instrumentação: histogramas, Server-Timing, /metrics e chamadas medidas por requisição"""
+import asyncio
+import contextvars
+import json
+import threading
+
+import fakeredis
+import pytest
+from flask import Flask
+
+from carga.locais import sessao_local
+from plataforma import instrumentacao
+from plataforma.instrumentacao import (
+    CursorInstrumentado,
+    Histograma,
+    LIMITES_MS,
+    instalar_instrumentacao,
+    medir,
+    resumo_chamadas,
+    server_timing,
+    texto_metricas
+)
+
+
+@pytest.fixture(autouse=True)
+def histogramas(monkeypatch):
+    """Histogramas novos a cada teste (são globais do processo)"""
+    novos = {}
+    monkeypatch.setattr(instrumentacao, 'HISTOGRAMAS', novos)
+    return novos
+
+
+def test_histograma_acumula_por_bucket():
+    histograma = Histograma()
+    for ms in (0.5, 1, 3, 20000):
+        histograma.observar(ms)
+    acumuladas, soma, total = histograma.retrato()
+    assert len(acumuladas) == len(LIMITES_MS) + 1
+    # le="1" inclui o próprio limite; acima do último só entra em +Inf
+    assert acumuladas[:3] == [2, 2, 3]
+    assert acumuladas[-2:] == [3, 4]
+    assert (soma, total) == (20004.5, 4)
+
+
+def test_texto_no_formato_do_prometheus():
+    with medir('redis', 'GET'):
+        pass
+    instrumentacao.registrar('http', 'servico"a', 0.004)
+    texto = texto_metricas()
+    assert '# TYPE dependencia_duracao_ms histogram' in texto
+    assert 'dependencia_duracao_ms_bucket{tipo="http",alvo="servico\\"a",le="5"} 1' in texto
+    assert 'dependencia_duracao_ms_bucket{tipo="http",alvo="servico\\"a",le="2.5"} 0' in texto
+    assert 'dependencia_duracao_ms_count{tipo="redis",alvo="GET"} 1' in texto
+    assert 'dependencia_duracao_ms_sum{tipo="http",alvo="servico\\"a"} 4.000' in texto
+    assert texto.endswith('\n')
+
+
+def test_resumo_e_server_timing():
+    resumo = resumo_chamadas([('http', 'a', 2.0), ('fila', 'x', 1.0), ('db', 'SELECT', 1.5), ('http', 'b', 0.5)])
+    assert list(resumo) == ['db', 'http', 'fila']
+    assert resumo['http'] == (2, 2.5)
+    assert server_timing(resumo, 10) == (
+        'db;dur=1.50;desc="1 chamada", http;dur=2.50;desc="2 chamadas", '
+        'fila;dur=1.00;desc="1 chamada", total;dur=10.00'
+    )
+
+
+def test_cursor_mede_execute_pela_operacao():
+    class Cursor:
+        rowcount = 3
+
+        def execute(self, sql, parametros=None):
+            return 'ok'
+
+        def __iter__(self):
+            return iter([(1,), (2,)])
+
+    cursor = CursorInstrumentado(Cursor())
+    assert cursor.execute('  select * from usuarios') == 'ok'
+    cursor.execute(b'INSERT INTO logs VALUES (%s)', ('x',))
+    assert cursor.rowcount == 3
+    assert list(cursor) == [(1,), (2,)]
+    series = {rotulos for metrica, rotulos in instrumentacao.HISTOGRAMAS}
+    assert series == {(('tipo', 'db'), ('alvo', 'SELECT')), (('tipo', 'db'), ('alvo', 'INSERT'))}
+
+
+@pytest.fixture
+def app():
+    servico = Flask('servico')
+
+    @servico.route('/dados')
+    def dados():
+        return {'ok': True}
+
+    sessao = sessao_local({'http://servico:5001': servico})
+    app = Flask(__name__)
+    instalar_instrumentacao(app)
+
+    @app.route('/compor/<int:vezes>')
+    def compor(vezes):
+        for _ in range(vezes):
+            sessao.get('http://servico:5001/dados')
+        return {'vezes': vezes}
+
+    @app.route('/paralelo')
+    def paralelo():
+        # Só a thread que roda numa cópia do contexto entra na requisição
+        copiada = threading.Thread(target=contextvars.copy_context().run, args=(sessao.get, 'http://servico:5001/dados'))
+        solta = threading.Thread(target=sessao.get, args=('http://servico:5001/dados',))
+        for thread in (copiada, solta):
+            thread.start()
+            thread.join()
+        return {}
+
+    @app.route('/redis')
+    def usar_redis():
+        cliente = fakeredis.FakeRedis()
+        cliente.set('chave', 1)
+        with cliente.pipeline() as pipe:
+            pipe.get('chave').incr('chave').execute()
+        return {}
+
+    return app
+
+
+def test_server_timing_soma_as_chamadas_da_requisicao(app):
+    cliente = app.test_client()
+    cabecalho = cliente.get('/compor/3').headers['Server-Timing']
+    assert cabecalho.startswith('http;dur=')
+    assert 'desc="3 chamadas"' in cabecalho
+    assert ', total;dur=' in cabecalho
+    assert cliente.get('/compor/0').headers['Server-Timing'].startswith('total;dur=')
+
+
+def test_thread_so_conta_com_o_contexto_copiado(app):
+    cabecalho = app.test_client().get('/paralelo').headers['Server-Timing']
+    assert 'desc="1 chamada"' in cabecalho
+    series = instrumentacao.HISTOGRAMAS[('dependencia_duracao_ms', (('tipo', 'http'), ('alvo', 'servico:5001')))]
+    assert series.total == 2
+
+
+def test_redis_comandos_e_pipeline(app):
+    cabecalho = app.test_client().get('/redis').headers['Server-Timing']
+    assert cabecalho.startswith('redis;dur=')
+    alvos = {dict(rotulos)['alvo'] for metrica, rotulos in instrumentacao.HISTOGRAMAS if dict(rotulos).get('tipo') == 'redis'}
+    assert {'SET', 'PIPELINE'} <= alvos
+
+
+def test_metricas_por_rota(app):
+    cliente = app.test_client()
+    cliente.get('/compor/1')
+    cliente.get('/compor/2')
+    cliente.get('/inexistente')
+    resposta = cliente.get('/metrics')
+    assert resposta.mimetype == 'text/plain'
+    texto = resposta.get_data(as_text=True)
+    assert 'requisicao_duracao_ms_count{metodo="GET",rota="/compor/<int:vezes>"} 2' in texto
+    assert 'requisicao_duracao_ms_count{metodo="GET",rota="desconhecida"} 1' in texto
+
+
+def test_linha_de_log_por_requisicao(app, monkeypatch, capsys):
+    monkeypatch.setattr(instrumentacao, 'INSTRUMENTACAO_LOG', True)
+    app.test_client().get('/compor/2')
+    linha = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert linha['evento'] == 'requisicao'
+    assert linha['rota'] == '/compor/<int:vezes>'
+    assert linha['status'] == 200
+    assert linha['chamadas']['http']['quantidade'] == 2
+
+
+def test_fora_de_requisicao_so_alimenta_o_histograma():
+    instrumentacao.registrar('db', 'SELECT', 0.001)
+    assert instrumentacao._CHAMADAS.get() is None
+    assert instrumentacao.HISTOGRAMAS[('dependencia_duracao_ms', (('tipo', 'db'), ('alvo', 'SELECT')))].total == 1
+
+
+def test_desabilitada_nao_instala_nada(monkeypatch):
+    monkeypatch.setattr(instrumentacao, 'INSTRUMENTACAO_HABILITADA', False)
+    app = Flask(__name__)
+    instalar_instrumentacao(app)
+    app.add_url_rule('/', 'raiz', lambda: 'ok')
+    cliente = app.test_client()
+    assert 'Server-Timing' not in cliente.get('/').headers
+    assert cliente.get('/metrics').status_code == 404
+
+
+def test_quart_mede_chamadas_httpx():
+    quart = pytest.importorskip('quart')
+    import httpx
+
+    app = quart.Quart(__name__)
+    instalar_instrumentacao(app)
+
+    @app.route('/compor')
+    async def compor():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200))) as cliente:
+            await asyncio.gather(*(cliente.get('http://servico:5001/dados') for _ in range(2)))
+        return {}
+
+    async def cenario():
+        resposta = await app.test_client().get('/compor')
+        assert 'desc="2 chamadas"' in resposta.headers['Server-Timing']
+
+    asyncio.run(cenario())
@@ -0,0 +1,111 @@
+"""Paginação por cursor e por offset: percurso completo e parâmetros inválidos"""
+import base64
+import json
+
+import pytest
+
+from plataforma.paginacao import (
+    PaginacaoInvalida,
+    codificar_cursor,
+    ler_offset,
+    ler_paginacao,
+    link_proximo,
+    paginar
+)
+
+CAMPOS = {'id': int, 'nome': str, 'total': float}
+
+ITENS = [
+    {'id': i, 'nome': f"nome {i % 4}", 'total': (i * 7) % 5 + 0.5}
+    for i in range(1, 24)
+]
+
+
+def cursor_bruto(valor):
+    """Cursor com um conteúdo JSON qualquer, como um cliente poderia forjar"""
+    return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip('=')
+
+
+def ordenados(sort):
+    campo = sort.lstrip('-')
+    return sorted(ITENS, key=lambda item: (item[campo], item['id']), reverse=sort.startswith('-'))
+
+
+def percorrer(sort, limit):
+    vistos = []
+    cursor = None
+    while True:
+        args = {'sort': sort, 'limit': str(limit)}
+        if cursor:
+            args['cursor'] = cursor
+        limite, decodificado, sort_lido = ler_paginacao(args, CAMPOS)
+        pagina, cursor = paginar(ITENS, limite, decodificado, sort_lido)
+        assert len(pagina) <= limit
+        vistos.extend(pagina)
+        if cursor is None:
+            return vistos
+
+
+@pytest.mark.parametrize('sort', ['id', '-id', 'nome', '-nome', 'total', '-total'])
+def test_percorre_todos_os_itens_sem_repetir(sort):
+    assert percorrer(sort, 5) == ordenados(sort)
+
+
+def test_sem_limit_nem_cursor_retorna_tudo():
+    assert ler_paginacao({}, CAMPOS) == (None, None, 'id')
+    assert paginar(ITENS) == (ITENS, None)
+
+
+@pytest.mark.parametrize('args, mensagem', [
+    ({'sort': 'email'}, 'sort deve ser um de'),
+    ({'limit': 'dez'}, 'limit deve ser um número'),
+    ({'limit': '0'}, 'limit deve ser maior que zero'),
+    ({'cursor': 'não é base64!'}, 'cursor inválido'),
+    ({'cursor': cursor_bruto({'sort': 'id'})}, 'cursor inválido'),
+    ({'cursor': cursor_bruto(['id', 1])}, 'cursor inválido'),
+    ({'cursor': cursor_bruto([1, 1, 1])}, 'cursor inválido'),
+    ({'cursor': cursor_bruto(['id', 1, '1'])}, 'cursor inválido'),
+    ({'cursor': cursor_bruto(['id', 1, True])}, 'cursor inválido'),
+    ({'cursor': cursor_bruto(['id', 'um', 1])}, 'cursor inválido'),
+    ({'sort': 'nome', 'cursor': cursor_bruto(['nome', 3, 1])}, 'cursor inválido'),
+    ({'sort': 'total', 'cursor': cursor_bruto(['total', None, 1])}, 'cursor inválido'),
+    ({'sort': 'nome', 'cursor': codificar_cursor('id', 1, 1)}, 'cursor gerado com outro sort')
+])
+def test_parametros_invalidos(args, mensagem):
+    with pytest.raises(PaginacaoInvalida, match=mensagem):
+        ler_paginacao(args, CAMPOS)
+
+
+def test_cursor_de_float_aceita_inteiro():
+    args = {'sort': 'total', 'cursor': codificar_cursor('total', 2, 1)}
+    assert ler_paginacao(args, CAMPOS)[1] == ('total', 2, 1)
+
+
+@pytest.mark.parametrize('sort', ['id', '-id', 'nome', '-total'])
+@pytest.mark.parametrize('offset, limit', [(0, 5), (5, 5), (20, 5), (30, 5), (3, None)])
+def test_offset_pula_os_primeiros_da_ordem(sort, offset, limit):
+    pagina, proximo = paginar(ITENS, limit, None, sort, offset)
+    fim = None if limit is None else offset + limit
+    assert pagina == ordenados(sort)[offset:fim]
+    assert (proximo is not None) == (fim is not None and fim < len(ITENS))
+
+
+@pytest.mark.parametrize('args, mensagem', [
+    ({'offset': 'dois'}, 'offset deve ser um número'),
+    ({'offset': '-1'}, 'offset não pode ser negativo')
+])
+def test_offset_invalido(args, mensagem):
+    with pytest.raises(PaginacaoInvalida, match=mensagem):
+        ler_offset(args, None)
+
+
+def test_offset_nao_combina_com_cursor():
+    assert ler_offset({}, None) == 0
+    assert ler_offset({'offset': '4'}, None) == 4
+    with pytest.raises(PaginacaoInvalida, match='cursor'):
+        ler_offset({'offset': '4'}, ('id', 1, 1))
+
+
+def test_link_da_proxima_pagina_troca_offset_por_cursor():
+    link = link_proximo({'offset': '10', 'limit': '5', 'perfil': 'cliente'}, 'abc', 5)
+    assert link == {'Link': '<?perfil=cliente&limit=5&cursor=abc>; rel="next"'}
@@ -0,0 +1,138 @@
+"""Perfilador: amostragem das pilhas, formato collapsed, autorização e registro da rota"""
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+from flask import Flask
+
+from plataforma import perfilador
+from plataforma.perfilador import amostrar, autorizado, colapsar, instalar_perfilador
+
+TOKEN = 'segredo'
+
+
+@pytest.fixture
+def habilitado(monkeypatch):
+    monkeypatch.setattr(perfilador, 'PERFILADOR_HABILITADO', True)
+    monkeypatch.setattr(perfilador, 'PERFILADOR_TOKEN', TOKEN)
+    monkeypatch.setattr(perfilador, 'PERFILADOR_INTERVALO_MS', 1)
+    monkeypatch.setattr(perfilador, 'PERFILADOR_MAX_SEGUNDOS', 2)
+
+
+def funcao_ocupada(parar):
+    while not parar.is_set():
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def thread_ocupada():
+    parar = threading.Event()
+    thread = threading.Thread(target=funcao_ocupada, args=(parar,), name='ocupada')
+    thread.start()
+    yield thread
+    parar.set()
+    thread.join()
+
+
+def test_amostra_as_outras_threads(thread_ocupada):
+    pilhas, amostragens = amostrar(0.05, 0.005)
+    assert amostragens >= 2
+    ocupada = [(pilha, contagem) for pilha, contagem in pilhas.items() if pilha.startswith('ocupada;')]
+    assert ocupada
+    pilha, contagem = max(ocupada, key=lambda item: item[1])
+    assert 'funcao_ocupada (test_perfilador.py:' in pilha
+    assert contagem <= amostragens
+    # A thread que amostra não entra nas pilhas
+    assert not any('amostrar (perfilador.py' in pilha for pilha in pilhas)
+
+
+def test_por_linha_troca_a_primeira_linha_pela_atual(thread_ocupada):
+    primeira = funcao_ocupada.__code__.co_firstlineno
+    por_funcao = ''.join(amostrar(0.02, 0.005)[0])
+    por_linha = ''.join(amostrar(0.02, 0.005, por_linha=True)[0])
+    assert f'funcao_ocupada (test_perfilador.py:{primeira})' in por_funcao
+    assert f'funcao_ocupada (test_perfilador.py:{primeira + 2})' in por_linha
+
+
+def test_colapsar_em_ordem_de_frequencia():
+    assert colapsar(Counter({'a;b': 2, 'a;c': 5})) == 'a;c 5\na;b 2\n'
+    assert colapsar(Counter()) == ''
+
+
+@pytest.mark.parametrize('cabecalho, esperado', [
+    (f'Bearer {TOKEN}', True),
+    (f'bearer {TOKEN} ', True),
+    ('Bearer errado', False),
+    (f'Basic {TOKEN}', False),
+    ('Bearer ', False),
+    (None, False)
+])
+def test_autorizacao(habilitado, cabecalho, esperado):
+    assert autorizado(cabecalho) is esperado
+
+
+def test_desabilitado_ou_sem_token_nao_registra(monkeypatch, capsys):
+    app = Flask(__name__)
+    instalar_perfilador(app)
+    assert app.test_client().get('/debug/profile').status_code == 404
+
+    monkeypatch.setattr(perfilador, 'PERFILADOR_HABILITADO', True)
+    app = Flask(__name__)
+    instalar_perfilador(app)
+    assert app.test_client().get('/debug/profile').status_code == 404
+    assert 'sem PERFILADOR_TOKEN' in capsys.readouterr().out
+
+
+@pytest.fixture
+def cliente(habilitado):
+    app = Flask(__name__)
+    instalar_perfilador(app)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('query, cabecalho, status', [
+    ('seconds=0.01', None, 401),
+    ('seconds=0.01', 'Bearer errado', 401),
+    ('seconds=dez', f'Bearer {TOKEN}', 400),
+    ('seconds=0', f'Bearer {TOKEN}', 400),
+    ('seconds=3', f'Bearer {TOKEN}', 400),
+    ('seconds=nan', f'Bearer {TOKEN}', 400)
+])
+def test_requisicoes_recusadas(cliente, query, cabecalho, status):
+    headers = {'Authorization': cabecalho} if cabecalho else {}
+    assert cliente.get(f'/debug/profile?{query}', headers=headers).status_code == status
+
+
+def test_rota_devolve_o_perfil(cliente, thread_ocupada):
+    resposta = cliente.get('/debug/profile?seconds=0.05', headers={'Authorization': f'Bearer {TOKEN}'})
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'text/plain'
+    assert int(resposta.headers['X-Perfilador-Amostragens']) >= 2
+    linhas = resposta.get_data(as_text=True).splitlines()
+    assert any(linha.startswith('ocupada;') and 'funcao_ocupada' in linha for linha in linhas)
+    assert all(linha.rsplit(' ', 1)[1].isdigit() for linha in linhas)
+
+
+def test_uma_amostragem_por_vez(cliente):
+    with perfilador._EM_ANDAMENTO:
+        resposta = cliente.get('/debug/profile?seconds=0.01', headers={'Authorization': f'Bearer {TOKEN}'})
+    assert resposta.status_code == 409
+    assert not perfilador._EM_ANDAMENTO.locked()
+
+
+def test_quart_amostra_fora_do_laco_de_eventos(habilitado):
+    quart = pytest.importorskip('quart')
+    app = quart.Quart(__name__)
+    instalar_perfilador(app)
+
+    async def cenario():
+        cliente = app.test_client()
+        assert (await cliente.get('/debug/profile?seconds=0.01')).status_code == 401
+        resposta = await cliente.get('/debug/profile?seconds=0.05', headers={'Authorization': f'Bearer {TOKEN}'})
+        assert resposta.status_code == 200
+        # O laço de eventos está em outra thread que a amostragem, e aparece no perfil
+        assert 'MainThread;' in await resposta.get_data(as_text=True)
+
+    asyncio.run(cenario())
@@ -0,0 +1,187 @@
+"""Diario: snapshot + log, linha incompleta, falha de gravação e trava do diretório"""
+import errno
+import os
+import threading
+
+import pytest
+
+import plataforma.persistencia as persistencia
+from plataforma.persistencia import Diario, DiarioEmUso
+
+
+class Estado:
+    """Estado mínimo de um serviço: chave -> valor, alterado sob lock"""
+
+    def __init__(self):
+        self.itens = {}
+        self.lock = threading.Lock()
+
+    def carregar(self, estado):
+        self.itens = dict(estado['itens'])
+
+    def aplicar(self, registro):
+        self.itens[registro['chave']] = registro['valor']
+
+    def exportar(self):
+        return {'itens': dict(self.itens)}
+
+    def gravar(self, diario, chave, valor):
+        with self.lock:
+            self.itens[chave] = valor
+            lsn = diario.anexar({'chave': chave, 'valor': valor})
+        diario.aguardar(lsn)
+        return lsn
+
+
+def abrir(diretorio):
+    """Abre o Diario como os serviços: estado vazio gravado em snapshot"""
+    diario = Diario(str(diretorio))
+    estado = Estado()
+    if not diario.abrir(estado.carregar, estado.aplicar, estado.exportar, estado.lock):
+        diario.snapshot()
+    return diario, estado
+
+
+def reabrir(diario, diretorio):
+    """Fecha o diário e abre de novo, como após um restart do processo"""
+    diario.fechar()
+    return abrir(diretorio)
+
+
+def segmentos(diretorio):
+    return sorted(nome for nome in os.listdir(diretorio) if nome.startswith('wal-'))
+
+
+def test_reabrir_reaplica_o_log_sobre_o_snapshot(tmp_path):
+    diario, estado = abrir(tmp_path)
+    estado.gravar(diario, 'a', 1)
+    estado.gravar(diario, 'b', 2)
+    estado.gravar(diario, 'a', 3)
+
+    diario, estado = reabrir(diario, tmp_path)
+    assert estado.itens == {'a': 3, 'b': 2}
+    assert diario.recuperacao['lsn'] == 3
+    assert diario.recuperacao['registros_reaplicados'] == 3
+
+    # Os LSNs continuam depois dos recuperados
+    assert estado.gravar(diario, 'c', 4) == 4
+
+
+def test_snapshot_descarta_os_segmentos_incluidos(tmp_path):
+    diario, estado = abrir(tmp_path)
+    estado.gravar(diario, 'a', 1)
+    estado.gravar(diario, 'b', 2)
+    diario.snapshot()
+    assert segmentos(tmp_path) == []
+
+    estado.gravar(diario, 'c', 3)
+    diario, estado = reabrir(diario, tmp_path)
+    assert estado.itens == {'a': 1, 'b': 2, 'c': 3}
+    assert diario.recuperacao['snapshot_lsn'] == 2
+    assert diario.recuperacao['registros_reaplicados'] == 1
+
+
+def test_linha_incompleta_e_truncada_na_recuperacao(tmp_path):
+    diario, estado = abrir(tmp_path)
+    estado.gravar(diario, 'a', 1)
+    caminho = os.path.join(tmp_path, segmentos(tmp_path)[-1])
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, 'ab') as arquivo:
+        arquivo.write(b'{"chave":"b","valor":2,"ls')
+
+    diario, estado = reabrir(diario, tmp_path)
+    assert estado.itens == {'a': 1}
+    assert os.path.getsize(caminho) == tamanho
+
+    # O próximo registro não pode ficar colado ao pedaço incompleto
+    estado.gravar(diario, 'c', 3)
+    diario, estado = reabrir(diario, tmp_path)
+    assert estado.itens == {'a': 1, 'c': 3}
+
+
+def test_falha_de_gravacao_desfaz_o_registro(tmp_path, monkeypatch):
+    diario, estado = abrir(tmp_path)
+    estado.gravar(diario, 'a', 1)
+
+    fsync = os.fsync
+    falhar = [True]
+
+    def fsync_sem_espaco(fd):
+        if falhar and diario._arquivo is not None and fd == diario._arquivo.fileno():
+            falhar.clear()
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+        fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', fsync_sem_espaco)
+    with estado.lock:
+        estado.itens['b'] = 2
+        lsn_falho = diario.anexar({'chave': 'b', 'valor': 2})
+    with pytest.raises(IOError):
+        diario.aguardar(lsn_falho)
+
+    # A memória volta ao que está no disco (lida sob o lock, como nos
+    # serviços), e o serviço continua gravando
+    with estado.lock:
+        assert estado.itens == {'a': 1}
+    lsn = estado.gravar(diario, 'c', 3)
+    assert lsn > lsn_falho
+    with pytest.raises(IOError):
+        diario.aguardar(lsn_falho)
+
+    diario, estado = reabrir(diario, tmp_path)
+    assert estado.itens == {'a': 1, 'c': 3}
+
+
+def test_diretorio_aberto_por_outro_diario_falha(tmp_path):
+    diario, estado = abrir(tmp_path)
+    estado.gravar(diario, 'a', 1)
+    with pytest.raises(DiarioEmUso):
+        abrir(tmp_path)
+
+    # O diário que falhou não alterou nada; depois de fechado, o diretório é liberado
+    assert estado.gravar(diario, 'b', 2) == 2
+    diario.fechar()
+    with pytest.raises(IOError):
+        diario.anexar({'chave': 'c', 'valor': 3})
+    diario, estado = abrir(tmp_path)
+    assert estado.itens == {'a': 1, 'b': 2}
+
+
+def test_trava_vale_entre_processos(tmp_path):
+    if persistencia.fcntl is None:
+        pytest.skip("sem fcntl")
+    abrir(tmp_path)
+    pid = os.fork()
+    if pid == 0:
+        # Processo filho: um descritor novo do mesmo arquivo não obtém o flock
+        try:
+            Diario(str(tmp_path)).abrir(None, None, None, None)
+            codigo = 1
+        except DiarioEmUso:
+            codigo = 0
+        except BaseException:
+            codigo = 2
+        os._exit(codigo)
+    assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+
+
+def test_snapshot_serializa_fora_do_lock(tmp_path, monkeypatch):
+    diario, estado = abrir(tmp_path)
+    estado.gravar(diario, 'a', 1)
+    serializacoes = []
+    dumps = persistencia.json.dumps
+
+    def dumps_espiando(valor, **kwargs):
+        if isinstance(valor, dict) and 'estado' in valor:
+            # Uma escrita durante a serialização não entra no snapshot
+            serializacoes.append(estado.lock.locked())
+            estado.itens['b'] = 2
+        return dumps(valor, **kwargs)
+
+    monkeypatch.setattr(persistencia.json, 'dumps', dumps_espiando)
+    diario.snapshot()
+    monkeypatch.undo()
+
+    assert serializacoes == [False]
+    diario, estado = reabrir(diario, tmp_path)
+    assert estado.itens == {'a': 1}
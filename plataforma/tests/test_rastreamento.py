@@ -0,0 +1,210 @@
+"""Rastreamento: traceparent, spans entre serviços, exportação e caminho crítico"""
+import asyncio
+import json
+import sys
+
+import httpx
+import pytest
+import requests
+from flask import Flask, request
+from requests.adapters import BaseAdapter
+
+from carga.locais import sessao_local
+from plataforma import rastreamento
+from plataforma.rastreamento import caminho_critico, instalar_rastreamento, ler_traceparent
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PAI_ID = '00f067aa0ba902b7'
+
+
+class AdaptadorFora(BaseAdapter):
+    """Serviço fora do ar"""
+
+    def send(self, request, **kwargs):
+        raise requests.ConnectionError(f"Conexão recusada: {request.url}")
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    """Spans exportados, em ordem de término"""
+    exportados = []
+    monkeypatch.setattr(rastreamento, 'exportar', exportados.append)
+    return exportados
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    (f'00-{TRACE_ID}-{PAI_ID}-01', (TRACE_ID, PAI_ID, True)),
+    (f' 00-{TRACE_ID.upper()}-{PAI_ID}-00 ', (TRACE_ID, PAI_ID, False)),
+    (f'00-{TRACE_ID}-{PAI_ID}-03', (TRACE_ID, PAI_ID, True)),
+    (None, None),
+    ('', None),
+    (f'ff-{TRACE_ID}-{PAI_ID}-01', None),
+    (f'00-{"0" * 32}-{PAI_ID}-01', None),
+    (f'00-{TRACE_ID}-{"0" * 16}-01', None),
+    (f'00-{TRACE_ID[:-1]}-{PAI_ID}-01', None),
+    (f'00-{TRACE_ID}-{PAI_ID}-01-extra', None)
+])
+def test_ler_traceparent(valor, esperado):
+    assert ler_traceparent(valor) == esperado
+
+
+@pytest.fixture
+def servicos():
+    """gateway → usuarios, os dois rastreados, ligados sem rede"""
+    usuarios = Flask('usuarios')
+    instalar_rastreamento(usuarios, 'usuarios')
+
+    @usuarios.route('/api/usuarios/<int:usuario_id>')
+    def obter(usuario_id):
+        if usuario_id == 500:
+            return {'erro': 'falha'}, 500
+        return {'id': usuario_id, 'traceparent': request.headers.get('traceparent')}
+
+    sessao = sessao_local({'http://usuarios:5001': usuarios})
+    sessao.mount('http://fora:5002', AdaptadorFora())
+    gateway = Flask('gateway')
+    instalar_rastreamento(gateway, 'gateway')
+
+    @gateway.route('/users/<int:usuario_id>')
+    def usuario(usuario_id):
+        resposta = sessao.get(f'http://usuarios:5001/api/usuarios/{usuario_id}')
+        return resposta.json(), resposta.status_code
+
+    @gateway.route('/fora')
+    def fora():
+        sessao.get('http://fora:5002/')
+        return {}
+
+    return gateway
+
+
+def test_um_trace_atravessa_os_servicos(servicos, spans):
+    resposta = servicos.test_client().get('/users/7')
+    assert resposta.status_code == 200
+    servidor_usuarios, cliente, servidor_gateway = spans
+
+    assert {span['trace_id'] for span in spans} == {resposta.headers['X-Trace-Id']}
+    assert servidor_gateway['pai_id'] is None
+    assert (servidor_gateway['servico'], servidor_gateway['tipo']) == ('gateway', 'servidor')
+    assert servidor_gateway['nome'] == 'GET /users/<int:usuario_id>'
+    assert (cliente['pai_id'], cliente['tipo'], cliente['servico']) == (servidor_gateway['span_id'], 'cliente', 'gateway')
+    assert cliente['nome'] == 'GET usuarios:5001/api/usuarios/7'
+    assert cliente['atributos']['http.status_code'] == 200
+    assert (servidor_usuarios['pai_id'], servidor_usuarios['servico']) == (cliente['span_id'], 'usuarios')
+    assert resposta.get_json()['traceparent'] == f"00-{cliente['trace_id']}-{cliente['span_id']}-01"
+
+
+def test_continua_o_trace_recebido(servicos, spans):
+    servicos.test_client().get('/users/7', headers={'traceparent': f'00-{TRACE_ID}-{PAI_ID}-01'})
+    assert {span['trace_id'] for span in spans} == {TRACE_ID}
+    assert spans[-1]['pai_id'] == PAI_ID
+
+
+def test_trace_nao_amostrado_propaga_sem_exportar(servicos, spans):
+    resposta = servicos.test_client().get('/users/7', headers={'traceparent': f'00-{TRACE_ID}-{PAI_ID}-00'})
+    assert spans == []
+    assert resposta.headers['X-Trace-Id'] == TRACE_ID
+    assert resposta.get_json()['traceparent'].endswith('-00')
+
+
+def test_amostragem_dos_traces_iniciados(servicos, spans, monkeypatch):
+    monkeypatch.setattr(rastreamento, 'RASTREAMENTO_AMOSTRAGEM', 0.0)
+    servicos.test_client().get('/users/7')
+    assert spans == []
+
+
+def test_erros_marcam_os_spans(servicos, spans):
+    servicos.test_client().get('/users/500')
+    assert [span['erro'] for span in spans] == [True, True, True]
+
+    spans.clear()
+    assert servicos.test_client().get('/fora').status_code == 500
+    cliente, servidor = spans
+    assert cliente['erro'] and cliente['atributos']['erro'] == 'ConnectionError'
+    assert servidor['erro'] and servidor['atributos']['erro'] == 'ConnectionError'
+
+
+def test_sem_requisicao_nao_ha_span(spans):
+    sessao_local({'http://servico:5001': Flask('servico')}).get('http://servico:5001/')
+    assert spans == []
+
+
+def test_exporta_linhas_json_no_arquivo(tmp_path, monkeypatch):
+    saida = tmp_path / 'spans.jsonl'
+    monkeypatch.setattr(rastreamento, 'RASTREAMENTO_SAIDA', str(saida))
+    monkeypatch.setattr(rastreamento, '_arquivo', None)
+    rastreamento.Span('tarefa', 'interno', 'teste').terminar()
+    rastreamento.Span('tarefa', 'interno', 'teste').terminar()
+    rastreamento._arquivo.close()
+    linhas = [json.loads(linha) for linha in saida.read_text().splitlines()]
+    assert [linha['nome'] for linha in linhas] == ['tarefa', 'tarefa']
+
+
+def span(span_id, pai_id, inicio, duracao, nome=None):
+    return {
+        'trace_id': TRACE_ID, 'span_id': span_id, 'pai_id': pai_id, 'servico': 'teste',
+        'nome': nome or span_id, 'tipo': 'servidor', 'inicio_us': inicio, 'duracao_us': duracao, 'erro': False
+    }
+
+
+TRACE = [
+    span('raiz', None, 0, 100),
+    span('a', 'raiz', 5, 30),     # paralelo a b, termina antes
+    span('b', 'raiz', 5, 50),     # crítico
+    span('c', 'raiz', 60, 35),    # crítico, depois de b
+    span('b1', 'b', 10, 40),      # crítico dentro de b
+    span('fora', 'raiz', 90, 20)  # termina depois da raiz (relógios), aceito como último
+]
+
+
+def test_caminho_critico():
+    filhos = {}
+    for item in TRACE[1:]:
+        filhos.setdefault(item['pai_id'], []).append(item)
+    assert [item['span_id'] for item in caminho_critico(TRACE[0], filhos)] == ['raiz', 'b', 'b1', 'fora']
+
+    sem_fora = {pai: [item for item in lista if item['span_id'] != 'fora'] for pai, lista in filhos.items()}
+    assert [item['span_id'] for item in caminho_critico(TRACE[0], sem_fora)] == ['raiz', 'b', 'b1', 'c']
+
+
+def test_cli_analisa_o_trace(tmp_path, monkeypatch, capsys):
+    arquivo = tmp_path / 'spans.jsonl'
+    arquivo.write_text('log que não é span\n' + ''.join(json.dumps(item) + '\n' for item in TRACE[:-1]))
+
+    monkeypatch.setattr(sys, 'argv', ['rastreamento', str(arquivo), '--trace', TRACE_ID])
+    rastreamento.main()
+    saida = capsys.readouterr().out
+    assert f'Trace {TRACE_ID}: teste: raiz (0.10 ms, 5 spans)' in saida
+    criticos = [linha.split()[-1] for linha in saida.splitlines() if linha.startswith('*')]
+    assert criticos == ['raiz', 'b', 'b1', 'c']
+
+    monkeypatch.setattr(sys, 'argv', ['rastreamento', str(arquivo), '--trace', 'inexistente'])
+    with pytest.raises(SystemExit, match='não encontrado'):
+        rastreamento.main()
+
+
+def test_quart_propaga_pelo_httpx(spans):
+    quart = pytest.importorskip('quart')
+    recebidos = []
+
+    def tratar(requisicao):
+        recebidos.append(requisicao.headers.get('traceparent'))
+        return httpx.Response(200)
+
+    app = quart.Quart('gateway')
+    instalar_rastreamento(app, 'gateway')
+
+    @app.route('/compor')
+    async def compor():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(tratar)) as cliente:
+            await asyncio.gather(cliente.get('http://usuarios:5001/a'), cliente.get('http://pedidos:5002/b'))
+        return {}
+
+    asyncio.run(app.test_client().get('/compor'))
+    servidor = spans[-1]
+    clientes = spans[:-1]
+    assert {item['pai_id'] for item in clientes} == {servidor['span_id']}
+    assert sorted(recebidos) == sorted(f"00-{item['trace_id']}-{item['span_id']}-01" for item in clientes)
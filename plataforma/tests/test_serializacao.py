@@ -0,0 +1,67 @@
+"""Serialização JSON: formato comum, diferenças do orjson e inteiros grandes"""
+import decimal
+import json
+import math
+import uuid
+from datetime import date, datetime, time
+
+import pytest
+
+from plataforma import serializacao
+from plataforma.serializacao import _serializar_padrao, desserializar, serializar
+
+COMUM = {
+    'id': 7,
+    'nome': 'José',
+    'criado_em': datetime(2025, 10, 19, 16, 34, 34, 120000),
+    'dia': date(2025, 10, 19),
+    'hora': time(8, 30),
+    'valor': decimal.Decimal('10.50'),
+    'codigo': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'itens': [1, 2.5, None, True],
+    'por_id': {3: 'c', 1: 'a'}
+}
+
+ESPERADO = (
+    '{"codigo":"12345678-1234-5678-1234-567812345678","criado_em":"2025-10-19T16:34:34.120000",'
+    '"dia":"2025-10-19","hora":"08:30:00","id":7,"itens":[1,2.5,null,true],"nome":"José",'
+    '"por_id":{"1":"a","3":"c"},"valor":"10.50"}'
+).encode('utf-8')
+
+CODIFICADORES = [pytest.param(_serializar_padrao, id='padrao'), pytest.param(serializar, id='atual')]
+
+
+@pytest.mark.parametrize('codificar', CODIFICADORES)
+def test_formato_comum(codificar):
+    assert codificar(COMUM) == ESPERADO
+    assert desserializar(codificar(COMUM))['por_id'] == {'1': 'a', '3': 'c'}
+
+
+@pytest.mark.parametrize('codificar', CODIFICADORES)
+@pytest.mark.parametrize('valor', [2 ** 64, -2 ** 63 - 1, 10 ** 30])
+def test_inteiro_alem_de_64_bits(codificar, valor):
+    assert codificar({'n': [valor]}) == f'{{"n":[{valor}]}}'.encode()
+    assert json.loads(codificar({valor: 1})) == {str(valor): 1}
+
+
+@pytest.mark.parametrize('codificar', CODIFICADORES)
+def test_tipo_desconhecido_continua_falhando(codificar):
+    with pytest.raises(TypeError):
+        codificar({'n': object()})
+
+
+def test_nao_finitos():
+    bruto = {'a': math.nan, 'b': math.inf}
+    assert _serializar_padrao(bruto) == b'{"a":NaN,"b":Infinity}'
+    if serializacao.orjson is None:
+        pytest.skip("orjson não instalado")
+    assert serializar(bruto) == b'{"a":null,"b":null}'
+    with pytest.raises(ValueError):
+        desserializar(b'{"a":NaN}')
+
+
+def test_ordem_de_chaves_inteiras():
+    if serializacao.orjson is None:
+        pytest.skip("orjson não instalado")
+    assert serializar({10: 'a', 9: 'b'}) == b'{"10":"a","9":"b"}'
+    assert _serializar_padrao({10: 'a', 9: 'b'}) == b'{"9":"b","10":"a"}'
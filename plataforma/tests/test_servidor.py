@@ -0,0 +1,92 @@
+"""Launcher de produção: configuração do gunicorn e carga da aplicação"""
+import pytest
+
+from plataforma import servidor
+
+VARIAVEIS = [
+    'HOST', 'PORT', 'WEB_APP', 'WEB_WORKERS', 'WEB_THREADS', 'WEB_WORKER_CLASS', 'WEB_PRELOAD',
+    'WEB_TIMEOUT', 'WEB_GRACEFUL_TIMEOUT', 'WEB_KEEPALIVE', 'WEB_MAX_REQUESTS', 'WEB_ACCESS_LOG',
+    'WEB_ESTADO_EM_MEMORIA', 'PERSISTENCIA_DIR'
+]
+
+
+@pytest.fixture(autouse=True)
+def ambiente(monkeypatch):
+    for nome in VARIAVEIS:
+        monkeypatch.delenv(nome, raising=False)
+    monkeypatch.setattr(servidor.multiprocessing, 'cpu_count', lambda: 2)
+    return monkeypatch
+
+
+def test_configuracao_padrao():
+    assert servidor.configuracao() == {
+        'bind': '0.0.0.0:5000',
+        'workers': 5,
+        'threads': 4,
+        'worker_class': 'gthread',
+        'preload_app': False,
+        'timeout': 30,
+        'graceful_timeout': 30,
+        'keepalive': 5,
+        'max_requests': 0,
+        'max_requests_jitter': 0,
+        'accesslog': '-'
+    }
+
+
+def test_configuracao_pelo_ambiente(ambiente):
+    for nome, valor in {
+        'PORT': '5002', 'WEB_WORKERS': '3', 'WEB_THREADS': '8', 'WEB_PRELOAD': 'true',
+        'WEB_MAX_REQUESTS': '1000', 'WEB_ACCESS_LOG': ''
+    }.items():
+        ambiente.setenv(nome, valor)
+    config = servidor.configuracao()
+    assert config['bind'] == '0.0.0.0:5002'
+    assert (config['workers'], config['threads'], config['preload_app']) == (3, 8, True)
+    assert (config['max_requests'], config['max_requests_jitter']) == (1000, 100)
+    assert config['accesslog'] is None
+
+
+@pytest.mark.parametrize('variaveis, forcado', [
+    ({'PERSISTENCIA_DIR': '/dados'}, True),
+    ({'WEB_ESTADO_EM_MEMORIA': 'true'}, True),
+    ({'PERSISTENCIA_DIR': '/dados', 'WEB_ESTADO_EM_MEMORIA': 'false'}, False),
+    ({}, False)
+])
+def test_estado_em_memoria_forca_um_worker_sem_preload(ambiente, capsys, variaveis, forcado):
+    ambiente.setenv('WEB_WORKERS', '4')
+    ambiente.setenv('WEB_PRELOAD', 'true')
+    for nome, valor in variaveis.items():
+        ambiente.setenv(nome, valor)
+
+    config = servidor.configuracao()
+    if forcado:
+        assert (config['workers'], config['preload_app']) == (1, False)
+        assert 'usando 1 worker sem preload' in capsys.readouterr().out
+    else:
+        assert (config['workers'], config['preload_app']) == (4, True)
+
+
+def test_carregar_aplicacao_do_diretorio_atual(tmp_path, ambiente):
+    (tmp_path / 'modulo_do_teste_servidor.py').write_text("app = 'wsgi'\noutra = 'asgi'\n")
+    ambiente.chdir(tmp_path)
+    ambiente.syspath_prepend(str(tmp_path))
+    assert servidor.carregar_aplicacao('modulo_do_teste_servidor:outra') == 'asgi'
+    assert servidor.carregar_aplicacao('modulo_do_teste_servidor') == 'wsgi'
+
+
+def test_main_usa_web_app_e_a_configuracao(ambiente, monkeypatch):
+    gunicorn = pytest.importorskip('gunicorn.app.base')
+    executados = []
+
+    def run(self):
+        self.load_config()
+        executados.append((self.load(), self.cfg.workers, self.cfg.threads, self.cfg.preload_app))
+
+    monkeypatch.setattr(gunicorn.BaseApplication, 'run', run)
+    monkeypatch.setattr(servidor, 'carregar_aplicacao', lambda alvo: alvo)
+    ambiente.setenv('WEB_APP', 'app_async:app')
+    ambiente.setenv('WEB_ESTADO_EM_MEMORIA', 'true')
+    ambiente.setenv('WEB_WORKERS', '3')
+    servidor.main(['app:app'])
+    assert executados == [('app_async:app', 1, 4, False)]